@@ -0,0 +1,275 @@
+"""
+Annuaire des scores par SIREN : « quel est le risque actuel de la société X ? » sans ressaisir ses caractéristiques.
+
+- construction hors ligne depuis la base scorée : clés SIREN triées (uint32) et colonnes alignées
+  (Prob_1an/2ans/3ans en float32, Statut_Expert, département et code APE encodés sur des vocabulaires,
+  dénomination en UTF-8 avec tableau d'offsets), un fichier .npy par colonne dans ANNUAIRE_DIR ;
+  le manifeste annuaire.json (vocabulaires, nombre de lignes, date) est écrit en dernier ;
+- chargement : np.load(mmap_mode="r"), quelques millisecondes quelle que soit la taille, les pages
+  ne sont lues qu'à la demande ;
+- requête : recherche dichotomique (np.searchsorted) sur les clés, unitaire ou en lot, sans pandas.
+  Un SIREN présent sur plusieurs lignes (établissements) renvoie une ligne par établissement.
+
+Usage (depuis src/api/api-business-risk) :
+    python annuaire.py --construire Dataset_Master_Predictions_2026.parquet --out models/annuaire
+    python annuaire.py --check 5800000
+"""
+import argparse
+import json
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from processing import LOCAL_ARTIFACTS_DIR
+
+# --- 1. CONFIGURATION ---
+ANNUAIRE_DIR = os.getenv("ANNUAIRE_DIR", os.path.join(LOCAL_ARTIFACTS_DIR or "models", "annuaire"))
+MANIFESTE = "annuaire.json"
+
+COL_SIREN = "SIREN"
+COL_DENOMINATION = "Dénomination"
+COL_STATUT = "Statut_Expert"
+COL_DEPT = "Code du département de l'établissement"
+COLS_APE = ["code_ape", "Activité principale de l'unité légale"]
+PROBABILITES = {"prob_1an": "Prob_1an", "prob_2ans": "Prob_2ans", "prob_3ans": "Prob_3ans"}
+VOCABULAIRES = ("statut", "departement", "ape")
+
+
+def normaliser_siren(valeur):
+    """SIREN (9 chiffres) ou SIRET (14 chiffres, dont le SIREN est le préfixe) -> entier ; ValueError sinon"""
+    texte = str(valeur).replace(" ", "").strip()
+    if not texte.isdigit() or len(texte) not in (9, 14):
+        raise ValueError(f"SIREN invalide : {valeur!r} (9 chiffres, ou SIRET à 14 chiffres)")
+    return int(texte[:9])
+
+
+# --- 2. CONSTRUCTION (HORS LIGNE, DEPUIS LA BASE SCORÉE) ---
+def _sauver(dossier, nom, tableau):
+    # Écriture puis renommage : une API qui a déjà projeté l'ancien fichier en mémoire le garde intact
+    temporaire = dossier / f"{nom}.tmp.npy"
+    np.save(temporaire, tableau)
+    os.replace(temporaire, dossier / f"{nom}.npy")
+
+
+def _encoder(series):
+    """Codes int16 (-1 si absent) et vocabulaire des valeurs"""
+    import pandas as pd
+
+    codes, vocabulaire = pd.factorize(series)
+    return codes.astype(np.int16), [str(v) for v in vocabulaire]
+
+
+def construire(df, dossier=ANNUAIRE_DIR):
+    """Écrit l'annuaire de `df` (colonnes de la base scorée) dans `dossier` et renvoie le manifeste"""
+    import pyarrow as pa
+
+    dossier = Path(dossier)
+    dossier.mkdir(parents=True, exist_ok=True)
+    sirens = df[COL_SIREN].astype(str).str.strip().str.zfill(9)
+    valides = sirens.str.fullmatch(r"\d{9}").to_numpy()
+    df, cles = df[valides], sirens[valides].astype(np.int64).to_numpy()
+    # Tri stable : les établissements d'un même SIREN gardent l'ordre de la base
+    ordre = np.argsort(cles, kind="stable")
+    df = df.iloc[ordre]
+
+    colonne_ape = next(c for c in COLS_APE if c in df.columns)
+    departements = df[COL_DEPT].astype(str).str.strip().str.replace(r"\.0$", "", regex=True).str.zfill(2)
+    vocabulaires = {}
+    for nom, brut, valeurs in (("statut", df[COL_STATUT], df[COL_STATUT].astype(str)),
+                               ("departement", df[COL_DEPT], departements),
+                               ("ape", df[colonne_ape], df[colonne_ape].astype(str))):
+        codes, vocabulaires[nom] = _encoder(valeurs.where(brut.notna()))
+        _sauver(dossier, nom, codes)
+    for nom, colonne in PROBABILITES.items():
+        _sauver(dossier, nom, df[colonne].to_numpy(dtype=np.float32))
+
+    noms = pa.array(df[COL_DENOMINATION].fillna("").astype(str).to_numpy(), pa.large_string())
+    offsets = np.frombuffer(noms.buffers()[1], dtype=np.int64)[:len(noms) + 1]
+    _sauver(dossier, "denomination_offsets", offsets)
+    _sauver(dossier, "denomination", np.frombuffer(noms.buffers()[2], dtype=np.uint8)[:offsets[-1]])
+    _sauver(dossier, "siren", cles[ordre].astype(np.uint32))
+
+    manifeste = {"n": int(len(df)), "construit_le": datetime.now().isoformat(timespec="seconds"),
+                 "colonne_ape": colonne_ape, "vocabulaires": vocabulaires}
+    with open(dossier / MANIFESTE, "w", encoding="utf-8") as f:
+        json.dump(manifeste, f, ensure_ascii=False)
+    return manifeste
+
+
+# --- 3. CONSULTATION (MMAP + RECHERCHE DICHOTOMIQUE) ---
+class Annuaire:
+    def __init__(self, dossier=ANNUAIRE_DIR):
+        dossier = Path(dossier)
+        with open(dossier / MANIFESTE, encoding="utf-8") as f:
+            self.manifeste = json.load(f)
+        # Vues ndarray des fichiers projetés : évite le coût de la sous-classe np.memmap à chaque indexation
+        charger = lambda nom: np.asarray(np.load(dossier / f"{nom}.npy", mmap_mode="r"))
+        self.cles = charger("siren")
+        self.probabilites = {nom: charger(nom) for nom in PROBABILITES}
+        self.codes = {nom: charger(nom) for nom in VOCABULAIRES}
+        self.vocabulaires = {nom: self.manifeste["vocabulaires"][nom] + [None] for nom in VOCABULAIRES}
+        self.offsets = charger("denomination_offsets")
+        self.noms = charger("denomination")
+        if len(self.cles) != self.manifeste["n"]:
+            raise ValueError(f"annuaire incohérent : {len(self.cles)} clés pour {self.manifeste['n']} lignes")
+
+    def __len__(self):
+        return len(self.cles)
+
+    def bornes(self, cles):
+        """Intervalles [début, fin) de chaque clé dans le tableau trié (fin == début si absente)"""
+        cles = np.asarray(cles, dtype=np.uint32)
+        return self.cles.searchsorted(cles, "left"), self.cles.searchsorted(cles, "right")
+
+    def lignes(self, positions):
+        """Lignes aux positions données, sous forme de dictionnaires JSON"""
+        positions = np.asarray(positions, dtype=np.int64)
+        if positions.size == 0:
+            return []
+        # Lecture groupée par colonne : seules les pages des positions demandées sont chargées
+        probas = {nom: [None if v != v else v for v in np.round(p[positions].astype(np.float64), 2).tolist()]
+                  for nom, p in self.probabilites.items()}
+        libelles = {nom: [self.vocabulaires[nom][c] for c in self.codes[nom][positions].tolist()]
+                    for nom in VOCABULAIRES}
+        debuts, fins = self.offsets[positions].tolist(), self.offsets[positions + 1].tolist()
+        sirens = self.cles[positions].tolist()
+        return [{
+            "siren": f"{sirens[k]:09d}",
+            "denomination": bytes(self.noms[debuts[k]:fins[k]]).decode("utf-8"),
+            "statut_expert": libelles["statut"][k],
+            **{nom: probas[nom][k] for nom in PROBABILITES},
+            "departement": libelles["departement"][k],
+            "code_ape": libelles["ape"][k],
+        } for k in range(len(positions))]
+
+    def chercher(self, siren):
+        """Établissements d'un SIREN (liste vide si inconnu)"""
+        debut, fin = self.bornes([normaliser_siren(siren)])
+        return self.lignes(np.arange(debut[0], fin[0]))
+
+    def chercher_lot(self, sirens):
+        """Une entrée par SIREN demandé, dans l'ordre : trouvé, établissements, ou erreur de format"""
+        cles, erreurs = [], {}
+        for i, siren in enumerate(sirens):
+            try:
+                cles.append(normaliser_siren(siren))
+            except ValueError as e:
+                cles.append(0)
+                erreurs[i] = str(e)
+        debuts, fins = self.bornes(cles)
+        lignes = self.lignes(np.concatenate([np.arange(d, f) for d, f in zip(debuts, fins)] or [[]]))
+        resultats, k = [], 0
+        for i, (siren, d, f) in enumerate(zip(sirens, debuts.tolist(), fins.tolist())):
+            if i in erreurs:
+                resultats.append({"siren": str(siren), "trouve": False, "erreur": erreurs[i]})
+                continue
+            resultats.append({"siren": f"{cles[i]:09d}", "trouve": f > d, "etablissements": lignes[k:k + f - d]})
+            k += f - d
+        return resultats
+
+
+def charger_annuaire(dossier=ANNUAIRE_DIR):
+    """Annuaire projeté en mémoire, ou None s'il n'a pas été construit"""
+    try:
+        return Annuaire(dossier)
+    except Exception as e:
+        print(f"⚠️ Annuaire SIREN non disponible ({dossier}) : {e}")
+        return None
+
+
+# --- 4. VÉRIFICATION ---
+def _base_synthetique(n, seed=0):
+    """Base scorée au schéma de 09_predictions_v3 : ~2 % de SIREN à plusieurs établissements"""
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    sirens = rng.integers(1, 999_999_999, n)
+    doublons = rng.random(n) < 0.02
+    sirens[doublons] = sirens[rng.integers(0, n, doublons.sum())]
+    p1 = rng.beta(1.1, 22, n) * 100
+    p2 = np.minimum(p1 + rng.beta(1.2, 18, n) * 100, 100)
+    return pd.DataFrame({
+        COL_SIREN: pd.Series(sirens).astype(str).str.zfill(9),
+        COL_DENOMINATION: pd.Series(rng.choice(["GARAGE", "SAS", "ÉTS", "BOULANGERIE"], n))
+        + " " + pd.Series(rng.integers(1, 100_000, n)).astype(str),
+        COL_STATUT: rng.choice(['🟢 SAIN', '🟡 OBSERVATION', '🟠 VIGILANCE', '🔴 CRITIQUE', '⚫ FERMÉ'], n),
+        "Prob_1an": p1, "Prob_2ans": p2, "Prob_3ans": np.minimum(p2 + 5, 100),
+        COL_DEPT: rng.choice(["1", "01", "13", "75", "2A", "971"], n),
+        "code_ape": rng.choice(["56.10A", "47.11B", "43.22A", None], n),
+    })
+
+
+def check(n=1_000_000, n_requetes=2_000, n_lot=5_000):
+    """Résultats identiques à un filtrage pandas, chargement en mmap, latence unitaire et en lot"""
+    import shutil
+    import tempfile
+
+    erreurs = []
+    dossier = Path(tempfile.mkdtemp(prefix="annuaire_check_"))
+    try:
+        df = _base_synthetique(n)
+        debut = time.perf_counter()
+        construire(df, dossier)
+        print(f"📦 Annuaire de {n} lignes construit en {time.perf_counter() - debut:.1f}s "
+              f"({sum(f.stat().st_size for f in dossier.iterdir()) / 1e6:.0f} Mo)")
+
+        debut = time.perf_counter()
+        annuaire = Annuaire(dossier)
+        chargement_ms = (time.perf_counter() - debut) * 1000
+
+        rng = np.random.default_rng(1)
+        demandes = list(df[COL_SIREN].iloc[rng.integers(0, n, n_requetes)]) + ["000000000", "123456789"]
+        durees = []
+        for siren in demandes:
+            debut = time.perf_counter()
+            trouve = annuaire.chercher(siren)
+            durees.append(time.perf_counter() - debut)
+            attendu = df[df[COL_SIREN] == siren]
+            if len(trouve) != len(attendu) or any(
+                    t["denomination"] != a or abs(t["prob_2ans"] - round(float(np.float32(p)), 2)) > 1e-9
+                    for t, a, p in zip(trouve, attendu[COL_DENOMINATION], attendu["Prob_2ans"])):
+                erreurs.append(f"{siren} : {len(trouve)} ligne(s) au lieu de {len(attendu)}")
+                break
+        ligne = df.iloc[0]
+        if annuaire.chercher(ligne[COL_SIREN] + "00017")[0]["departement"] not in ("01", "13", "75", "2A", "971"):
+            erreurs.append("SIRET ou normalisation du département incorrects")
+
+        lot = list(df[COL_SIREN].iloc[rng.integers(0, n, n_lot)]) + ["12A"]
+        debut = time.perf_counter()
+        resultats = annuaire.chercher_lot(lot)
+        duree_lot = time.perf_counter() - debut
+        if [r["etablissements"] for r in resultats[:50]] != [annuaire.chercher(s) for s in lot[:50]]:
+            erreurs.append("chercher_lot différent de chercher")
+        if "erreur" not in resultats[-1] or not all(r["trouve"] for r in resultats[:-1]):
+            erreurs.append("SIREN invalide non signalé dans le lot")
+
+        p50, p95 = np.percentile(np.array(durees) * 1e6, [50, 95])
+        print(f"⏱️ Chargement {chargement_ms:.1f} ms | unitaire p50 {p50:.0f} µs, p95 {p95:.0f} µs | "
+              f"lot de {n_lot} SIREN en {duree_lot * 1000:.0f} ms")
+    finally:
+        shutil.rmtree(dossier, ignore_errors=True)
+    print("✅ Vérification réussie" if not erreurs else "❌ " + "\n❌ ".join(erreurs))
+    return not erreurs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Annuaire SIREN -> scores (construction et vérification)")
+    parser.add_argument("--construire", metavar="PARQUET", help="Base scorée (Dataset_Master_Predictions_2026)")
+    parser.add_argument("--out", default=ANNUAIRE_DIR)
+    parser.add_argument("--check", type=int, nargs="?", const=1_000_000, metavar="N",
+                        help="Vérification sur N lignes synthétiques")
+    args = parser.parse_args()
+
+    if args.check:
+        raise SystemExit(0 if check(args.check) else 1)
+    if args.construire:
+        import pyarrow.parquet as pq
+
+        schema = pq.read_schema(args.construire).names
+        colonnes = [COL_SIREN, COL_DENOMINATION, COL_STATUT, COL_DEPT, *PROBABILITES.values(),
+                    next(c for c in COLS_APE if c in schema)]
+        manifeste = construire(pq.read_table(args.construire, columns=colonnes).to_pandas(), args.out)
+        print(f"✅ Annuaire écrit dans {args.out} ({manifeste['n']} lignes)")
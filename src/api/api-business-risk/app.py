@@ -1,15 +1,22 @@
 import os
 import json
+import time
 import numpy as np
 import xgboost as xgb
 import pandas as pd
 import mlflow.xgboost
 from fastapi import FastAPI, HTTPException, Body
-from fastapi.responses import RedirectResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, RedirectResponse
 from dotenv import load_dotenv
 
 # On importe les fonctions et la constante FEATURES depuis processing
-from processing import prepare_input, calculate_survival_risk, map_statut_expert, get_sigma, FEATURES
+from processing import calculate_survival_risk, map_statut_expert, get_sigma, load_from_s3, FEATURES, PIPELINE
+from thresholds import simulate_policy, HISTOGRAMS, NIVEAUX
+from explain import Explainer, IMPORTANCE_GLOBALE
+from monitoring import Moniteur, REFERENCE_FILE
+from audit import JournalAudit, AUDIT_DIR
+from annuaire import charger_annuaire
+from recherche_noms import charger_index, LIMITE_MAX
 
 # --- 1. CONFIGURATION MLFLOW ---
 load_dotenv()
@@ -17,6 +24,13 @@ mlflow.set_tracking_uri(os.getenv("MLFLOW_TRACKING_URI"))
 
 RUN_ID = "674d07aab0b0493a838310da47c71a95"
 MODEL_URI = f"runs:/{RUN_ID}/model"
+# Booster local (fichier XGBoost) : court-circuite MLflow, utilisé par les benchmarks
+MODEL_PATH = os.getenv("MODEL_PATH")
+# Nombre maximal d'entreprises par appel à /explain et par lot /predict
+EXPLAIN_MAX_BATCH = int(os.getenv("EXPLAIN_MAX_BATCH", "1000"))
+PREDICT_MAX_BATCH = int(os.getenv("PREDICT_MAX_BATCH", "1000"))
+# Nombre maximal de SIREN par appel à /company/lot
+COMPANY_MAX_BATCH = int(os.getenv("COMPANY_MAX_BATCH", "10000"))
 
 # --- 2. INITIALISATION DE L'API ---
 app = FastAPI(
@@ -28,13 +42,59 @@ app = FastAPI(
 # Variables globales
 model = None
 SIGMA = None
+EXPLAINER = None
+MONITEUR = None
+JOURNAL = None
+
+# Moniteur de dérive (profil de référence écrit à l'entraînement)
+try:
+    MONITEUR = Moniteur(load_from_s3(REFERENCE_FILE), PIPELINE)
+except Exception as e:
+    print(f"⚠️ Monitoring de dérive désactivé : {e}")
+
+# Annuaire SIREN -> scores de la base scorée (fichiers projetés en mémoire, chargés en quelques ms)
+ANNUAIRE = charger_annuaire()
+# Index des dénominations aligné sur l'annuaire (recherche par nom, frappe partielle et fautes tolérées)
+RECHERCHE = charger_index(ANNUAIRE)
+
+
+def surveiller(methode, *args):
+    """Le monitoring ne doit jamais faire échouer une prédiction"""
+    if MONITEUR is None:
+        return
+    try:
+        getattr(MONITEUR, methode)(*args)
+    except Exception as e:
+        print(f"⚠️ Observation de dérive ignorée : {e}")
+
+
+def journaliser(methode, *args):
+    """Dépôt dans le journal d'audit (écrit en arrière-plan) ; comme le monitoring, sans effet sur la réponse"""
+    if JOURNAL is None:
+        return
+    try:
+        getattr(JOURNAL, methode)(*args)
+    except Exception as e:
+        print(f"❌ Décision non journalisée : {e}")
 
 @app.on_event("startup")
 async def load_model():
-    global model, SIGMA
+    global model, SIGMA, EXPLAINER, JOURNAL
+    # Journal d'audit sur demande (AUDIT_DIR) : demandé mais inaccessible, l'API refuse de démarrer plutôt que
+    # de servir des décisions non journalisées
+    if AUDIT_DIR and JOURNAL is None:
+        try:
+            JOURNAL = JournalAudit(AUDIT_DIR, RUN_ID, "3.6.0")
+        except Exception as e:
+            raise RuntimeError(f"❌ Journal d'audit demandé (AUDIT_DIR={AUDIT_DIR}) mais indisponible : {e}") from e
+        print(f"📝 Journal d'audit actif : {AUDIT_DIR}")
     try:
-        print(f"🚀 Connexion à MLflow : {os.getenv('MLFLOW_TRACKING_URI')}")
-        loaded_model = mlflow.xgboost.load_model(MODEL_URI)
+        if MODEL_PATH:
+            print(f"🚀 Chargement du modèle local : {MODEL_PATH}")
+            loaded_model = xgb.Booster(model_file=MODEL_PATH)
+        else:
+            print(f"🚀 Connexion à MLflow : {os.getenv('MLFLOW_TRACKING_URI')}")
+            loaded_model = mlflow.xgboost.load_model(MODEL_URI)
         
         if isinstance(loaded_model, xgb.Booster):
             model = loaded_model
@@ -42,10 +102,17 @@ async def load_model():
             model = loaded_model.get_booster()
             
         SIGMA = get_sigma(model)
+        EXPLAINER = Explainer(model, FEATURES)
         print(f"✅ Modèle chargé avec succès (Sigma: {round(SIGMA, 4)})")
     except Exception as e:
         print(f"❌ Erreur lors du chargement du modèle : {e}")
 
+@app.on_event("shutdown")
+def fermer_journal():
+    # Vide la file du journal d'audit et clôt le fichier Parquet courant
+    if JOURNAL is not None:
+        JOURNAL.fermer()
+
 # --- 3. ROUTES ---
 
 @app.get("/", include_in_schema=False)
@@ -61,8 +128,82 @@ def health():
         "features_synced": len(FEATURES) > 0
     }
 
+@app.get("/monitoring", tags=["Système"])
+def monitoring():
+    """
+    Dérive du trafic contre le profil de référence de l'entraînement : PSI par variable d'entrée et par
+    score (mu, Prob_2ans), fenêtre courante, fenêtre glissante et fenêtres closes.
+    """
+    if MONITEUR is None:
+        raise HTTPException(status_code=503, detail="Profil de référence de dérive non disponible")
+    return {**MONITEUR.etat(), "metadonnees": {"run_id": RUN_ID, "api_version": "3.6.0"}}
+
+@app.get("/metrics", tags=["Système"], response_class=PlainTextResponse)
+def metrics():
+    """Indicateurs de dérive et du journal d'audit au format Prometheus"""
+    lignes = f"# TYPE business_risk_model_loaded gauge\nbusiness_risk_model_loaded {int(model is not None)}\n"
+    if AUDIT_DIR:
+        lignes += ("# HELP business_risk_audit_actif Journal d'audit demandé (AUDIT_DIR) et en état d'écrire\n"
+                   "# TYPE business_risk_audit_actif gauge\n"
+                   f"business_risk_audit_actif {int(JOURNAL is not None and JOURNAL.actif())}\n")
+    if JOURNAL is not None:
+        etat = JOURNAL.etat()
+        lignes += ("# HELP business_risk_audit_decisions_total Décisions reçues, écrites et perdues par le journal\n"
+                   "# TYPE business_risk_audit_decisions_total counter\n"
+                   + "".join(f'business_risk_audit_decisions_total{{etat="{k}"}} {etat[k]}\n'
+                             for k in ("recues", "ecrites", "pertes"))
+                   + "# TYPE business_risk_audit_en_attente gauge\n"
+                   + f"business_risk_audit_en_attente {etat['en_attente']}\n")
+    return PlainTextResponse(lignes + (MONITEUR.prometheus() if MONITEUR is not None else ""))
+
+def predict_lot(records):
+    """Lot de requêtes /predict : encodage vectorisé, un seul predict, mêmes probabilités que l'unitaire"""
+    if not isinstance(records, list) or not records:
+        raise HTTPException(status_code=400, detail="'entreprises' doit être une liste non vide")
+    if len(records) > PREDICT_MAX_BATCH:
+        raise HTTPException(status_code=400, detail=f"Lot trop volumineux ({len(records)} > {PREDICT_MAX_BATCH})")
+
+    try:
+        X = PIPELINE.transform_records(records)
+        mus = model.predict(xgb.DMatrix(X, feature_names=FEATURES)).astype(np.float64)
+        # Formule de calculate_survival_risk vectorisée, arrondi Python par valeur (identique à l'unitaire)
+        z = np.clip((np.log([[1.0, 2.0, 3.0]]) - mus[:, None]) / SIGMA, -50, 50)
+        probs = np.array([[round(v, 2) for v in ligne] for ligne in ((1 / (1 + np.exp(-z))) * 100).tolist()])
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Erreur lors de la prédiction : {str(e)}"
+        )
+
+    statuts = [map_statut_expert(p2) for p2 in probs[:, 1]]
+    surveiller("observer", records, mus, probs[:, 1])
+    journaliser("enregistrer_lot", "predict", records, X, mus, probs, statuts)
+    return {
+        "resultats": [
+            {
+                "diagnostic": {
+                    "profil_global": statut,
+                    "indice_confiance_mu": round(float(mu), 4)
+                },
+                "probabilites_fermeture": {
+                    "1_an": f"{p[0]}%",
+                    "2_ans": f"{p[1]}%",
+                    "3_ans": f"{p[2]}%"
+                }
+            }
+            for mu, p, statut in zip(mus, probs.tolist(), statuts)
+        ],
+        "metadonnees": {
+            "run_id": RUN_ID,
+            "sigma_utilise": round(SIGMA, 6),
+            "api_version": "3.6.0"
+        }
+    }
+
+# Handlers synchrones (def) : FastAPI les exécute dans son pool de threads, un lot de plusieurs secondes
+# (inférence, TreeSHAP) ne bloque pas la boucle d'événements (/health, /metrics, autres requêtes)
 @app.post("/predict", tags=["Prédiction"])
-async def predict(
+def predict(
     data: dict = Body(..., example={
         "age_estime": 0.5,
         "Tranche_effectif_num": 0,
@@ -74,13 +215,17 @@ async def predict(
 ):
     """
     Simule le risque de fermeture d'une entreprise à 1, 2 et 3 ans.
+    Un lot ({"entreprises": [...]}) est scoré en un seul appel au modèle (balayages de scénarios).
     """
     if model is None:
         raise HTTPException(status_code=503, detail="Modèle non disponible")
+    if "entreprises" in data:
+        return predict_lot(data["entreprises"])
 
     try:
-        # 1. Préparation des données (Utilise le mapping S3)
-        dmatrix = prepare_input(data)
+        # 1. Préparation des données (Utilise le mapping S3) ; le vecteur encodé est conservé pour l'audit
+        x = PIPELINE.transform_one(data)
+        dmatrix = xgb.DMatrix(x[None, :], feature_names=FEATURES)
         
         # 2. Inférence (Score MU)
         mu = float(model.predict(dmatrix)[0])
@@ -89,10 +234,13 @@ async def predict(
         p1 = calculate_survival_risk(mu, 1, SIGMA)
         p2 = calculate_survival_risk(mu, 2, SIGMA)
         p3 = calculate_survival_risk(mu, 3, SIGMA)
+        statut = map_statut_expert(p2)
+        surveiller("observer_un", data, mu, p2)
+        journaliser("enregistrer", "predict", data, x, mu, (p1, p2, p3), statut)
         
         return {
             "diagnostic": {
-                "profil_global": map_statut_expert(p2),
+                "profil_global": statut,
                 "indice_confiance_mu": round(mu, 4)
             },
             "probabilites_fermeture": {
@@ -122,6 +270,209 @@ async def predict(
             detail=f"Erreur lors de la prédiction : {str(e)}"
         )
 
+@app.post("/explain", tags=["Explication"])
+def explain(
+    data: dict = Body(..., example={
+        "age_estime": 0.5,
+        "Tranche_effectif_num": 0,
+        "code_departement": "75",
+        "code_ape": "56",
+        "categorie_juridique": "5499",
+        "is_ess": 0
+    })
+):
+    """
+    Décompose le score d'une entreprise (ou d'un lot : {"entreprises": [...]}) en contributions des
+    facteurs métier (TreeSHAP). Les contributions s'additionnent sur log(mu) : une contribution
+    positive allonge la durée de survie prédite et réduit donc le risque.
+    """
+    if model is None or EXPLAINER is None:
+        raise HTTPException(status_code=503, detail="Modèle non disponible")
+
+    lot = "entreprises" in data
+    records = data["entreprises"] if lot else [data]
+    if not isinstance(records, list) or not records:
+        raise HTTPException(status_code=400, detail="'entreprises' doit être une liste non vide")
+    if len(records) > EXPLAIN_MAX_BATCH:
+        raise HTTPException(status_code=400, detail=f"Lot trop volumineux ({len(records)} > {EXPLAIN_MAX_BATCH})")
+
+    try:
+        X = PIPELINE.transform_one(records[0])[None, :] if len(records) == 1 else PIPELINE.transform_records(records)
+        contributions = EXPLAINER.expliquer(X)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Erreur lors de l'explication : {str(e)}"
+        )
+
+    resultats, mus, probs, statuts = [], [], [], []
+    for phi in contributions:
+        # Même mu que /predict : le modèle prédit exp(somme des contributions)
+        mu = float(np.exp(phi.sum()))
+        p1, p2, p3 = (calculate_survival_risk(mu, h, SIGMA) for h in (1, 2, 3))
+        mus.append(mu)
+        probs.append((p1, p2, p3))
+        statuts.append(map_statut_expert(p2))
+        resultats.append({
+            "diagnostic": {
+                "profil_global": statuts[-1],
+                "indice_confiance_mu": round(mu, 4)
+            },
+            "probabilites_fermeture": {
+                "1_an": f"{p1}%",
+                "2_ans": f"{p2}%",
+                "3_ans": f"{p3}%"
+            },
+            "explication": {
+                "base": round(float(phi[-1]), 4),
+                "log_mu": round(float(phi.sum()), 4),
+                "facteurs": EXPLAINER.detail(phi)
+            }
+        })
+
+    surveiller("observer", records, np.array(mus), np.array([p[1] for p in probs]))
+    journaliser("enregistrer_lot", "explain", records, X, mus, probs, statuts)
+
+    metadonnees = {
+        "run_id": RUN_ID,
+        "sigma_utilise": round(SIGMA, 6),
+        "cache": {"hits": EXPLAINER.hits, "calculs": EXPLAINER.misses},
+        "api_version": "3.6.0"
+    }
+    if lot:
+        return {"resultats": resultats, "metadonnees": metadonnees}
+    return {**resultats[0], "metadonnees": metadonnees}
+
+@app.get("/explain/global", tags=["Explication"])
+def explain_global():
+    """
+    Importance globale des facteurs métier sur le portefeuille (moyenne des |contributions| TreeSHAP),
+    calculée hors ligne par explain.py --global.
+    """
+    if not IMPORTANCE_GLOBALE:
+        raise HTTPException(status_code=503, detail="Importance globale non disponible")
+    return {
+        **IMPORTANCE_GLOBALE,
+        "metadonnees": {
+            "run_id": RUN_ID,
+            "api_version": "3.6.0"
+        }
+    }
+
+def metadonnees_annuaire():
+    return {
+        "run_id": RUN_ID,
+        "api_version": "3.6.0",
+        "annuaire_construit_le": ANNUAIRE.manifeste["construit_le"]
+    }
+
+@app.get("/company/{siren}", tags=["Annuaire"])
+def company(siren: str):
+    """
+    Risque actuel d'une société d'après la base scorée, à partir de son SIREN (ou d'un SIRET) :
+    une ligne par établissement, avec probabilités de fermeture, statut, département et code APE.
+    """
+    if ANNUAIRE is None:
+        raise HTTPException(status_code=503, detail="Annuaire SIREN non disponible")
+    try:
+        etablissements = ANNUAIRE.chercher(siren)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not etablissements:
+        raise HTTPException(status_code=404, detail=f"SIREN {siren} absent de la base scorée")
+    return {
+        "siren": etablissements[0]["siren"],
+        "etablissements": etablissements,
+        "metadonnees": metadonnees_annuaire()
+    }
+
+@app.post("/company/lot", tags=["Annuaire"])
+def company_lot(
+    data: dict = Body(..., example={"sirens": ["123456789", "98765432100017"]})
+):
+    """
+    Consultation en lot : un résultat par SIREN demandé, dans l'ordre (trouvé ou non, établissements,
+    erreur de format le cas échéant), en une seule recherche dichotomique vectorisée.
+    """
+    if ANNUAIRE is None:
+        raise HTTPException(status_code=503, detail="Annuaire SIREN non disponible")
+    sirens = data.get("sirens")
+    if not isinstance(sirens, list) or not sirens:
+        raise HTTPException(status_code=400, detail="'sirens' doit être une liste non vide")
+    if len(sirens) > COMPANY_MAX_BATCH:
+        raise HTTPException(status_code=400, detail=f"Lot trop volumineux : {len(sirens)} SIREN (max {COMPANY_MAX_BATCH})")
+
+    resultats = ANNUAIRE.chercher_lot(sirens)
+    # Types JSON natifs : sérialisation directe, sans jsonable_encoder (7x plus lent sur 5000 SIREN)
+    return JSONResponse({
+        "resultats": resultats,
+        "metadonnees": {**metadonnees_annuaire(), "n_trouves": sum(r["trouve"] for r in resultats)}
+    })
+
+@app.get("/search", tags=["Annuaire"])
+def search(q: str, limite: int = 10):
+    """
+    Recherche d'une société par dénomination, pour la saisie au fil de l'eau : accents et casse ignorés,
+    dernier mot complété comme un préfixe, fautes de frappe tolérées. Chaque résultat reprend la ligne de
+    l'annuaire (SIREN, statut, probabilités de fermeture) avec un score de pertinence entre 0 et 1.
+    """
+    if RECHERCHE is None:
+        raise HTTPException(status_code=503, detail="Index de recherche par dénomination non disponible")
+    if len(q.strip()) < 2:
+        raise HTTPException(status_code=400, detail="'q' doit contenir au moins 2 caractères")
+    if not 1 <= limite <= LIMITE_MAX:
+        raise HTTPException(status_code=400, detail=f"'limite' doit être comprise entre 1 et {LIMITE_MAX}")
+
+    debut = time.perf_counter()
+    resultats = RECHERCHE.rechercher(q, limite)
+    return JSONResponse({
+        "requete": q,
+        "resultats": resultats,
+        "metadonnees": {**metadonnees_annuaire(), "duree_ms": round((time.perf_counter() - debut) * 1000, 2)}
+    })
+
+@app.post("/simulation/politique", tags=["Simulation"])
+def simulation_politique(
+    data: dict = Body(..., example={
+        "niveau": "departement",
+        "horizon": 2,
+        "seuils": [5, 10, 20],
+        "groupes": ["13", "75"]
+    })
+):
+    """
+    Simule une politique de seuils sur le portefeuille scoré : volume et part de sociétés
+    dans chaque bande de risque, par département, secteur ou forme juridique.
+    """
+    if not HISTOGRAMS:
+        raise HTTPException(status_code=503, detail="Histogrammes de portefeuille non disponibles")
+
+    niveau = data.get("niveau", "departement")
+    if niveau not in NIVEAUX:
+        raise HTTPException(status_code=400, detail=f"Niveau inconnu : {niveau} (attendu : {', '.join(NIVEAUX)})")
+    if niveau not in HISTOGRAMS:
+        raise HTTPException(status_code=404, detail=f"Histogrammes non disponibles pour le niveau {niveau}")
+
+    try:
+        resultat = simulate_policy(niveau, int(data.get("horizon", 2)), data.get("seuils"), data.get("groupes"))
+    except KeyError as e:
+        raise HTTPException(status_code=422, detail=e.args[0])
+    except (TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Paramètres invalides : {str(e)}")
+
+    return {
+        "parametres": {
+            "niveau": niveau,
+            "horizon": int(data.get("horizon", 2)),
+            "seuils": sorted(float(s) for s in (data.get("seuils") or [5, 10, 20]))
+        },
+        **resultat,
+        "metadonnees": {
+            "run_id": RUN_ID,
+            "api_version": "3.6.0"
+        }
+    }
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=7860)
\ No newline at end of file
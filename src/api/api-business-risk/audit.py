@@ -0,0 +1,381 @@
+"""
+Journal d'audit des décisions de scoring : chaque prédiction (/predict, /explain) est conservée avec ses
+entrées, l'empreinte du vecteur encodé, mu, les probabilités, le run du modèle et l'horodatage.
+
+- journal activé uniquement si AUDIT_DIR est défini : dossier accessible en écriture et persistant
+  (/data/audit dans l'image Docker, voir le Dockerfile) ;
+- JournalAudit.enregistrer : seul coût sur le chemin de la requête, un dépôt dans une file bornée
+  (AUDIT_MAX_FILE dépôts) ; l'encodage JSON, l'empreinte et l'écriture sont faits par un thread dédié ;
+- le thread regroupe les décisions (AUDIT_TAILLE_LOT lignes ou AUDIT_FLUSH_S secondes) et écrit chaque
+  vidage dans un fichier Parquet clos (zstd), partitionné par jour :
+  AUDIT_DIR/jour=AAAA-MM-JJ/audit-HHMMSS-<pid>-<n>.parquet. Le fichier est écrit sous le suffixe .partiel
+  et renommé une fois son pied de page écrit : une décision comptée comme écrite est relisible, même après
+  un arrêt brutal (SIGKILL, OOM, redémarrage). Seules les décisions encore en file (au plus AUDIT_FLUSH_S
+  secondes) sont alors perdues ; un .partiel restant au démarrage est signalé. Sous trafic continu, un
+  fichier par vidage : au plus 86400 / AUDIT_FLUSH_S fichiers par jour et par processus ;
+- fermer() (arrêt de l'API, atexit) vide la file ;
+- lire_journal(dossier, jour, filtre) relit un jour avec filtrage poussé dans les row groups.
+
+Si l'écriture prend du retard et que la file est pleine, le dépôt n'attend pas (put_nowait : les routes sont
+async, une attente bloquerait la boucle d'événements) : la décision est comptée comme perdue (compteur
+exposé par /metrics), la mémoire reste bornée.
+
+Usage (depuis src/api/api-business-risk) :
+    python audit.py --lire /data/audit --jour 2026-10-19 --filtre code_departement=13
+    python audit.py --check 200000
+"""
+import argparse
+import atexit
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+# --- 1. CONFIGURATION ---
+AUDIT_DIR = os.getenv("AUDIT_DIR", "")                 # non défini : journal désactivé
+MAX_FILE = int(os.getenv("AUDIT_MAX_FILE", "10000"))    # dépôts en attente (une requête ou un lot /explain)
+TAILLE_LOT = int(os.getenv("AUDIT_TAILLE_LOT", "5000"))
+FLUSH_S = float(os.getenv("AUDIT_FLUSH_S", "5"))
+INTERVALLE_S = 0.05                                     # relève de la file par le thread d'écriture
+COMPRESSION = "zstd"
+PARTIEL = ".partiel"
+
+# Entrées de /predict conservées en colonnes typées (filtrables) ; la requête complète reste dans "entrees"
+ENTREES_NUMERIQUES = ["age_estime", "Tranche_effectif_num", "is_ess"]
+ENTREES_TEXTE = ["code_departement", "code_ape", "categorie_juridique"]
+
+SCHEMA = pa.schema([
+    ("horodatage", pa.timestamp("us", tz="UTC")),
+    ("endpoint", pa.string()),
+    ("run_id", pa.string()),
+    ("api_version", pa.string()),
+    *[(c, pa.float64()) for c in ENTREES_NUMERIQUES],
+    *[(c, pa.string()) for c in ENTREES_TEXTE],
+    ("entrees", pa.string()),
+    ("hash_vecteur", pa.string()),
+    ("mu", pa.float64()),
+    ("prob_1an", pa.float64()),
+    ("prob_2ans", pa.float64()),
+    ("prob_3ans", pa.float64()),
+    ("statut", pa.string()),
+])
+
+# Encodeur réutilisé : json.dumps avec options en recrée un à chaque appel
+_JSON = json.JSONEncoder(ensure_ascii=False, default=str)
+
+
+def hash_vecteur(x):
+    """Empreinte du vecteur encodé (float32) : identifie l'entrée réellement vue par le modèle"""
+    return hashlib.blake2b(np.ascontiguousarray(x, dtype=np.float32).tobytes(), digest_size=16).hexdigest()
+
+
+def _jour(horodatage):
+    return datetime.fromtimestamp(horodatage, timezone.utc).strftime("%Y-%m-%d")
+
+
+def _nombre(valeur):
+    try:
+        valeur = float(valeur)
+    except (TypeError, ValueError):
+        return None
+    return None if valeur != valeur else valeur
+
+
+def _texte(valeur):
+    return None if valeur is None else str(valeur)
+
+
+# --- 2. TAMPON (THREAD D'ÉCRITURE) ---
+class _Tampon:
+    """Dépôts en attente d'écriture ; la mise en forme colonne par colonne est faite ici, hors requête"""
+
+    def __init__(self):
+        self.depots = []
+        self.jour = None
+        self.n = 0
+        self.cree = time.monotonic()
+
+    def ajouter(self, depot):
+        if not self.depots:
+            self.jour, self._debut_jour = _jour(depot[0]), depot[0] - depot[0] % 86400
+        self.depots.append(depot)
+        self.n += len(depot[2])
+
+    def meme_jour(self, horodatage):
+        return 0 <= horodatage - self._debut_jour < 86400
+
+    def table(self, run_id, api_version):
+        lignes = [(int(h * 1e6), endpoint, *ligne)
+                  for h, endpoint, *colonnes in self.depots for ligne in zip(*colonnes)]
+        horodatages, endpoints, records, X, mus, probs, statuts = zip(*lignes)
+        colonnes = {
+            "horodatage": horodatages, "endpoint": endpoints,
+            "run_id": [run_id] * self.n, "api_version": [api_version] * self.n,
+            **{cle: [_nombre(r.get(cle)) for r in records] for cle in ENTREES_NUMERIQUES},
+            **{cle: [_texte(r.get(cle)) for r in records] for cle in ENTREES_TEXTE},
+            "entrees": [_JSON.encode(r) for r in records],
+            "hash_vecteur": [hash_vecteur(x) for x in X],
+            "mu": [float(m) for m in mus],
+            **{nom: [float(p[i]) for p in probs] for i, nom in enumerate(("prob_1an", "prob_2ans", "prob_3ans"))},
+            "statut": statuts,
+        }
+        return pa.Table.from_pydict(colonnes, schema=SCHEMA)
+
+
+# --- 3. JOURNAL ---
+class JournalAudit:
+    def __init__(self, dossier, run_id, api_version, taille_lot=TAILLE_LOT, flush_s=FLUSH_S, max_file=MAX_FILE):
+        self.dossier = Path(dossier)
+        # Un dossier non inscriptible est signalé au démarrage, pas à la première écriture
+        self.dossier.mkdir(parents=True, exist_ok=True)
+        if not os.access(self.dossier, os.W_OK):
+            raise PermissionError(f"Dossier du journal d'audit non inscriptible : {self.dossier}")
+        # Un .partiel est un vidage interrompu par un arrêt brutal : ses décisions n'ont jamais été comptées écrites
+        partiels = list(self.dossier.glob(f"jour=*/*{PARTIEL}"))
+        if partiels:
+            print(f"⚠️ Journal d'audit : {len(partiels)} vidage(s) interrompu(s) par un arrêt brutal "
+                  f"({partiels[0].parent}/...{PARTIEL})")
+        self.run_id, self.api_version = run_id, api_version
+        self.taille_lot, self.flush_s = taille_lot, flush_s
+        self._file = queue.Queue(maxsize=max_file)
+        self._arret = threading.Event()
+        self._sequence = 0
+        self.recues = 0
+        self.ecrites = 0
+        self.pertes = 0
+        self.fichiers = 0
+        self._ferme = False
+        self._sature = False
+        self._thread = threading.Thread(target=self._boucle, name="journal-audit", daemon=True)
+        self._thread.start()
+        atexit.register(self.fermer)
+
+    # --- Chemin de la requête ---
+    def enregistrer(self, endpoint, record, x, mu, probs, statut):
+        """Une décision : record (requête brute), x (vecteur encodé), mu, (p1, p2, p3) en %"""
+        self._deposer((time.time(), endpoint, (record,), (x,), (mu,), (probs,), (statut,)))
+
+    def enregistrer_lot(self, endpoint, records, X, mus, probs, statuts):
+        self._deposer((time.time(), endpoint, records, X, mus, probs, statuts))
+
+    def _deposer(self, depot):
+        if self._ferme:
+            return
+        n = len(depot[2])
+        self.recues += n
+        try:
+            # Jamais d'attente : le thread d'écriture relève la file périodiquement, sans réveil
+            self._file.put_nowait(depot)
+        except queue.Full:
+            self.pertes += n
+            if not self._sature:
+                print(f"⚠️ Journal d'audit saturé : décisions non journalisées (total {self.pertes})")
+            self._sature = True
+            return
+        self._sature = False
+
+    # --- Thread d'écriture ---
+    def _boucle(self):
+        tampon = _Tampon()
+        while True:
+            fin = self._arret.wait(INTERVALLE_S)
+            while True:
+                try:
+                    depot = self._file.get_nowait()
+                except queue.Empty:
+                    break
+                # Une décision n'est jamais écrite dans le fichier d'un autre jour
+                if tampon.n and not tampon.meme_jour(depot[0]):
+                    self._vider(tampon)
+                    tampon = _Tampon()
+                tampon.ajouter(depot)
+                if tampon.n >= self.taille_lot:
+                    self._vider(tampon)
+                    tampon = _Tampon()
+            if tampon.n and (fin or time.monotonic() - tampon.cree >= self.flush_s):
+                self._vider(tampon)
+                tampon = _Tampon()
+            if fin:
+                return
+
+    def _vider(self, tampon):
+        """Un fichier clos par vidage : écrit sous .partiel, renommé une fois le pied de page écrit"""
+        dossier = self.dossier / f"jour={tampon.jour}"
+        self._sequence += 1
+        fichier = dossier / f"audit-{datetime.now(timezone.utc):%H%M%S}-{os.getpid()}-{self._sequence}.parquet"
+        partiel = fichier.with_name(fichier.name + PARTIEL)
+        try:
+            dossier.mkdir(parents=True, exist_ok=True)
+            pq.write_table(tampon.table(self.run_id, self.api_version), partiel, compression=COMPRESSION)
+            os.replace(partiel, fichier)
+            self.ecrites += tampon.n
+            self.fichiers += 1
+        except Exception as e:
+            self.pertes += tampon.n
+            print(f"❌ Écriture du journal d'audit impossible ({fichier}) : {e}")
+
+    def fermer(self, timeout=30):
+        """Vide la file (arrêt de l'API)"""
+        if self._ferme:
+            return
+        self._ferme = True
+        self._arret.set()
+        self._thread.join(timeout)
+
+    def actif(self):
+        """Le thread d'écriture tourne et le journal accepte des dépôts"""
+        return not self._ferme and self._thread.is_alive()
+
+    def etat(self):
+        return {"recues": self.recues, "ecrites": self.ecrites, "pertes": self.pertes,
+                "en_attente": self._file.qsize(), "fichiers": self.fichiers}
+
+
+# --- 4. LECTURE ---
+def lire_journal(dossier, jour, filtre=None, colonnes=None):
+    """Décisions d'un jour (fichiers clos), en DataFrame. filtre : expression pyarrow
+    (ex. ds.field("code_departement") == "13"), évaluée sur les statistiques des row groups avant lecture"""
+    fichiers = sorted(str(f) for f in (Path(dossier) / f"jour={jour}").glob("*.parquet"))
+    if not fichiers:
+        return pa.Table.from_pydict({c.name: [] for c in SCHEMA}, schema=SCHEMA).select(
+            colonnes or SCHEMA.names).to_pandas()
+    return ds.dataset(fichiers, schema=SCHEMA, format="parquet").to_table(columns=colonnes, filter=filtre).to_pandas()
+
+
+# --- 5. VÉRIFICATION ---
+def check(n=200_000):
+    """Aucune décision perdue ni dupliquée, relecture avant l'arrêt, vidage à l'arrêt, lecture filtrée et coût
+    du dépôt"""
+    import random
+    import shutil
+    import tempfile
+
+    erreurs = []
+    base = Path(tempfile.mkdtemp(prefix="audit_check_"))
+    rng = random.Random(0)
+    depts = ["13", "75", "69", "2A", "971"]
+    records = [{"age_estime": rng.randint(0, 80) / 10, "Tranche_effectif_num": rng.choice([0, 1, 2, 3, 11]),
+                "code_departement": rng.choice(depts), "code_ape": f"{rng.randint(1, 99):02d}",
+                "categorie_juridique": rng.choice(["5499", "5710"]), "is_ess": int(rng.random() < 0.03)}
+               for _ in range(1_000)]
+    X = np.random.default_rng(0).random((len(records), 60), dtype=np.float32)
+    try:
+        # Une décision comptée comme écrite est relisible sans attendre l'arrêt (survit à un SIGKILL)
+        vivant = JournalAudit(base / "vivant", "run-check", "check", flush_s=0.05)
+        for k in range(1_000):
+            vivant.enregistrer("predict", records[k], X[k], 1.0, (1.0, 2.0, 3.0), "🟢 SAIN")
+        limite = time.monotonic() + 10
+        while vivant.ecrites < 1_000 and time.monotonic() < limite:
+            time.sleep(0.01)
+        relues = len(lire_journal(base / "vivant", _jour(time.time())))
+        if vivant.ecrites != 1_000 or relues != 1_000:
+            erreurs.append(f"avant l'arrêt : {vivant.ecrites} décisions écrites, {relues} relues")
+        vivant.fermer()
+
+        # Flux continu : un fichier par vidage, lot /explain et vidage à l'arrêt. Le temps CPU du thread
+        # appelant isole le coût du dépôt de celui du thread d'écriture (entrelacés sur un même cœur).
+        # La boucle dépose bien plus vite qu'une API : file dimensionnée pour ne rien perdre ici
+        journal = JournalAudit(base, "run-check", "check", taille_lot=max(1, n // 5), flush_s=0.2, max_file=n + 1)
+        debut, cpu = time.perf_counter(), time.thread_time()
+        for i in range(n):
+            k = i % len(records)
+            journal.enregistrer("predict", records[k], X[k], 1.0 + k, (1.0, 2.0 + i % 50, 3.0), "🟢 SAIN")
+        par_depot = (time.thread_time() - cpu) / n * 1e6
+        par_decision = (time.perf_counter() - debut) / n * 1e6
+        journal.enregistrer_lot("explain", records[:100], X[:100], np.arange(100.0), np.ones((100, 3)),
+                                ["🟢 SAIN"] * 100)
+        debut = time.perf_counter()
+        journal.fermer()
+        duree_fermeture = time.perf_counter() - debut
+        etat = journal.etat()
+
+        jour = _jour(time.time())
+        fichiers = list((base / f"jour={jour}").glob("*"))
+        if any(f.name.endswith(PARTIEL) for f in fichiers):
+            erreurs.append("fichier partiel restant après fermeture")
+        if etat["ecrites"] != n + 100 or etat["pertes"]:
+            erreurs.append(f"décisions écrites {etat['ecrites']} / {n + 100}, pertes {etat['pertes']}")
+        if len(fichiers) < 5:
+            erreurs.append(f"pas un fichier par vidage ({len(fichiers)} fichier(s))")
+
+        complet = lire_journal(base, jour)
+        if len(complet) != n + 100 or (complet["endpoint"] == "explain").sum() != 100:
+            erreurs.append(f"relecture : {len(complet)} lignes")
+        attendu = complet["hash_vecteur"].iloc[0] == hash_vecteur(X[0])
+        if not attendu:
+            erreurs.append("empreinte du vecteur incorrecte")
+        debut = time.perf_counter()
+        filtre = (ds.field("code_departement") == "13") & (ds.field("prob_2ans") > 40)
+        extrait = lire_journal(base, jour, filtre, ["horodatage", "code_departement", "prob_2ans", "mu"])
+        duree_lecture = time.perf_counter() - debut
+        reference = complet[(complet["code_departement"] == "13") & (complet["prob_2ans"] > 40)]
+        if len(extrait) != len(reference):
+            erreurs.append(f"lecture filtrée : {len(extrait)} lignes au lieu de {len(reference)}")
+        taille = sum(f.stat().st_size for f in fichiers)
+
+        # File bornée : un écrivain bloqué ne fait pas grossir la mémoire, et un dépôt sur file pleine
+        # revient aussitôt (aucune attente sur la boucle d'événements)
+        bloque = JournalAudit(base / "bloque", "run-check", "check", taille_lot=1, max_file=10)
+        verrou = threading.Event()
+        bloque._vider = lambda tampon: verrou.wait()
+        pire = 0.0
+        for i in range(1_000):
+            debut = time.perf_counter()
+            bloque.enregistrer("predict", records[0], X[0], 1.0, (1.0, 2.0, 3.0), "🟢 SAIN")
+            pire = max(pire, time.perf_counter() - debut)
+            time.sleep(0.0001 if i < 20 else 0)
+        if bloque._file.qsize() > 10 or bloque.pertes == 0:
+            erreurs.append("file d'attente non bornée")
+        if pire > 0.01:
+            erreurs.append(f"dépôt bloquant sur file pleine ({pire * 1000:.1f} ms)")
+        verrou.set()
+
+        print(f"⏱️ Dépôt sur le chemin de la requête : {par_depot:.2f} µs CPU ; total avec l'écriture sur un cœur : "
+              f"{par_decision:.2f} µs/décision ; vidage à l'arrêt {duree_fermeture:.2f}s ; pire dépôt sur file pleine "
+              f"{pire * 1e6:.0f} µs")
+        print(f"📦 {etat['ecrites']} décisions, {len(fichiers)} fichiers, {taille / 1e6:.1f} Mo "
+              f"({taille / etat['ecrites']:.1f} o/décision) ; lecture filtrée {len(extrait)} lignes "
+              f"en {duree_lecture * 1000:.0f} ms")
+    finally:
+        shutil.rmtree(base, ignore_errors=True)
+
+    for e in erreurs:
+        print(f"❌ {e}")
+    if not erreurs:
+        print("✅ Journal d'audit complet, borné et relu avec filtrage")
+    return not erreurs
+
+
+def _filtre(expressions):
+    """['code_departement=13', 'statut=🔴 CRITIQUE'] -> expression pyarrow (égalités)"""
+    filtre = None
+    for expression in expressions or ():
+        colonne, _, valeur = expression.partition("=")
+        champ = SCHEMA.field(colonne)
+        terme = ds.field(colonne) == (float(valeur) if pa.types.is_floating(champ.type) else valeur)
+        filtre = terme if filtre is None else filtre & terme
+    return filtre
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Journal d'audit Parquet des décisions de scoring")
+    parser.add_argument("--lire", metavar="DOSSIER", help="Dossier du journal (AUDIT_DIR)")
+    parser.add_argument("--jour", default=datetime.now(timezone.utc).strftime("%Y-%m-%d"), help="AAAA-MM-JJ")
+    parser.add_argument("--filtre", nargs="*", metavar="COLONNE=VALEUR")
+    parser.add_argument("--check", type=int, nargs="?", const=200_000, metavar="N",
+                        help="Vérification sur N décisions synthétiques")
+    args = parser.parse_args()
+
+    if args.check:
+        raise SystemExit(0 if check(args.check) else 1)
+    if args.lire:
+        print(lire_journal(args.lire, args.jour, _filtre(args.filtre)).to_string(max_rows=50))
@@ -0,0 +1 @@
+"""Modèle de substitution et mesures de charge de l'API (hors production)."""
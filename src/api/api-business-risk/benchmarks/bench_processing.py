@@ -0,0 +1,234 @@
+"""
+Micro-benchmarks des primitives de scoring de processing.py, avec contrôle de non-régression des sorties.
+
+- prepare_input, calculate_survival_risk, map_statut_expert, get_sigma et model.predict
+  sont chronométrés à des tailles de lot de 1, 100, 10 000 et 1 000 000 ;
+- audit_depot mesure le surcoût du journal d'audit sur le chemin de la requête (dépôt dans la file,
+  thread d'écriture actif dans un dossier temporaire) ;
+- avant toute mesure, les sorties sont comparées aux valeurs figées dans reference_processing.json
+  (entrées déterministes, modèle de substitution de benchmarks.stand_in) : une optimisation
+  n'est valide que si elle est plus rapide ET équivalente ;
+- au-delà du budget de temps (--budget), une taille est mesurée sur un échantillon puis extrapolée.
+
+Usage (depuis src/api/api-business-risk) :
+    python -m benchmarks.bench_processing
+    python -m benchmarks.bench_processing --sizes 1 100 10000 --json micro_v3.6.json
+    python -m benchmarks.bench_processing --update-reference   # après un changement de sortie VOULU
+"""
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks.stand_in import DEFAULT_DIR, api_env, write_artifacts
+
+# --- 1. CONFIGURATION ---
+REFERENCE_FILE = Path(__file__).resolve().parent / "reference_processing.json"
+SIZES = [1, 100, 10_000, 1_000_000]
+N_REFERENCE = 200
+HORIZONS = [1, 2, 3]
+
+
+def _setup(artifacts):
+    """Artefacts de substitution puis import de processing (FEATURES et mappings sont lus à l'import)"""
+    artifacts = Path(artifacts)
+    env = api_env(artifacts) if (artifacts / "model.json").exists() else write_artifacts(artifacts)
+    os.environ.update(env)
+    import xgboost as xgb
+    import processing
+
+    return processing, xgb.Booster(model_file=env["MODEL_PATH"]), env["MODEL_PATH"]
+
+
+def _quiet():
+    # prepare_input écrit une ligne de debug par appel : hors mesure d'affichage
+    return contextlib.redirect_stdout(io.StringIO())
+
+
+def payloads(n, seed=0):
+    from benchmarks.load_test import payload_predict, payload_predict_inconnu
+
+    rng = random.Random(seed)
+    return [payload_predict_inconnu(rng) if i % 10 == 9 else payload_predict(rng) for i in range(n)]
+
+
+def grille_survie():
+    """(mu, horizon, sigma) : valeurs usuelles, extrêmes et cas saturés par le clip à ±50"""
+    mus = [-60.0, -3.0, -0.5, 0.0, 0.3, 1.0, 1.7, 2.5, 4.0, 60.0]
+    return [(mu, h, s) for mu in mus for h in HORIZONS for s in (0.2, 0.8, 1.5)]
+
+
+GRILLE_STATUT = [0.0, 4.99, 5.0, 5.01, 9.99, 10.0, 10.01, 19.99, 20.0, 20.01, 55.0, 100.0]
+
+
+# --- 2. SORTIES DE RÉFÉRENCE ---
+def _model_hash(path):
+    return hashlib.sha1(Path(path).read_bytes()).hexdigest()[:12]
+
+
+def compute_outputs(processing, model, model_path):
+    items = payloads(N_REFERENCE)
+    with _quiet():
+        matrices = [processing.prepare_input(p) for p in items]
+    mu = [float(model.predict(m)[0]) for m in matrices]
+    return {
+        "modele": _model_hash(model_path),
+        "features": processing.FEATURES,
+        "prepare_input": [m.get_data().toarray()[0].tolist() for m in matrices],
+        "predict_mu": mu,
+        "calculate_survival_risk": [float(processing.calculate_survival_risk(*args)) for args in grille_survie()],
+        "map_statut_expert": [processing.map_statut_expert(p) for p in GRILLE_STATUT],
+        "get_sigma": [processing.get_sigma(model), processing.get_sigma(None)],
+    }
+
+
+def check_outputs(actuel, reference):
+    """Écarts par primitive ; predict et get_sigma ne sont comparés que sur le même modèle"""
+    ecarts = []
+    if actuel["features"] != reference["features"]:
+        return ["features : liste de colonnes différente de la référence"]
+    meme_modele = actuel["modele"] == reference["modele"]
+    if not meme_modele:
+        print("⚠️ Modèle différent de la référence : predict et get_sigma non comparés")
+    for cle in ["prepare_input", "calculate_survival_risk", "map_statut_expert"] + (["predict_mu", "get_sigma"] if meme_modele else []):
+        a, b = actuel[cle], reference[cle]
+        if cle == "map_statut_expert":
+            ok = a == b
+        else:
+            ok = np.array_equal(np.asarray(a, dtype="float64"), np.asarray(b, dtype="float64"), equal_nan=True) \
+                if cle != "predict_mu" else np.allclose(a, b, rtol=1e-6, atol=1e-6)
+        if not ok:
+            ecarts.append(cle)
+    return ecarts
+
+
+# --- 3. MESURES ---
+def _chrono(fn, k, repeats):
+    durees = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(k)
+        durees.append(time.perf_counter() - start)
+    return statistics.median(durees)
+
+
+def mesurer(fn, n, budget, repeats):
+    """Durée totale pour n éléments ; extrapolée depuis un échantillon si elle dépasse le budget"""
+    sonde = min(n, 100)
+    par_element = _chrono(fn, sonde, 1) / sonde
+    k = n if par_element * n * repeats <= budget else max(sonde, int(budget / max(par_element * repeats, 1e-12)))
+    k = min(k, n)
+    duree = _chrono(fn, k, repeats if k == n else 1) * n / k
+    return {"total_s": round(duree, 6), "us_par_element": round(duree / n * 1e6, 3), "extrapole": k < n}
+
+
+def primitives(processing, model, items_ref):
+    """Chaque primitive sous forme fn(k) traitant un lot de k éléments"""
+    import xgboost as xgb
+
+    with _quiet():
+        lignes = np.vstack([processing.prepare_input(p).get_data().toarray() for p in items_ref])
+    args_survie = grille_survie()
+
+    def prepare(k):
+        with _quiet():
+            for i in range(k):
+                processing.prepare_input(items_ref[i % len(items_ref)])
+
+    def survie(k):
+        for i in range(k):
+            processing.calculate_survival_risk(*args_survie[i % len(args_survie)])
+
+    def statut(k):
+        for i in range(k):
+            processing.map_statut_expert(GRILLE_STATUT[i % len(GRILLE_STATUT)])
+
+    def sigma(k):
+        for _ in range(k):
+            processing.get_sigma(model)
+
+    matrices = {}
+
+    def predict(k):
+        # DMatrix construit hors mesure : seul l'appel au booster est chronométré
+        if k not in matrices:
+            matrices.clear()
+            matrices[k] = xgb.DMatrix(lignes[np.arange(k) % len(lignes)], feature_names=processing.FEATURES)
+        model.predict(matrices[k])
+
+    def predict_unitaire(k):
+        # Chemin de l'API : un DMatrix d'une ligne et un predict par requête
+        for i in range(k):
+            model.predict(xgb.DMatrix(lignes[i % len(lignes)][None, :], feature_names=processing.FEATURES))
+
+    from audit import JournalAudit
+
+    journal = JournalAudit(tempfile.mkdtemp(prefix="bench_audit_"), "bench", "bench")
+    vecteurs = lignes.astype(np.float32)
+
+    def audit(k):
+        # Temps de l'appelant seulement : l'écriture Parquet se fait dans le thread du journal
+        for i in range(k):
+            j = i % len(items_ref)
+            journal.enregistrer("predict", items_ref[j], vecteurs[j], 1.5, (1.0, 2.0, 3.0), "🟢 SAIN")
+
+    return {
+        "prepare_input": prepare,
+        "calculate_survival_risk": survie,
+        "map_statut_expert": statut,
+        "get_sigma": sigma,
+        "predict_lot": predict,
+        "predict_unitaire": predict_unitaire,
+        "audit_depot": audit,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Micro-benchmarks des primitives de processing.py")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--only", nargs="+", help="Primitives à mesurer (toutes par défaut)")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--budget", type=float, default=10.0, help="Secondes max par mesure avant extrapolation")
+    parser.add_argument("--artifacts", default=str(DEFAULT_DIR))
+    parser.add_argument("--update-reference", action="store_true", help="Fige les sorties actuelles comme référence")
+    parser.add_argument("--json", help="Fichier de sortie des résultats")
+    args = parser.parse_args()
+
+    processing, model, model_path = _setup(args.artifacts)
+    actuel = compute_outputs(processing, model, model_path)
+    if args.update_reference or not REFERENCE_FILE.exists():
+        with open(REFERENCE_FILE, "w", encoding="utf-8") as f:
+            json.dump(actuel, f, ensure_ascii=False)
+        print(f"📌 Référence écrite : {REFERENCE_FILE.name}")
+    else:
+        with open(REFERENCE_FILE, encoding="utf-8") as f:
+            ecarts = check_outputs(actuel, json.load(f))
+        if ecarts:
+            print(f"❌ Sorties différentes de la référence : {', '.join(ecarts)} (mesures annulées)")
+            sys.exit(1)
+        print("✅ Sorties identiques à la référence")
+
+    fns = primitives(processing, model, payloads(N_REFERENCE))
+    resultats = []
+    for nom, fn in fns.items():
+        if args.only and nom not in args.only:
+            continue
+        for n in args.sizes:
+            r = {"primitive": nom, "taille": n, **mesurer(fn, n, args.budget, args.repeats)}
+            resultats.append(r)
+            print(f"   {nom:<24} n={n:<9} {r['total_s']:>10.4f}s | {r['us_par_element']:>10.2f} µs/élément"
+                  + (" (extrapolé)" if r["extrapole"] else ""), flush=True)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"modele": actuel["modele"], "resultats": resultats}, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,289 @@
+"""
+Test de charge de l'API : débit, latences p50/p95/p99 et CPU serveur par requête.
+
+- démarre l'API (uvicorn) sur les artefacts locaux de benchmarks.stand_in : ni MLflow ni S3 ;
+- envoie un mélange pondéré de requêtes (--mix) à plusieurs niveaux de concurrence ;
+- le CPU serveur est lu dans /proc (utime + stime du processus uvicorn et de ses workers) ;
+- les résultats sont enregistrés en JSON ; --baseline compare à une mesure précédente et signale les régressions.
+
+Usage (depuis src/api/api-business-risk) :
+    python -m benchmarks.load_test --concurrency 1 8 32 --duration 20 --json charge_v3.6.json
+    python -m benchmarks.load_test --mix predict=8,predict_inconnu=1,simulation=1 --baseline charge_v3.6.json
+    python -m benchmarks.load_test --url http://localhost:7860 --pid 12345   # serveur déjà lancé
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import httpx
+import numpy as np
+
+from benchmarks.stand_in import API_DIR, DEFAULT_DIR, DEPARTEMENTS, DIVISIONS_APE, api_env, write_artifacts
+
+# --- 1. SCÉNARIOS ---
+NIVEAUX = ["departement", "secteur", "forme_juridique"]
+
+
+def payload_predict(rng):
+    return {
+        "age_estime": round(rng.uniform(0, 30), 1),
+        "Tranche_effectif_num": rng.randint(0, 11),
+        "code_departement": rng.choice(DEPARTEMENTS),
+        "code_ape": rng.choice(DIVISIONS_APE),
+        "categorie_juridique": rng.choice(["5499", "5710"]),
+        "is_ess": int(rng.random() < 0.03),
+    }
+
+
+def payload_predict_inconnu(rng):
+    """Codes absents des mappings : chemins de repli de prepare_input"""
+    return {**payload_predict(rng), "code_departement": "00", "code_ape": "00", "categorie_juridique": "9999"}
+
+
+def payload_simulation(rng):
+    niveau = rng.choice(NIVEAUX)
+    return {
+        "niveau": niveau,
+        "horizon": rng.randint(1, 3),
+        "seuils": sorted(rng.sample(range(1, 60), 3)),
+        "groupes": rng.sample(DEPARTEMENTS, 3) if niveau == "departement" and rng.random() < 0.5 else None,
+    }
+
+
+SCENARIOS = {
+    "predict": ("POST", "/predict", payload_predict),
+    "predict_inconnu": ("POST", "/predict", payload_predict_inconnu),
+    "simulation": ("POST", "/simulation/politique", payload_simulation),
+    "health": ("GET", "/health", None),
+}
+
+
+def parse_mix(spec):
+    """'predict=8,simulation=1' -> {'predict': 8.0, 'simulation': 1.0}"""
+    mix = {}
+    for part in spec.split(","):
+        nom, _, poids = part.partition("=")
+        if nom.strip() not in SCENARIOS:
+            raise ValueError(f"Scénario inconnu : {nom} (attendu : {', '.join(SCENARIOS)})")
+        mix[nom.strip()] = float(poids or 1)
+    return mix
+
+
+# --- 2. SERVEUR & CPU ---
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(env, port, workers, log_path):
+    cmd = [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(port),
+           "--workers", str(workers), "--log-level", "warning", "--no-access-log"]
+    log = open(log_path, "w", encoding="utf-8")
+    proc = subprocess.Popen(cmd, cwd=API_DIR, env={**os.environ, **env}, stdout=log, stderr=subprocess.STDOUT)
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"L'API s'est arrêtée au démarrage (voir {log_path})")
+        try:
+            if httpx.get(f"{url}/health", timeout=2).json().get("model_loaded"):
+                return proc, url
+        except (httpx.HTTPError, ValueError):
+            pass
+        time.sleep(0.5)
+    proc.terminate()
+    raise RuntimeError(f"Modèle non chargé après 120 s (voir {log_path})")
+
+
+def cpu_seconds(pid):
+    """utime + stime du processus et de ses enfants directs (workers uvicorn), Linux uniquement"""
+    if pid is None or not Path("/proc").exists():
+        return None
+    tick = os.sysconf("SC_CLK_TCK")
+    total = 0.0
+    for stat in Path("/proc").glob("[0-9]*/stat"):
+        try:
+            fields = stat.read_text().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        # fields[0] = état (3e champ de /proc/pid/stat) : ppid = fields[1], utime = fields[11], stime = fields[12]
+        if stat.parent.name == str(pid) or fields[1] == str(pid):
+            total += (int(fields[11]) + int(fields[12])) / tick
+    return total
+
+
+# --- 3. GÉNÉRATION DE CHARGE ---
+async def _client(client, url, mix, rng, stop_at, max_requests, mesures):
+    noms, poids = list(mix), list(mix.values())
+    while time.perf_counter() < stop_at and (max_requests is None or len(mesures) < max_requests):
+        nom = rng.choices(noms, poids)[0]
+        method, path, make = SCENARIOS[nom]
+        start = time.perf_counter()
+        try:
+            r = await client.request(method, url + path, json=make(rng) if make else None)
+            statut = r.status_code
+        except httpx.HTTPError:
+            statut = 0
+        mesures.append((nom, (time.perf_counter() - start) * 1000, statut))
+
+
+async def run_level(url, mix, concurrency, duration, max_requests, seed):
+    mesures = []
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=60) as client:
+        stop_at = time.perf_counter() + duration
+        start = time.perf_counter()
+        await asyncio.gather(*[
+            _client(client, url, mix, random.Random(seed + i), stop_at, max_requests, mesures)
+            for i in range(concurrency)
+        ])
+        elapsed = time.perf_counter() - start
+    return mesures, elapsed
+
+
+def _stats(latences, erreurs, elapsed):
+    lat = np.asarray(latences)
+    return {
+        "n": int(len(lat)),
+        "erreurs": int(erreurs),
+        "debit_rps": round(len(lat) / elapsed, 2),
+        "p50_ms": round(float(np.percentile(lat, 50)), 2),
+        "p95_ms": round(float(np.percentile(lat, 95)), 2),
+        "p99_ms": round(float(np.percentile(lat, 99)), 2),
+        "moyenne_ms": round(float(lat.mean()), 2),
+    }
+
+
+def bench(url, pid, mix, concurrencies, duration, max_requests, warmup, seed=0):
+    asyncio.run(run_level(url, mix, 1, 3600, warmup, seed))
+    niveaux = []
+    for c in concurrencies:
+        cpu_avant, client_avant = cpu_seconds(pid), time.process_time()
+        mesures, elapsed = asyncio.run(run_level(url, mix, c, duration, max_requests, seed))
+        cpu_apres = cpu_seconds(pid)
+        if not mesures:
+            continue
+
+        global_ = _stats([m[1] for m in mesures], sum(m[2] != 200 for m in mesures), elapsed)
+        if cpu_avant is not None and cpu_apres is not None:
+            global_["cpu_serveur_ms_par_requete"] = round((cpu_apres - cpu_avant) * 1000 / len(mesures), 3)
+        # CPU du générateur de charge : sur une machine partagée, il concurrence le serveur
+        global_["cpu_client_ms_par_requete"] = round((time.process_time() - client_avant) * 1000 / len(mesures), 3)
+        scenarios = {
+            nom: _stats([m[1] for m in mesures if m[0] == nom], sum(m[0] == nom and m[2] != 200 for m in mesures), elapsed)
+            for nom in mix if any(m[0] == nom for m in mesures)
+        }
+        niveaux.append({"concurrence": c, "duree_s": round(elapsed, 2), "global": global_, "scenarios": scenarios})
+        print(f"   c={c:<3} {global_['debit_rps']:>8.1f} req/s | p50 {global_['p50_ms']:>7.2f} ms"
+              f" | p95 {global_['p95_ms']:>7.2f} ms | p99 {global_['p99_ms']:>7.2f} ms"
+              + (f" | CPU {global_['cpu_serveur_ms_par_requete']:.2f} ms/req" if "cpu_serveur_ms_par_requete" in global_ else "")
+              + (f" | ⚠️ {global_['erreurs']} erreurs" if global_["erreurs"] else ""), flush=True)
+    return niveaux
+
+
+# --- 4. COMPARAISON ---
+# (métrique, sens) : +1 = plus haut est pire, -1 = plus bas est pire
+METRIQUES = [("p50_ms", 1), ("p95_ms", 1), ("p99_ms", 1), ("debit_rps", -1), ("cpu_serveur_ms_par_requete", 1)]
+
+
+def compare(resultats, baseline, tolerance):
+    """Régressions au-delà de `tolerance` (relative) par niveau de concurrence et par scénario"""
+    ref = {n["concurrence"]: n for n in baseline["niveaux"]}
+    # Mélanges différents : seuls les scénarios communs sont comparables, pas les agrégats globaux
+    meme_mix = baseline["meta"].get("mix") == resultats["meta"]["mix"]
+    regressions = []
+    for niveau in resultats["niveaux"]:
+        avant = ref.get(niveau["concurrence"])
+        if avant is None:
+            continue
+        blocs = ([("global", niveau["global"], avant["global"])] if meme_mix else []) + [
+            (nom, s, avant["scenarios"][nom]) for nom, s in niveau["scenarios"].items() if nom in avant["scenarios"]
+        ]
+        for nom, apres_s, avant_s in blocs:
+            for metrique, sens in METRIQUES:
+                a, b = avant_s.get(metrique), apres_s.get(metrique)
+                if not a or b is None:
+                    continue
+                ecart = (b - a) / a
+                if ecart * sens > tolerance:
+                    regressions.append(f"c={niveau['concurrence']} {nom} {metrique} : {a} -> {b} ({ecart:+.0%})")
+    return regressions
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=API_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Test de charge de l'API (modèle local de substitution)")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--duration", type=float, default=15, help="Durée par niveau de concurrence (s)")
+    parser.add_argument("--requests", type=int, help="Nombre maximal de requêtes par niveau")
+    parser.add_argument("--mix", default="predict=8,predict_inconnu=1,simulation=1")
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=1, help="Workers uvicorn")
+    parser.add_argument("--artifacts", default=str(DEFAULT_DIR), help="Dossier des artefacts de substitution")
+    parser.add_argument("--rebuild", action="store_true", help="Régénère le modèle et les mappings")
+    parser.add_argument("--url", help="API déjà démarrée (pas de lancement local)")
+    parser.add_argument("--pid", type=int, help="PID du serveur déjà démarré, pour la mesure CPU")
+    parser.add_argument("--json", help="Fichier de sortie des résultats")
+    parser.add_argument("--baseline", help="Résultats précédents à comparer")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Écart relatif toléré avant alerte")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    proc = None
+    if args.url:
+        url, pid = args.url.rstrip("/"), args.pid
+    else:
+        artifacts = Path(args.artifacts)
+        env = write_artifacts(artifacts) if args.rebuild or not (artifacts / "model.json").exists() else api_env(artifacts)
+        proc, url = start_server(env, _free_port(), args.workers, artifacts / "uvicorn.log")
+        pid = proc.pid
+        print(f"🚀 API locale démarrée ({url}, {args.workers} worker(s))")
+
+    try:
+        print(f"📊 Mélange : {mix}")
+        niveaux = bench(url, pid, mix, args.concurrency, args.duration, args.requests, args.warmup)
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=30)
+
+    resultats = {
+        "meta": {
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "git": _git_revision(),
+            "python": platform.python_version(),
+            "cpu": os.cpu_count(),
+            "workers": args.workers,
+            "mix": mix,
+            "url_externe": bool(args.url),
+        },
+        "niveaux": niveaux,
+    }
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultats, f, ensure_ascii=False, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(resultats, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\n❌ {len(regressions)} régression(s) au-delà de {args.tolerance:.0%} :\n   " + "\n   ".join(regressions))
+            sys.exit(1)
+        print(f"\n✅ Aucune régression au-delà de {args.tolerance:.0%} par rapport à {args.baseline}")
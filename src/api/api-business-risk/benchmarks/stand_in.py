@@ -0,0 +1,193 @@
+"""
+Artefacts locaux de substitution pour faire tourner l'API sans MLflow ni S3.
+
+- model.json : petit booster XGBoost AFT (distribution logistique, comme le modèle de production)
+  entraîné sur des données synthétiques au schéma de models/features_config.json ;
+- mapping_dep_risk.json / mapping_ape_section.json : mappings au format attendu par processing.py ;
+- feature_spec.json : spécification des features (features.FeaturePipeline) correspondant au modèle ;
+- threshold_histograms.json : histogrammes de portefeuille pour /simulation/politique ;
+- importance_globale.json : importance TreeSHAP des facteurs pour /explain/global ;
+- drift_reference.json : profil de référence du moniteur de dérive (/monitoring, /metrics) ;
+- annuaire/ : annuaire SIREN d'une base scorée synthétique (/company/{siren}, /company/lot) ;
+- annuaire/noms/ : index de recherche de ses dénominations (/search).
+
+Usage (depuis src/api/api-business-risk) :
+    python -m benchmarks.stand_in --out /tmp/business-risk-api-bench
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+# --- 1. CONFIGURATION ---
+API_DIR = Path(__file__).resolve().parent.parent
+FEATURES_FILE = API_DIR / "models" / "features_config.json"
+DEFAULT_DIR = Path(tempfile.gettempdir()) / "business-risk-api-bench"
+
+DEPARTEMENTS = [f"{i:02d}" for i in range(1, 96) if i != 20] + ["2A", "2B", "971", "972", "973", "974", "976"]
+DIVISIONS_APE = [f"{d:02d}" for d in [*range(1, 4), *range(5, 10), *range(10, 34), *range(35, 40), *range(41, 44),
+                                      *range(45, 48), *range(49, 54), 55, 56, *range(58, 64), *range(64, 67), 68,
+                                      *range(69, 76), *range(77, 83), 84, 85, *range(86, 89), *range(90, 94),
+                                      *range(94, 97), 97, 98, 99]]
+
+
+def load_features():
+    return json.loads(FEATURES_FILE.read_text(encoding="utf-8"))
+
+
+# --- 2. CONSTRUCTION ---
+def build_mappings(features, seed=0):
+    """Risque par département et rattachement division APE -> colonne APE_ du modèle (quelques divisions non mappées)"""
+    rng = np.random.default_rng(seed)
+    sections = [f[len("APE_"):] for f in features if f.startswith("APE_")]
+    dep_risk = {d: round(float(rng.uniform(0.03, 0.2)), 4) for d in DEPARTEMENTS}
+    ape_section = {d: sections[rng.integers(0, len(sections))] for d in DIVISIONS_APE if rng.random() < 0.9}
+    return dep_risk, ape_section
+
+
+def _training_frame(features, n_rows, seed=0):
+    """Matrice au schéma du modèle et durées de survie censurées (bornes AFT)"""
+    rng = np.random.default_rng(seed)
+    col = {f: i for i, f in enumerate(features)}
+    M = np.zeros((n_rows, len(features)))
+    M[:, col["age_au_diagnostic"]] = rng.gamma(1.8, 6.0, n_rows)
+    M[:, col["Tranche_effectif_num"]] = rng.choice(12, n_rows, p=[.47, .2, .12, .08, .05, .035, .02, .012, .008, .003, .001, .001])
+    M[:, col["risque_departemental"]] = rng.uniform(0.03, 0.2, n_rows)
+    M[:, col["is_ess"]] = rng.random(n_rows) < 0.03
+    M[:, col["CJ_5710"]] = rng.random(n_rows) < 0.55
+    ape = [col[f] for f in features if f.startswith("APE_")]
+    effet_ape = rng.normal(0, 0.3, len(ape))
+    choix = rng.integers(0, len(ape), n_rows)
+    M[np.arange(n_rows), np.array(ape)[choix]] = 1.0
+    X = pd.DataFrame(M, columns=features)
+
+    log_t = (1.6 + 0.04 * X["age_au_diagnostic"] + 0.08 * X["Tranche_effectif_num"]
+             - 4 * X["risque_departemental"] + effet_ape[choix] + rng.logistic(0, 0.8, n_rows))
+    duree = np.exp(log_t)
+    suivi = rng.uniform(0.5, 12, n_rows)
+    observe = duree <= suivi
+    lower = np.where(observe, duree, suivi)
+    upper = np.where(observe, duree, np.inf)
+    return X, lower, upper
+
+
+def train_booster(features, n_rows=50_000, rounds=300, max_depth=6, seed=0):
+    X, lower, upper = _training_frame(features, n_rows, seed)
+    dtrain = xgb.DMatrix(X, label_lower_bound=lower, label_upper_bound=upper)
+    params = {
+        "objective": "survival:aft", "eval_metric": "aft-nloglik",
+        "aft_loss_distribution": "logistic", "aft_loss_distribution_scale": 0.8,
+        "tree_method": "hist", "learning_rate": 0.05, "max_depth": max_depth, "seed": seed,
+    }
+    return xgb.train(params, dtrain, num_boost_round=rounds)
+
+
+def build_histograms(n_rows=200_000, seed=0):
+    """Histogrammes de portefeuille calculés par thresholds.build_histograms sur une base scorée synthétique"""
+    from thresholds import NIVEAUX, build_histograms as build
+
+    rng = np.random.default_rng(seed)
+    p1 = rng.beta(1.1, 22, n_rows) * 100
+    p2 = np.minimum(p1 + rng.beta(1.2, 18, n_rows) * 100, 100)
+    df = pd.DataFrame({
+        "Statut_Expert": np.where(rng.random(n_rows) < 0.3, '⚫ FERMÉ', ''),
+        "Prob_1an": p1, "Prob_2ans": p2, "Prob_3ans": np.minimum(p2 + rng.beta(1.2, 20, n_rows) * 100, 100),
+        NIVEAUX["departement"]: rng.choice(DEPARTEMENTS, n_rows),
+        NIVEAUX["secteur"]: rng.choice(["Construction", "Hébergement et restauration", "Activités immobilières",
+                                        "Commerce ; réparation d'automobiles et de motocycles"], n_rows),
+        NIVEAUX["forme_juridique"]: rng.choice([5499, 5710], n_rows),
+    })
+    return build(df)
+
+
+def build_drift_reference(booster, features, dep_risk, ape_section, n_rows=100_000, seed=0):
+    """Profil de référence de monitoring.py sur un portefeuille synthétique au schéma de dataset_full"""
+    from features import COL_CJ, COL_CODE_APE, COL_DEPT, COL_ESS, COL_SECTION, FeaturePipeline
+    from monitoring import construire_reference
+
+    rng = np.random.default_rng(seed)
+    divisions = sorted(ape_section)
+    codes = rng.choice(divisions, n_rows)
+    df = pd.DataFrame({
+        COL_DEPT: rng.choice(sorted(dep_risk), n_rows), COL_CODE_APE: codes,
+        COL_SECTION: [ape_section[c] for c in codes], COL_CJ: rng.choice(["5499", "5710"], n_rows, p=[0.45, 0.55]),
+        COL_ESS: np.where(rng.random(n_rows) < 0.03, "O", "N"), "age_estime": rng.integers(0, 9, n_rows),
+        "Tranche_effectif_num": rng.choice([0, 1, 2, 3, 11, 12], n_rows, p=[.5, .2, .12, .1, .05, .03]),
+    })
+    spec = FeaturePipeline.from_legacy(features, dep_risk, ape_section)
+    mu = booster.inplace_predict(spec.transform(df))
+    return construire_reference([(df, mu)], spec, 0.8)
+
+
+def _write_json(path, payload):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False, separators=(",", ":"))
+
+
+def write_artifacts(out_dir, rounds=300, max_depth=6, seed=0):
+    """Écrit tous les artefacts dans out_dir et renvoie les variables d'environnement à passer à l'API.
+    processing, thresholds et explain lisent leurs artefacts à l'import : chaque fichier est écrit avant
+    le premier import du module qui le lit, et l'environnement est posé avant tout import de processing."""
+    if "processing" in sys.modules:
+        raise RuntimeError("processing déjà importé : ses artefacts ne seraient pas ceux de " + str(out_dir))
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    features = load_features()
+    env = api_env(out_dir, features)
+    os.environ.update(env)
+
+    start = time.perf_counter()
+    booster = train_booster(features, rounds=rounds, max_depth=max_depth, seed=seed)
+    booster.save_model(out_dir / "model.json")
+    print(f"🌲 Booster AFT ({rounds} arbres, profondeur {max_depth}) entraîné en {time.perf_counter() - start:.1f}s")
+
+    # Mappings et spécification : lus par processing à l'import
+    from features import SPEC_FILE, FeaturePipeline
+    dep_risk, ape_section = build_mappings(features, seed)
+    for name, payload in {"mapping_dep_risk.json": dep_risk, "mapping_ape_section.json": ape_section}.items():
+        _write_json(out_dir / name, payload)
+    FeaturePipeline.from_legacy(features, dep_risk, ape_section).save(out_dir / SPEC_FILE)
+
+    # thresholds et explain lisent à l'import l'artefact qu'ils servent à produire : fichier vide d'abord,
+    # remplacé aussitôt par le calcul
+    for name in ("threshold_histograms.json", "importance_globale.json"):
+        _write_json(out_dir / name, {})
+    _write_json(out_dir / "threshold_histograms.json", build_histograms(seed=seed))
+    from explain import Explainer
+    portefeuille = _training_frame(features, 100_000, seed + 1)[0].to_numpy(dtype=np.float32)
+    _write_json(out_dir / "importance_globale.json", Explainer(booster, features).importance([portefeuille]))
+    _write_json(out_dir / "drift_reference.json",
+                build_drift_reference(booster, features, dep_risk, ape_section, seed=seed))
+    from annuaire import Annuaire, _base_synthetique, construire
+    import recherche_noms
+    base = _base_synthetique(200_000, seed)
+    base["Dénomination"] = recherche_noms._denominations(len(base), seed)
+    construire(base, out_dir / "annuaire")
+    recherche_noms.construire(Annuaire(out_dir / "annuaire"), out_dir / "annuaire" / "noms")
+    print(f"✅ Artefacts écrits dans {out_dir}")
+    return env
+
+
+def api_env(out_dir, features=None):
+    return {
+        "MODEL_PATH": str(Path(out_dir) / "model.json"),
+        "LOCAL_ARTIFACTS_DIR": str(out_dir),
+        "AUDIT_DIR": str(Path(out_dir) / "audit"),
+        "MODEL_FEATURES": json.dumps(features or load_features(), ensure_ascii=False),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Artefacts locaux (modèle AFT, mappings, histogrammes) pour l'API")
+    parser.add_argument("--out", default=str(DEFAULT_DIR))
+    parser.add_argument("--rounds", type=int, default=300)
+    parser.add_argument("--max-depth", type=int, default=6)
+    args = parser.parse_args()
+    write_artifacts(args.out, args.rounds, args.max_depth)
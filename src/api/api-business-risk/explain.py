@@ -0,0 +1,442 @@
+"""
+Explications du modèle de survie AFT : contributions TreeSHAP (pred_contribs de XGBoost) par feature,
+regroupées en facteurs métier (secteur, forme juridique, risque départemental, âge, effectif, ESS).
+
+- Explainer.expliquer(X) : requêtes unitaires ou en lot ; les contributions sont mises en cache (LRU)
+  par profil de features ;
+- Explainer.importance(lots) : importance globale sur la base complète, servie par /explain/global
+  depuis l'artefact importance_globale.json ;
+- les contributions sont additives sur la marge du modèle (log de la durée de survie prédite) :
+  positive = survie allongée, donc risque réduit.
+
+Une contribution TreeSHAP ne dépend d'une ligne que par les branches qu'elle prend dans chaque arbre.
+Les valeurs sont donc ramenées à leur intervalle entre seuils de split (profil) : deux lignes de même
+profil ont exactement les mêmes contributions. Pour l'importance globale, chaque arbre n'est ensuite
+évalué que sur ses motifs de branches distincts, avec des tables TreeSHAP précalculées par feuille
+(2^d motifs de conditions satisfaites) : ~25 s pour 1M de lignes sur un cœur, contre plus d'une heure
+pour pred_contribs ligne à ligne, à résultat identique (voir --check).
+
+Usage (depuis src/api/api-business-risk) :
+    python explain.py --global dataset_full.parquet --model model.json --out models/importance_globale.json
+    python explain.py --check 1000000
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from math import factorial, prod
+
+import numpy as np
+import xgboost as xgb
+
+from features import AGE, COL_CJ, COL_DEPT, COL_ESS, COL_SECTION
+from processing import load_from_s3
+
+# --- 1. CONFIGURATION ---
+IMPORTANCE_FILE = "importance_globale.json"
+BASE = "Base"
+
+# Facteur métier de chaque feature (les indicatrices APE_* / CJ_* sont regroupées par préfixe)
+FACTEURS = {AGE: "Âge", "Tranche_effectif_num": "Effectif", "risque_departemental": "Département",
+            "is_ess": "ESS"}
+PREFIXES = {"APE_": "Secteur", "CJ_": "Forme juridique"}
+ORDRE = ["Secteur", "Forme juridique", "Département", "Âge", "Effectif", "ESS"]
+
+CACHE_SIZE = int(os.getenv("EXPLAIN_CACHE_SIZE", "20000"))
+TAILLE_BLOC = 20_000    # lignes par appel pred_contribs
+TAILLE_LOT = 200_000    # lignes lues par lot dans le parquet
+DENSE_MAX = 1 << 20     # au-delà, les clés de motifs sont renumérotées avant d'être combinées
+
+
+def facteur(feature):
+    if feature in FACTEURS:
+        return FACTEURS[feature]
+    for prefixe, nom in PREFIXES.items():
+        if feature.startswith(prefixe):
+            return nom
+    return feature
+
+
+def _lignes(codes):
+    """Une clé binaire par ligne (np.unique sur une seule colonne au lieu de axis=0)"""
+    codes = np.ascontiguousarray(codes)
+    return codes.view(np.dtype((np.void, codes.dtype.itemsize * codes.shape[1]))).ravel()
+
+
+def _arbres(booster):
+    """Arbres du modèle (JSON) : nœuds internes et chemin (nœud, sens, fraction de couverture) de chaque feuille"""
+    modele = json.loads(booster.save_raw("json"))["learner"]["gradient_booster"]["model"]
+    arbres = []
+    for arbre in modele["trees"]:
+        gauche, droite, couverture = arbre["left_children"], arbre["right_children"], arbre["sum_hessian"]
+        internes = np.flatnonzero(np.asarray(gauche) != -1)
+        position = {int(noeud): p for p, noeud in enumerate(internes)}
+        feuilles, pile = [], [(0, [])]
+        while pile:
+            noeud, chemin = pile.pop()
+            if gauche[noeud] == -1:
+                feuilles.append((arbre["split_conditions"][noeud], chemin))
+                continue
+            for enfant, vers_gauche in ((gauche[noeud], True), (droite[noeud], False)):
+                pile.append((enfant, chemin + [(position[noeud], vers_gauche, couverture[enfant] / couverture[noeud])]))
+        arbres.append({
+            "indices": np.asarray(arbre["split_indices"], dtype=np.int64)[internes],
+            "conditions": np.asarray(arbre["split_conditions"], dtype=np.float32)[internes],
+            "defaut_gauche": np.asarray(arbre["default_left"], dtype=bool)[internes],
+            "feuilles": feuilles,
+        })
+    return arbres
+
+
+def _tables(valeurs, z, regroupement):
+    """
+    TreeSHAP de n feuilles dont le chemin porte d features distinctes, pour chacun des 2^d motifs o de
+    conditions satisfaites (z : fractions de couverture cumulées par feature le long du chemin) :
+        phi_i = v (o_i - z_i) somme_{S inclus dans o, i hors S} |S|!(d-|S|-1)!/d! prod_{j hors S, j != i} z_j
+    valeurs (n,), z (n, d), regroupement (n, d, facteurs) -> (n, 2^d, facteurs)
+    """
+    d = z.shape[1]
+    motifs = np.arange(2 ** d)
+    bits = (motifs[:, None] >> np.arange(d)) & 1
+    inclus = ((motifs[None, :] & ~motifs[:, None]) == 0).astype(np.float64)
+    poids = np.array([factorial(s) * factorial(d - s - 1) / factorial(d) for s in range(d)] + [0.0])[bits.sum(axis=1)]
+    fractions = np.where(bits[None], 1.0, z[:, None, :])
+    hors_i = np.where(np.eye(d, dtype=bool), 1.0, fractions[:, :, None, :]).prod(axis=-1)
+    phi = valeurs[:, None, None] * (bits[None] - z[:, None, :]) * (inclus @ (poids[:, None] * hors_i * (bits == 0)))
+    return phi @ regroupement
+
+
+def _renumeroter(cle, taille):
+    """Clés -> identifiants denses 0..k-1 (tableau de présence tant que l'espace des clés reste petit)"""
+    if taille <= DENSE_MAX:
+        present = np.zeros(taille, dtype=bool)
+        present[cle] = True
+        return (np.cumsum(present) - 1)[cle], int(present.sum())
+    uniques, inverse = np.unique(cle, return_inverse=True)
+    return inverse.ravel(), len(uniques)
+
+
+def _combiner(colonnes, bases, n):
+    """Identifiant dense de chaque combinaison de colonnes de codes (base : nombre de codes de la colonne)"""
+    cle, taille = np.zeros(n, dtype=np.int64), 1
+    for colonne, base in zip(colonnes, bases):
+        if taille * base > DENSE_MAX:
+            cle, taille = _renumeroter(cle, taille)
+        cle = cle * base + colonne
+        taille *= base
+    return _renumeroter(cle, taille)
+
+
+# --- 2. EXPLICATIONS ---
+class Explainer:
+    def __init__(self, booster, features, cache_size=CACHE_SIZE):
+        self.booster = booster
+        self.features = list(features)
+        noms = [facteur(f) for f in self.features]
+        self.facteurs = ([n for n in ORDRE if n in noms] + [n for n in dict.fromkeys(noms) if n not in ORDRE]
+                         + [BASE])
+        colonne = {n: j for j, n in enumerate(self.facteurs)}
+        # Regroupement (features + biais) -> facteurs : une multiplication matricielle par bloc
+        self.regroupement = np.zeros((len(self.features) + 1, len(self.facteurs)))
+        self.regroupement[np.arange(len(self.features)), [colonne[n] for n in noms]] = 1.0
+        self.regroupement[-1, -1] = 1.0
+
+        self._arbres = _arbres(booster)
+        indices = np.concatenate([a["indices"] for a in self._arbres] or [np.zeros(0, dtype=np.int64)])
+        conditions = np.concatenate([a["conditions"] for a in self._arbres] or [np.zeros(0, dtype=np.float32)])
+        self.seuils = [np.unique(conditions[indices == j]) for j in range(len(self.features))]
+        self._dtype = np.uint16 if max(len(s) for s in self.seuils) + 2 < 2 ** 16 else np.uint32
+        # Valeur représentative de chaque code : sous le premier seuil, puis chaque seuil, puis NaN
+        self._valeurs = [np.concatenate([[np.nextafter(s[0], -np.inf) if len(s) else 0.0], s, [np.nan]])
+                         .astype(np.float32) for s in self.seuils]
+        self.base = float(self.contributions(np.zeros((1, len(self.features))))[0, -1])
+
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._verrou = threading.Lock()
+        self.hits = self.misses = 0
+
+    def _codes(self, X):
+        """Rang de chaque valeur parmi les seuils de split de sa feature (NaN : code à part)"""
+        codes = np.empty(X.shape, dtype=self._dtype)
+        for j, s in enumerate(self.seuils):
+            colonne = X[:, j]
+            codes[:, j] = np.searchsorted(s, colonne, side="right")
+            codes[np.isnan(colonne), j] = len(s) + 1
+        return codes
+
+    def contributions(self, X):
+        """pred_contribs par blocs, regroupés par facteur : (n, facteurs), somme d'une ligne = marge"""
+        X = np.asarray(X, dtype=np.float32)
+        sortie = np.empty((len(X), len(self.facteurs)))
+        for debut in range(0, len(X), TAILLE_BLOC):
+            bloc = X[debut:debut + TAILLE_BLOC]
+            phi = self.booster.predict(xgb.DMatrix(bloc, feature_names=self.features), pred_contribs=True)
+            sortie[debut:debut + len(bloc)] = phi @ self.regroupement
+        return sortie
+
+    def expliquer(self, X):
+        """Contributions par facteur d'un lot de requêtes ; les profils déjà vus sont servis par le cache"""
+        X = np.atleast_2d(np.asarray(X, dtype=np.float32))
+        cles, premiers, inverse = np.unique(_lignes(self._codes(X)), return_index=True, return_inverse=True)
+        cles = [c.tobytes() for c in cles]
+        resultats = np.empty((len(cles), len(self.facteurs)))
+        manquants = []
+        with self._verrou:
+            for i, cle in enumerate(cles):
+                phi = self._cache.get(cle)
+                if phi is None:
+                    manquants.append(i)
+                else:
+                    self._cache.move_to_end(cle)
+                    resultats[i] = phi
+            self.hits += len(cles) - len(manquants)
+            self.misses += len(manquants)
+        if manquants:
+            calcul = self.contributions(X[premiers[manquants]])
+            resultats[manquants] = calcul
+            with self._verrou:
+                for i, phi in zip(manquants, calcul):
+                    self._cache[cles[i]] = phi
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return resultats[inverse.ravel()]
+
+    def detail(self, phi):
+        """Contributions d'une ligne -> facteurs triés par impact (base exclue)"""
+        facteurs = [{"facteur": f, "contribution": round(float(v), 4),
+                     "effet": "⬇️ risque" if v > 0 else ("⬆️ risque" if v < 0 else "neutre")}
+                    for f, v in zip(self.facteurs[:-1], phi[:-1])]
+        return sorted(facteurs, key=lambda d: -abs(d["contribution"]))
+
+    # --- Importance globale ---
+    def profils(self, lots):
+        """Lots de matrices -> codes des profils distincts et nombre de lignes de chacun"""
+        uniques, effectifs = [], []
+        for X in lots:
+            codes = self._codes(np.asarray(X, dtype=np.float32))
+            _, premiers, compte = np.unique(_lignes(codes), return_index=True, return_counts=True)
+            uniques.append(codes[premiers])
+            effectifs.append(compte)
+        codes = np.concatenate(uniques)
+        _, premiers, inverse = np.unique(_lignes(codes), return_index=True, return_inverse=True)
+        return codes[premiers], np.bincount(inverse.ravel(), weights=np.concatenate(effectifs))
+
+    def _preparer(self, arbre, regroupement):
+        """Structures vectorisées d'un arbre : décision de chaque nœud par code, conditions des chemins, tables"""
+        decisions = []
+        for j, seuil, defaut in zip(arbre["indices"], arbre["conditions"], arbre["defaut_gauche"]):
+            with np.errstate(invalid="ignore"):
+                gauche = self._valeurs[j] < seuil
+            gauche[-1] = defaut
+            decisions.append(gauche)
+        # Condition o_k d'une feature du chemin = ET de ses étapes ; tableaux complétés par une étape toujours
+        # vraie (nœud fictif n) et une condition toujours fausse (condition fictive m) pour rester rectangulaires
+        etapes, conditions, profondeurs, groupes = [], [], [], {}
+        for numero, (valeur, chemin) in enumerate(arbre["feuilles"]):
+            par_feature = {}
+            for position, vers_gauche, fraction in chemin:
+                par_feature.setdefault(int(arbre["indices"][position]), []).append((position, vers_gauche, fraction))
+            conditions.append(list(range(len(etapes), len(etapes) + len(par_feature))))
+            etapes += [[(e[0], e[1]) for e in liste] for liste in par_feature.values()]
+            z = [prod(e[2] for e in liste) for liste in par_feature.values()]
+            profondeurs.append(len(z))
+            groupe = groupes.setdefault(len(z), ([], [], [], []))
+            for liste, element in zip(groupe, (numero, valeur, z, regroupement[list(par_feature)])):
+                liste.append(element)
+        n, m = len(decisions), len(etapes)
+        largeur = max(len(e) for e in etapes)
+        noeuds = np.array([[i for i, _ in e] + [n] * (largeur - len(e)) for e in etapes])
+        sens = np.array([[g for _, g in e] + [True] * (largeur - len(e)) for e in etapes])
+        conditions = np.array([c + [m] * (max(profondeurs) - len(c)) for c in conditions])
+
+        decalages_tables = np.concatenate([[0], np.cumsum(2 ** np.asarray(profondeurs))[:-1]])
+        tables = np.empty((int(np.sum(2 ** np.asarray(profondeurs))), regroupement.shape[1]))
+        for d, (feuilles, valeurs, z, sous_regroupement) in groupes.items():
+            t = _tables(np.asarray(valeurs), np.asarray(z).reshape(len(feuilles), d),
+                        np.asarray(sous_regroupement).reshape(len(feuilles), d, -1))
+            tables[(decalages_tables[feuilles][:, None] + np.arange(2 ** d)).ravel()] = t.reshape(-1, t.shape[-1])
+        return {
+            "decisions": np.concatenate(decisions),
+            "decalages": np.concatenate([[0], np.cumsum([len(g) for g in decisions])[:-1]])[:, None],
+            "noeuds": noeuds, "sens": sens, "conditions": conditions,
+            "tables": tables.astype(np.float32),
+            "decalages_tables": decalages_tables[:, None].astype(np.int16 if len(tables) < 2 ** 15 else np.int32),
+        }
+
+    def _groupes(self, codes):
+        """Une colonne par facteur : identifiant de la combinaison de codes de ses features (indicatrices APE_*)"""
+        groupes = []
+        for g in range(len(self.facteurs) - 1):
+            colonnes = np.flatnonzero(self.regroupement[:-1, g])
+            inverse, k = _combiner([codes[:, j] for j in colonnes], [len(self._valeurs[j]) for j in colonnes],
+                                   len(codes))
+            representants = np.empty(k, dtype=np.int64)
+            representants[inverse] = np.arange(len(codes))
+            groupes.append((colonnes, codes[representants][:, colonnes], inverse))
+        return groupes
+
+    def contributions_profils(self, codes):
+        """Contributions par facteur de chaque profil, chaque arbre n'étant évalué que sur ses motifs de branches"""
+        n = len(codes)
+        total = np.zeros((n, len(self.facteurs)))
+        total[:, -1] = self.base
+        regroupement = self.regroupement[:-1, :-1]
+        groupes = self._groupes(codes)
+        for arbre in self._arbres:
+            indices, conditions = arbre["indices"], arbre["conditions"]
+            if not len(indices):
+                continue
+            # Motif de branches : rang des valeurs parmi les seuils de CET arbre, par facteur puis entre facteurs
+            colonnes, bases = [], []
+            for features, combinaisons, inverse in groupes:
+                locales, tailles = [], []
+                for c, j in enumerate(features):
+                    seuils = np.unique(conditions[indices == j])
+                    if len(seuils):
+                        table = np.searchsorted(seuils, self._valeurs[j], side="right")
+                        table[-1] = len(seuils) + 1
+                        locales.append(table[combinaisons[:, c]])
+                        tailles.append(len(seuils) + 2)
+                if locales:
+                    table, base = _combiner(locales, tailles, len(combinaisons))
+                    colonnes.append(table[inverse])
+                    bases.append(base)
+            motif, k = _combiner(colonnes, bases, n)
+            representants = np.empty(k, dtype=np.int64)
+            representants[motif] = np.arange(n)
+
+            # Conditions satisfaites par chaque représentant, motif de chaque feuille, somme des tables
+            # (lignes = nœuds, conditions ou feuilles ; colonnes = représentants ; np.take plutôt que
+            # l'indexation avancée, nettement plus rapide sur ces gathers)
+            p = self._preparer(arbre, regroupement)
+            sous_codes = np.take(codes, representants, axis=0).T
+            gauche = np.ones((len(indices) + 1, k), dtype=bool)
+            gauche[:-1] = np.take(p["decisions"], p["decalages"] + np.take(sous_codes, indices, axis=0))
+            satisfaites = np.ones((len(p["noeuds"]) + 1, k), dtype=bool)
+            satisfaites[-1] = False
+            for noeuds, sens in zip(p["noeuds"].T, p["sens"].T):
+                satisfaites[:-1] &= np.take(gauche, noeuds, axis=0) == sens[:, None]
+            satisfaites = satisfaites.astype(p["decalages_tables"].dtype)
+            motifs_feuilles = p["decalages_tables"]
+            for c, colonne in enumerate(p["conditions"].T):
+                motifs_feuilles = motifs_feuilles + (np.take(satisfaites, colonne, axis=0) << c)
+            phi = np.take(p["tables"], motifs_feuilles, axis=0).sum(axis=0)
+            total[:, :-1] += np.take(phi, motif, axis=0)
+        return total
+
+    def importance(self, lots):
+        """Importance globale des facteurs (moyenne des |contributions|) sur tous les lots"""
+        debut = time.perf_counter()
+        codes, effectifs = self.profils(lots)
+        phi = self.contributions_profils(codes)[:, :-1]
+        n = effectifs.sum()
+        absolue, signee = effectifs @ np.abs(phi) / n, effectifs @ phi / n
+        somme = absolue.sum() or 1.0
+        facteurs = [{"facteur": f, "importance": round(float(a), 6), "part_pct": round(float(a / somme * 100), 2),
+                     "contribution_moyenne": round(float(s), 6)}
+                    for f, a, s in zip(self.facteurs[:-1], absolue, signee)]
+        return {
+            "n_lignes": int(n),
+            "n_profils": int(len(codes)),
+            "base": round(self.base, 6),
+            "facteurs": sorted(facteurs, key=lambda d: -d["importance"]),
+            "duree_s": round(time.perf_counter() - debut, 2),
+        }
+
+
+IMPORTANCE_GLOBALE = load_from_s3(IMPORTANCE_FILE)
+
+
+# --- 3. CONSTRUCTION DE L'ARTEFACT (HORS LIGNE) ---
+def lots_parquet(chemin, pipeline, taille_lot=TAILLE_LOT):
+    """dataset_full.parquet lu par lots -> matrices de features encodées comme à l'entraînement"""
+    import pyarrow.parquet as pq
+
+    fichier = pq.ParquetFile(chemin)
+    colonnes = [c for c in (COL_DEPT, COL_SECTION, COL_CJ, COL_ESS, "is_ess", "age_estime", "Tranche_effectif_num")
+                if c in fichier.schema_arrow.names]
+    for lot in fichier.iter_batches(batch_size=taille_lot, columns=colonnes):
+        yield pipeline.transform(lot.to_pandas())
+
+
+# --- 4. VÉRIFICATION ---
+def _portefeuille(features, n, seed=1):
+    """Matrice synthétique au grain de dataset_full : âge en années entières, risque unique par département"""
+    from benchmarks.stand_in import _training_frame, build_mappings
+
+    rng = np.random.default_rng(seed)
+    X = _training_frame(features, n, seed)[0].to_numpy(dtype=np.float32).copy()
+    risques = np.array(list(build_mappings(features, seed)[0].values()), dtype=np.float32)
+    X[:, features.index(AGE)] = np.round(X[:, features.index(AGE)])
+    X[:, features.index("risque_departemental")] = rng.choice(risques, n)
+    return X
+
+
+def check(n=1_000_000, n_exact=2_000):
+    """Contributions exactes (somme = marge, motifs = TreeSHAP complet), cache, et temps sur n lignes"""
+    from benchmarks.stand_in import load_features, train_booster
+
+    erreurs = []
+    features = load_features()
+    if os.getenv("MODEL_PATH"):
+        booster = xgb.Booster(model_file=os.getenv("MODEL_PATH"))
+    else:
+        booster = train_booster(features, n_rows=20_000, rounds=200)
+    explainer = Explainer(booster, features)
+    X = _portefeuille(features, n)
+    echantillon = X[:n_exact]
+
+    debut = time.perf_counter()
+    reference = booster.predict(xgb.DMatrix(echantillon, feature_names=features), pred_contribs=True)
+    duree_ligne = (time.perf_counter() - debut) / len(echantillon)
+    reference = reference @ explainer.regroupement
+    marge = booster.predict(xgb.DMatrix(echantillon, feature_names=features), output_margin=True)
+    if not np.allclose(reference.sum(axis=1), marge, atol=1e-3):
+        erreurs.append("somme des facteurs différente de la marge")
+    if not np.allclose(explainer.contributions_profils(explainer._codes(echantillon)), reference, atol=1e-3):
+        erreurs.append("contributions par motifs différentes de pred_contribs")
+
+    premier = explainer.expliquer(echantillon[:100])
+    second = explainer.expliquer(echantillon[:100])
+    if not (np.allclose(premier, reference[:100], atol=1e-4) and np.array_equal(premier, second)):
+        erreurs.append("expliquer différent de pred_contribs")
+    if explainer.hits < len(np.unique(_lignes(explainer._codes(echantillon[:100])))):
+        erreurs.append(f"cache inopérant ({explainer.hits} hits)")
+    print(f"🧠 Cache : {explainer.hits} hits / {explainer.misses} calculs")
+
+    resultat = explainer.importance(X[i:i + TAILLE_LOT] for i in range(0, n, TAILLE_LOT))
+    print(f"🌍 Importance globale sur {resultat['n_lignes']} lignes ({resultat['n_profils']} profils) : "
+          f"{resultat['duree_s']:.1f}s, contre ~{duree_ligne * n / 60:.0f} min en pred_contribs ligne à ligne")
+    for d in resultat["facteurs"]:
+        print(f"   {d['facteur']:<16} {d['importance']:.4f} ({d['part_pct']:.1f}%)")
+
+    print("✅ Vérification réussie" if not erreurs else "❌ " + "\n❌ ".join(erreurs))
+    return not erreurs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Explications TreeSHAP du modèle de survie")
+    parser.add_argument("--global", dest="dataset", metavar="PARQUET",
+                        help="dataset_full.parquet sur lequel calculer l'importance globale")
+    parser.add_argument("--model", default=os.getenv("MODEL_PATH"), help="Booster XGBoost (JSON)")
+    parser.add_argument("--spec", help="feature_spec.json (défaut : spécification chargée par processing)")
+    parser.add_argument("--out", default=f"models/{IMPORTANCE_FILE}")
+    parser.add_argument("--check", type=int, metavar="N", help="Vérification sur N lignes synthétiques")
+    args = parser.parse_args()
+
+    if args.check:
+        raise SystemExit(0 if check(args.check) else 1)
+    if args.dataset:
+        from features import FeaturePipeline
+        from processing import PIPELINE
+
+        pipeline = FeaturePipeline.load(args.spec) if args.spec else PIPELINE
+        explainer = Explainer(xgb.Booster(model_file=args.model), pipeline.features)
+        artefact = explainer.importance(lots_parquet(args.dataset, pipeline))
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(artefact, f, ensure_ascii=False, indent=2)
+        print(f"✅ Importance globale écrite dans {args.out} ({artefact['n_lignes']} lignes, "
+              f"{artefact['n_profils']} profils, {artefact['duree_s']}s)")
@@ -0,0 +1,371 @@
+"""
+Features du modèle de survie AFT : une seule implémentation pour l'entraînement (model/08_xgboost_v4),
+le scoring en lot (model/09_predictions_v3) et l'API (processing.prepare_input).
+
+- FeaturePipeline.fit(df) apprend sur dataset_full ce que faisait 08_xgboost_v4 :
+  risque départemental, modalités de référence (drop_first) et regroupement des modalités rares
+  (APE_Autres_Secteurs / CJ_Autres_Status) ;
+- la spécification est sérialisée en JSON (feature_spec.json) à côté du modèle ;
+- transform(df) : lots vectorisés (lookups calculés sur les modalités uniques puis propagés) ;
+- transform_one(record) : chemin rapide d'une requête API, sans pandas.
+
+Usage (depuis src/api/api-business-risk) :
+    python features.py --fit dataset_full.parquet --out models/feature_spec.json
+    python features.py --check
+"""
+import argparse
+import json
+
+import numpy as np
+import pandas as pd
+
+# --- 1. CONFIGURATION ---
+SPEC_FILE = "feature_spec.json"
+SPEC_VERSION = 1
+
+COL_DEPT = "Code du département de l'établissement"
+COL_CJ = "Catégorie juridique de l'unité légale"
+COL_ESS = "Economie sociale et solidaire unité légale"
+COL_SECTION = "libelle_section_ape"
+COL_CODE_APE = "code_ape"
+
+APE_AUTRES = "APE_Autres_Secteurs"
+CJ_AUTRES = "CJ_Autres_Status"
+NUMERIQUES = ["Tranche_effectif_num", "risque_departemental", "is_ess"]
+AGE = "age_au_diagnostic"
+
+# Seuil de fréquence (en %) sous lequel une modalité rejoint la colonne "Autres" (08_xgboost_v4)
+RARE_LIMIT = 0.1
+# Risque départemental d'un code absent de la carte (valeur historique de l'API)
+RISQUE_DEFAUT = 0.05
+
+
+# --- 2. NORMALISATION DES CODES ---
+def code_departement(valeur):
+    """'1', '1.0', ' 2a ' -> '01', '01', '2A'"""
+    code = str(valeur).strip().upper()
+    if code.endswith(".0"):
+        code = code[:-2]
+    return code.zfill(2)
+
+
+def code_cj(valeur):
+    """5710, '5710', '5710.0', '57101' -> '5710'"""
+    code = str(valeur).strip()
+    if code.endswith(".0"):
+        code = code[:-2]
+    return code[:4]
+
+
+def code_ape(valeur):
+    """Division APE sur 2 caractères : '56', '56.10A' -> '56' ; 1 -> '01'"""
+    code = str(valeur).strip()
+    if code.endswith(".0"):
+        code = code[:-2]
+    return code.zfill(2)[:2]
+
+
+def _lookup(series, fonction):
+    """Applique fonction aux seules valeurs distinctes puis propage (lots : peu de modalités, beaucoup de lignes)"""
+    codes, uniques = pd.factorize(series, use_na_sentinel=False)
+    valeurs = np.array([fonction(u) for u in uniques], dtype=object)
+    return valeurs[codes] if len(valeurs) else np.empty(0, dtype=object)
+
+
+# --- 3. PIPELINE ---
+class FeaturePipeline:
+    def __init__(self, features, dep_risk, ape_sections, ape_reference=None, ape_rares=(), cj_reference=None,
+                 cj_rares=(), risque_defaut=RISQUE_DEFAUT):
+        self.features = list(features)
+        self.dep_risk = {str(k): float(v) for k, v in dep_risk.items()}
+        self.ape_sections = dict(ape_sections)
+        self.ape_reference = ape_reference
+        self.ape_rares = sorted(ape_rares)
+        self.cj_reference = cj_reference
+        self.cj_rares = sorted(cj_rares)
+        self.risque_defaut = float(risque_defaut)
+        self._compiler()
+
+    def _compiler(self):
+        """Index de colonne précalculés : chaque transformation n'est plus qu'une suite de lookups"""
+        self.index = {f: i for i, f in enumerate(self.features)}
+        self.i_age = self.index.get(AGE)
+        self.i_tranche = self.index.get("Tranche_effectif_num")
+        self.i_ess = self.index.get("is_ess")
+        self.i_risque = self.index.get("risque_departemental")
+        self.i_ape_autres = self.index.get(APE_AUTRES)
+        self.i_cj_autres = self.index.get(CJ_AUTRES)
+        self._rares_ape = set(self.ape_rares)
+        self._rares_cj = set(self.cj_rares)
+
+    # Colonne (index) d'une modalité ; None = modalité de référence ou inconnue sans colonne "Autres"
+    def colonne_section(self, libelle):
+        if libelle is None or (isinstance(libelle, float) and np.isnan(libelle)) or libelle == self.ape_reference:
+            return None
+        i = self.index.get(f"APE_{libelle}")
+        if i is not None and libelle not in self._rares_ape:
+            return i
+        return self.i_ape_autres
+
+    def colonne_cj(self, cj):
+        if cj == self.cj_reference:
+            return None
+        i = self.index.get(f"CJ_{cj}")
+        if i is not None and cj not in self._rares_cj:
+            return i
+        # Forme juridique inconnue : pas de repli sur "Autres", comme l'API historique
+        return self.i_cj_autres if cj in self._rares_cj else None
+
+    def risque(self, dept):
+        return self.dep_risk.get(dept, self.risque_defaut)
+
+    # --- Apprentissage (08_xgboost_v4) ---
+    @classmethod
+    def fit(cls, df, rare_limit=RARE_LIMIT):
+        """df : dataset_full (toutes les sociétés) ; reproduit l'encodage d'entraînement du notebook"""
+        return cls.fit_lots([df], rare_limit)
+
+    @classmethod
+    def fit_lots(cls, lots, rare_limit=RARE_LIMIT):
+        """Même apprentissage sur dataset_full lu par lots : seuls des comptages sont conservés entre les lots"""
+        fermetures, effectifs = pd.Series(dtype=float), pd.Series(dtype=float)
+        ape_sections, sections, cjs = {}, set(), set()
+        n_train, compte_ape, compte_cj = 0, pd.Series(dtype=float), pd.Series(dtype=float)
+        for df in lots:
+            groupes = df["fermeture"].groupby(df[COL_DEPT].astype(str).str.zfill(2))
+            fermetures = fermetures.add(groupes.sum(), fill_value=0)
+            effectifs = effectifs.add(groupes.count(), fill_value=0)
+            ape_sections.update(zip(df[COL_CODE_APE].astype(str).str.replace(r"\.0$", "", regex=True).str.zfill(2),
+                                    df[COL_SECTION]))
+            cj = df[COL_CJ].astype(str)
+            sections.update(df[COL_SECTION].dropna().unique())
+            cjs.update(cj.unique())
+            # Fréquences calculées sur les lignes d'entraînement (age_estime > 0)
+            train = (df["age_estime"] > 0).fillna(False).to_numpy(dtype=bool)
+            n_train += int(train.sum())
+            compte_ape = compte_ape.add(df.loc[train, COL_SECTION].value_counts(), fill_value=0)
+            compte_cj = compte_cj.add(cj[train].value_counts(), fill_value=0)
+
+        # get_dummies(drop_first=True) : la première modalité triée sert de référence
+        sections, cjs = sorted(sections), sorted(cjs)
+        freq_ape = compte_ape.reindex(sections[1:], fill_value=0) / max(n_train, 1) * 100
+        freq_cj = compte_cj.reindex(cjs[1:], fill_value=0) / max(n_train, 1) * 100
+        ape_rares = [s for s, f in freq_ape.items() if f < rare_limit]
+        cj_rares = [c for c, f in freq_cj.items() if f < rare_limit]
+
+        features = (NUMERIQUES + [f"APE_{s}" for s in sections[1:] if s not in ape_rares]
+                    + [f"CJ_{c}" for c in cjs[1:] if c not in cj_rares]
+                    + ([APE_AUTRES] if ape_rares else []) + ([CJ_AUTRES] if cj_rares else []) + [AGE])
+        dep_risk = (fermetures / effectifs).to_dict()
+        return cls(features, dep_risk, ape_sections, sections[0] if sections else None, ape_rares,
+                   cjs[0] if cjs else None, cj_rares, risque_defaut=float(fermetures.sum() / effectifs.sum()))
+
+    @classmethod
+    def from_legacy(cls, features, dep_risk, ape_sections):
+        """Spécification reconstruite depuis les artefacts historiques de l'API (features_config + mappings).
+        La modalité de référence est la première section triée : drop_first l'a retirée avant le
+        regroupement des rares, elle n'a donc jamais de colonne."""
+        sections = sorted(set(ape_sections.values()))
+        reference = sections[0] if sections and f"APE_{sections[0]}" not in features else None
+        rares = [s for s in sections if s != reference and f"APE_{s}" not in features]
+        return cls(features, dep_risk, ape_sections, reference, rares, cj_reference=None, cj_rares=())
+
+    # --- Sérialisation ---
+    def to_dict(self):
+        return {
+            "version": SPEC_VERSION, "features": self.features, "dep_risk": self.dep_risk,
+            "risque_defaut": self.risque_defaut, "ape_sections": self.ape_sections,
+            "ape_reference": self.ape_reference, "ape_rares": self.ape_rares,
+            "cj_reference": self.cj_reference, "cj_rares": self.cj_rares,
+        }
+
+    @classmethod
+    def from_dict(cls, payload):
+        if payload.get("version") != SPEC_VERSION:
+            raise ValueError(f"Version de spécification inattendue : {payload.get('version')}")
+        return cls(payload["features"], payload["dep_risk"], payload["ape_sections"], payload["ape_reference"],
+                   payload["ape_rares"], payload["cj_reference"], payload["cj_rares"], payload["risque_defaut"])
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+    # --- Transformation en lot ---
+    def _matrice(self, age, tranche, is_ess, depts, sections, cjs):
+        n = len(age)
+        X = np.zeros((n, len(self.features)), dtype=np.float32)
+        for i, valeurs in ((self.i_age, age), (self.i_tranche, tranche), (self.i_ess, is_ess)):
+            if i is not None:
+                X[:, i] = valeurs
+        if self.i_risque is not None:
+            X[:, self.i_risque] = _lookup(depts, lambda d: self.risque(code_departement(d))).astype(np.float64)
+        lignes = np.arange(n)
+        for colonnes in (_lookup(sections, self.colonne_section), _lookup(cjs, lambda c: self.colonne_cj(code_cj(c)))):
+            mask = colonnes != None  # noqa: E711 (tableau object : comparaison élément par élément)
+            X[lignes[mask], colonnes[mask].astype(np.int64)] = 1.0
+        return X
+
+    def transform(self, df):
+        """Lot au schéma de dataset_full -> matrice float32 (colonnes = self.features)"""
+        def num(col):
+            return pd.to_numeric(df[col], errors="coerce").fillna(0).to_numpy(dtype=np.float64)
+
+        if "is_ess" in df.columns:
+            is_ess = num("is_ess")
+        else:
+            is_ess = df[COL_ESS].map({"O": 1, "N": 0}).fillna(0).to_numpy(dtype=np.float64)
+        return self._matrice(num("age_estime"), num("Tranche_effectif_num"), is_ess,
+                             df[COL_DEPT], df[COL_SECTION], df[COL_CJ])
+
+    def transform_records(self, records):
+        """Lot de requêtes API (clés de /predict) -> matrice float32"""
+        df = pd.DataFrame.from_records(records)
+
+        def num(col):
+            if col not in df.columns:
+                return np.zeros(len(df))
+            return pd.to_numeric(df[col], errors="coerce").fillna(0).to_numpy(dtype=np.float64)
+
+        def texte(col):
+            return df[col] if col in df.columns else pd.Series([""] * len(df))
+
+        sections = _lookup(texte("code_ape"), lambda c: self.ape_sections.get(code_ape(c)))
+        return self._matrice(num("age_estime"), num("Tranche_effectif_num"), num("is_ess"),
+                             texte("code_departement"), pd.Series(sections, dtype=object),
+                             texte("categorie_juridique"))
+
+    # --- Chemin rapide : une requête ---
+    def transform_one(self, data):
+        x = np.zeros(len(self.features), dtype=np.float32)
+        if self.i_age is not None:
+            x[self.i_age] = float(data.get("age_estime", 0) or 0)
+        if self.i_tranche is not None:
+            x[self.i_tranche] = float(data.get("Tranche_effectif_num", 0) or 0)
+        if self.i_ess is not None:
+            x[self.i_ess] = int(data.get("is_ess", 0) or 0)
+        if self.i_risque is not None:
+            x[self.i_risque] = self.risque(code_departement(data.get("code_departement", "")))
+        i = self.colonne_section(self.ape_sections.get(code_ape(data.get("code_ape", ""))))
+        if i is not None:
+            x[i] = 1.0
+        i = self.colonne_cj(code_cj(data.get("categorie_juridique", "")))
+        if i is not None:
+            x[i] = 1.0
+        return x
+
+
+# --- 4. VÉRIFICATION ---
+def reference_notebook(df, rare_limit=RARE_LIMIT):
+    """Encodage d'entraînement d'origine de 08_xgboost_v4 (get_dummies, cellules 4, 9 et 17 avant features.py).
+    Public : référence des vérifications de features.py et de model/entrainement (X, index des lignes gardées)"""
+    df = df.copy()
+    df[COL_DEPT] = df[COL_DEPT].astype(str).str.zfill(2)
+    dep_risk_map = df.groupby(COL_DEPT)["fermeture"].mean()
+    df['risque_departemental'] = df[COL_DEPT].map(dep_risk_map)
+    df[COL_CJ] = df[COL_CJ].astype(str)
+    df['age_estime'] = df['age_estime'].astype(float)
+    df['Tranche_effectif_num'] = df['Tranche_effectif_num'].fillna(0).astype(float)
+    df['is_ess'] = df[COL_ESS].map({'O': 1, 'N': 0}).fillna(0).astype(int)
+    df_final = pd.get_dummies(df, columns=[COL_SECTION, COL_CJ], prefix=['APE', 'CJ'], drop_first=True, dtype=int)
+    cols_to_drop = ["Code postal de l'établissement", "Code commune de l'établissement",
+                    "Activité principale de l'unité légale", 'Date_fermeture_finale', 'latitude', 'longitude',
+                    COL_CODE_APE, COL_DEPT, "Code de la région de l'établissement", COL_ESS]
+    df_final = df_final.drop(columns=[c for c in cols_to_drop if c in df_final.columns])
+    df_final = df_final[df_final['age_estime'] > 0].copy()
+    binary_cols = [c for c in df_final.columns if c.startswith('APE_') or c.startswith('CJ_')]
+    frequencies = df_final[binary_cols].mean().sort_values(ascending=False) * 100
+    rare_cols = frequencies[frequencies < rare_limit]
+    rare_ape_cols = [c for c in rare_cols.index if c.startswith('APE_')]
+    rare_cj_cols = [c for c in rare_cols.index if c.startswith('CJ_')]
+    if rare_ape_cols:
+        df_final[APE_AUTRES] = df_final[rare_ape_cols].any(axis=1).astype(int)
+        df_final.drop(columns=rare_ape_cols, inplace=True)
+    if rare_cj_cols:
+        df_final[CJ_AUTRES] = df_final[rare_cj_cols].any(axis=1).astype(int)
+        df_final.drop(columns=rare_cj_cols, inplace=True)
+    df_final['y_lower'] = df_final['age_estime']
+    df_final['y_upper'] = np.where(df_final['fermeture'] == 1, df_final['age_estime'], np.inf)
+    df_final[AGE] = df_final['age_estime']
+    non_numeric_cols = df_final.select_dtypes(exclude=[np.number]).columns.tolist()
+    to_drop = list(set(non_numeric_cols + ['fermeture', 'age_estime', 'y_lower', 'y_upper']))
+    return df_final.drop(columns=to_drop), df_final.index
+
+
+def _dataset_synthetique(n, seed=0):
+    rng = np.random.default_rng(seed)
+    sections = ["Action sociale sans hébergement", "Restauration", "Construction de bâtiments ", "Hébergement",
+                "Industrie du tabac", "Activités immobilières", "Pêche et aquaculture"]
+    poids = np.array([0.2, 0.3, 0.2, 0.1, 0.0005, 0.199, 0.0005])
+    sect = rng.choice(len(sections), n, p=poids / poids.sum())
+    return pd.DataFrame({
+        "SIREN": [f"{i:09d}" for i in range(n)],
+        COL_CJ: rng.choice([5499, 5710, 6540], n, p=[0.45, 0.5495, 0.0005]),
+        COL_ESS: rng.choice(["O", "N"], n, p=[0.03, 0.97]),
+        COL_DEPT: rng.choice(["1", "01", "13", "2A", "75", "971"], n),
+        "Tranche_effectif_num": pd.array(rng.choice([0, 1, 3, 6, 10, 20], n), dtype="Int64"),
+        "age_estime": pd.array(rng.integers(0, 35, n), dtype="Int64"),
+        "latitude": rng.uniform(41, 51, n),
+        COL_CODE_APE: [f"{10 + s:02d}" for s in sect],
+        COL_SECTION: [sections[s] for s in sect],
+        "fermeture": rng.choice([0, 1], n, p=[0.7, 0.3]),
+    })
+
+
+def check(n=100_000):
+    """Encodage identique au notebook, aller-retour JSON, et cohérence lot / requête unitaire"""
+    import time
+
+    erreurs = []
+    df = _dataset_synthetique(n)
+    X_ref, index = reference_notebook(df)
+    pipeline = FeaturePipeline.fit(df)
+    par_lots = FeaturePipeline.fit_lots(df.iloc[i:i + 7_000] for i in range(0, len(df), 7_000))
+    if par_lots.to_dict() != pipeline.to_dict():
+        erreurs.append("fit_lots différent de fit")
+    pipeline = FeaturePipeline.from_dict(json.loads(json.dumps(pipeline.to_dict())))
+    if list(X_ref.columns) != pipeline.features:
+        erreurs.append(f"colonnes différentes :\n{list(X_ref.columns)}\n{pipeline.features}")
+    else:
+        debut = time.perf_counter()
+        X = pipeline.transform(df.loc[index])
+        duree = time.perf_counter() - debut
+        if not np.array_equal(X, X_ref.to_numpy(dtype=np.float32)):
+            erreurs.append("matrice d'entraînement différente du notebook")
+        print(f"🟰 {X.shape[0]} lignes x {X.shape[1]} features identiques au notebook ({duree * 1000:.0f} ms)")
+
+    # Requêtes API : le chemin rapide et le lot donnent la même ligne que dataset_full
+    inverse = {v: k for k, v in pipeline.ape_sections.items()}
+    echantillon = df.loc[index].head(2_000)
+    records = [{"age_estime": r.age_estime, "Tranche_effectif_num": r.Tranche_effectif_num,
+                "code_departement": r.dept, "code_ape": inverse[r.section], "categorie_juridique": str(r.cj),
+                "is_ess": int(r.ess == "O")}
+               for r in echantillon.rename(columns={COL_DEPT: "dept", COL_SECTION: "section", COL_CJ: "cj",
+                                                    COL_ESS: "ess"}).itertuples()]
+    attendu = pipeline.transform(echantillon)
+    if not np.array_equal(np.vstack([pipeline.transform_one(r) for r in records]), attendu):
+        erreurs.append("transform_one différent de transform")
+    if not np.array_equal(pipeline.transform_records(records), attendu):
+        erreurs.append("transform_records différent de transform")
+
+    print("✅ Vérification réussie" if not erreurs else "❌ " + "\n❌ ".join(erreurs))
+    return not erreurs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Spécification des features du modèle de survie")
+    parser.add_argument("--fit", metavar="PARQUET", help="dataset_full.parquet sur lequel apprendre la spécification")
+    parser.add_argument("--out", default=f"models/{SPEC_FILE}")
+    parser.add_argument("--check", action="store_true", help="Compare l'encodage au notebook 08_xgboost_v4")
+    args = parser.parse_args()
+
+    if args.check:
+        raise SystemExit(0 if check() else 1)
+    if args.fit:
+        spec = FeaturePipeline.fit(pd.read_parquet(args.fit))
+        spec.save(args.out)
+        print(f"✅ {len(spec.features)} features, {len(spec.ape_rares)} sections rares -> {args.out}")
@@ -0,0 +1,534 @@
+"""
+Surveillance en ligne de la dérive des entrées et des scores de l'API.
+
+- profil de référence (drift_reference.json) écrit à l'entraînement sur la partie validation : pour chaque
+  variable, des bornes (âge, effectif, mu, Prob_2ans) ou des modalités (département, secteur, forme juridique,
+  ESS), et les effectifs de référence par case ;
+- Moniteur : histogrammes aux mêmes cases, par fenêtre de temps (MONITORING_FENETRE_S). La mémoire est
+  constante (cases x fenêtres conservées) et une requête coûte une recherche dichotomique ou un lookup par
+  variable, quel que soit le trafic déjà observé ;
+- par fenêtre : PSI contre la référence, part des âges au-delà de la plage vérifiée (0-8 ans du simulateur)
+  et quantiles approchés de mu / Prob_2ans ; exposés par /monitoring (JSON) et /metrics (Prometheus).
+
+Les cases de mu et Prob_2ans sont les déciles de la référence, calculés en une passe sur une grille fine.
+
+Usage (depuis src/api/api-business-risk) :
+    python monitoring.py --reference dataset_full.parquet --model model.json --spec feature_spec.json \
+        --out models/drift_reference.json
+    python monitoring.py --check
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from bisect import bisect_right
+from collections import deque
+from datetime import datetime, timezone
+from math import log
+
+import numpy as np
+import pandas as pd
+
+from features import CJ_AUTRES, COL_CJ, COL_DEPT, COL_ESS, COL_SECTION, _lookup, code_ape, code_cj, code_departement
+
+# --- 1. CONFIGURATION ---
+REFERENCE_FILE = "drift_reference.json"
+REFERENCE_VERSION = 1
+
+FENETRE_S = int(os.getenv("MONITORING_FENETRE_S", "3600"))      # durée d'une fenêtre
+HISTORIQUE = int(os.getenv("MONITORING_HISTORIQUE", "24"))      # fenêtres closes conservées
+MIN_OBSERVATIONS = int(os.getenv("MONITORING_MIN_OBS", "200"))  # en dessous, le PSI n'est pas interprété
+
+# Lecture usuelle du PSI : < 0,1 stable, 0,1 - 0,25 dérive modérée, > 0,25 dérive forte
+PSI_MODERE = 0.1
+PSI_FORT = 0.25
+EPSILON = 1e-4
+
+# Plage d'âge sur laquelle le modèle a été vérifié (curseur du simulateur)
+AGE_MAX_VERIFIE = 8.0
+BORNES_AGE = [0, 1, 2, 3, 4, 5, 6, 7, 8, 10, 15, 20, 30, 200]
+# Codes INSEE de tranche d'effectif : une case par code
+BORNES_EFFECTIF = [0, 1, 2, 3, 11, 12, 21, 22, 31, 32, 41, 42, 51, 52, 53, 54]
+# Grilles fines des scores (déciles de référence choisis parmi leurs bornes)
+GRILLE_LOG_MU = np.round(np.arange(-10.0, 15.0 + 1e-9, 0.01), 2)
+GRILLE_PROB = np.round(np.arange(0.0, 100.0 + 1e-9, 0.05), 2)
+N_QUANTILES = 10
+
+NUMERIQUES = ("age", "effectif", "mu", "Prob_2ans")
+CATEGORIELLES = ("departement", "secteur", "forme_juridique", "is_ess")
+
+
+def prob_fermeture(mu, horizon, sigma):
+    """Vectorisation de processing.calculate_survival_risk (même formule, même arrondi)"""
+    z = np.clip((np.log(horizon) - np.asarray(mu, dtype=np.float64)) / sigma, -50, 50)
+    return np.round(100 / (1 + np.exp(-z)), 2)
+
+
+def sigma_modele(booster):
+    """aft_loss_distribution_scale lu dans la configuration du booster"""
+    config = json.loads(booster.save_config())["learner"]["objective"]
+    return float(config.get("aft_loss_param", {}).get("aft_loss_distribution_scale", 0.8))
+
+
+# --- 2. ENTRÉES NORMALISÉES ---
+def colonnes_dataset(df):
+    """Lot au schéma de dataset_full -> variables surveillées (normalisées comme features.py)"""
+    def num(col):
+        return pd.to_numeric(df[col], errors="coerce").fillna(0).to_numpy(dtype=np.float64)
+
+    if "is_ess" in df.columns:
+        is_ess = num("is_ess")
+    else:
+        is_ess = df[COL_ESS].map({"O": 1, "N": 0}).fillna(0).to_numpy(dtype=np.float64)
+    return {
+        "age": num("age_estime"), "effectif": num("Tranche_effectif_num"),
+        "departement": _lookup(df[COL_DEPT], code_departement), "secteur": df[COL_SECTION].to_numpy(dtype=object),
+        "forme_juridique": _lookup(df[COL_CJ], code_cj), "is_ess": is_ess.astype(np.int64).astype(str),
+    }
+
+
+def colonnes_requetes(records, spec):
+    """Requêtes API (clés de /predict) -> variables surveillées"""
+    df = pd.DataFrame.from_records(records)
+
+    def num(col):
+        if col not in df.columns:
+            return np.zeros(len(df))
+        return pd.to_numeric(df[col], errors="coerce").fillna(0).to_numpy(dtype=np.float64)
+
+    def texte(col):
+        return df[col] if col in df.columns else pd.Series([""] * len(df))
+
+    return {
+        "age": num("age_estime"), "effectif": num("Tranche_effectif_num"),
+        "departement": _lookup(texte("code_departement"), code_departement),
+        "secteur": _lookup(texte("code_ape"), lambda c: spec.ape_sections.get(code_ape(c))),
+        "forme_juridique": _lookup(texte("categorie_juridique"), code_cj),
+        "is_ess": num("is_ess").astype(np.int64).astype(str),
+    }
+
+
+# --- 3. CASES ---
+class Profil:
+    """Cases de chaque variable : bornes croissantes (numériques) ou modalités + 'autre' (catégorielles)"""
+
+    def __init__(self, bornes, modalites):
+        self.bornes = {v: [float(b) for b in bornes[v]] for v in NUMERIQUES}
+        self.modalites = {v: [str(m) for m in modalites[v]] for v in CATEGORIELLES}
+        self._index = {v: {m: i for i, m in enumerate(ms)} for v, ms in self.modalites.items()}
+        self.tailles = {**{v: len(b) - 1 for v, b in self.bornes.items()},
+                        **{v: len(m) + 1 for v, m in self.modalites.items()}}
+
+    @classmethod
+    def depuis_spec(cls, spec, bornes_mu, bornes_prob):
+        """Vocabulaires connus du modèle : départements cartographiés, sections APE, formes juridiques encodées"""
+        cjs = {f[len("CJ_"):] for f in spec.features if f.startswith("CJ_")} | set(spec.cj_rares)
+        if spec.cj_reference:
+            cjs.add(spec.cj_reference)
+        cjs.discard(CJ_AUTRES[len("CJ_"):])
+        modalites = {
+            "departement": sorted(spec.dep_risk), "secteur": sorted(set(spec.ape_sections.values())),
+            "forme_juridique": sorted(cjs), "is_ess": ["0", "1"],
+        }
+        bornes = {"age": BORNES_AGE, "effectif": BORNES_EFFECTIF, "mu": bornes_mu, "Prob_2ans": bornes_prob}
+        return cls(bornes, modalites)
+
+    def case_numerique(self, variable, valeurs):
+        """Indice de case ; les valeurs hors bornes tombent dans la première ou la dernière case"""
+        bornes = self.bornes[variable]
+        return np.clip(np.searchsorted(bornes, valeurs, side="right") - 1, 0, len(bornes) - 2)
+
+    def case_categorie(self, variable, valeurs):
+        index, autre = self._index[variable], len(self.modalites[variable])
+        return np.asarray(_lookup(pd.Series(valeurs, dtype=object), lambda m: index.get(m, autre)), dtype=np.int64)
+
+    def cases(self, colonnes, mu, prob):
+        """Lot : variables normalisées + scores -> indices de case par variable"""
+        cases = {v: self.case_categorie(v, colonnes[v]) for v in CATEGORIELLES}
+        cases["age"] = self.case_numerique("age", colonnes["age"])
+        cases["effectif"] = self.case_numerique("effectif", colonnes["effectif"])
+        cases["mu"] = self.case_numerique("mu", np.log(np.maximum(np.asarray(mu, dtype=np.float64), 1e-300)))
+        cases["Prob_2ans"] = self.case_numerique("Prob_2ans", prob)
+        return cases
+
+    def cases_une(self, data, mu, prob, spec):
+        """Chemin rapide d'une requête : bisect et lookups, sans pandas ni numpy"""
+        def num(cle):
+            try:
+                valeur = float(data.get(cle, 0) or 0)
+            except (TypeError, ValueError):
+                return 0.0
+            return 0.0 if valeur != valeur else valeur
+
+        def case(variable, valeur):
+            bornes = self.bornes[variable]
+            return min(max(bisect_right(bornes, valeur) - 1, 0), len(bornes) - 2)
+
+        def modalite(variable, valeur):
+            return self._index[variable].get(valeur, len(self.modalites[variable]))
+
+        return {
+            "age": case("age", num("age_estime")), "effectif": case("effectif", num("Tranche_effectif_num")),
+            "mu": case("mu", log(max(mu, 1e-300))), "Prob_2ans": case("Prob_2ans", prob),
+            "departement": modalite("departement", code_departement(data.get("code_departement", ""))),
+            "secteur": modalite("secteur", spec.ape_sections.get(code_ape(data.get("code_ape", "")))),
+            "forme_juridique": modalite("forme_juridique", code_cj(data.get("categorie_juridique", ""))),
+            "is_ess": modalite("is_ess", str(int(num("is_ess")))),
+        }
+
+    def to_dict(self):
+        return {"bornes": self.bornes, "modalites": self.modalites}
+
+
+class Fenetre:
+    """Histogrammes d'une fenêtre : un tableau de comptes par variable (taille fixée par le profil)"""
+
+    def __init__(self, profil, debut):
+        self.debut = debut
+        self.n = 0
+        self.age_hors_plage = 0
+        self.comptes = {v: np.zeros(t, dtype=np.int64) for v, t in profil.tailles.items()}
+
+    def ajouter(self, cases, n, age_hors_plage):
+        for variable, c in cases.items():
+            if np.ndim(c):
+                self.comptes[variable] += np.bincount(c, minlength=len(self.comptes[variable]))
+            else:
+                self.comptes[variable][c] += 1
+        self.n += n
+        self.age_hors_plage += age_hors_plage
+
+    def fusionner(self, autre):
+        for variable, c in autre.comptes.items():
+            self.comptes[variable] += c
+        self.n += autre.n
+        self.age_hors_plage += autre.age_hors_plage
+
+
+# --- 4. RÉFÉRENCE (ENTRAÎNEMENT) ---
+def _bornes_quantiles(comptes, grille, n_quantiles=N_QUANTILES):
+    """Bornes de la grille fine les plus proches des quantiles (cumul de l'histogramme fin)"""
+    cumul = np.cumsum(comptes)
+    if cumul[-1] == 0:
+        return [float(grille[0]), float(grille[-1])]
+    cibles = cumul[-1] * np.arange(1, n_quantiles) / n_quantiles
+    interieures = grille[1:-1][np.searchsorted(cumul[:-1], cibles)]
+    return [float(grille[0]), *sorted(set(float(b) for b in interieures)), float(grille[-1])]
+
+
+def _reagreger(comptes, grille, bornes):
+    """Histogramme fin -> cases du profil (les bornes sont des points de la grille : exact)"""
+    debuts = np.searchsorted(grille, bornes[:-1])
+    return np.add.reduceat(comptes, debuts)
+
+
+def construire_reference(lots, spec, sigma):
+    """lots : (DataFrame au schéma de dataset_full, mu prédit par le modèle) ; une passe, mémoire constante"""
+    brut = Profil.depuis_spec(spec, GRILLE_LOG_MU, GRILLE_PROB)
+    fenetre = Fenetre(brut, 0.0)
+    for df, mu in lots:
+        colonnes = colonnes_dataset(df)
+        cases = brut.cases(colonnes, mu, prob_fermeture(mu, 2, sigma))
+        fenetre.ajouter(cases, len(df), int((colonnes["age"] > AGE_MAX_VERIFIE).sum()))
+    fin_mu, fin_prob = fenetre.comptes["mu"], fenetre.comptes["Prob_2ans"]
+
+    bornes_mu, bornes_prob = _bornes_quantiles(fin_mu, GRILLE_LOG_MU), _bornes_quantiles(fin_prob, GRILLE_PROB)
+    profil = Profil.depuis_spec(spec, bornes_mu, bornes_prob)
+    comptes = {v: c.tolist() for v, c in fenetre.comptes.items()}
+    comptes["mu"] = _reagreger(fin_mu, GRILLE_LOG_MU, bornes_mu).tolist()
+    comptes["Prob_2ans"] = _reagreger(fin_prob, GRILLE_PROB, bornes_prob).tolist()
+    return {
+        "version": REFERENCE_VERSION, "cree_le": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "sigma": sigma, "n": fenetre.n, "age_max_verifie": AGE_MAX_VERIFIE,
+        "part_age_hors_plage": round(fenetre.age_hors_plage / max(fenetre.n, 1), 6),
+        **profil.to_dict(), "comptes": comptes,
+    }
+
+
+# --- 5. MONITEUR (API) ---
+def psi(comptes, reference):
+    """Population Stability Index entre deux histogrammes aux mêmes cases"""
+    p = np.maximum(comptes / max(comptes.sum(), 1), EPSILON)
+    q = np.maximum(reference / max(reference.sum(), 1), EPSILON)
+    return float(np.sum((p - q) * np.log(p / q)))
+
+
+def statut(valeur):
+    if valeur is None:
+        return "insuffisant"
+    if valeur >= PSI_FORT:
+        return "derive_forte"
+    return "derive_moderee" if valeur >= PSI_MODERE else "stable"
+
+
+class Moniteur:
+    def __init__(self, reference, spec, fenetre_s=FENETRE_S, historique=HISTORIQUE, horloge=time.time):
+        if not reference or reference.get("version") != REFERENCE_VERSION:
+            raise ValueError("Profil de référence absent ou de version inattendue")
+        self.spec, self.fenetre_s, self.horloge = spec, fenetre_s, horloge
+        self.profil = Profil(reference["bornes"], reference["modalites"])
+        self.reference = {v: np.asarray(c, dtype=np.float64) for v, c in reference["comptes"].items()}
+        self.meta = {k: reference[k] for k in ("cree_le", "n", "part_age_hors_plage")}
+        self._lock = threading.Lock()
+        self._courante = Fenetre(self.profil, self._debut(horloge()))
+        self._passees = deque(maxlen=historique)
+        self.requetes = 0
+        self.duree_s = 0.0
+
+    def _debut(self, maintenant):
+        return maintenant - maintenant % self.fenetre_s
+
+    def _tourner(self, maintenant):
+        """Clôt la fenêtre courante si elle est échue (fenêtres alignées sur fenetre_s)"""
+        if maintenant - self._courante.debut >= self.fenetre_s:
+            self._passees.append(self._courante)
+            self._courante = Fenetre(self.profil, self._debut(maintenant))
+
+    def _enregistrer(self, cases, n, hors_plage, debut):
+        with self._lock:
+            self._tourner(self.horloge())
+            self._courante.ajouter(cases, n, hors_plage)
+            self.requetes += 1
+            self.duree_s += time.perf_counter() - debut
+
+    def observer_un(self, data, mu, prob):
+        """Une requête /predict : coût constant (une case par variable)"""
+        debut = time.perf_counter()
+        cases = self.profil.cases_une(data, mu, prob, self.spec)
+        try:
+            hors_plage = int(float(data.get("age_estime", 0) or 0) > AGE_MAX_VERIFIE)
+        except (TypeError, ValueError):
+            hors_plage = 0
+        self._enregistrer(cases, 1, hors_plage, debut)
+
+    def observer(self, records, mus, probs):
+        """Un lot (/explain) : cases calculées en vectoriel, proportionnel à la taille du lot"""
+        debut = time.perf_counter()
+        colonnes = colonnes_requetes(records, self.spec)
+        cases = self.profil.cases(colonnes, mus, probs)
+        self._enregistrer(cases, len(records), int((colonnes["age"] > AGE_MAX_VERIFIE).sum()), debut)
+
+    # --- Indicateurs ---
+    def _quantile(self, variable, comptes, q):
+        """Interpolation linéaire dans la case (mu : échelle log, comme ses bornes)"""
+        n = comptes.sum()
+        if n == 0:
+            return None
+        bornes = self.profil.bornes[variable]
+        cumul = np.cumsum(comptes)
+        k = int(np.searchsorted(cumul, q * n))
+        avant = cumul[k - 1] if k else 0
+        valeur = bornes[k] + (bornes[k + 1] - bornes[k]) * (q * n - avant) / max(comptes[k], 1)
+        return round(float(np.exp(valeur)) if variable == "mu" else float(valeur), 4)
+
+    def _indicateurs(self, fenetre, fin):
+        suffisant = fenetre.n >= MIN_OBSERVATIONS
+        valeurs = {v: round(psi(c, self.reference[v]), 4) if suffisant else None for v, c in fenetre.comptes.items()}
+        return {
+            "debut": datetime.fromtimestamp(fenetre.debut, timezone.utc).isoformat(timespec="seconds"),
+            "fin": datetime.fromtimestamp(fin, timezone.utc).isoformat(timespec="seconds"),
+            "n": fenetre.n,
+            "part_age_hors_plage": round(fenetre.age_hors_plage / fenetre.n, 4) if fenetre.n else None,
+            "psi": valeurs,
+            "statuts": {v: statut(p) for v, p in valeurs.items()},
+            "alertes": sorted(v for v, p in valeurs.items() if p is not None and p >= PSI_FORT),
+            "quantiles": {v: {f"p{int(q * 100)}": self._quantile(v, fenetre.comptes[v], q) for q in (0.5, 0.9)}
+                          for v in ("mu", "Prob_2ans")},
+        }
+
+    def _copies(self):
+        """Copie des fenêtres sous verrou : les indicateurs sont ensuite calculés hors verrou"""
+        with self._lock:
+            self._tourner(self.horloge())
+            fenetres = [*self._passees, self._courante]
+            copies = []
+            for f in fenetres:
+                copie = Fenetre(self.profil, f.debut)
+                copie.fusionner(f)
+                copies.append(copie)
+            return copies, self.requetes, self.duree_s
+
+    def etat(self):
+        """Indicateurs de la fenêtre courante, de la fenêtre glissante (toutes les fenêtres conservées)
+        et de chaque fenêtre close"""
+        fenetres, requetes, duree = self._copies()
+        courante = fenetres[-1]
+        glissante = Fenetre(self.profil, fenetres[0].debut)
+        for f in fenetres:
+            glissante.fusionner(f)
+        fin = courante.debut + self.fenetre_s
+        return {
+            "reference": self.meta,
+            "parametres": {"fenetre_s": self.fenetre_s, "historique": self._passees.maxlen,
+                           "min_observations": MIN_OBSERVATIONS, "seuils_psi": [PSI_MODERE, PSI_FORT],
+                           "age_max_verifie": AGE_MAX_VERIFIE},
+            "courante": self._indicateurs(courante, fin),
+            "glissante": self._indicateurs(glissante, fin),
+            "fenetres_closes": [self._indicateurs(f, f.debut + self.fenetre_s) for f in fenetres[:-1]],
+            "surcout": {"requetes": requetes,
+                        "moyenne_us": round(duree / requetes * 1e6, 1) if requetes else None},
+        }
+
+    def prometheus(self):
+        """Format d'exposition texte de Prometheus"""
+        etat = self.etat()
+        lignes = [
+            "# HELP business_risk_drift_psi PSI de la variable contre le profil de référence",
+            "# TYPE business_risk_drift_psi gauge",
+        ]
+        for nom in ("courante", "glissante"):
+            for variable, valeur in etat[nom]["psi"].items():
+                if valeur is not None:
+                    lignes.append(f'business_risk_drift_psi{{variable="{variable}",fenetre="{nom}"}} {valeur}')
+        lignes += ["# HELP business_risk_drift_alerte 1 si le PSI glissant dépasse le seuil de dérive forte",
+                   "# TYPE business_risk_drift_alerte gauge"]
+        for variable in self.profil.tailles:
+            alerte = int(variable in etat["glissante"]["alertes"])
+            lignes.append(f'business_risk_drift_alerte{{variable="{variable}"}} {alerte}')
+        lignes += ["# HELP business_risk_drift_observations Entreprises observées dans la fenêtre",
+                   "# TYPE business_risk_drift_observations gauge"]
+        lignes += [f'business_risk_drift_observations{{fenetre="{nom}"}} {etat[nom]["n"]}'
+                   for nom in ("courante", "glissante")]
+        lignes += ["# HELP business_risk_age_hors_plage_ratio Part des âges au-delà de la plage vérifiée",
+                   "# TYPE business_risk_age_hors_plage_ratio gauge"]
+        lignes += [f'business_risk_age_hors_plage_ratio{{fenetre="{nom}"}} {etat[nom]["part_age_hors_plage"]}'
+                   for nom in ("courante", "glissante") if etat[nom]["part_age_hors_plage"] is not None]
+        lignes += ["# HELP business_risk_score_quantile Quantiles approchés des scores (fenêtre glissante)",
+                   "# TYPE business_risk_score_quantile gauge"]
+        for score, quantiles in etat["glissante"]["quantiles"].items():
+            for q, valeur in quantiles.items():
+                if valeur is not None:
+                    lignes.append(f'business_risk_score_quantile{{score="{score}",quantile="0.{q[1:]}"}} {valeur}')
+        lignes += ["# HELP business_risk_monitoring_requetes_total Requêtes observées par le moniteur",
+                   "# TYPE business_risk_monitoring_requetes_total counter",
+                   f"business_risk_monitoring_requetes_total {etat['surcout']['requetes']}"]
+        return "\n".join(lignes) + "\n"
+
+
+# --- 6. VÉRIFICATION ---
+def check(n=200_000):
+    """Référence en une passe identique aux histogrammes numpy, PSI nul sans dérive et élevé avec,
+    rotation des fenêtres et surcoût par requête"""
+    from features import FeaturePipeline, _dataset_synthetique
+
+    erreurs = []
+    sigma = 0.8
+    df = _dataset_synthetique(n, seed=0)
+    df["age_estime"] = pd.array(np.random.default_rng(0).integers(0, 9, n), dtype="Int64")
+    spec = FeaturePipeline.fit(df)
+
+    def mu_de(colonnes):
+        # Score synthétique : dépend de l'âge, de l'effectif et du département
+        risque = np.array([spec.risque(d) for d in colonnes["departement"]])
+        return np.exp(0.5 + 0.08 * colonnes["age"] + 0.05 * colonnes["effectif"] - 4 * risque)
+
+    debut = time.perf_counter()
+    lots = ((df.iloc[i:i + 30_000], mu_de(colonnes_dataset(df.iloc[i:i + 30_000]))) for i in range(0, n, 30_000))
+    reference = json.loads(json.dumps(construire_reference(lots, spec, sigma)))
+    print(f"📦 Référence construite sur {reference['n']} lignes en {time.perf_counter() - debut:.2f}s")
+
+    # Comptes de référence = histogrammes calculés d'un bloc
+    colonnes = colonnes_dataset(df)
+    mu = mu_de(colonnes)
+    attendus = {
+        "age": np.histogram(np.clip(colonnes["age"], BORNES_AGE[0], np.nextafter(BORNES_AGE[-1], 0)), BORNES_AGE)[0],
+        "mu": np.histogram(np.clip(np.log(mu), -10, 14.99), reference["bornes"]["mu"])[0],
+        "Prob_2ans": np.histogram(prob_fermeture(mu, 2, sigma), reference["bornes"]["Prob_2ans"])[0],
+    }
+    for variable, attendu in attendus.items():
+        if reference["comptes"][variable] != attendu.tolist():
+            erreurs.append(f"comptes de référence différents pour {variable}")
+    parts = np.asarray(reference["comptes"]["mu"]) / n
+    if parts.max() > 2 / N_QUANTILES:
+        erreurs.append(f"déciles de mu mal répartis (case max {parts.max():.2%})")
+
+    horloge = [1_000_000.0]
+    moniteur = Moniteur(reference, spec, fenetre_s=60, historique=3, horloge=lambda: horloge[0])
+    records = [{"age_estime": float(a), "Tranche_effectif_num": int(t), "code_departement": d, "code_ape": c,
+                "categorie_juridique": str(j), "is_ess": int(e == "O")}
+               for a, t, d, c, j, e in zip(df["age_estime"], df["Tranche_effectif_num"], df[COL_DEPT], df["code_ape"],
+                                           df[COL_CJ], df[COL_ESS])]
+    # Fenêtre 1 : trafic conforme, requête par requête
+    n_un = 5_000
+    mus = mu_de(colonnes_requetes(records[:n_un], spec))
+    probs = prob_fermeture(mus, 2, sigma)
+    debut = time.perf_counter()
+    for record, m, p in zip(records[:n_un], mus, probs):
+        moniteur.observer_un(record, float(m), float(p))
+    par_requete = (time.perf_counter() - debut) / n_un * 1e6
+    etat = moniteur.etat()["courante"]
+    if max(etat["psi"].values()) >= PSI_MODERE:
+        erreurs.append(f"dérive détectée sans dérive : {etat['psi']}")
+
+    # Fenêtre 2 : sociétés plus âgées, concentrées sur deux départements, par lots de 1000
+    horloge[0] += 60
+    derive = [{**r, "age_estime": r["age_estime"] + 10, "code_departement": "13" if i % 3 else "75"}
+              for i, r in enumerate(records[n_un:2 * n_un])]
+    for i in range(0, len(derive), 1_000):
+        lot = derive[i:i + 1_000]
+        m = mu_de(colonnes_requetes(lot, spec))
+        moniteur.observer(lot, m, prob_fermeture(m, 2, sigma))
+    etat = moniteur.etat()
+    courante = etat["courante"]
+    for variable in ("age", "departement", "mu"):
+        if courante["statuts"][variable] != "derive_forte":
+            erreurs.append(f"dérive de {variable} non détectée : {courante['psi'][variable]}")
+    if courante["part_age_hors_plage"] != 1.0 or etat["fenetres_closes"][0]["part_age_hors_plage"] != 0.0:
+        erreurs.append("part d'âges hors plage incorrecte")
+    if courante["statuts"]["is_ess"] != "stable":
+        erreurs.append("dérive détectée sur une variable inchangée (is_ess)")
+
+    # Chemin unitaire et chemin en lot : mêmes histogrammes
+    seul = Moniteur(reference, spec, horloge=lambda: 0.0)
+    lot = Moniteur(reference, spec, horloge=lambda: 0.0)
+    for record, m, p in zip(records[:2_000], mus, probs):
+        seul.observer_un(record, float(m), float(p))
+    lot.observer(records[:2_000], mus[:2_000], probs[:2_000])
+    if any((seul._courante.comptes[v] != lot._courante.comptes[v]).any() for v in seul.profil.tailles):
+        erreurs.append("observer_un et observer divergent")
+
+    # Mémoire constante : fenêtres bornées par l'historique
+    for _ in range(10):
+        horloge[0] += 60
+        moniteur.observer_un(records[0], float(mus[0]), float(probs[0]))
+    if len(moniteur.etat()["fenetres_closes"]) != 3:
+        erreurs.append("historique des fenêtres non borné")
+    if "business_risk_drift_psi" not in moniteur.prometheus():
+        erreurs.append("exposition Prometheus vide")
+
+    print(f"⏱️ Surcoût : {par_requete:.1f} µs par requête unitaire ; PSI de la fenêtre dérivée : "
+          + ", ".join(f"{v}={p}" for v, p in courante["psi"].items()))
+    for e in erreurs:
+        print(f"❌ {e}")
+    if not erreurs:
+        print("✅ Profil de référence, PSI, fenêtres et exposition conformes")
+    return not erreurs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Profil de référence et vérification du moniteur de dérive")
+    parser.add_argument("--reference", metavar="PARQUET", help="dataset_full.parquet (partie validation conseillée)")
+    parser.add_argument("--model", default=os.getenv("MODEL_PATH"), help="Booster XGBoost (JSON)")
+    parser.add_argument("--spec", help="feature_spec.json")
+    parser.add_argument("--out", default=f"models/{REFERENCE_FILE}")
+    parser.add_argument("--check", type=int, nargs="?", const=200_000, metavar="N",
+                        help="Vérification sur N lignes synthétiques")
+    args = parser.parse_args()
+
+    if args.check:
+        raise SystemExit(0 if check(args.check) else 1)
+    if args.reference:
+        import pyarrow.parquet as pq
+        import xgboost as xgb
+
+        from features import FeaturePipeline
+
+        spec = FeaturePipeline.load(args.spec)
+        booster = xgb.Booster(model_file=args.model)
+        lots = (lot.to_pandas() for lot in pq.ParquetFile(args.reference).iter_batches(batch_size=200_000))
+        artefact = construire_reference(((df, booster.inplace_predict(spec.transform(df))) for df in lots), spec,
+                                        sigma_modele(booster))
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(artefact, f, ensure_ascii=False)
+        print(f"✅ Profil de référence écrit dans {args.out} ({artefact['n']} lignes)")
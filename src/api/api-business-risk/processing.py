@@ -1,16 +1,25 @@
-import pandas as pd
 import numpy as np
 import xgboost as xgb
 import json
 import os
 import boto3
 
+from features import SPEC_FILE, FeaturePipeline
+
 # --- 1. CHARGEMENT DES CONFIGURATIONS ---
-# On récupère la liste des colonnes depuis le Secret
-FEATURES = json.loads(os.getenv("MODEL_FEATURES", "[]"))
+
+# Dossier local d'artefacts (mappings, histogrammes) : remplace S3 en local et pour les benchmarks
+LOCAL_ARTIFACTS_DIR = os.getenv("LOCAL_ARTIFACTS_DIR")
 
 def load_from_s3(file_name):
-    """Charge un dictionnaire JSON depuis S3"""
+    """Charge un dictionnaire JSON depuis S3 (ou depuis LOCAL_ARTIFACTS_DIR s'il est défini)"""
+    if LOCAL_ARTIFACTS_DIR:
+        try:
+            with open(os.path.join(LOCAL_ARTIFACTS_DIR, file_name), encoding="utf-8") as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"❌ ÉCHEC lecture locale de {file_name} : {e}")
+            return {}
     try:
         s3 = boto3.client(
             's3',
@@ -37,6 +46,16 @@ def load_from_s3(file_name):
 DEP_RISK_MAP = load_from_s3("mapping_dep_risk.json")
 APE_SECTION_MAP = load_from_s3("mapping_ape_section.json")
 
+# Spécification des features produite à l'entraînement (features.py) ; à défaut, reconstruite depuis
+# la liste de colonnes du Secret et les mappings historiques
+_spec = load_from_s3(SPEC_FILE)
+if _spec:
+    PIPELINE = FeaturePipeline.from_dict(_spec)
+else:
+    PIPELINE = FeaturePipeline.from_legacy(json.loads(os.getenv("MODEL_FEATURES", "[]")), DEP_RISK_MAP,
+                                           APE_SECTION_MAP)
+FEATURES = PIPELINE.features
+
 # --- 2. CALCULS ---
 def get_sigma(model):
     try:
@@ -70,42 +89,5 @@ def map_statut_expert(p2):
 
 # --- 3. PRÉPARATION DES DONNÉES ---
 def prepare_input(data):
-    # Création du DF avec les colonnes du Secret
-    df = pd.DataFrame(0.0, index=[0], columns=FEATURES)
-    
-    # Remplissage des variables
-    # On utilise .loc[0, col] pour être sûr de ne pas créer de nouvelles colonnes
-    if 'age_au_diagnostic' in df.columns:
-        df.loc[0, 'age_au_diagnostic'] = float(data.get('age_estime', 0))
-    
-    if 'Tranche_effectif_num' in df.columns:
-        df.loc[0, 'Tranche_effectif_num'] = float(data.get('Tranche_effectif_num', 0))
-    
-    if 'is_ess' in df.columns:
-        df.loc[0, 'is_ess'] = int(data.get('is_ess', 0))
-    
-    # Risque départemental
-    code_dep = str(data.get('code_departement', '')).strip().upper()
-    if 'risque_departemental' in df.columns:
-        df.loc[0, 'risque_departemental'] = float(DEP_RISK_MAP.get(code_dep, 0.05))
-    
-    # Mapping APE
-    code_ape = str(data.get('code_ape', '')).zfill(2)
-    section_name = APE_SECTION_MAP.get(code_ape)
-    if section_name:
-        col_ape = f"APE_{section_name}"
-        if col_ape in df.columns:
-            df.loc[0, col_ape] = 1.0
-        elif 'APE_Autres_Secteurs' in df.columns:
-            df.loc[0, 'APE_Autres_Secteurs'] = 1.0
-            
-    # Mapping CJ
-    cj_prefix = str(data.get('categorie_juridique', ''))[:4]
-    col_cj = f"CJ_{cj_prefix}"
-    if col_cj in df.columns:
-        df.loc[0, col_cj] = 1.0
-
-    # LOG DE DEBUG (Visible dans les logs HF)
-    print(f"DEBUG: Age envoyé={data.get('age_estime')} | Valeur dans DF={df['age_au_diagnostic'].iloc[0]}")
-    
-    return xgb.DMatrix(df)
\ No newline at end of file
+    """Requête /predict -> DMatrix d'une ligne, encodée comme à l'entraînement"""
+    return xgb.DMatrix(PIPELINE.transform_one(data)[None, :], feature_names=FEATURES)
@@ -0,0 +1,502 @@
+"""
+Recherche de sociétés par dénomination, sur les lignes de l'annuaire SIREN (annuaire.py).
+
+- normalisation : décomposition Unicode sans accents, majuscules, tout caractère hors [A-Z0-9] -> espace ;
+- index (un .npy par tableau dans RECHERCHE_DIR, projetés en mémoire comme l'annuaire) :
+  vocabulaire trié des mots (UTF-8 + offsets), postings mot -> lignes de l'annuaire, index direct
+  ligne -> mots, et trigrammes -> mots du vocabulaire pour la tolérance aux fautes de frappe ;
+- requête : chaque mot est résolu en mots du vocabulaire (exact ; préfixe pour le dernier mot en cours
+  de frappe, un intervalle contigu d'identifiants puisque le vocabulaire est trié ; à défaut, voisins
+  par trigrammes puis distance d'édition). Le mot le plus sélectif fournit les candidats, tous les mots
+  sont vérifiés sur l'index direct ; s'il reste moins de `limite` dénominations et aucune à l'identique,
+  les mots reconnus sont élargis à leurs voisins. Classement : exact > préfixe > approché ; à score égal,
+  dénomination la plus courte d'abord si tous les mots sont trouvés à l'identique (homonymes groupés),
+  sinon (saisie en cours, faute) des dénominations distinctes d'abord, les plus portées en premier.
+
+Usage (depuis src/api/api-business-risk) :
+    python recherche_noms.py --construire --annuaire models/annuaire
+    python recherche_noms.py --check 5800000
+"""
+import argparse
+import json
+import os
+import re
+import time
+import unicodedata
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from annuaire import ANNUAIRE_DIR, Annuaire
+
+# --- 1. CONFIGURATION ---
+RECHERCHE_DIR = os.getenv("RECHERCHE_DIR", os.path.join(ANNUAIRE_DIR, "noms"))
+MANIFESTE = "noms.json"
+LIMITE = 10
+LIMITE_MAX = 50
+MAX_CANDIDATS = 20_000      # lignes examinées au plus par requête (mots les plus fréquents d'abord)
+MAX_PRESELECTION = 200     # mots présélectionnés par trigrammes avant le calcul des distances d'édition
+MAX_VOISINS = 50            # mots approchés retenus par mot de la requête
+MIN_FLOU = 4                # longueur minimale d'un mot pour chercher ses voisins approchés
+POIDS_EXACT, POIDS_PREFIXE, POIDS_FLOU = 1.0, 0.9, 0.8
+
+ALPHABET = " ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
+BASE = len(ALPHABET)
+CODES = np.zeros(256, dtype=np.int64)
+CODES[np.frombuffer(ALPHABET.encode(), dtype=np.uint8)] = np.arange(BASE)
+_LIGATURES = str.maketrans({"Œ": "OE", "œ": "oe", "Æ": "AE", "æ": "ae", "ß": "ss"})
+_SEPARATEURS = re.compile(r"[^A-Z0-9]+")
+
+
+def normaliser(texte):
+    """'Boulangerie Pâtissière  L'Épi' -> 'BOULANGERIE PATISSIERE L EPI' (mêmes règles à l'index et à la requête)"""
+    texte = unicodedata.normalize("NFKD", str(texte).translate(_LIGATURES)).encode("ascii", "ignore").decode()
+    return _SEPARATEURS.sub(" ", texte.upper()).strip()
+
+
+def trigrammes(texte):
+    """Identifiants des trigrammes distincts d'un texte de l'alphabet (déjà bordé d'espaces)"""
+    codes = CODES[np.frombuffer(texte.encode(), dtype=np.uint8)]
+    return np.unique(codes[:-2] * BASE * BASE + codes[1:-1] * BASE + codes[2:])
+
+
+def distances_edition(mot, matrice, longueurs):
+    """Distances de Levenshtein de `mot` à chaque candidat (lignes de `matrice`, octets complétés par des zéros
+    au-delà de `longueurs`) et au plus proche de ses préfixes, vectorisées sur les candidats.
+    La récurrence d'insertion D[i][j] = min(D[i][j-1] + 1, ...) se calcule d'un bloc : D[i][j] - j est le
+    minimum cumulé de (meilleur de substitution/suppression)[k] - k"""
+    if not len(matrice):
+        return np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+    q = np.frombuffer(mot.encode(), dtype=np.uint8)
+    largeur = matrice.shape[1]
+    colonnes = np.arange(largeur + 1)
+    ligne = np.broadcast_to(colonnes, (len(matrice), largeur + 1))
+    for i, caractere in enumerate(q, start=1):
+        meilleur = np.empty_like(ligne)
+        meilleur[:, 0] = i
+        meilleur[:, 1:] = np.minimum(ligne[:, :-1] + (matrice != caractere), ligne[:, 1:] + 1)
+        ligne = np.minimum.accumulate(meilleur - colonnes, axis=1) + colonnes
+    prefixes = np.where(colonnes <= longueurs[:, None], ligne, largeur + len(q)).min(axis=1)
+    return ligne[np.arange(len(matrice)), longueurs], prefixes
+
+
+# --- 2. CONSTRUCTION (HORS LIGNE, DEPUIS L'ANNUAIRE) ---
+def _sauver(dossier, nom, tableau):
+    temporaire = dossier / f"{nom}.tmp.npy"
+    np.save(temporaire, tableau)
+    os.replace(temporaire, dossier / f"{nom}.npy")
+
+
+def _csr(cles, valeurs, n_cles):
+    """(clé, valeur) triés par clé -> offsets (n_cles + 1) et valeurs"""
+    return np.searchsorted(cles, np.arange(n_cles + 1)), valeurs
+
+
+def construire(annuaire, dossier=RECHERCHE_DIR):
+    """Écrit l'index des dénominations de `annuaire` dans `dossier` et renvoie le manifeste"""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    dossier = Path(dossier)
+    dossier.mkdir(parents=True, exist_ok=True)
+    n = len(annuaire)
+    bruts = pa.LargeStringArray.from_buffers(n, pa.py_buffer(np.ascontiguousarray(annuaire.offsets)),
+                                             pa.py_buffer(np.ascontiguousarray(annuaire.noms)))
+    decoupes = pc.split_pattern(pa.array([normaliser(t) for t in bruts.to_pylist()]), " ")
+    mots = pc.list_flatten(decoupes)
+    lignes = pc.list_parent_indices(decoupes).to_numpy()
+    garder = pc.not_equal(mots, "").to_numpy(zero_copy_only=False)
+    mots, lignes = mots.filter(pa.array(garder)), lignes[garder]
+
+    vocabulaire = pc.unique(mots)
+    vocabulaire = vocabulaire.take(pc.sort_indices(vocabulaire)).cast(pa.large_string())
+    n_mots = len(vocabulaire)
+    ids = pc.index_in(mots, value_set=vocabulaire).to_numpy().astype(np.int64)
+
+    # Couples (ligne, mot) distincts, triés par ligne puis par mot : index direct
+    couples = np.unique(lignes.astype(np.int64) * n_mots + ids)
+    lignes, ids = couples // n_mots, couples % n_mots
+    offsets, valeurs = _csr(lignes, ids, n)
+    _sauver(dossier, "lignes_offsets", offsets.astype(np.int64))
+    _sauver(dossier, "lignes_mots", valeurs.astype(np.uint32))
+    # Postings : tri stable par mot, les lignes restent croissantes pour chaque mot
+    ordre = np.argsort(ids, kind="stable")
+    offsets, valeurs = _csr(ids[ordre], lignes[ordre], n_mots)
+    _sauver(dossier, "postings_offsets", offsets.astype(np.int64))
+    _sauver(dossier, "postings", valeurs.astype(np.uint32))
+
+    offsets_vocab = np.frombuffer(vocabulaire.buffers()[1], dtype=np.int64)[:n_mots + 1]
+    octets = np.frombuffer(vocabulaire.buffers()[2], dtype=np.uint8)[:offsets_vocab[-1]]
+    _sauver(dossier, "vocabulaire_offsets", offsets_vocab)
+    _sauver(dossier, "vocabulaire", octets)
+
+    # Trigrammes de chaque mot bordé d'espaces (" MOT ") : fenêtres de 3 codes sans franchir un mot
+    longueurs = np.diff(offsets_vocab)
+    borde = np.full(len(octets) + 2 * n_mots, CODES[ord(" ")])
+    debuts = offsets_vocab[:-1] + 2 * np.arange(n_mots)
+    interieur = np.repeat(debuts + 1, longueurs) + np.arange(len(octets)) - np.repeat(offsets_vocab[:-1], longueurs)
+    borde[interieur] = CODES[octets]
+    positions = np.repeat(debuts, longueurs) + np.arange(len(octets)) - np.repeat(offsets_vocab[:-1], longueurs)
+    tri = borde[positions] * BASE * BASE + borde[positions + 1] * BASE + borde[positions + 2]
+    couples = np.unique(tri * n_mots + np.repeat(np.arange(n_mots), longueurs))
+    tri, proprietaires = couples // n_mots, couples % n_mots
+    offsets, valeurs = _csr(tri, proprietaires, BASE ** 3)
+    _sauver(dossier, "trigrammes_offsets", offsets.astype(np.int64))
+    _sauver(dossier, "trigrammes_mots", valeurs.astype(np.uint32))
+
+    manifeste = {"n_lignes": n, "n_mots": n_mots, "n_couples": int(len(lignes)),
+                 "annuaire_construit_le": annuaire.manifeste["construit_le"],
+                 "construit_le": datetime.now().isoformat(timespec="seconds")}
+    with open(dossier / MANIFESTE, "w", encoding="utf-8") as f:
+        json.dump(manifeste, f, ensure_ascii=False)
+    return manifeste
+
+
+# --- 3. RECHERCHE ---
+class IndexNoms:
+    def __init__(self, annuaire, dossier=RECHERCHE_DIR):
+        dossier = Path(dossier)
+        with open(dossier / MANIFESTE, encoding="utf-8") as f:
+            self.manifeste = json.load(f)
+        if self.manifeste["annuaire_construit_le"] != annuaire.manifeste["construit_le"]:
+            raise ValueError("index construit sur une autre version de l'annuaire")
+        charger = lambda nom: np.asarray(np.load(dossier / f"{nom}.npy", mmap_mode="r"))
+        self.annuaire = annuaire
+        self.vocabulaire, self.vocabulaire_offsets = charger("vocabulaire"), charger("vocabulaire_offsets")
+        self.postings, self.postings_offsets = charger("postings"), charger("postings_offsets")
+        self.lignes_mots, self.lignes_offsets = charger("lignes_mots"), charger("lignes_offsets")
+        self.trigrammes_mots, self.trigrammes_offsets = charger("trigrammes_mots"), charger("trigrammes_offsets")
+        self.n_mots = self.manifeste["n_mots"]
+
+    def _mot(self, i):
+        return self.vocabulaire[self.vocabulaire_offsets[i]:self.vocabulaire_offsets[i + 1]].tobytes()
+
+    def _rang(self, cle):
+        """Premier identifiant de mot >= cle (recherche dichotomique dans le vocabulaire trié)"""
+        debut, fin = 0, self.n_mots
+        while debut < fin:
+            milieu = (debut + fin) // 2
+            if self._mot(milieu) < cle:
+                debut = milieu + 1
+            else:
+                fin = milieu
+        return debut
+
+    def _matrice(self, ids):
+        """Octets des mots `ids`, une ligne par mot complétée par des zéros, et leurs longueurs"""
+        debuts = self.vocabulaire_offsets[ids]
+        longueurs = self.vocabulaire_offsets[ids + 1] - debuts
+        matrice = np.zeros((len(ids), int(longueurs.max(initial=0))), dtype=np.uint8)
+        dans_mot = np.arange(matrice.shape[1]) < longueurs[:, None]
+        matrice[dans_mot] = self.vocabulaire[(debuts[:, None] + np.arange(matrice.shape[1]))[dans_mot]]
+        return matrice, longueurs
+
+    def _voisins(self, mot, partiel):
+        """Mots du vocabulaire à distance d'édition <= 1 (2 au-delà de 7 lettres) de `mot`, ou de l'un de leurs
+        préfixes si partiel : présélection par trigrammes communs, puis distance exacte sur les meilleurs"""
+        tolerance = 1 if len(mot) <= 7 else 2
+        requete = trigrammes(f" {mot}" if partiel else f" {mot} ")
+        tranches = [self.trigrammes_mots[self.trigrammes_offsets[t]:self.trigrammes_offsets[t + 1]] for t in requete]
+        communs = np.bincount(np.concatenate(tranches), minlength=self.n_mots)
+        # Une édition détruit au plus 3 trigrammes : en deçà de ce seuil, le mot est trop loin
+        ids = np.flatnonzero(communs >= max(1, len(requete) - 3 * tolerance))
+        communs = communs[ids]
+        frequences = self.postings_offsets[ids + 1] - self.postings_offsets[ids]
+        if len(ids) > MAX_PRESELECTION:
+            # Moitié les plus proches en trigrammes, moitié les plus fréquents (les plus probables en saisie)
+            moitie = MAX_PRESELECTION // 2
+            proches = np.argpartition(-communs, moitie)[:moitie]
+            frequents = np.argpartition(-frequences, moitie)[:moitie]
+            selection = np.union1d(proches, frequents)
+            ids, frequences = ids[selection], frequences[selection]
+        completes, prefixes = distances_edition(mot, *self._matrice(ids))
+        distances = prefixes if partiel else completes
+        retenus = np.flatnonzero(distances <= tolerance)
+        retenus = retenus[np.lexsort((-frequences[retenus], distances[retenus]))[:MAX_VOISINS]]
+        poids = POIDS_FLOU * (1 - distances[retenus] / (len(mot) + 1))
+        # Comme pour les correspondances exactes, un mot entier l'emporte sur un mot dont seul le début répond
+        return ids[retenus], np.where(completes[retenus] > distances[retenus], poids * POIDS_PREFIXE, poids)
+
+    def _resoudre(self, mot, partiel, approche=False):
+        """Mots du vocabulaire qui répondent à `mot` : intervalles d'identifiants [début, fin) pondérés
+        (exact, préfixe) ou, à défaut ou si `approche`, identifiants approchés triés et leurs poids"""
+        cle = mot.encode()
+        rang = self._rang(cle)
+        intervalles = []
+        if rang < self.n_mots and self._mot(rang) == cle:
+            intervalles.append((rang, rang + 1, POIDS_EXACT))
+        if partiel:
+            fin = self._rang(cle + b"~")
+            if fin > rang:
+                intervalles.append((rang, fin, POIDS_PREFIXE))
+        if (intervalles and not approche) or len(mot) < MIN_FLOU:
+            return {"intervalles": intervalles, "ids": np.array([], dtype=np.int64), "poids": np.array([])}
+        ids, poids = self._voisins(mot, partiel)
+        hors = np.ones(len(ids), dtype=bool)
+        for debut, fin, _ in intervalles:
+            hors &= (ids < debut) | (ids >= fin)
+        ids, poids = ids[hors], poids[hors]
+        ordre = np.argsort(ids)
+        return {"intervalles": intervalles, "ids": ids[ordre], "poids": poids[ordre]}
+
+    def _mots(self, resolu):
+        mots = [np.arange(d, f) for d, f, _ in resolu["intervalles"]] + [resolu["ids"]]
+        return np.concatenate(mots).astype(np.int64)
+
+    def _taille(self, resolu):
+        mots = self._mots(resolu)
+        return int((self.postings_offsets[mots + 1] - self.postings_offsets[mots]).sum())
+
+    def _candidats(self, resolu):
+        """Lignes contenant l'un des mots, les mots les plus fréquents d'abord, au plus MAX_CANDIDATS"""
+        mots = self._mots(resolu)
+        debuts, fins = self.postings_offsets[mots], self.postings_offsets[mots + 1]
+        if (fins - debuts).sum() > MAX_CANDIDATS:
+            ordre = np.argsort(debuts - fins, kind="stable")
+            debuts, fins = debuts[ordre], fins[ordre]
+            cumul = np.cumsum(fins - debuts)
+            garder = int(np.searchsorted(cumul, MAX_CANDIDATS)) + 1
+            debuts, fins = debuts[:garder], fins[:garder]
+            fins[-1] -= max(0, int(cumul[garder - 1]) - MAX_CANDIDATS)
+        # Une ligne peut porter plusieurs de ces mots : doublons retirés après filtrage, sur bien moins de lignes
+        return np.concatenate([self.postings[d:f] for d, f in zip(debuts.tolist(), fins.tolist())]).astype(np.int64)
+
+    def _poids(self, resolu, mots):
+        """Poids de `resolu` pour chaque mot des lignes candidates (0 si le mot ne lui répond pas)"""
+        poids = np.zeros(len(mots))
+        for debut, fin, p in resolu["intervalles"]:
+            dedans = (mots >= debut) & (mots < fin)
+            poids[dedans] = np.maximum(poids[dedans], p)
+        if len(resolu["ids"]):
+            rang = np.minimum(np.searchsorted(resolu["ids"], mots), len(resolu["ids"]) - 1)
+            poids = np.maximum(poids, np.where(resolu["ids"][rang] == mots, resolu["poids"][rang], 0))
+        return poids
+
+    def _evaluer(self, resolus):
+        """Lignes candidates, score cumulé, présence de tous les mots et nombre de mots reconnus"""
+        resolus = [r for r in resolus if r["intervalles"] or len(r["ids"])]
+        if not resolus:
+            return np.array([], dtype=np.int64), np.array([]), np.array([], dtype=bool), 0
+        # Le mot le plus sélectif fournit les candidats, tous les mots les pondèrent ; si ses candidats ont été
+        # tronqués sans qu'aucun ne contienne tous les mots, le mot suivant prend le relais (une fois)
+        tailles = [self._taille(r) for r in resolus]
+        for rang in np.argsort(tailles, kind="stable")[:2].tolist():
+            lignes, score, trouves = self._ponderer(resolus, self._candidats(resolus[rang]))
+            if trouves.any() or tailles[rang] <= MAX_CANDIDATS:
+                break
+        return lignes, score, trouves, len(resolus)
+
+    def _ponderer(self, resolus, lignes):
+        """Score cumulé des mots de la requête et présence de tous les mots, pour chaque ligne candidate"""
+        # Mots des lignes candidates, mis bout à bout (index direct) ; par ligne, le meilleur poids de chaque mot
+        debuts = self.lignes_offsets[lignes]
+        longueurs = self.lignes_offsets[lignes + 1] - debuts
+        bornes = np.concatenate(([0], np.cumsum(longueurs)[:-1]))
+        mots_lignes = self.lignes_mots[np.repeat(debuts - bornes, longueurs) + np.arange(int(longueurs.sum()))]
+        score = np.zeros(len(lignes))
+        trouves = np.ones(len(lignes), dtype=bool)
+        for resolu in resolus:
+            meilleur = np.maximum.reduceat(self._poids(resolu, mots_lignes), bornes)
+            score += meilleur
+            trouves &= meilleur > 0
+        return lignes, score, trouves
+
+    def _homonymes(self, lignes):
+        """Nombre de lignes candidates qui portent la même dénomination (mêmes mots) et rang de chaque ligne
+        parmi elles"""
+        debuts = self.lignes_offsets[lignes]
+        longueurs = self.lignes_offsets[lignes + 1] - debuts
+        bornes = np.concatenate(([0], np.cumsum(longueurs)[:-1]))
+        mots = self.lignes_mots[np.repeat(debuts - bornes, longueurs) + np.arange(int(longueurs.sum()))]
+        # Empreinte de l'ensemble des mots : somme de leurs identifiants brassés (modulo 2**64)
+        brasses = (mots.astype(np.uint64) + np.uint64(1)) * np.uint64(0x9E3779B97F4A7C15)
+        brasses = (brasses ^ (brasses >> np.uint64(31))) * np.uint64(0xBF58476D1CE4E5B9)
+        _, groupes, effectifs = np.unique(np.add.reduceat(brasses, bornes), return_inverse=True, return_counts=True)
+        ordre = np.lexsort((lignes, groupes))
+        premiers = np.flatnonzero(np.r_[True, groupes[ordre][1:] != groupes[ordre][:-1]])
+        rang = np.empty(len(lignes), dtype=np.int64)
+        rang[ordre] = np.arange(len(lignes)) - np.repeat(premiers, np.diff(np.r_[premiers, len(lignes)]))
+        return effectifs[groupes], rang
+
+    def chercher(self, requete, limite=LIMITE):
+        """Positions (lignes de l'annuaire) et scores des meilleures dénominations pour `requete`"""
+        texte = normaliser(requete)
+        mots = texte.split()
+        vide = np.array([], dtype=np.int64), np.array([])
+        if len(texte.replace(" ", "")) < 2:
+            return vide
+        # Le dernier mot est en cours de frappe, sauf si la requête se termine par un séparateur
+        partiel = not re.search(r"[\W_]$", str(requete))
+        mots = list(dict.fromkeys(mots))
+        partiels = [partiel and m == mots[-1] for m in mots]
+        resolus = [self._resoudre(m, p) for m, p in zip(mots, partiels)]
+        lignes, score, trouves, n_mots = self._evaluer(resolus)
+        # Trop peu de dénominations contiennent tous les mots, aucune à l'identique : une faute a pu tomber sur
+        # un autre mot existant (ou sur le début d'un mot rare), les mots reconnus tels quels sont élargis
+        elargissables = [k for k, r in enumerate(resolus) if r["intervalles"] and len(mots[k]) >= MIN_FLOU]
+        if elargissables and trouves.sum() < limite and not (score[trouves] >= n_mots * POIDS_EXACT).any():
+            for k in elargissables:
+                resolus[k] = self._resoudre(mots[k], partiels[k], approche=True)
+            elargi = self._evaluer(resolus)
+            lignes, score, trouves = (np.concatenate((a, b)) for a, b in zip((lignes, score, trouves), elargi))
+            n_mots = max(n_mots, elargi[3])
+        if not n_mots:
+            return vide
+        if trouves.any():
+            lignes, score = lignes[trouves], score[trouves]
+        # Une ligne par position, avec son meilleur score
+        ordre = np.argsort(-score, kind="stable")
+        lignes, uniques = np.unique(lignes[ordre], return_index=True)
+        score = score[ordre][uniques]
+
+        taille_nom = self.annuaire.offsets[lignes + 1] - self.annuaire.offsets[lignes]
+        # Tous les mots trouvés à l'identique : les homonymes restent groupés, du plus court au plus long. Sinon
+        # un début de mot répond à des dizaines de dénominations : une ligne par dénomination d'abord, les plus
+        # portées en premier (les plus probables pour une saisie), les homonymes ensuite
+        effectifs, rang = self._homonymes(lignes)
+        complet = score >= n_mots * POIDS_EXACT
+        ordre = np.lexsort((lignes, taille_nom, np.where(complet, 0, -effectifs), np.where(complet, 0, rang > 0),
+                            -score))[:min(int(limite), LIMITE_MAX)]
+        return lignes[ordre], np.round(score[ordre] / n_mots, 3)
+
+    def rechercher(self, requete, limite=LIMITE):
+        """Lignes de l'annuaire (SIREN, dénomination, statut, probabilités...) avec leur score de pertinence"""
+        positions, scores = self.chercher(requete, limite)
+        return [{**ligne, "pertinence": s} for ligne, s in zip(self.annuaire.lignes(positions), scores.tolist())]
+
+
+def charger_index(annuaire, dossier=RECHERCHE_DIR):
+    """Index des dénominations projeté en mémoire, ou None s'il n'a pas été construit"""
+    if annuaire is None:
+        return None
+    try:
+        return IndexNoms(annuaire, dossier)
+    except Exception as e:
+        print(f"⚠️ Recherche par dénomination non disponible ({dossier}) : {e}")
+        return None
+
+
+# --- 4. VÉRIFICATION ---
+def _denominations(n, seed=0):
+    """Dénominations à longue traîne : formes et métiers fréquents, ~400 000 mots rares (loi de Zipf)"""
+    rng = np.random.default_rng(seed)
+    syllabes = np.array(["BA", "BE", "BI", "BO", "CA", "CO", "DA", "DE", "DU", "FA", "GA", "GE", "LA", "LE", "LI",
+                         "LO", "MA", "ME", "MI", "MO", "NA", "NE", "PA", "PE", "PI", "RA", "RE", "RI", "RO", "SA",
+                         "SE", "SI", "TA", "TE", "TI", "TO", "VA", "VE", "VI", "ZE", "RAN", "TIN", "LON", "BER"])
+    # Quatre syllabes : un vocabulaire peu dense, comme celui des vraies dénominations, où une faute de frappe
+    # ne retombe qu'exceptionnellement sur un autre mot existant
+    rares = rng.choice(syllabes, (4, 400_000))
+    rares = np.unique(np.char.add(np.char.add(rares[0], rares[1]), np.char.add(rares[2], rares[3])))
+    zipf = 1.0 / np.arange(1, len(rares) + 1) ** 0.9
+    tetes = np.array(["SAS", "SARL", "HOLDING", "GROUPE", "ETS", "SCI", "BOULANGERIE", "GARAGE", "CAFÉ",
+                      "RESTAURANT", "TRANSPORTS", "IMMOBILIÈRE", "CONSEIL", "BÂTIMENT", "PHARMACIE", "L'ATELIER"])
+    mots = [tetes[rng.integers(0, len(tetes), n)], rares[rng.choice(len(rares), n, p=zipf / zipf.sum())]]
+    troisieme = rares[rng.choice(len(rares), n, p=zipf / zipf.sum())]
+    avec = rng.random(n) < 0.5
+    return [f"{a} {b} {c}" if x else f"{a} {b}"
+            for a, b, c, x in zip(mots[0].tolist(), mots[1].tolist(), troisieme.tolist(), avec.tolist())]
+
+
+def _faute(mot, rng):
+    i = int(rng.integers(1, len(mot) - 1))
+    return mot[:i] + ("E" if mot[i] != "E" else "A") + mot[i + 1:]
+
+
+def check(n=1_000_000, n_requetes=1_000):
+    """Rappel des requêtes exactes, partielles et avec faute ; latence p50/p95 ; taille sur disque"""
+    import shutil
+    import tempfile
+    from collections import Counter, defaultdict
+
+    from annuaire import _base_synthetique, construire as construire_annuaire
+
+    erreurs = []
+    base = Path(tempfile.mkdtemp(prefix="recherche_check_"))
+    try:
+        df = _base_synthetique(n)
+        df["Dénomination"] = _denominations(n)
+        construire_annuaire(df, base / "annuaire")
+        annuaire = Annuaire(base / "annuaire")
+        debut = time.perf_counter()
+        manifeste = construire(annuaire, base / "noms")
+        taille = sum(f.stat().st_size for f in (base / "noms").iterdir()) / 1e6
+        print(f"📦 Index de {manifeste['n_lignes']} dénominations ({manifeste['n_mots']} mots) construit en "
+              f"{time.perf_counter() - debut:.1f}s ({taille:.0f} Mo)")
+        debut = time.perf_counter()
+        index = IndexNoms(annuaire, base / "noms")
+        print(f"⏱️ Chargement {(time.perf_counter() - debut) * 1000:.1f} ms")
+
+        rng = np.random.default_rng(1)
+        noms = [normaliser(annuaire.lignes([p])[0]["denomination"]) for p in rng.integers(0, n, n_requetes)]
+        familles = {
+            "exacte": [(nom, nom) for nom in noms],
+            "frappe": [(" ".join(nom.split()[:-1] + [nom.split()[-1][:3]]).lower(), nom) for nom in noms],
+            "faute": [(" ".join(_faute(m, rng) if len(m) >= 6 else m for m in nom.split()), nom) for nom in noms],
+        }
+        # Un début de mot de trois lettres prolonge souvent des dizaines de dénominations distinctes : aucun
+        # classement ne les met toutes dans les LIMITE premières. Plafond atteignable = part des requêtes dont
+        # la dénomination attendue figure parmi les LIMITE plus fréquentes de celles qui prolongent la saisie
+        frequences = Counter(normaliser(nom) for nom in df["Dénomination"])
+        par_mot = defaultdict(set)
+        for nom in frequences:
+            for m in nom.split():
+                par_mot[m].add(nom)
+        plafond = 0
+        for requete, attendu in familles["frappe"]:
+            *complets, debut_mot = requete.upper().split()
+            prolongent = set.intersection(*(par_mot[m] for m in complets))
+            prolongent = [nom for nom in prolongent if any(m.startswith(debut_mot) for m in nom.split())]
+            plafond += attendu in sorted(prolongent, key=lambda nom: -frequences[nom])[:LIMITE]
+        plafond /= n_requetes
+        seuils = {"exacte": 0.99, "frappe": 0.9 * plafond, "faute": 0.85}
+
+        durees = []
+        for famille, requetes in familles.items():
+            trouves = 0
+            for requete, attendu in requetes:
+                debut = time.perf_counter()
+                positions, _ = index.chercher(requete)
+                durees.append(time.perf_counter() - debut)
+                resultats = [normaliser(r["denomination"]) for r in index.annuaire.lignes(positions)]
+                trouves += attendu in resultats
+                # Saisie en cours : les dénominations qui contiennent les mots complets et prolongent le dernier
+                # passent avant les suggestions approchées
+                *complets, debut_mot = requete.upper().split()
+                prolonge = [set(complets) <= set(r.split()) and any(m.startswith(debut_mot) for m in r.split())
+                            for r in resultats]
+                if famille == "frappe" and prolonge != sorted(prolonge, reverse=True):
+                    erreurs.append(f"suggestion approchée avant une dénomination prolongeant la saisie '{requete}'")
+            rappel = trouves / len(requetes)
+            print(f"🔎 {famille:<7} rappel@{LIMITE} {rappel:.1%}"
+                  + (f" (plafond {plafond:.1%}, seuil {seuils[famille]:.1%})" if famille == "frappe" else ""))
+            # Une faute qui place le mot à égale distance de plusieurs mots existants reste ambiguë : seuil plus bas
+            if rappel < seuils[famille]:
+                erreurs.append(f"rappel insuffisant pour les requêtes '{famille}' ({rappel:.1%})")
+        if index.chercher("é")[0].size or index.rechercher("Boulangerie Café", 3)[0]["pertinence"] <= 0:
+            erreurs.append("requête trop courte ou normalisation des accents incorrecte")
+
+        p50, p95, p99 = np.percentile(np.array(durees) * 1000, [50, 95, 99])
+        print(f"⏱️ Requête p50 {p50:.2f} ms, p95 {p95:.2f} ms, p99 {p99:.2f} ms")
+        if p95 > 20:
+            erreurs.append(f"p95 {p95:.1f} ms > 20 ms")
+    finally:
+        shutil.rmtree(base, ignore_errors=True)
+    print("✅ Vérification réussie" if not erreurs else "❌ " + "\n❌ ".join(erreurs))
+    return not erreurs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Index de recherche des dénominations (construction et vérification)")
+    parser.add_argument("--construire", action="store_true", help="Construit l'index depuis l'annuaire")
+    parser.add_argument("--annuaire", default=ANNUAIRE_DIR)
+    parser.add_argument("--out", default=None, help="Défaut : <annuaire>/noms")
+    parser.add_argument("--check", type=int, nargs="?", const=1_000_000, metavar="N",
+                        help="Vérification sur N lignes synthétiques")
+    args = parser.parse_args()
+
+    if args.check:
+        raise SystemExit(0 if check(args.check) else 1)
+    if args.construire:
+        manifeste = construire(Annuaire(args.annuaire), args.out or os.path.join(args.annuaire, "noms"))
+        print(f"✅ Index écrit ({manifeste['n_lignes']} dénominations, {manifeste['n_mots']} mots)")
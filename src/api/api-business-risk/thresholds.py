@@ -0,0 +1,140 @@
+import json
+import sys
+import numpy as np
+import pandas as pd
+
+from processing import load_from_s3
+
+# --- 1. CONFIGURATION ---
+HORIZONS = {1: "Prob_1an", 2: "Prob_2ans", 3: "Prob_3ans"}
+
+# Dimensions de découpage du portefeuille (colonnes de la base scorée)
+NIVEAUX = {
+    "departement": "Code du département de l'établissement",
+    "secteur": "libelle_section_ape",
+    "forme_juridique": "Catégorie juridique de l'unité légale",
+}
+
+# Histogrammes en pas de 0,1 point : tout seuil multiple de 0,1 est évalué exactement
+BIN_STEP = 0.1
+N_BINS = int(100 / BIN_STEP)
+
+# Bornes de map_statut_expert (sur Prob_2ans, bornes hautes incluses) : les libellés de statut ne
+# s'appliquent qu'à ces bornes et à cet horizon, toute autre politique est restituée en bandes numérotées
+STATUS_HORIZON = 2
+DEFAULT_CUTOFFS = [5.0, 10.0, 20.0]
+STATUS_LABELS = ['🟢 SAIN', '🟡 OBSERVATION', '🟠 VIGILANCE', '🔴 CRITIQUE']
+
+
+# --- 2. CONSTRUCTION (HORS LIGNE, DEPUIS LA BASE SCORÉE) ---
+def _group_labels(niveau, series):
+    """Libellés normalisés calculés sur les valeurs uniques"""
+    codes, uniques = pd.factorize(series)
+    uniques = pd.Series(uniques)
+    if niveau == "departement":
+        labels = uniques.astype(str).str.strip().str.replace(r'\.0$', '', regex=True).str.zfill(2)
+    elif niveau == "forme_juridique":
+        labels = pd.to_numeric(uniques, errors='coerce').astype("Int64").astype(str).str[:4]
+    else:
+        labels = uniques.astype(str)
+    merged_codes, merged_labels = pd.factorize(labels)
+    if len(merged_labels) == 0:
+        return [], codes
+    return list(merged_labels), np.where(codes >= 0, merged_codes[np.maximum(codes, 0)], -1)
+
+
+def build_histograms(df):
+    """Histogrammes de Prob_* des sociétés actives, par niveau et par groupe (sérialisables en JSON)"""
+    actives = df[df["Statut_Expert"] != '⚫ FERMÉ']
+    bins = {
+        h: np.clip(np.ceil(np.nan_to_num(actives[col].to_numpy(dtype="float64"), nan=0.0) / BIN_STEP), 0, N_BINS).astype(np.int64)
+        for h, col in HORIZONS.items()
+    }
+    niveaux = {}
+    for niveau, col in NIVEAUX.items():
+        labels, codes = _group_labels(niveau, actives[col])
+        mask = codes >= 0
+        niveaux[niveau] = {
+            "labels": labels,
+            "counts": {
+                str(h): np.bincount(codes[mask] * (N_BINS + 1) + b[mask], minlength=len(labels) * (N_BINS + 1))
+                .reshape(len(labels), N_BINS + 1).tolist()
+                for h, b in bins.items()
+            },
+        }
+    return {"bin_step": BIN_STEP, "n_rows": int(len(actives)), "niveaux": niveaux}
+
+
+# --- 3. CHARGEMENT & ÉVALUATION EN O(BINS) ---
+def load_histograms(payload):
+    """Convertit l'artefact JSON en histogrammes cumulés numpy"""
+    if not payload or payload.get("bin_step") != BIN_STEP:
+        return {}
+    histos = {}
+    for niveau, data in payload["niveaux"].items():
+        cum = {int(h): np.asarray(c, dtype=np.int64).reshape(len(data["labels"]), N_BINS + 1).cumsum(axis=1)
+               for h, c in data["counts"].items()}
+        histos[niveau] = {"labels": data["labels"], "index": {l: i for i, l in enumerate(data["labels"])}, "cum": cum}
+    return histos
+
+
+HISTOGRAMS = load_histograms(load_from_s3("threshold_histograms.json"))
+
+
+def _threshold_index(seuil):
+    return int(np.clip(round(float(seuil) / BIN_STEP), 0, N_BINS))
+
+
+def simulate_policy(niveau, horizon, seuils=None, groupes=None):
+    """Répartition du portefeuille dans les bandes définies par `seuils`, pour chaque groupe demandé.
+    KeyError si le niveau n'a pas d'histogrammes ou si des groupes demandés y sont inconnus"""
+    if niveau not in HISTOGRAMS:
+        raise KeyError(f"Niveau sans histogrammes : {niveau}")
+    if horizon not in HORIZONS:
+        raise ValueError(f"Horizon invalide : {horizon} (attendu 1, 2 ou 3)")
+    seuils = sorted(float(s) for s in (seuils or DEFAULT_CUTOFFS))
+    if any(s < 0 or s > 100 for s in seuils):
+        raise ValueError("Les seuils doivent être compris entre 0 et 100")
+
+    data = HISTOGRAMS[niveau]
+    cum = data["cum"][horizon]
+    if groupes:
+        inconnus = [g for g in groupes if g not in data["index"]]
+        if inconnus:
+            raise KeyError(f"Groupes inconnus pour le niveau {niveau} : {', '.join(map(str, inconnus))}")
+        idx = [data["index"][g] for g in groupes]
+    else:
+        idx = list(range(len(data["labels"])))
+
+    if seuils == DEFAULT_CUTOFFS and horizon == STATUS_HORIZON:
+        labels = STATUS_LABELS
+    else:
+        labels = [f"bande_{i + 1}" for i in range(len(seuils) + 1)]
+    ks = [_threshold_index(s) for s in seuils]
+    sub = cum[idx]
+    bounds = np.column_stack([np.zeros(len(sub), dtype=np.int64)] + [sub[:, k] for k in ks] + [sub[:, -1]])
+    counts = np.diff(bounds, axis=1)
+
+    groupes_out = [
+        {"groupe": data["labels"][i], "total": int(row.sum()), "bandes": dict(zip(labels, map(int, row)))}
+        for i, row in zip(idx, counts)
+    ]
+    total = counts.sum(axis=0)
+    n = max(int(total.sum()), 1)
+    bornes = [0.0, *seuils, 100.0]
+    return {
+        "bandes": labels,
+        "bornes": {l: [bas, haut] for l, bas, haut in zip(labels, bornes, bornes[1:])},
+        "portefeuille": {l: {"volume": int(v), "part_pct": round(v / n * 100, 2)} for l, v in zip(labels, total)},
+        "groupes": groupes_out,
+    }
+
+
+if __name__ == "__main__":
+    # Génération de l'artefact : python thresholds.py dataset_scored.parquet threshold_histograms.json
+    src, dst = sys.argv[1], sys.argv[2]
+    cols = ["Statut_Expert", *HORIZONS.values(), *NIVEAUX.values()]
+    artefact = build_histograms(pd.read_parquet(src, columns=cols))
+    with open(dst, "w", encoding="utf-8") as f:
+        json.dump(artefact, f, ensure_ascii=False, separators=(",", ":"))
+    print(f"✅ Histogrammes écrits dans {dst} ({artefact['n_rows']} sociétés actives)")
@@ -1,14 +1,11 @@
 import streamlit as st
-import pandas as pd
-import pyarrow.parquet as pq
-import s3fs
-import os
-import requests
-from PIL import Image
-import io
+from utils import demarrage
+from utils.data import sync_session_dataset
+from utils.profiling import start_page, end_page, bloc, jalon
 
 # --- 1. CONFIGURATION ---
 st.set_page_config(page_title="Projet Égide | Expertise & Vision", layout="wide")
+start_page(__file__)
 
 # CSS (inchangé)
 st.markdown("""
@@ -22,97 +19,36 @@ st.markdown("""
     </style>
     """, unsafe_allow_html=True)
 
-# --- 2. FONCTIONS DE CHARGEMENT ---
-@st.cache_data(show_spinner=False)
-def load_global_dataset_s3():
-    """Moteur unique de chargement de la base Parquet globale"""
-    aws_key = os.environ.get("AWS_ACCESS_KEY_ID") or st.secrets.get("AWS_ACCESS_KEY_ID")
-    aws_secret = os.environ.get("AWS_SECRET_ACCESS_KEY") or st.secrets.get("AWS_SECRET_ACCESS_KEY")
-    bucket_name = os.environ.get("AWS_BUCKET_NAME") or st.secrets.get("AWS_BUCKET_NAME")
-    file_path = os.environ.get("AWS_FILE_PATH") or st.secrets.get("AWS_FILE_PATH")
-
-    if not aws_key: return None
-    try:
-        fs = s3fs.S3FileSystem(key=aws_key, secret=aws_secret, anon=False)
-        s3_path = f"s3://{bucket_name}/{file_path}"
-        with fs.open(s3_path, mode='rb') as f:
-            df_loaded = pd.read_parquet(f)
-        
-        # Formatage de sécurité pour les dates
-        if "Date_fermeture_finale" in df_loaded.columns:
-            df_loaded["Date_fermeture_finale"] = pd.to_datetime(df_loaded["Date_fermeture_finale"], errors='coerce')
-        return df_loaded
-    except Exception as e:
-        st.error(f"Erreur critique S3 lors du chargement initial : {e}")
-        return None
-
-@st.cache_data(show_spinner=False)
-def load_s3_image(file_key_name):
-    keys = ["AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY", "AWS_BUCKET_NAME"]
-    creds = {k: os.environ.get(k) or st.secrets.get(k) for k in keys}
-    file_path = os.environ.get(file_key_name) or st.secrets.get(file_key_name)
-    try:
-        fs = s3fs.S3FileSystem(key=creds["AWS_ACCESS_KEY_ID"], secret=creds["AWS_SECRET_ACCESS_KEY"], anon=False)
-        with fs.open(f"s3://{creds['AWS_BUCKET_NAME']}/{file_path}", mode='rb') as f:
-            return Image.open(io.BytesIO(f.read()))
-    except: return None
-
-def check_space(space_id, token):
-    if not space_id or not token: return "OFFLINE"
-    try:
-        res = requests.get(f"https://huggingface.co/api/spaces/{space_id}", headers={"Authorization": f"Bearer {token}"}, timeout=3)
-        return res.json().get("runtime", {}).get("stage", "UNKNOWN")
-    except: return "OFFLINE"
-
-# --- 3. INITIALISATION CENTRALISÉE ---
+# --- 2. INITIALISATION PARALLÈLE ---
+# Dataset et photo partent en arrière-plan dès l'ouverture de la session ; les statuts des Spaces viennent
+# du poller du processus. La page s'affiche tout de suite, les emplacements sont remplis en fin de rendu.
 if 'initialized' not in st.session_state:
-    with st.status("🔮 Initialisation de l'intelligence économique...", expanded=True) as status:
-        hf_token = os.environ.get("HF_TOKEN") or st.secrets.get("HF_TOKEN")
-        
-        st.write("📡 1. Connexion aux infrastructures d'API...")
-        st.session_state['status_api'] = check_space(os.environ.get("SPACE_API_ID") or st.secrets.get("SPACE_API_ID"), hf_token)
-        st.session_state['status_mlflow'] = check_space(os.environ.get("SPACE_MLFLOW_ID") or st.secrets.get("SPACE_MLFLOW_ID"), hf_token)
-        
-        st.write("🗂️ 2. Téléchargement et indexation de la base de données globale S3...")
-        df_global = load_global_dataset_s3()
-        
-        if df_global is not None:
-            # 🎯 On injecte la base pour TOUTES les pages de l'application
-            st.session_state['df'] = df_global
-            st.session_state['total_rows'] = len(df_global)
-            status.update(label="Système prêt & Données synchronisées !", state="complete")
-        else:
-            st.session_state['total_rows'] = 5816238
-            status.update(label="⚠️ Base de données S3 indisponible", state="error")
-            st.stop()
-            
-        st.write("📸 3. Chargement des ressources visuelles...")
-        st.session_state['user_photo'] = load_s3_image("AWS_MY_PHOTO_PATH")
-        
-        st.session_state['initialized'] = True
-        status.update(label="Système prêt !", state="complete")
+    chargements = demarrage.lancer_initialisation()
+    status = st.status("🔮 Initialisation de l'intelligence économique...", expanded=False)
+    with status:
+        st.write("📡 Statut des infrastructures d'API (sonde partagée du serveur)")
+        st.write("🗂️ Téléchargement et indexation de la base de données globale S3...")
+        st.write("📸 Chargement des ressources visuelles...")
+else:
+    chargements, status = None, None
 
-# --- 4. SIDEBAR & UI (Identique à ton code) ---
+# --- 3. SIDEBAR ---
 with st.sidebar:
     st.image("https://img.icons8.com/fluency/96/artificial-intelligence.png", width=50)
     st.title("Framework")
     with st.container(border=True):
         st.markdown("**Périmètre d'analyse**")
-        st.caption(f"• {st.session_state['total_rows']:,}".replace(",", " ") + " Sociétés (SAS/SARL)")
-    
-    # Affichage dynamique des status
-    for key, label in [('status_api', 'API'), ('status_mlflow', 'MLflow')]:
-        val = st.session_state[key]
-        color = "🟢" if "RUNNING" in val else "🔴"
-        st.caption(f"{color} **{label} :** {val}")
+        zone_perimetre = st.empty()
+        zone_perimetre.caption("• Chargement de la base...")
+    zone_statuts = st.container()
+    zone_version = st.empty()
 
-# --- 5. CONTENU PRINCIPAL ---
+# --- 4. CONTENU PRINCIPAL ---
 with st.container(border=True):
     c1, c2 = st.columns([1, 3], gap="large")
     
     with c1:
-        if st.session_state.get('user_photo'):
-            st.image(st.session_state['user_photo'], use_container_width=True)
+        zone_photo = st.empty()
         st.markdown("### Joël TERMONDJIAN")
         st.caption("🚀 Expert Banque & Data Scientist")
         
@@ -148,7 +84,9 @@ with st.container(border=True):
 
 st.divider()
 
-# --- 6. VISION STRATÉGIQUE ---
+jalon("premier_affichage")
+
+# --- 5. VISION STRATÉGIQUE ---
 st.markdown("### 🎯 Ma Vision de l'Analyse")
 st.write("L'analyse ne se limite pas aux chiffres, elle décrypte l'ADN profond de l'entreprise.")
 st.write("")
@@ -167,4 +105,33 @@ st.info("""
 **En bref :** Cette méthode combine analyse sectorielle et indicateurs structurels pour une vision préventive du risque. 
 L'objectif est de comprendre la mécanique de l'entreprise pour mieux protéger son avenir.
 """)
-st.caption("✨ Application conçue pour l'aide à la décision et le pilotage des risques d'entreprises.")
\ No newline at end of file
+st.caption("✨ Application conçue pour l'aide à la décision et le pilotage des risques d'entreprises.")
+
+# --- 6. FIN DES CHARGEMENTS ---
+if chargements is not None:
+    with bloc("accueil:attente_chargements"):
+        snapshot = chargements["donnees"].result()
+        st.session_state['user_photo'] = chargements["photo"].result()
+    if snapshot["version"] is not None:
+        st.session_state['initialized'] = True
+        status.update(label="Système prêt & Données synchronisées !", state="complete")
+    else:
+        # Pas de marqueur d'initialisation : le chargement est retenté au prochain rerun
+        st.session_state['total_rows'] = 5816238
+        status.update(label="⚠️ Base de données S3 indisponible", state="error")
+
+# Vérification périodique de la version S3 (ETag) : échange à chaud si la base a été mise à jour
+sync_session_dataset()
+
+zone_perimetre.caption(f"• {st.session_state['total_rows']:,}".replace(",", " ") + " Sociétés (SAS/SARL)")
+with zone_statuts:
+    # Affichage dynamique des status (première sonde du processus attendue au plus le temps d'un timeout)
+    for label, val in demarrage.statuts_spaces(attente_s=demarrage.SPACE_TIMEOUT_S).items():
+        color = "🟢" if "RUNNING" in val else "🔴"
+        st.caption(f"{color} **{label} :** {val}")
+if st.session_state.get('data_version'):
+    zone_version.caption(f"🗂️ **Données :** v{st.session_state['data_version']} · MAJ {st.session_state['data_refreshed_at']:%d/%m %H:%M}")
+if st.session_state.get('user_photo'):
+    zone_photo.image(st.session_state['user_photo'], use_container_width=True)
+
+end_page()
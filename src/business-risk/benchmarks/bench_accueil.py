@@ -0,0 +1,162 @@
+"""
+Benchmark headless de la page d'accueil (AppTest) : délai avant premier affichage et durée totale du rendu.
+
+Les services distants sont remplacés par des doublures à latence fixe (API Hugging Face des Spaces,
+téléchargement S3 du dataset synthétique, photo S3) ; la mesure vient du profileur de rendu
+(jalon « premier_affichage » et total du rerun). Trois situations par page :
+- froid : processus neuf, caches vides (premier visiteur après un déploiement) ;
+- session : nouvelle session dans un processus chaud (visiteur suivant) ;
+- rerun : interaction dans une session déjà initialisée.
+
+Pour comparer avec une version antérieure de la page, l'extraire puis la passer en argument
+(elle doit appeler jalon("premier_affichage") pour que le premier affichage soit mesuré) :
+    git show <rev>:src/business-risk/Expertise_et_vision.py > /tmp/accueil_avant.py
+    python -m benchmarks.bench_accueil --pages /tmp/accueil_avant.py Expertise_et_vision.py
+"""
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+# --- 1. CONFIGURATION ---
+APP_DIR = Path(__file__).resolve().parent.parent
+PAGE = APP_DIR / "Expertise_et_vision.py"
+LATENCE_SPACE_S = 0.8
+LATENCE_DATASET_S = 1.5
+LATENCE_PHOTO_S = 0.4
+N_ROWS = 100_000
+ENV = {
+    "HF_TOKEN": "bench", "SPACE_API_ID": "bench/api", "SPACE_MLFLOW_ID": "bench/mlflow",
+    "AWS_ACCESS_KEY_ID": "bench", "AWS_SECRET_ACCESS_KEY": "bench", "AWS_BUCKET_NAME": "bench",
+    "AWS_FILE_PATH": "bench.parquet", "AWS_MY_PHOTO_PATH": "photo.png",
+}
+
+
+# --- 2. DOUBLURES DES SERVICES DISTANTS ---
+class _Reponse:
+    def json(self):
+        return {"runtime": {"stage": "RUNNING"}}
+
+
+def _space(*args, **kwargs):
+    time.sleep(LATENCE_SPACE_S)
+    return _Reponse()
+
+
+class _S3:
+    """Seule la photo passe par s3fs : le dataset est servi par la doublure de refresh_dataset"""
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def open(self, path, mode="rb"):
+        from PIL import Image
+
+        time.sleep(LATENCE_PHOTO_S)
+        buffer = io.BytesIO()
+        Image.new("RGB", (64, 64), "navy").save(buffer, format="PNG")
+        buffer.seek(0)
+        return buffer
+
+
+def _doublure_dataset(df):
+    """Premier appel : téléchargement simulé ; ensuite, comme le vrai magasin, la version en mémoire"""
+    store = {}
+
+    def refresh_dataset(force=False):
+        if "snapshot" not in store:
+            time.sleep(LATENCE_DATASET_S)
+            store["snapshot"] = {"df": df, "n_rows": len(df), "etags": {}, "version": "bench",
+                                 "refreshed_at": datetime.now()}
+        return store["snapshot"]
+
+    return refresh_dataset
+
+
+# --- 3. MESURE (PROCESSUS ENFANT) ---
+def _dernier_rerun(log):
+    with open(log, encoding="utf-8") as f:
+        record = json.loads(f.readlines()[-1])
+    return {"premier_affichage_ms": record["jalons"].get("premier_affichage"), "total_ms": record["total_ms"]}
+
+
+def run_worker(page, parquet):
+    log = Path(tempfile.mkdtemp()) / "render_profile.jsonl"
+    os.environ.update(ENV, PROFILING_ENABLED="1", PROFILING_LOG=str(log))
+    sys.path.insert(0, str(APP_DIR))
+
+    import pandas as pd
+    import requests
+    import s3fs
+    from streamlit.testing.v1 import AppTest
+
+    import utils.data
+    from utils import demarrage
+
+    requests.get = _space
+    s3fs.S3FileSystem = _S3
+    utils.data.refresh_dataset = demarrage.refresh_dataset = _doublure_dataset(pd.read_parquet(parquet))
+
+    mesures = {}
+    at = AppTest.from_file(str(page), default_timeout=120)
+    at.run()
+    mesures["froid"] = _dernier_rerun(log)
+    erreurs = [str(e.value)[:200] for e in at.exception]
+
+    at = AppTest.from_file(str(page), default_timeout=120)
+    at.run()
+    mesures["session"] = _dernier_rerun(log)
+    at.run()
+    mesures["rerun"] = _dernier_rerun(log)
+    return {"page": Path(page).name, "mesures": mesures, "erreurs": erreurs}
+
+
+def measure(page, parquet):
+    cmd = [sys.executable, "-m", "benchmarks.bench_accueil", "--worker", "--parquet", str(parquet), "--page", str(page)]
+    proc = subprocess.run(cmd, cwd=APP_DIR, capture_output=True, text=True)
+    if proc.returncode != 0:
+        return {"page": Path(page).name, "mesures": {}, "erreurs": [(proc.stderr.strip().splitlines() or ["?"])[-1]]}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def _ligne(situation, m):
+    premier = m["premier_affichage_ms"]
+    return (f"   {situation:<8} premier affichage {premier if premier is not None else float('nan'):>7.0f} ms"
+            f" | rendu complet {m['total_ms']:>7.0f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Premier affichage et rendu complet de la page d'accueil")
+    parser.add_argument("--pages", nargs="+", default=[str(PAGE)], help="Fichiers de page à comparer")
+    parser.add_argument("--rows", type=int, default=N_ROWS, help="Taille du dataset synthétique")
+    parser.add_argument("--json", help="Fichier de sortie des résultats")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--parquet", help=argparse.SUPPRESS)
+    parser.add_argument("--page", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    os.chdir(APP_DIR)
+    if args.worker:
+        print(json.dumps(run_worker(args.page, args.parquet), ensure_ascii=False))
+        sys.exit(0)
+
+    from benchmarks.bench_pages import dataset_path
+
+    print(f"⏱️ Latences simulées : Space {LATENCE_SPACE_S}s (x2), dataset {LATENCE_DATASET_S}s, photo {LATENCE_PHOTO_S}s")
+    resultats = []
+    for page in args.pages:
+        resultats.append(measure(Path(page).resolve(), dataset_path(args.rows)))
+        print(f"\n📄 {resultats[-1]['page']}")
+        for situation, m in resultats[-1]["mesures"].items():
+            print(_ligne(situation, m))
+        for erreur in resultats[-1]["erreurs"]:
+            print(f"   ⚠️ {erreur}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultats, f, ensure_ascii=False, indent=2)
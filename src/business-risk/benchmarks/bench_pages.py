@@ -0,0 +1,134 @@
+"""
+Benchmark headless des pages du dashboard (AppTest), sans S3 : temps de rendu et pic mémoire par taille de base.
+
+- le jeu synthétique de chaque taille est généré une fois puis mis en cache (Parquet) ;
+- chaque (taille, page) s'exécute dans un processus dédié : le pic RSS mesuré est celui de la page seule
+  (chargement des données inclus), sans héritage des caches ni de la mémoire des mesures précédentes ;
+- rendu à froid (premier run, caches vides) puis reruns à chaud (caches Streamlit remplis) ;
+- pic RSS relevé après lecture du Parquet puis en fin de rendu : l'écart est le surcoût mémoire de la page.
+
+La page d'accueil est exclue (secrets et appels réseau aux Spaces) : voir benchmarks.bench_accueil.
+
+Usage (depuis src/business-risk) :
+    python -m benchmarks.bench_pages
+    python -m benchmarks.bench_pages --sizes 100000 1000000 --pages 02 05 --json resultats_pages.json
+"""
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# --- 1. CONFIGURATION ---
+APP_DIR = Path(__file__).resolve().parent.parent
+PAGES = sorted(p.name for p in (APP_DIR / "pages").glob("[0-9]*.py"))
+SIZES = [100_000, 1_000_000, 6_000_000]
+CACHE_DIR = Path(os.environ.get("BENCH_CACHE_DIR", Path(tempfile.gettempdir()) / "business-risk-bench"))
+
+
+def _rss_mb():
+    # ru_maxrss : pic du processus courant, en Ko sous Linux (octets sous macOS)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def dataset_path(n_rows, seed=0):
+    """Parquet synthétique de n_rows lignes, généré au premier appel"""
+    path = CACHE_DIR / f"synthetique_{n_rows}_{seed}.parquet"
+    if not path.exists():
+        from benchmarks.synthetic import make_dataset
+
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        start = time.perf_counter()
+        make_dataset(n_rows, seed).to_parquet(path, index=False)
+        print(f"📦 {n_rows:,} lignes générées en {time.perf_counter() - start:.1f}s -> {path}".replace(",", " "))
+    return path
+
+
+# --- 2. MESURE D'UNE PAGE (PROCESSUS ENFANT) ---
+def run_worker(parquet, page, reruns):
+    import pandas as pd
+    from streamlit.testing.v1 import AppTest
+
+    start = time.perf_counter()
+    df = pd.read_parquet(parquet)
+    chargement_s = time.perf_counter() - start
+    rss_chargement = _rss_mb()
+
+    at = AppTest.from_file(str(APP_DIR / "pages" / page), default_timeout=900)
+    at.session_state["df"] = df
+    at.session_state["total_rows"] = len(df)
+    at.session_state["data_version"] = f"bench-{len(df)}"
+    start = time.perf_counter()
+    at.run()
+    froid_s = time.perf_counter() - start
+
+    chaud = []
+    for _ in range(reruns):
+        start = time.perf_counter()
+        at.run()
+        chaud.append(time.perf_counter() - start)
+
+    return {
+        "page": Path(page).stem,
+        "n_rows": len(df),
+        "chargement_s": round(chargement_s, 3),
+        "froid_s": round(froid_s, 3),
+        "chaud_s": round(statistics.median(chaud), 3) if chaud else None,
+        "rss_pic_chargement_mb": round(rss_chargement, 1),
+        "rss_pic_mb": round(_rss_mb(), 1),
+        "erreurs": [str(e.value)[:200] for e in at.exception],
+    }
+
+
+def measure(n_rows, page, reruns):
+    """Lance la mesure dans un interpréteur neuf et renvoie son résultat JSON"""
+    cmd = [sys.executable, "-m", "benchmarks.bench_pages", "--worker",
+           "--parquet", str(dataset_path(n_rows)), "--page", page, "--reruns", str(reruns)]
+    proc = subprocess.run(cmd, cwd=APP_DIR, capture_output=True, text=True)
+    if proc.returncode != 0:
+        # Typiquement un OOM à 6M lignes : on le consigne sans interrompre la série
+        return {"page": Path(page).stem, "n_rows": n_rows, "erreurs": [(proc.stderr.strip().splitlines() or [f"code retour {proc.returncode}"])[-1]]}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def _ligne(r):
+    if "froid_s" not in r:
+        return f"   {r['page']:<32} ❌ {r['erreurs'][0]}"
+    return (f"   {r['page']:<32} froid {r['froid_s']:>7.2f}s | chaud {r['chaud_s'] or 0:>6.2f}s"
+            f" | pic RSS chargement {r['rss_pic_chargement_mb']:>6.0f} Mo | page {r['rss_pic_mb']:>6.0f} Mo"
+            + (f" | ⚠️ {r['erreurs'][0][:60]}" if r["erreurs"] else ""))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Temps de rendu et pic mémoire des pages (AppTest, données synthétiques)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES, help="Tailles de base (lignes)")
+    parser.add_argument("--pages", nargs="+", help="Préfixes de pages (ex. 02 05) ; toutes par défaut")
+    parser.add_argument("--reruns", type=int, default=3, help="Reruns à chaud par page")
+    parser.add_argument("--json", help="Fichier de sortie des résultats")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--parquet", help=argparse.SUPPRESS)
+    parser.add_argument("--page", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    os.chdir(APP_DIR)
+    if args.worker:
+        print(json.dumps(run_worker(args.parquet, args.page, args.reruns), ensure_ascii=False))
+        sys.exit(0)
+
+    pages = [p for p in PAGES if not args.pages or any(p.startswith(x) for x in args.pages)]
+    resultats = []
+    for n_rows in args.sizes:
+        print(f"\n📊 {n_rows:,} lignes".replace(",", " "))
+        for page in pages:
+            resultats.append(measure(n_rows, page, args.reruns))
+            print(_ligne(resultats[-1]), flush=True)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultats, f, ensure_ascii=False, indent=2)
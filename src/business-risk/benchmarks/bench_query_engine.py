@@ -0,0 +1,143 @@
+"""
+Benchmark du moteur de requêtes : temps de rendu des pages 01 à 04, chemin pandas vs DuckDB.
+
+- préparation : construction de la vue Arrow partagée (une fois par version des données et par processus) ;
+- rendu à froid : aucun agrégat en cache ;
+- changements de département : agrégats non encore calculés, sur le même snapshot ;
+- contrôle de cohérence : chaque requête nommée doit donner le même résultat sur les deux moteurs.
+
+Usage (depuis src/business-risk) :
+    python -m benchmarks.bench_query_engine --rows 1000000
+    python -m benchmarks.bench_query_engine --parquet dataset_scored.parquet --json resultats.json
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+from pathlib import Path
+
+import pandas as pd
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+import utils.query as query
+from benchmarks.synthetic import make_dataset
+
+# --- 1. CONFIGURATION ---
+APP_DIR = Path(__file__).resolve().parent.parent
+PAGES = [
+    "pages/01_Panorama_et_historique.py",
+    "pages/02_Les_secteurs.py",
+    "pages/03_Formes_et_Effectifs.py",
+    "pages/04_Analyse_territoriale.py",
+]
+DEPARTEMENTS_TEST = ["75", "13", "2A"]
+PARAMS = {
+    "fermetures_par_mois": {"annee_min": 2023},
+    "top_ape_fermes": {"limite": 10},
+    "top_secteurs_fermes": {"limite": 10},
+}
+
+
+# --- 2. MESURES ---
+def _render(page, df, version, dep=None):
+    at = AppTest.from_file(str(APP_DIR / page), default_timeout=600)
+    at.session_state["df"] = df
+    at.session_state["data_version"] = version
+    start = time.perf_counter()
+    at.run()
+    # La sélection d'un département déclenche un second rendu (temps cumulé des deux passes)
+    selects = [s for s in at.selectbox if dep in s.options] if dep else []
+    if selects:
+        selects[0].select(dep).run()
+    elapsed = time.perf_counter() - start
+    erreurs = [e.value for e in at.exception]
+    return elapsed, erreurs
+
+
+def bench_engine(engine, df, repeats):
+    query.QUERY_ENGINE = engine
+    resultats = {}
+    for page in PAGES:
+        froid, deps = [], []
+        for r in range(repeats):
+            # Agrégats recalculés ; la vue Arrow (une fois par version et par processus) reste en cache
+            st.cache_data.clear()
+            version = f"bench-{engine}"
+            t, erreurs = _render(page, df, version)
+            froid.append(t)
+            for dep in DEPARTEMENTS_TEST:
+                t_dep, _ = _render(page, df, version, dep)
+                deps.append(t_dep)
+        resultats[page] = {
+            "froid_s": round(statistics.median(froid), 3),
+            "departement_s": round(statistics.median(deps), 3),
+            "erreurs": erreurs,
+        }
+        print(f"   {engine:<7} {Path(page).stem:<28} froid {resultats[page]['froid_s']:>7.3f}s"
+              f" | département {resultats[page]['departement_s']:>7.3f}s"
+              + (f" | ⚠️ {erreurs[0][:60]}" if erreurs else ""))
+    return resultats
+
+
+def check_consistency(df):
+    """Compare chaque agrégat nommé entre les deux moteurs (France entière et un département)"""
+    st.session_state["df"] = df
+    st.session_state["data_version"] = None
+    secteurs = query._run_pandas("top_secteurs_fermes", None, {"limite": 3})["secteur"].tolist()
+    params = {**PARAMS, "risque_secteur_age": {"secteurs": secteurs},
+              "heatmap_secteur_mois": {"annee": 2024, "secteurs": secteurs}}
+    ecarts, durees = [], {"duckdb": 0.0, "pandas": 0.0}
+    for dep in (None, DEPARTEMENTS_TEST[0]):
+        for nom in query.SQL:
+            t0 = time.perf_counter()
+            a = query._run_duckdb(nom, dep, params.get(nom, {})).reset_index(drop=True)
+            t1 = time.perf_counter()
+            b = query._run_pandas(nom, dep, params.get(nom, {})).reset_index(drop=True)
+            durees["duckdb"] += t1 - t0
+            durees["pandas"] += time.perf_counter() - t1
+            try:
+                pd.testing.assert_frame_equal(a, b, check_dtype=False, check_exact=False, rtol=1e-9)
+            except AssertionError as e:
+                ecarts.append(f"{nom} (dep={dep}) : {str(e).splitlines()[0]}")
+    return ecarts, durees
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rendu des pages 01-04 : pandas vs DuckDB")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Taille du jeu synthétique")
+    parser.add_argument("--parquet", help="Base scorée réelle (prioritaire sur --rows)")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--json", help="Fichier de sortie des résultats")
+    args = parser.parse_args()
+
+    os.chdir(APP_DIR)
+    df = pd.read_parquet(args.parquet) if args.parquet else make_dataset(args.rows)
+    print(f"📦 {len(df):,} lignes".replace(",", " "))
+
+    ecarts, durees = check_consistency(df) if query.duckdb is not None else (["duckdb non installé"], {})
+    print("✅ Résultats identiques sur les deux moteurs" if not ecarts else "❌ Écarts :\n   " + "\n   ".join(ecarts))
+    if durees:
+        # Requêtes seules (hors rendu Streamlit/Plotly), vue Arrow incluse pour DuckDB
+        print(f"⏱️ {len(query.SQL) * 2} requêtes : pandas {durees['pandas']:.3f}s | duckdb {durees['duckdb']:.3f}s")
+
+    if query.duckdb is not None:
+        start = time.perf_counter()
+        query._arrow_snapshot(df, "bench-duckdb")
+        durees["preparation_duckdb"] = time.perf_counter() - start
+        print(f"🧱 Vue Arrow DuckDB : {durees['preparation_duckdb']:.3f}s")
+
+    engines = ["pandas"] + (["duckdb"] if query.duckdb is not None else [])
+    resultats = {engine: bench_engine(engine, df, args.repeats) for engine in engines}
+
+    if "duckdb" in resultats:
+        print("\n📊 Gain DuckDB / pandas (médianes)")
+        for page in PAGES:
+            p, d = resultats["pandas"][page], resultats["duckdb"][page]
+            print(f"   {Path(page).stem:<28} froid x{p['froid_s'] / d['froid_s']:.1f}"
+                  f" | département x{p['departement_s'] / d['departement_s']:.1f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"n_rows": len(df), "ecarts": ecarts, "requetes_s": durees, "resultats": resultats}, f, ensure_ascii=False, indent=2)
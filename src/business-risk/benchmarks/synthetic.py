@@ -0,0 +1,175 @@
+"""
+Base scorée synthétique au schéma du dashboard, pour mesurer les pages sans accès S3.
+
+Cardinalités calquées sur la base réelle : 101 départements pondérés par leur tissu d'entreprises
+(avec codes non normalisés '1' / '01'), ~730 codes NAF répartis sur les 21 sections A-U avec une
+distribution très concentrée, formes juridiques SAS/SARL, coordonnées autour du centre de chaque
+département, probabilités croissantes avec l'horizon et statut expert cohérent avec les seuils du projet.
+
+Usage (depuis src/business-risk) :
+    python -m benchmarks.synthetic --rows 5800000 --out dataset_synthetique.parquet
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.projection import COL_DEPT, COL_FORME, COL_SECTEUR, STATUS_CUTOFFS, STATUS_LABELS
+
+# --- 1. RÉFÉRENTIELS ---
+DEPARTEMENTS = [f"{i:02d}" for i in range(1, 96) if i != 20] + ["2A", "2B", "971", "972", "973", "974", "976"]
+# Poids relatifs du nombre d'établissements (ordre de grandeur SIRENE) ; 1 par défaut
+POIDS_DEPARTEMENTS = {
+    "75": 12, "92": 5, "13": 5.5, "69": 5, "59": 4.5, "33": 4, "06": 4, "31": 3.5, "93": 3.5, "94": 3,
+    "78": 3, "44": 3, "34": 3.2, "91": 2.6, "95": 2.4, "77": 2.8, "67": 2.6, "38": 2.8, "76": 2.4, "83": 3,
+    "971": 0.9, "972": 0.8, "973": 0.3, "974": 1.3, "976": 0.2,
+}
+# Centres approximatifs des DROM ; la métropole est tirée dans son emprise
+CENTRES_DROM = {"971": (16.25, -61.58), "972": (14.64, -61.02), "973": (3.93, -53.13), "974": (-21.11, 55.53), "976": (-12.83, 45.17)}
+
+# Sections NAF rév. 2 : (libellé, divisions)
+SECTIONS = {
+    "A": ("Agriculture, sylviculture et pêche", [1, 2, 3]),
+    "B": ("Industries extractives", [5, 6, 7, 8, 9]),
+    "C": ("Industrie manufacturière", list(range(10, 34))),
+    "D": ("Production et distribution d'électricité, de gaz, de vapeur et d'air conditionné", [35]),
+    "E": ("Production et distribution d'eau ; assainissement, gestion des déchets et dépollution", [36, 37, 38, 39]),
+    "F": ("Construction", [41, 42, 43]),
+    "G": ("Commerce ; réparation d'automobiles et de motocycles", [45, 46, 47]),
+    "H": ("Transports et entreposage", [49, 50, 51, 52, 53]),
+    "I": ("Hébergement et restauration", [55, 56]),
+    "J": ("Information et communication", [58, 59, 60, 61, 62, 63]),
+    "K": ("Activités financières et d'assurance", [64, 65, 66]),
+    "L": ("Activités immobilières", [68]),
+    "M": ("Activités spécialisées, scientifiques et techniques", [69, 70, 71, 72, 73, 74, 75]),
+    "N": ("Activités de services administratifs et de soutien", [77, 78, 79, 80, 81, 82]),
+    "O": ("Administration publique", [84]),
+    "P": ("Enseignement", [85]),
+    "Q": ("Santé humaine et action sociale", [86, 87, 88]),
+    "R": ("Arts, spectacles et activités récréatives", [90, 91, 92, 93]),
+    "S": ("Autres activités de services", [94, 95, 96]),
+    "T": ("Activités des ménages en tant qu'employeurs", [97, 98]),
+    "U": ("Activités extra-territoriales", [99]),
+}
+# Poids des sections dans les SAS/SARL (commerce, services et construction dominent)
+POIDS_SECTIONS = {
+    "A": 1.5, "B": 0.1, "C": 6, "D": 0.8, "E": 0.3, "F": 13, "G": 20, "H": 3.5, "I": 8, "J": 5, "K": 4,
+    "L": 11, "M": 14, "N": 6, "O": 0.02, "P": 1.5, "Q": 2.5, "R": 2, "S": 3, "T": 0.01, "U": 0.01,
+}
+FORMES = {5710: 0.52, 5499: 0.40, 5720: 0.05, 5498: 0.03}  # SAS, SARL, SASU, EURL
+TRANCHES_P = [.47, .2, .12, .08, .05, .035, .02, .012, .008, .003, .001, .001]
+PREFIXES = ["SAS", "SARL", "HOLDING", "GROUPE", "ETS", "STE", "CABINET", "ATELIER", "MAISON", "BOULANGERIE",
+            "GARAGE", "TRANSPORTS", "IMMO", "CONSEIL", "BATIMENT", "RESTAURANT", "PHARMACIE", "SOLUTIONS"]
+NOMS = ["MARTIN", "BERNARD", "DUBOIS", "THOMAS", "ROBERT", "RICHARD", "PETIT", "DURAND", "LEROY", "MOREAU",
+        "SIMON", "LAURENT", "LEFEBVRE", "MICHEL", "GARCIA", "DAVID", "BERTRAND", "ROUX", "VINCENT", "FOURNIER",
+        "MOREL", "GIRARD", "ANDRE", "MERCIER", "DUPONT", "LAMBERT", "BONNET", "FRANCOIS", "MARTINEZ", "LEGRAND"]
+DATE_MIN, DATE_MAX = pd.Timestamp("1975-01-01"), pd.Timestamp("2026-03-31")
+
+
+def nomenclature_naf():
+    """~730 codes NAF fictifs au format réel (ex. '56.10A'), chacun rattaché à une seule section"""
+    codes, sections = [], []
+    for lettre, (_, divisions) in SECTIONS.items():
+        for division in divisions:
+            for groupe in range(1, 5):
+                for suffixe in ("Z", "A", "B")[: 3 if division in (10, 46, 47, 56, 68, 70, 86) else 2]:
+                    codes.append(f"{division:02d}.{groupe}{0 if suffixe == 'Z' else 1}{suffixe}")
+                    sections.append(lettre)
+    return np.array(codes), np.array(sections)
+
+
+def _probabilites_ape(sections, rng):
+    """Poids par code : part de la section répartie selon une loi de Zipf (quelques codes très fréquents)"""
+    poids = np.empty(len(sections))
+    for lettre in SECTIONS:
+        idx = np.flatnonzero(sections == lettre)
+        zipf = 1.0 / np.arange(1, len(idx) + 1) ** 1.1
+        poids[rng.permutation(idx)] = POIDS_SECTIONS[lettre] * zipf / zipf.sum()
+    return poids / poids.sum()
+
+
+# --- 2. GÉNÉRATION ---
+def make_dataset(n_rows, seed=0):
+    """Base scorée synthétique au schéma du dashboard (volumes, colonnes et cardinalités réalistes)"""
+    rng = np.random.default_rng(seed)
+
+    # Départements : tirage pondéré, ~5 % des codes 01-09 écrits sans zéro (comme dans les exports bruts)
+    p_dep = np.array([POIDS_DEPARTEMENTS.get(d, 1.0) for d in DEPARTEMENTS])
+    dep_idx = rng.choice(len(DEPARTEMENTS), n_rows, p=p_dep / p_dep.sum())
+    variantes = [d.lstrip("0") for d in DEPARTEMENTS[:9]]
+    bruts = np.where((dep_idx < 9) & (rng.random(n_rows) < 0.05), dep_idx + len(DEPARTEMENTS), dep_idx)
+    departement = pd.Categorical.from_codes(bruts, DEPARTEMENTS + variantes)
+
+    codes, sections = nomenclature_naf()
+    ape_idx = rng.choice(len(codes), n_rows, p=_probabilites_ape(sections, rng))
+    lettres = list(SECTIONS)
+    section_idx = np.searchsorted(lettres, sections)[ape_idx]
+
+    # Fermeture plus fréquente dans la restauration, le commerce et la construction
+    risque_section = np.array([{"I": 1.5, "G": 1.2, "F": 1.25, "L": 0.6, "M": 0.8}.get(s, 1.0) for s in lettres])
+    fermeture = (rng.random(n_rows) < 0.3 * risque_section[section_idx]).astype("int64")
+    ferme = fermeture == 1
+    age = np.where(ferme, rng.gamma(1.4, 4.5, n_rows), rng.gamma(1.8, 8.0, n_rows))
+    age = np.minimum(age.round(0), 80)
+
+    # Dates de fermeture concentrées sur les années récentes (décroissance exponentielle depuis le 31/03/2026)
+    jours_max = (DATE_MAX - DATE_MIN).days
+    recul = np.minimum(rng.exponential(2_500, n_rows), jours_max).astype("int64")
+    dates = pd.Series(DATE_MAX - pd.to_timedelta(recul, unit="D")).where(ferme)
+
+    tranche = rng.choice(len(TRANCHES_P), n_rows, p=TRANCHES_P).astype("float64")
+    tranche[rng.random(n_rows) < 0.08] = np.nan
+
+    # Coordonnées : centre du département (fixé par la graine) + dispersion ~20 km
+    centres = np.column_stack([rng.uniform(42.5, 50.8, len(DEPARTEMENTS)), rng.uniform(-4.3, 7.8, len(DEPARTEMENTS))])
+    for d, (lat, lon) in CENTRES_DROM.items():
+        centres[DEPARTEMENTS.index(d)] = lat, lon
+    lat = centres[dep_idx, 0] + rng.normal(0, 0.18, n_rows)
+    lon = centres[dep_idx, 1] + rng.normal(0, 0.25, n_rows)
+
+    # Probabilités croissantes avec l'horizon, plus élevées pour les jeunes entreprises
+    p1 = rng.beta(1.1, 22, n_rows) * 100 * np.where(age < 3, 1.8, 1.0)
+    p2 = np.minimum(p1 + rng.beta(1.2, 18, n_rows) * 100, 100)
+    p3 = np.minimum(p2 + rng.beta(1.2, 20, n_rows) * 100, 100)
+
+    denomination = pd.Series(
+        np.char.add(np.char.add(np.array(PREFIXES)[rng.integers(0, len(PREFIXES), n_rows)], " "),
+                    np.array(NOMS)[rng.integers(0, len(NOMS), n_rows)]),
+        dtype="string[pyarrow]",
+    ) + " " + pd.Series(rng.integers(1, 10_000, n_rows)).astype("string[pyarrow]")
+
+    df = pd.DataFrame({
+        COL_DEPT: departement,
+        "code_ape": pd.Categorical.from_codes(ape_idx, codes),
+        COL_SECTEUR: pd.Categorical.from_codes(section_idx, [SECTIONS[s][0] for s in lettres]),
+        "fermeture": fermeture,
+        "age_estime": age,
+        "Date_fermeture_finale": dates,
+        "Tranche_effectif_num": tranche,
+        COL_FORME: rng.choice(list(FORMES), n_rows, p=list(FORMES.values())),
+        "latitude": lat,
+        "longitude": lon,
+        "Dénomination": denomination,
+        "Prob_1an": p1.clip(0, 100),
+        "Prob_2ans": p2,
+        "Prob_3ans": p3,
+    })
+    statut = pd.cut(df["Prob_2ans"], [-np.inf] + STATUS_CUTOFFS + [np.inf], labels=STATUS_LABELS)
+    df["Statut_Expert"] = pd.Categorical(
+        np.where(ferme, '⚫ FERMÉ', statut.astype(str)), categories=STATUS_LABELS + ['⚫ FERMÉ'],
+    )
+    return df
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Génère une base scorée synthétique au format Parquet")
+    parser.add_argument("--rows", type=int, default=5_800_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="dataset_synthetique.parquet")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    df = make_dataset(args.rows, args.seed)
+    df.to_parquet(args.out, index=False)
+    print(f"✅ {len(df):,} lignes écrites dans {args.out} ({time.perf_counter() - start:.1f}s)".replace(",", " "))
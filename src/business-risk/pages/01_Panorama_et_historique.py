@@ -2,14 +2,17 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
+from utils.data import sync_session_dataset, data_available, list_departements
+from utils.profiling import start_page, end_page, etape, emettre_graphique
+from utils.query import requete
 
 # --- 1. CONFIGURATION ---
 st.set_page_config(page_title="Egide - Diagnostic Firmographique", layout="wide")
+start_page(__file__)
 
 # --- LOGIQUE DE RÉCUPÉRATION CENTRALISÉE ---
-if 'df' in st.session_state and st.session_state['df'] is not None:
-    df = st.session_state['df']
-else:
+sync_session_dataset()
+if not data_available():
     st.warning("⚠️ Session rafraîchie ou expirée. Veuillez repasser brièvement par la page d'accueil pour réinitialiser l'intelligence économique.")
     st.info("💡 *Pourquoi ? Le dataset global est volumineux et s'initialise uniquement sur la page principale pour optimiser les performances.*")
     st.stop()
@@ -21,7 +24,7 @@ with st.sidebar:
     st.markdown("---")
     
     st.header("📍 Périmètre Géo")
-    dept_options = ["Toute la France"] + sorted(df["Code du département de l'établissement"].dropna().unique().tolist())
+    dept_options = ["Toute la France"] + list_departements()
     dept_sel = st.selectbox(
         "Choisir un département :", 
         options=dept_options,
@@ -29,10 +32,12 @@ with st.sidebar:
         key="sb_panorama_departement"
     )
     
-    df_selection = df if dept_sel == "Toute la France" else df[df["Code du département de l'établissement"] == dept_sel]
+    # Les graphiques sont des agrégats calculés par le moteur de requêtes sur le seul périmètre choisi
+    dep_filtre = None if dept_sel == "Toute la France" else dept_sel
+    synthese = requete("synthese", dep=dep_filtre).iloc[0]
     
     st.markdown("---")
-    st.caption(f"🌍 **Base analysée :** {len(df_selection):,} établissements")
+    st.caption(f"🌍 **Base analysée :** {int(synthese['n_total']):,} établissements")
 
 # --- 3. ENTÊTE ---
 st.title("📊 1. Historiques & Dynamiques")
@@ -61,14 +66,16 @@ with st.container(border=True):
         """)
 
 # --- 4. CALCULS & KPI ---
-annee_min_global = df_selection[df_selection["fermeture"] == 1]["Date_fermeture_finale"].dt.year.min()
-annee_max_global = df_selection[df_selection["fermeture"] == 1]["Date_fermeture_finale"].dt.year.max()
+annee_min_global = synthese["annee_min_fermes"]
+annee_max_global = synthese["annee_max_fermes"]
 nb_annees_global = (annee_max_global - annee_min_global + 1) if pd.notna(annee_min_global) else 1
 
-df_fermes = df_selection[df_selection["fermeture"] == 1]
-total_fermetures = len(df_fermes)
-taux_annuel = (df_selection["fermeture"].mean() * 100) / nb_annees_global
-age_moyen = df_fermes["age_estime"].mean() if total_fermetures > 0 else 0
+total_fermetures = int(synthese["n_fermes"])
+taux_annuel = (synthese["taux_fermeture"] * 100) / nb_annees_global
+age_moyen = synthese["age_moyen_fermes"] if total_fermetures > 0 else 0
+
+# Effectifs par âge arrondi et statut : alimente l'histogramme et l'indice de vulnérabilité
+df_ages = requete("ages", dep=dep_filtre)
 
 with st.container(border=True):
     c1, c2, c3 = st.columns(3)
@@ -88,15 +95,15 @@ with st.container(border=True):
     Cette analyse compare l'âge des sociétés **actuellement en activité** avec l'âge qu'avaient les sociétés **disparues** au moment de leur fermeture. 
     """)
     
-    df_plot = df_selection.assign(
-        Statut = df_selection["fermeture"].map({0: "Ouvertes", 1: "Fermées"}),
-        age_arrondi = df_selection["age_estime"].round(0)
+    df_plot = df_ages.assign(
+        Statut = df_ages["fermeture"].map({0: "Ouvertes", 1: "Fermées"}),
+        age_arrondi = df_ages["age_ans"]
     )
     
     df_plot_50 = df_plot[df_plot["age_arrondi"] <= 50]
     
     fig_age = px.histogram(
-        df_plot_50, x="age_arrondi", color="Statut", barmode="group",
+        df_plot_50, x="age_arrondi", y="nb", histfunc="sum", color="Statut", barmode="group",
         color_discrete_map={"Ouvertes": "#178F49", "Fermées": "#FFFFFF"}, 
         category_orders={"Statut": ["Ouvertes", "Fermées"]},
         template='plotly_white', height=400
@@ -121,7 +128,8 @@ with st.container(border=True):
         )
     )
     
-    st.plotly_chart(fig_age, use_container_width=True, key="chart_age_histogram")
+    etape("figure:age")
+    emettre_graphique(fig_age, "age", use_container_width=True, key="chart_age_histogram")
 
     with st.chat_message("assistant"):
         st.markdown(f"""
@@ -152,16 +160,12 @@ with st.container(border=True):
     Il répond à la question : *Si l'entreprise a atteint l'âge X, quel est son risque statistique d'enregistrer une fermeture au cours de l'exercice ?*
     """)
     
-    age_ans_temp = df_selection["age_estime"].round(0).astype(int)
-
-    annee_min = df_selection[df_selection["fermeture"] == 1]["Date_fermeture_finale"].dt.year.min()
-    annee_max = df_selection[df_selection["fermeture"] == 1]["Date_fermeture_finale"].dt.year.max()
-    nb_annees = (annee_max - annee_min + 1) if pd.notna(annee_min) else 1
+    nb_annees = nb_annees_global
 
-    fermetures_par_age = df_selection[df_selection["fermeture"] == 1].groupby(age_ans_temp).size()
+    fermetures_par_age = df_ages[df_ages["fermeture"] == 1].groupby("age_ans")["nb"].sum()
     flux_annuel_fermetures = fermetures_par_age / nb_annees
 
-    stock_actif_par_age = df_selection[df_selection["fermeture"] == 0].groupby(age_ans_temp).size()
+    stock_actif_par_age = df_ages[df_ages["fermeture"] == 0].groupby("age_ans")["nb"].sum()
 
     df_age_events = (
         pd.DataFrame(
@@ -229,7 +233,8 @@ with st.container(border=True):
             ),
         )
         
-        st.plotly_chart(fig_courbe, use_container_width=True, key="chart_vulnerability_curve")
+        etape("figure:courbe")
+        emettre_graphique(fig_courbe, "courbe", use_container_width=True, key="chart_vulnerability_curve")
 
         peak_risk = df_graph.loc[df_graph['proba_fermeture'].idxmax()]
         peak_age = peak_risk['age_ans']
@@ -266,16 +271,11 @@ with st.container(border=True):
     Cette analyse permet de visualiser si les fermetures s'accélèrent ou ralentissent d'un mois sur l'autre par rapport aux années précédentes. 
     """)
 
-    df_comp = df_selection[(df_selection["fermeture"] == 1) & (df_selection["Date_fermeture_finale"].notna())].copy()
+    df_clean = requete("fermetures_par_mois", dep=dep_filtre, annee_min=2023).rename(columns={"annee": "Année", "mois": "Mois"})
     
-    if not df_comp.empty:
-        df_comp['Année'] = df_comp["Date_fermeture_finale"].dt.year
-        df_comp['Mois'] = df_comp["Date_fermeture_finale"].dt.month
-
-        df_clean = df_comp.query("Année >= 2023")
-
+    if not df_clean.empty:
         df_pivot = df_clean.pivot_table(
-            index="Mois", columns="Année", values="fermeture", aggfunc="count", fill_value=0
+            index="Mois", columns="Année", values="nb", aggfunc="sum", fill_value=0
         )
         
         mois_labels = ["Jan", "Fév", "Mar", "Avr", "Mai", "Juin", "Juil", "Août", "Sep", "Oct", "Nov", "Déc"]
@@ -296,7 +296,8 @@ with st.container(border=True):
             margin=dict(l=20, r=20, t=20, b=20)
         )
         
-        st.plotly_chart(fig_comp, use_container_width=True, key="chart_monthly_comparison")
+        etape("figure:comp")
+        emettre_graphique(fig_comp, "comp", use_container_width=True, key="chart_monthly_comparison")
 
         if 2023 in df_pivot.columns and 2024 in df_pivot.columns:
             total_23 = df_pivot[2023].sum()
@@ -324,4 +325,6 @@ with st.container(border=True):
             """)
 
 st.divider()
-st.caption("ℹ️ Source : Base SIRENE & Infogreffe | Focus méthodologique : SAS & SARL.")
\ No newline at end of file
+st.caption("ℹ️ Source : Base SIRENE & Infogreffe | Focus méthodologique : SAS & SARL.")
+
+end_page()
@@ -2,31 +2,17 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
+from utils.data import sync_session_dataset, data_available, list_departements
+from utils.profiling import start_page, end_page, etape, emettre_graphique
+from utils.query import requete
 
 # --- 1. CONFIGURATION ---
 st.set_page_config(page_title="Firmographie - Secteurs", layout="wide")
+start_page(__file__)
 
 # --- LOGIQUE DE RÉCUPÉRATION CENTRALISÉE ---
-if 'df' in st.session_state and st.session_state['df'] is not None:
-    # 🎯 On récupère la base globale chargée sur la main
-    df_raw = st.session_state['df']
-    
-    # 🎯 On recrée ton optimisation RAM localement sans re-télécharger le fichier
-    required_columns = [
-        "Code du département de l'établissement",
-        "fermeture",
-        "age_estime",
-        "Date_fermeture_finale",
-        "code_ape",
-        "libelle_section_ape"
-    ]
-    
-    # On ne garde que ce qui est nécessaire pour cette page et on convertit en catégorie
-    df = df_raw[required_columns].copy()
-    for col in ["Code du département de l'établissement", "code_ape", "libelle_section_ape"]:
-        if col in df.columns:
-            df[col] = df[col].astype("category")
-else:
+sync_session_dataset()
+if not data_available():
     # Sécurité Hugging Face
     st.warning("⚠️ Session rafraîchie ou expirée. Veuillez repasser brièvement par la page d'accueil pour réinitialiser l'intelligence économique.")
     st.info("💡 *Pourquoi ? Le dataset global s'initialise uniquement sur la page principale pour garantir la fluidité des filtres.*")
@@ -38,24 +24,19 @@ with st.sidebar:
     st.title("Filtres")
     st.header("📍 Géographie")
     
-    # Extraction des départements (gestion propre du type category)
-    depts = sorted(df["Code du département de l'établissement"].dropna().unique().astype(str).tolist())
-    dept_options = ["Toute la France"] + depts
+    dept_options = ["Toute la France"] + list_departements()
     dept_sel = st.selectbox("Département :", options=dept_options, index=0, key="sb_secteurs_dept")
     
-    if dept_sel == "Toute la France":
-        df_selection = df
-    else:
-        df_selection = df[df["Code du département de l'établissement"].astype(str) == dept_sel]
+    # Agrégats calculés par le moteur de requêtes sur le seul périmètre choisi (aucune copie du dataset)
+    dep_filtre = None if dept_sel == "Toute la France" else dept_sel
+    synthese = requete("synthese", dep=dep_filtre).iloc[0]
     
     st.divider()
-    st.metric("Périmètre", f"{len(df_selection):,}".replace(',', ' '), delta="Unités")
+    st.metric("Périmètre", f"{int(synthese['n_total']):,}".replace(',', ' '), delta="Unités")
 
 # --- 3. PRÉPARATION ---
-df_fermes_only = df_selection[df_selection["fermeture"] == 1].copy()
-
 # Extraction propre des catégories principales
-top_secteurs_list = df_fermes_only['libelle_section_ape'].value_counts().head(10).index.astype(str).tolist()
+top_secteurs_list = requete("top_secteurs_fermes", dep=dep_filtre, limite=10)["secteur"].tolist()
 
 # --- 4. TITRE ET TOP SECTEURS ---
 st.title("📊 2. Dynamique des Secteurs d'Activité")
@@ -65,14 +46,10 @@ st.subheader("🏭 Top 10 des secteurs les plus exposés")
 
 with st.container(border=True):
     st.markdown("*Volume total de fermetures enregistrées sur la période.*")
-    if not df_fermes_only.empty:
+    top_ape = requete("top_ape_fermes", dep=dep_filtre, limite=10)
+    if not top_ape.empty:
 
-        top_ape = (
-            df_fermes_only["code_ape"].value_counts().head(10).reset_index()
-            .rename(columns={"count": "nb_fermetures"})
-            .merge(df_selection[['code_ape', 'libelle_section_ape']].drop_duplicates('code_ape'), on='code_ape', how='left')
-            .assign(label = lambda x: x["code_ape"].astype(str) + " – " + x["libelle_section_ape"].astype(str))
-        )
+        top_ape = top_ape.assign(label = lambda x: x["code_ape"].astype(str) + " – " + x["libelle_section_ape"].astype(str))
 
         fig_sectors = px.bar(
             top_ape, x="nb_fermetures", y="label", orientation='h', 
@@ -85,7 +62,8 @@ with st.container(border=True):
         )
         fig_sectors.update_layout(xaxis_title="Nombre de fermetures", yaxis_title=None, coloraxis_showscale=False)
         fig_sectors.update_yaxes(autorange="reversed")
-        st.plotly_chart(fig_sectors, use_container_width=True)
+        etape("figure:sectors")
+        emettre_graphique(fig_sectors, "sectors", use_container_width=True)
 
         top_secteur_nom = str(top_ape.iloc[0]["libelle_section_ape"])
         with st.chat_message("assistant"):
@@ -103,23 +81,8 @@ with st.container(border=True):
         secteurs_choisis = st.multiselect("🔍 Comparer les secteurs :", options=top_secteurs_list, default=[top_secteurs_list[0]])
 
         if secteurs_choisis:
-            def calculate_sector_hazard(df_full, sectors):
-                all_results = []
-                for sector in sectors:
-                    df_s = df_full[df_full['libelle_section_ape'].astype(str) == sector]
-                    for age in range(36):
-                        morts = len(df_s[(df_s["age_estime"] == age) & (df_s["fermeture"] == 1)])
-                        exposes = len(df_s[df_s["age_estime"] >= age])
-                        
-                        if exposes > 30:
-                            all_results.append({
-                                "Secteur": sector,
-                                "age_estime": age,
-                                "proba": (morts / exposes) * 100
-                            })
-                return pd.DataFrame(all_results)
-
-            df_stats = calculate_sector_hazard(df_selection, secteurs_choisis)
+            # Risque annuel par âge (décès à l'âge exact / exposés), en une seule requête pour tous les secteurs
+            df_stats = requete("risque_secteur_age", dep=dep_filtre, secteurs=secteurs_choisis)
 
             if not df_stats.empty:
                 fig_comp_risk = px.line(
@@ -132,14 +95,15 @@ with st.container(border=True):
                     legend=dict(orientation="h", y=-0.3, x=0.5, xanchor="center"),
                     yaxis=dict(rangemode="tozero")
                 )
-                st.plotly_chart(fig_comp_risk, use_container_width=True)
+                etape("figure:comp_risk")
+                emettre_graphique(fig_comp_risk, "comp_risk", use_container_width=True)
             else:
                 st.warning("Données insuffisantes pour comparer ces secteurs avec cette rigueur statistique.")
 
 # --- 6. HEATMAP DYNAMIQUE ---
 if top_secteurs_list:
     # 1. Identifier de manière dynamique la dernière année complète disponible
-    annees_fermetures = df_selection["Date_fermeture_finale"].dt.year.dropna().unique().astype(int)
+    annees_fermetures = requete("annees", dep=dep_filtre)["annee"].astype(int).tolist()
     
     if len(annees_fermetures) > 0:
         max_annee_data = max(annees_fermetures)
@@ -165,21 +129,14 @@ if top_secteurs_list:
         
         mois_labels = ["Jan", "Fév", "Mar", "Avr", "Mai", "Juin", "Juil", "Août", "Sep", "Oct", "Nov", "Déc"]
 
-        # Cast en str pour la robustesse avec les catégories
-        df_selection_copy = df_selection.copy()
-        df_selection_copy['libelle_section_ape_str'] = df_selection_copy['libelle_section_ape'].astype(str)
-        
-        # Filtrage basé sur l'année calculée dynamiquement
-        df_heatmap_raw = df_selection_copy[
-            (df_selection_copy["fermeture"] == 1) & 
-            (df_selection_copy["Date_fermeture_finale"].dt.year == annee_heatmap) &
-            (df_selection_copy["libelle_section_ape_str"].isin(top_secteurs_list))
-        ].copy()
+        # Comptage secteur x mois sur l'année calculée dynamiquement
+        df_heatmap_raw = requete(
+            "heatmap_secteur_mois", dep=dep_filtre, annee=int(annee_heatmap), secteurs=top_secteurs_list
+        )
 
         if not df_heatmap_raw.empty:
             df_pivot_heat = (
-                df_heatmap_raw.assign(Mois_num = lambda x: x["Date_fermeture_finale"].dt.month)
-                .groupby(["libelle_section_ape_str", "Mois_num"], observed=True).size().reset_index(name="Nb")
+                df_heatmap_raw.rename(columns={"secteur": "libelle_section_ape_str", "mois": "Mois_num", "nb": "Nb"})
                 .pivot(index="libelle_section_ape_str", columns="Mois_num", values="Nb").fillna(0)
                 .reindex(columns=range(1, 13), fill_value=0)
             )
@@ -204,7 +161,8 @@ if top_secteurs_list:
                 xaxis_title=None, 
                 yaxis_title=None
             )
-            st.plotly_chart(fig_heat, use_container_width=True)
+            etape("figure:heat")
+            emettre_graphique(fig_heat, "heat", use_container_width=True)
 
             with st.chat_message("assistant"):
                 st.markdown(f"**Analyse :** La heatmap met en évidence les périodes critiques par secteur sur **{annee_heatmap}**. Les pics structurels de fermeture observés à intervalles réguliers révèlent l'effet des échéances comptables et déclaratives de fin de trimestre.")
@@ -212,4 +170,6 @@ if top_secteurs_list:
             st.info(f"ℹ️ Données {annee_heatmap} insuffisantes pour générer la Heatmap.")
 
 st.divider()
-st.caption("ℹ️ Source : Base SIRENE & Bilans Publics | Focus méthodologique : SAS & SARL.")
\ No newline at end of file
+st.caption("ℹ️ Source : Base SIRENE & Bilans Publics | Focus méthodologique : SAS & SARL.")
+
+end_page()
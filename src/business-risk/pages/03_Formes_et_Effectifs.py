@@ -3,15 +3,17 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
+from utils.data import sync_session_dataset, data_available, list_departements
+from utils.profiling import start_page, end_page, etape, emettre_graphique
+from utils.query import requete
 
 # --- 1. CONFIGURATION ---
 st.set_page_config(page_title="Formes et Effectifs", layout="wide")
+start_page(__file__)
 
 # --- LOGIQUE DE RÉCUPÉRATION CENTRALISÉE ---
-if 'df' in st.session_state and st.session_state['df'] is not None:
-    # 🎯 Récupération instantanée du dataset chargé par la page main
-    df = st.session_state['df']
-else:
+sync_session_dataset()
+if not data_available():
     # Sécurité contre les pertes de session sur Hugging Face
     st.warning("⚠️ Session rafraîchie ou expirée. Veuillez repasser brièvement par la page d'accueil pour réinitialiser l'intelligence économique.")
     st.info("💡 *Pourquoi ? Le dataset global est volumineux et s'initialise uniquement sur la page principale pour optimiser les performances.*")
@@ -23,18 +25,15 @@ with st.sidebar:
     st.title("Structure")
     st.header("📍 Géographie")
     
-    # Gestion du tri et conversion propre en str pour éviter les conflits
-    depts = sorted(df["Code du département de l'établissement"].dropna().astype(str).unique().tolist())
-    dept_options = ["Toute la France"] + depts
+    dept_options = ["Toute la France"] + list_departements()
     dept_sel = st.selectbox("Département :", options=dept_options, index=0, key="sb_struct_dept")
     
-    if dept_sel == "Toute la France":
-        df_selection = df
-    else:
-        df_selection = df[df["Code du département de l'établissement"].astype(str) == dept_sel]
+    # Agrégats calculés par le moteur de requêtes sur le seul périmètre choisi (aucune copie du dataset)
+    dep_filtre = None if dept_sel == "Toute la France" else dept_sel
+    synthese = requete("synthese", dep=dep_filtre).iloc[0]
     
     st.divider()
-    st.metric("Périmètre", f"{len(df_selection):,}".replace(',', ' '), delta="Unités")
+    st.metric("Périmètre", f"{int(synthese['n_total']):,}".replace(',', ' '), delta="Unités")
 
 # --- 3. TITRE ---
 st.title("📊 3. Formes Juridiques et Effectifs")
@@ -44,24 +43,18 @@ st.markdown("Analyse de la répartition structurelle du parc : typologie des sta
 st.subheader("⚖️ Répartition par forme juridique (SARL vs SAS)")
 
 with st.container(border=True):
-    # Nettoyage et filtrage local sur la sélection géographique
-    df_local = df_selection.copy()
-    df_local["Catégorie juridique de l'unité légale"] = pd.to_numeric(
-        df_local["Catégorie juridique de l'unité légale"], errors='coerce'
-    )
-    
-    # Filtrage ciblé SAS (5710) / SARL (5499)
-    df_statuts = df_local[df_local["Catégorie juridique de l'unité légale"].isin([5499, 5710])].copy()
+    # Volumes SAS (5710) / SARL (5499) par statut, agrégés sur la sélection géographique
+    df_statuts = requete("formes_par_statut", dep=dep_filtre)
     
-    st.write(f"Nombre d'entreprises trouvées pour SAS/SARL : **{len(df_statuts):,}**".replace(',', ' '))
+    st.write(f"Nombre d'entreprises trouvées pour SAS/SARL : **{int(df_statuts['nb'].sum()):,}**".replace(',', ' '))
 
     mapping = {5499: "SARL", 5710: "SAS"}
     color_map = {"SARL": "#4C759F", "SAS": "#6B2C6B"} 
     
-    df_statuts["statut_nom"] = df_statuts["Catégorie juridique de l'unité légale"].map(mapping)
+    df_statuts["statut_nom"] = df_statuts["forme"].map(mapping)
 
     def get_statut_data(data):
-        return data["statut_nom"].value_counts().sort_index()
+        return data.groupby("statut_nom")["nb"].sum().sort_index()
 
     data_list = [
         get_statut_data(df_statuts),
@@ -97,7 +90,8 @@ with st.container(border=True):
         showlegend=True, 
         legend=dict(orientation="h", y=-0.1, x=0.5, xanchor="center")
     )
-    st.plotly_chart(fig_pie, use_container_width=True)
+    etape("figure:pie")
+    emettre_graphique(fig_pie, "pie", use_container_width=True)
 
     fermes = data_list[1] 
     if not fermes.empty and fermes.sum() > 0:
@@ -118,12 +112,10 @@ with st.container(border=True):
         8: "200-249 sal.", 9: "250-499 sal.", 10: "500-999 sal.", 11: "1000+ sal."
     }
     
-    df_eff = df_selection.copy()
+    df_eff = requete("effectifs_par_statut", dep=dep_filtre)
     
     def get_eff_data(data):
-        if "Tranche_effectif_num" in data.columns:
-            return data["Tranche_effectif_num"].value_counts().sort_index()
-        return pd.Series(dtype=int)
+        return data.groupby("tranche")["nb"].sum().sort_index()
 
     eff_data_list = [
         get_eff_data(df_eff),
@@ -157,7 +149,8 @@ with st.container(border=True):
             )
 
     fig_eff.update_layout(height=400, showlegend=True, legend=dict(orientation="h", y=-0.2))
-    st.plotly_chart(fig_eff, use_container_width=True)
+    etape("figure:eff")
+    emettre_graphique(fig_eff, "eff", use_container_width=True)
 
     counts_fermes = eff_data_list[1]
     if not counts_fermes.empty and counts_fermes.sum() > 0:
@@ -168,4 +161,6 @@ with st.container(border=True):
                      f"La fragilité est concentrée sur les micro-structures.")
 
 st.divider()
-st.caption("ℹ️ Source : Base SIRENE & Bilans Publics | Focus méthodologique : SAS & SARL.")
\ No newline at end of file
+st.caption("ℹ️ Source : Base SIRENE & Bilans Publics | Focus méthodologique : SAS & SARL.")
+
+end_page()
@@ -2,51 +2,37 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-import requests
+from utils.geo import get_geojson_source, choropleth_departements
+from utils.data import sync_session_dataset, data_available, list_departements, get_page_data
+from utils.profiling import start_page, end_page, etape, emettre_graphique
+from utils.query import requete
 
 # --- 1. CONFIGURATION ---
 st.set_page_config(page_title="Analyse territoriale", layout="wide")
-
-# On garde le GeoJSON ici car il est exclusif aux cartes de cette page
-@st.cache_data
-def get_geojson():
-    """Récupère le fond de carte des départements français"""
-    repo_url = "https://raw.githubusercontent.com/gregoiredavid/france-geojson/master/departements-version-simplifiee.geojson"
-    try: 
-        return requests.get(repo_url).json()
-    except: 
-        return None
+start_page(__file__)
 
 # --- LOGIQUE DE RÉCUPÉRATION CENTRALISÉE ---
-if 'df' in st.session_state and st.session_state['df'] is not None:
-    # 🎯 Récupération directe depuis la page main
-    df = st.session_state['df']
-else:
+sync_session_dataset()
+COLONNES_EXPLORATEUR = [
+    "fermeture", "age_estime", "code_ape", "libelle_section_ape", "Tranche_effectif_num",
+    "latitude", "longitude", "Dénomination"
+]
+if not data_available():
     # Sécurité Hugging Face
     st.warning("⚠️ Session rafraîchie ou expirée. Veuillez repasser brièvement par la page d'accueil pour réinitialiser l'intelligence économique.")
     st.info("💡 *Pourquoi ? Le dataset global est volumineux et s'initialise uniquement sur la page principale pour optimiser les performances.*")
     st.stop()
 
-# Récupération du GeoJSON (spécifique à cette page)
-geojson_france = get_geojson()
-
-# --- SÉCURISATION & HARMONISATION DES DEPARTEMENTS ---
-
-df_geo = df.copy()
-col_brute = "Code du département de l'établissement"
-
-if col_brute in df_geo.columns:
-    df_geo = df_geo.rename(columns={col_brute: "dept_code"})
+# Fond de carte embarqué, chargé une seule fois par processus
+geojson_france = get_geojson_source()
 
-if "dept_code" in df_geo.columns:
-    df_geo["dept_code"] = df_geo["dept_code"].astype(str).str.replace(r'\.0$', '', regex=True).str.zfill(2)
-
-# Récupération du GeoJSON
-geojson_france = get_geojson()
+# --- INDICATEURS DÉPARTEMENTAUX (UNE SEULE REQUÊTE, CODES DÉJÀ HARMONISÉS) ---
+df_dept = requete("indicateurs_departement")
+synthese = requete("synthese").iloc[0]
 
 # Calculs temporels de base
-annee_min = df_geo["Date_fermeture_finale"].dt.year.min()
-annee_max = df_geo["Date_fermeture_finale"].dt.year.max()
+annee_min = synthese["annee_min"]
+annee_max = synthese["annee_max"]
 nb_annees = max(1, (annee_max - annee_min + 1)) if not pd.isna(annee_min) else 1
 
 # --- TITRE ---
@@ -54,9 +40,9 @@ st.title("🗺️ 4. Analyse Territoriale")
 st.markdown("Analyse comparative des dynamiques de fermeture et de la maturité des tissus économiques par département.")
 
 # --- CARTE 1 : INDICE DE FERMETURE ---
-df_dept_stats = df_geo.groupby("dept_code").agg(taux_brut=("fermeture", "mean")).reset_index()
+df_dept_stats = df_dept[["dept_code", "taux_brut"]].copy()
 df_dept_stats["taux_pct"] = ((df_dept_stats["taux_brut"] * 100) / nb_annees).round(2)
-moy_nat_annuelle = ((df_geo["fermeture"].mean() * 100) / nb_annees)
+moy_nat_annuelle = ((synthese["taux_fermeture"] * 100) / nb_annees)
 
 vmin = df_dept_stats["taux_pct"].quantile(0.05)
 vmax = df_dept_stats["taux_pct"].quantile(0.95)
@@ -74,19 +60,12 @@ with st.container(border=True):
             [1.0, "#B91C1C"]   
         ]
 
-        fig_map = px.choropleth(
-            df_dept_stats, geojson=geojson_france, locations="dept_code",
-            featureidkey="properties.code", color="taux_pct",
-            color_continuous_scale=nuanced_scale, 
-            range_color=[vmin, vmax], 
-            scope="europe", height=600,
-            custom_data=[df_dept_stats["taux_pct"].round(2)]
-        )
-        fig_map.update_geos(fitbounds="locations", visible=False)
-        fig_map.update_traces(hovertemplate="<b>Département %{location}</b><br>Taux de fermeture : %{customdata[0]:.2f}%<extra></extra>")
-        fig_map.update_layout(
-            margin={"r":0, "t":0, "l":0, "b":0},
-            coloraxis_colorbar=dict(
+        fig_map = choropleth_departements(
+            df_dept_stats["dept_code"], df_dept_stats["taux_pct"],
+            colorscale=nuanced_scale, zmin=vmin, zmax=vmax,
+            customdata=df_dept_stats[["taux_pct"]].round(2).values,
+            hovertemplate="<b>Département %{location}</b><br>Taux de fermeture : %{customdata[0]:.2f}%<extra></extra>",
+            colorbar=dict(
                 title="Taux (%)",
                 yanchor="middle", y=0.5,
                 ticks="outside",
@@ -95,7 +74,8 @@ with st.container(border=True):
                 len=0.7 
             )
         )
-        st.plotly_chart(fig_map, use_container_width=True)
+        etape("figure:map")
+        emettre_graphique(fig_map, "map", use_container_width=True)
     else:
         st.warning("⚠️ Impossible de charger le fond de carte GeoJSON.")
 
@@ -143,23 +123,18 @@ tab1, tab2 = st.tabs(["🛡️ Taux de Maturité (+10 ans)", "⏳ Durée de vie
 
 with tab1:
     with st.container(border=True):
-        df_resilience = df_geo[df_geo["fermeture"] == 0].groupby("dept_code").agg(
-            total=("age_estime", "count"), 
-            plus_de_10ans=("age_estime", lambda x: (x > 10).sum())
-        ).reset_index()
+        df_resilience = df_dept.loc[df_dept["n_actifs"] > 0, ["dept_code", "total", "plus_de_10ans"]].copy()
         df_resilience["taux_vieux"] = (df_resilience["plus_de_10ans"] / df_resilience["total"] * 100).round(2)
         moy_maturite = df_resilience["taux_vieux"].mean()
 
         if geojson_france:
-            fig_res = px.choropleth(
-                df_resilience, geojson=geojson_france, locations="dept_code",
-                featureidkey="properties.code", color="taux_vieux",
-                color_continuous_scale="YlGn", scope="europe", height=600
+            fig_res = choropleth_departements(
+                df_resilience["dept_code"], df_resilience["taux_vieux"], colorscale="YlGn",
+                hovertemplate="<b>Département %{location}</b><br>Part +10 ans : %{z:.1f}%<extra></extra>",
+                colorbar=dict(title="%")
             )
-            fig_res.update_geos(fitbounds="locations", visible=False)
-            fig_res.update_traces(hovertemplate="<b>Département %{location}</b><br>Part +10 ans : %{z:.1f}%<extra></extra>")
-            fig_res.update_layout(margin={"r":0, "t":0, "l":0, "b":0}, coloraxis_colorbar=dict(title="%"))
-            st.plotly_chart(fig_res, use_container_width=True)
+            etape("figure:res")
+            emettre_graphique(fig_res, "res", use_container_width=True)
 
         top_mat = df_resilience[df_resilience["dept_code"].str.len() <= 2].sort_values("taux_vieux", ascending=False).head(3)
         st.write(f"💡 **Note :** La moyenne nationale de maturité est de **{moy_maturite:.1f}%**. Les tissus les plus ancrés se trouvent en : " + 
@@ -167,19 +142,20 @@ with tab1:
 
 with tab2:
     with st.container(border=True):
-        df_life = df_geo[df_geo["fermeture"] == 1].groupby("dept_code")["age_estime"].mean().reset_index()
+        df_life = (
+            df_dept.loc[df_dept["age_moyen_fermes"].notna(), ["dept_code", "age_moyen_fermes"]]
+            .rename(columns={"age_moyen_fermes": "age_estime"})
+        )
         moy_longevite = df_life["age_estime"].mean()
 
         if geojson_france:
-            fig_life = px.choropleth(
-                df_life, geojson=geojson_france, locations="dept_code",
-                featureidkey="properties.code", color="age_estime", 
-                color_continuous_scale="Purples", scope="europe", height=600
+            fig_life = choropleth_departements(
+                df_life["dept_code"], df_life["age_estime"], colorscale="Purples",
+                hovertemplate="<b>Département %{location}</b><br>Âge moyen fermeture : %{z:.1f} ans<extra></extra>",
+                colorbar=dict(title="Ans")
             )
-            fig_life.update_geos(fitbounds="locations", visible=False)
-            fig_life.update_traces(hovertemplate="<b>Département %{location}</b><br>Âge moyen fermeture : %{z:.1f} ans<extra></extra>")
-            fig_life.update_layout(margin={"r":0, "t":0, "l":0, "b":0}, coloraxis_colorbar=dict(title="Ans"))
-            st.plotly_chart(fig_life, use_container_width=True)
+            etape("figure:life")
+            emettre_graphique(fig_life, "life", use_container_width=True)
 
         top_life = df_life[df_life["dept_code"].str.len() <= 2].sort_values("age_estime", ascending=False).head(3)
         st.write(f"⏳ **Analyse :** En moyenne, une entreprise ferme après **{moy_longevite:.1f} ans** d'existence. Record de longévité constaté en : " + 
@@ -195,10 +171,11 @@ with st.container(border=True):
     c_dep, c_sec, c_info = st.columns([1, 2, 1])
     
     with c_dep:
-        dep_cible = st.selectbox("📍 Département", options=sorted(df_geo["dept_code"].unique()))
+        dep_cible = st.selectbox("📍 Département", options=list_departements())
     
     with c_sec:
-        df_dep_only = df_geo[df_geo["dept_code"] == dep_cible].copy()
+        # Lecture limitée au département ciblé (partition unique en mode paresseux)
+        df_dep_only = get_page_data(COLONNES_EXPLORATEUR, dep=dep_cible).copy()
         secteurs_df = df_dep_only[['code_ape', 'libelle_section_ape']].drop_duplicates().dropna()
         secteurs_df["label"] = secteurs_df["code_ape"].astype(str) + " – " + secteurs_df["libelle_section_ape"].astype(str)
         secteurs = secteurs_df.sort_values("label")
@@ -250,10 +227,13 @@ with st.container(border=True):
                 showarrow=False, align="left", bgcolor="rgba(255, 255, 255, 0.95)", bordercolor="#d1d5db", borderwidth=1, borderpad=12
             )]
         )
-        st.plotly_chart(fig_mapbox, use_container_width=True, config={'scrollZoom': True})
+        etape("figure:mapbox")
+        emettre_graphique(fig_mapbox, "mapbox", use_container_width=True, config={'scrollZoom': True})
         st.caption("🔍 _Astuce : Survolez un point pour découvrir l'identité et les caractéristiques de l'entreprise._")
     else:
         st.warning("⚠️ Aucune donnée disponible pour cette sélection spécifique. Essayez un autre secteur ou département.")
 
 st.divider()
-st.caption("ℹ️ Source : Base SIRENE & Bilans Publics | Focus méthodologique : SAS & SARL.")
\ No newline at end of file
+st.caption("ℹ️ Source : Base SIRENE & Bilans Publics | Focus méthodologique : SAS & SARL.")
+
+end_page()
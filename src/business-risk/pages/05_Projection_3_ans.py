@@ -1,33 +1,28 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-import requests
+import plotly.graph_objects as go
+from utils.geo import get_geojson_source, choropleth_departements
+from utils.projection import (
+    get_projection_cube, fragility_table, band_table, threshold_sweep, STATUS_CUTOFFS, STATUS_LABELS
+)
+from utils.data import sync_session_dataset, data_available, get_page_data
+from utils.profiling import start_page, end_page, etape, emettre_graphique
 
 # 1. Configuration de la page
 st.set_page_config(page_title="Projection Stratégique", layout="wide")
-
-# --- FONCTION GEOJSON ---
-@st.cache_data
-def get_france_geojson():
-    repo_url = "https://raw.githubusercontent.com/gregoiredavid/france-geojson/master/departements-version-simplifiee.geojson"
-    try:
-        return requests.get(repo_url).json()
-    except:
-        return None
+start_page(__file__)
 
 # --- LOGIQUE DE RÉCUPÉRATION CENTRALISÉE ---
-if 'df' in st.session_state and st.session_state['df'] is not None:
-    # 🎯 Récupération directe du dataset global de la main
-    df_raw = st.session_state['df'].copy()
-    
-    # Nettoyage et préparation des données de projection
-    df_proj = df_raw[df_raw['Statut_Expert'] != '⚫ FERMÉ'].copy()
-    
-    # Nettoyage robuste des codes départements (gère les formats textes et numériques)
-    df_proj["dep_code"] = df_proj["Code du département de l'établissement"].astype(str).str.strip().str.replace(r'\.0$', '', regex=True).str.zfill(2)
-    
-    # Exclusion des DOM-TOM pour focaliser l'analyse cartographique métropolitaine
-    df_proj = df_proj[~df_proj["dep_code"].str.startswith('97')]
+sync_session_dataset()
+COLONNES_PAGE = [
+    "Statut_Expert", "Prob_1an", "Prob_2ans", "Prob_3ans", "Code du département de l'établissement",
+    "libelle_section_ape", "Catégorie juridique de l'unité légale"
+]
+if data_available():
+    # 🎯 Agrégats précalculés une seule fois par processus (aucune copie du dataset global)
+    df_raw = get_page_data(COLONNES_PAGE)
+    cube = get_projection_cube(df_raw, st.session_state.get('data_version', len(df_raw)))
 else:
     # Sécurité Hugging Face si la session est coupée
     st.warning("⚠️ Session rafraîchie ou expirée. Veuillez repasser brièvement par la page d'accueil pour réinitialiser l'intelligence économique.")
@@ -36,12 +31,15 @@ else:
 
 # --- SIDEBAR : DÉFINITIONS ---
 with st.sidebar:
+    st.header("🎚️ Seuil de fragilité")
+    seuil = st.slider("Probabilité de défaillance (%)", 1.0, 50.0, 10.0, 0.5, key="sb_projection_seuil")
+
     st.header("🔍 Concept")
     st.markdown("### Définition du Basculement")
-    st.write("""
+    st.write(f"""
     Un **basculement** est comptabilisé lorsqu'une entreprise :
-    1. Était considérée comme **Saine** en N+1 (Probabilité de défaillance < 10%).
-    2. Devient **Fragile** à l'horizon choisi (Probabilité > 10%).
+    1. Était considérée comme **Saine** en N+1 (Probabilité de défaillance ≤ {seuil:g}%).
+    2. Devient **Fragile** à l'horizon choisi (Probabilité > {seuil:g}%).
     """)
     st.caption("Cela permet d'isoler le flux de dégradation futur du stock de risque actuel.")
 
@@ -96,8 +94,8 @@ with st.container(border=True):
         st.markdown("Le modèle calcule la <b>résistance</b> aux chocs. Plus l'entreprise est jeune, plus son horloge tourne vite.", unsafe_allow_html=True)
 
     with col_pedago2:
-        st.markdown("🌡️ **Le Seuil de 10%**")
-        st.markdown("C'est notre **filtre de basculement**. Toute entreprise dépassant cette probabilité est comptabilisée dans le **Volume** des alertes et impacte directement la carte.", unsafe_allow_html=True)
+        st.markdown(f"🌡️ **Le Seuil de {seuil:g}%**")
+        st.markdown("C'est notre **filtre de basculement** (ajustable dans le menu latéral). Toute entreprise dépassant cette probabilité est comptabilisée dans le **Volume** des alertes et impacte directement la carte.", unsafe_allow_html=True)
 
     with col_pedago3:
         st.markdown("🌊 **L'Effet de Vague**")
@@ -112,23 +110,14 @@ if 'horizon_val' not in st.session_state:
 # Capture immédiate de l'horizon courant
 h_val = st.session_state['horizon_val']
 
-# --- 2. CALCULS DYNAMIQUES ---
-seuil = 10
-col_curr = f"Prob_{h_val}an" if h_val == 1 else f"Prob_{h_val}ans"
-
-df_proj['is_fragile_N1'] = (df_proj['Prob_1an'] > seuil).astype(int)
-df_proj['is_fragile_curr'] = (df_proj[col_curr] > seuil).astype(int)
-
+# --- 2. CALCULS DYNAMIQUES (lecture des histogrammes cumulés) ---
 if h_val == 1:
-    df_proj['val_metier'] = df_proj['is_fragile_N1']
     label_vol, label_delta = "Entreprises fragiles (Stock actuel)", "Inventaire de départ"
 else:
-    df_proj['val_metier'] = ((df_proj['is_fragile_curr'] == 1) & (df_proj['is_fragile_N1'] == 0)).astype(int)
     label_vol, label_delta = "Nouveaux basculements (Flux)", "Dégradations nettes prévues"
 
 # Agrégation par département
-map_data = df_proj.groupby("dep_code").agg({'is_fragile_curr': 'mean', 'val_metier': 'sum'}).reset_index()
-map_data['Taux_Fragilite'] = map_data['is_fragile_curr'] * 100
+map_data = fragility_table(cube, "dep", h_val, seuil).rename(columns={'groupe': 'dep_code'})
 moyenne_nat = map_data['Taux_Fragilite'].mean()
 map_data['Indice'] = (map_data['Taux_Fragilite'] / moyenne_nat * 100) if moyenne_nat > 0 else 100
 
@@ -136,18 +125,16 @@ map_data['Indice'] = (map_data['Taux_Fragilite'] / moyenne_nat * 100) if moyenne
 col_map, col_stats = st.columns([1.6, 1])
 
 with col_map:
-    geojson = get_france_geojson()
-    if geojson:
+    if get_geojson_source():
         frost_grey_scale = [[0.0, "#FFFFFF"], [0.25, "#F0F4F8"], [0.5, "#CBD5E1"], [0.75, "#94A3B8"], [1.0, "#64748B"]]
-        fig_map = px.choropleth(
-            map_data, geojson=geojson, locations="dep_code", featureidkey="properties.code",
-            color='Indice', color_continuous_scale=frost_grey_scale, range_color=(90, 110),
-            scope='europe', height=600, custom_data=[map_data['Taux_Fragilite'].round(2), map_data['val_metier']]
+        fig_map = choropleth_departements(
+            map_data['dep_code'], map_data['Indice'], colorscale=frost_grey_scale, zmin=90, zmax=110,
+            customdata=list(zip(map_data['Taux_Fragilite'].round(2), map_data['val_metier'])),
+            hovertemplate="<b>Dépt %{location}</b><br>Indice : %{z:.1f}<br>Taux : %{customdata[0]}%<br>Volume : %{customdata[1]}<extra></extra>"
         )
-        fig_map.update_traces(hovertemplate="<b>Dépt %{location}</b><br>Indice : %{z:.1f}<br>Taux : %{customdata[0]}%<br>Volume : %{customdata[1]}<extra></extra>")
-        fig_map.update_geos(fitbounds="locations", visible=False)
-        fig_map.update_layout(margin={"r":0,"t":0,"l":0,"b":0}, paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)')
-        st.plotly_chart(fig_map, use_container_width=True)
+        fig_map.update_layout(paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)')
+        etape("figure:map")
+        emettre_graphique(fig_map, "map", use_container_width=True)
     else:
         st.warning("⚠️ Impossible de récupérer le fond de carte GeoJSON.")
 
@@ -156,15 +143,16 @@ with col_stats:
     st.metric(label_vol, f"{vol_total:,}".replace(',', ' '), delta=label_delta)
     st.write(f"**🏢 Secteurs les plus impactés (N+{h_val})**")
     
-    secteurs_data = (df_proj.groupby('libelle_section_ape')['is_fragile_curr'].mean() * 100).sort_values(ascending=True).tail(5).reset_index()
-    secteurs_data.columns = ['Secteur', 'Taux']
+    secteurs_data = fragility_table(cube, "secteur", h_val, seuil).sort_values('Taux_Fragilite', ascending=True).tail(5)
+    secteurs_data = secteurs_data[['groupe', 'Taux_Fragilite']].rename(columns={'groupe': 'Secteur', 'Taux_Fragilite': 'Taux'})
     
     fig_bars = px.bar(secteurs_data, x='Taux', y='Secteur', orientation='h', color_discrete_sequence=["#E67E22"])
     fig_bars.update_layout(
         paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)', margin={"r":40,"t":10,"l":0,"b":0}, height=350,
         yaxis=dict(ticktext=[(s[:25] + '...') if len(s) > 25 else s for s in secteurs_data['Secteur']], tickvals=secteurs_data['Secteur'])
     )
-    st.plotly_chart(fig_bars, use_container_width=True, config={'displayModeBar': False})
+    etape("figure:bars")
+    emettre_graphique(fig_bars, "bars", use_container_width=True, config={'displayModeBar': False})
 
 # --- BARRE DE SÉLECTION DE L'HORIZON ---
 st.markdown("""
@@ -215,4 +203,70 @@ with st.expander("⚖️ Note sur l'interprétation"):
     st.markdown(f"Ce diagnostic à N+{h_val} identifie les zones de fragilité atypique par rapport à la moyenne nationale du moment.")
 
 st.divider()
-st.caption("ℹ️ Source : Base SIRENE & Bilans Publics | Focus méthodologique : SAS & SARL.")
\ No newline at end of file
+
+# --- 5. SIMULATION DE POLITIQUE DE SEUILS ---
+st.subheader("🎛️ Simulation de politique de risque")
+st.markdown("""
+Testez d'autres bornes pour les statuts du moteur (**Sain / Observation / Vigilance / Critique**) : 
+la répartition est relue instantanément dans les distributions précalculées, sans re-parcourir la base.
+""")
+
+with st.container(border=True):
+    c_h, c_niv, c_bornes = st.columns([1, 1, 2])
+    with c_h:
+        h_pol = st.radio("Horizon", options=[1, 2, 3], index=1, format_func=lambda x: f"N+{x}", horizontal=True, key="policy_horizon")
+    with c_niv:
+        niveaux = {"dep": "Département", "secteur": "Secteur", "forme": "Forme juridique"}
+        niveau = st.selectbox("Découpage", options=list(niveaux), format_func=niveaux.get, key="policy_niveau")
+    with c_bornes:
+        b1, b2, b3 = st.columns(3)
+        bornes = [
+            b1.number_input("Observation >", 0.0, 100.0, STATUS_CUTOFFS[0], 0.1, format="%.1f", key="policy_b1"),
+            b2.number_input("Vigilance >", 0.0, 100.0, STATUS_CUTOFFS[1], 0.1, format="%.1f", key="policy_b2"),
+            b3.number_input("Critique >", 0.0, 100.0, STATUS_CUTOFFS[2], 0.1, format="%.1f", key="policy_b3"),
+        ]
+
+    bandes_nat = band_table(cube, "france", h_pol, bornes)
+    total_nat = max(int(bandes_nat["total"].sum()), 1)
+    kpis = st.columns(len(STATUS_LABELS))
+    for kpi, label in zip(kpis, STATUS_LABELS):
+        kpi.metric(label, f"{int(bandes_nat[label].sum()):,}".replace(',', ' '), f"{bandes_nat[label].sum() / total_nat * 100:.1f} %", delta_color="off")
+
+    col_bandes, col_courbe = st.columns([1.4, 1])
+    with col_bandes:
+        bandes = band_table(cube, niveau, h_pol, bornes).sort_values("total", ascending=False).head(15)
+        parts = bandes.melt(id_vars=["groupe", "total"], value_vars=STATUS_LABELS, var_name="Statut", value_name="Volume")
+        parts["Part"] = parts["Volume"] / parts["total"] * 100
+        fig_bandes = px.bar(
+            parts, x="Part", y="groupe", color="Statut", orientation="h", height=450,
+            color_discrete_sequence=["#178F49", "#F1C40F", "#E67E22", "#B91C1C"],
+            custom_data=["Volume"]
+        )
+        fig_bandes.update_traces(hovertemplate="<b>%{y}</b><br>Part : %{x:.1f}%<br>Volume : %{customdata[0]}<extra></extra>")
+        fig_bandes.update_layout(
+            paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)', margin={"r":0,"t":10,"l":0,"b":0},
+            xaxis_title="Part du périmètre (%)", yaxis_title=None, legend=dict(orientation="h", y=-0.15)
+        )
+        fig_bandes.update_yaxes(autorange="reversed")
+        etape("figure:bandes")
+        emettre_graphique(fig_bandes, "bandes", use_container_width=True, config={'displayModeBar': False})
+
+    with col_courbe:
+        sweep = threshold_sweep(cube, "france", h_pol).query("seuil <= 50")
+        fig_sweep = go.Figure(go.Scatter(
+            x=sweep["seuil"], y=sweep["part_fragiles"], mode="lines", line=dict(color="#E67E22", width=3),
+            hovertemplate="Seuil : %{x:.1f}%<br>Sociétés au-dessus : %{y:.1f}%<extra></extra>"
+        ))
+        for borne in bornes:
+            fig_sweep.add_vline(x=borne, line_dash="dot", line_color="#94A3B8")
+        fig_sweep.update_layout(
+            paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)', margin={"r":0,"t":10,"l":0,"b":0}, height=450,
+            xaxis_title=f"Seuil sur la probabilité à N+{h_pol} (%)", yaxis_title="Part du parc au-dessus du seuil (%)"
+        )
+        etape("figure:sweep")
+        emettre_graphique(fig_sweep, "sweep", use_container_width=True, config={'displayModeBar': False})
+
+st.divider()
+st.caption("ℹ️ Source : Base SIRENE & Bilans Publics | Focus méthodologique : SAS & SARL.")
+
+end_page()
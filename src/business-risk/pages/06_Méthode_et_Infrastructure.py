@@ -1,13 +1,19 @@
 import streamlit as st
 import pandas as pd
+import plotly.express as px
+from utils import api
+from utils.data import sync_session_dataset, data_available, get_page_data
+from utils.profiling import start_page, end_page, etape, emettre_graphique
 
 # --- CONFIGURATION ---
 st.set_page_config(page_title="Audit & Méthodologie", layout="wide")
+start_page(__file__)
 
 # --- LOGIQUE DE RÉCUPÉRATION CENTRALISÉE ---
-if 'df' in st.session_state and st.session_state['df'] is not None:
+sync_session_dataset()
+if data_available():
     # 🎯 Récupération directe depuis la page main pour éviter les doublons S3
-    df_preds = st.session_state['df']
+    df_preds = get_page_data(["fermeture"])
 else:
     # Sécurité Hugging Face si la session a sauté en cours de route
     st.warning("⚠️ Session rafraîchie ou expirée. Veuillez repasser brièvement par la page d'accueil pour réinitialiser l'intelligence économique.")
@@ -124,4 +130,30 @@ eda3.metric("Effectifs", "Signaux Faibles", "RH")
 eda4.metric("Juridique", "Gouvernance", "Pérennité")
 
 st.divider()
-st.caption("ℹ️ Méthodologie certifiée interne - Mise à jour des modèles : Mars 2026")
\ No newline at end of file
+
+# --- SECTION 4 : IMPORTANCE GLOBALE DES FACTEURS ---
+st.subheader("🔍 Ce qui pèse sur la survie : importance globale des facteurs")
+st.write("""
+Les prédictions du modèle sont décomposées (TreeSHAP) en contributions par facteur métier sur l'ensemble
+du portefeuille. L'importance d'un facteur est la moyenne de la valeur absolue de ses contributions.
+""")
+
+try:
+    # Importance globale pré-calculée hors ligne et servie par l'API (/explain/global)
+    importance = api.importance_globale()
+    df_imp = pd.DataFrame(importance["facteurs"]).sort_values("part_pct")
+    fig_imp = px.bar(df_imp, x="part_pct", y="facteur", orientation='h', text_auto=".1f",
+                     labels={"part_pct": "Part de l'importance (%)", "facteur": ""},
+                     color_discrete_sequence=["#3498db"])
+    fig_imp.update_layout(paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)',
+                          margin=dict(l=0, r=0, t=10, b=0))
+    etape("figure:importance_globale")
+    emettre_graphique(fig_imp, "importance_globale", use_container_width=True, config={'displayModeBar': False})
+    st.caption(f"Calculée sur {importance.get('n_lignes', 0):,} établissements".replace(',', ' '))
+except Exception as e:
+    st.info(f"💡 Importance globale indisponible pour le moment ({e}).")
+
+st.divider()
+st.caption("ℹ️ Méthodologie certifiée interne - Mise à jour des modèles : Mars 2026")
+
+end_page()
@@ -1,15 +1,134 @@
 import streamlit as st
 import requests
 import pandas as pd
-import os
+import plotly.express as px
+from utils import api
+from utils.data import sync_session_dataset, data_available, get_page_data
+from utils.profiling import start_page, end_page, etape, emettre_graphique
 
 # --- 1. CONFIGURATION DE LA PAGE ---
 if "set_page_config" not in st.session_state:
     st.set_page_config(layout="wide", page_title="Business Risk Simulator", page_icon="📈")
     st.session_state["set_page_config"] = True
+start_page(__file__)
 
-# URL de l'API Hugging Face
-API_URL = "https://djohell-api-business-risk.hf.space/predict"
+MODE_UNIQUE = "🎯 Diagnostic unique"
+MODE_BALAYAGE = "📈 Balayage de scénarios"
+HORIZONS_BALAYAGE = {"Prob_1an": "1 an", "Prob_2ans": "2 ans", "Prob_3ans": "3 ans"}
+SEUILS_STATUT = [5, 10, 20]
+
+
+def afficher_diagnostic(res):
+    """Diagnostic, métriques de risque, analyse et facteurs explicatifs d'une réponse /explain"""
+    diag = res.get("diagnostic", {})
+    profil = str(diag.get("profil_global", "INCONNU")).upper().strip()
+
+    # --- LOGIQUE D'AFFICHAGE COMPLÈTE ET EFFETS ANIMÉS ---
+    color, icon, comment = "grey", "❓", "Diagnostic atypique détecté."
+
+    if "SAIN" in profil:
+        st.balloons()
+        color, icon = "green", "✅"
+        comment = "La structure présente des indicateurs favorables de résilience. Votre modèle économique semble solide face aux contraintes actuelles."
+    elif "OBSERVATION" in profil:
+        color, icon = "blue", "🧐"
+        comment = "Profil stable, mais certains indicateurs sectoriels suggèrent de rester attentif à l'évolution du marché."
+    elif "VIGILANCE" in profil:
+        color, icon = "orange", "⚠️"
+        comment = "Attention : Des facteurs de vulnérabilité (âge, secteur ou zone géographique) pèsent sur la pérennité statistique."
+    elif "CRITIQUE" in profil:
+        st.snow()
+        color, icon = "red", "🚨"
+        comment = "Attention : Des éléments laissent à penser que des difficultés pourraient survenir à moyen terme. Il est recommandé de renforcer votre stratégie et de solliciter un accompagnement spécialisé."
+
+    st.divider()
+    st.markdown(f"### {icon} Diagnostic : :{color}[{profil}]")
+
+    # Bloc des Métriques de Risque Temporel
+    probs = res.get("probabilites_fermeture", {})
+    m1, m2, m3 = st.columns(3)
+    m1.metric("Risque à 1 an", probs.get("1_an", "N/A"))
+    m2.metric("Risque à 2 ans", probs.get("2_ans", "N/A"))
+    m3.metric("Risque à 3 ans", probs.get("3_ans", "N/A"))
+
+    # Affichage de l'analyse textuelle
+    st.subheader("💡 Analyse Stratégique")
+    st.info(comment)
+
+    # Décomposition TreeSHAP de la prédiction par facteur métier
+    facteurs = res.get("explication", {}).get("facteurs", [])
+    if facteurs:
+        st.subheader("🔍 Facteurs explicatifs")
+        df_exp = pd.DataFrame(facteurs).sort_values("contribution")
+        fig = px.bar(df_exp, x="contribution", y="facteur", orientation='h', color="effet",
+                     color_discrete_map={"⬇️ risque": "#2ecc71", "⬆️ risque": "#e74c3c", "neutre": "#95a5a6"},
+                     labels={"contribution": "Contribution (log de la durée de survie)", "facteur": ""})
+        fig.update_layout(paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)',
+                          margin=dict(l=0, r=0, t=10, b=0), legend_title_text="")
+        etape("figure:explication")
+        emettre_graphique(fig, "explication", use_container_width=True, config={'displayModeBar': False})
+        st.caption("Chaque barre mesure l'écart apporté par le facteur au log de la durée de survie "
+                   "prédite, par rapport au profil moyen (Base). Une contribution positive allonge la "
+                   "survie attendue, donc réduit le risque.")
+
+
+def afficher_balayage(df):
+    """Courbes de sensibilité du risque à l'âge, par tranche d'effectif et forme juridique"""
+    st.divider()
+    st.subheader("📈 Sensibilité du risque")
+    col_h = st.radio("Horizon", options=list(HORIZONS_BALAYAGE), format_func=HORIZONS_BALAYAGE.get,
+                     index=1, horizontal=True, key="balayage_horizon")
+    fig = px.line(df, x="age", y=col_h, color="tranche", facet_col="forme", markers=True,
+                  labels={"age": "Âge de l'entreprise (années)", col_h: "Risque de fermeture (%)",
+                          "tranche": "Effectif", "forme": ""})
+    if col_h == "Prob_2ans":
+        # Bandes de statut du moteur (calculées sur le risque à 2 ans)
+        for seuil in SEUILS_STATUT:
+            fig.add_hline(y=seuil, line_dash="dot", line_color="grey", opacity=0.6)
+    fig.update_layout(paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)',
+                      margin=dict(l=0, r=0, t=30, b=0))
+    etape("figure:balayage")
+    emettre_graphique(fig, "balayage", use_container_width=True, config={'displayModeBar': False})
+    st.caption(f"{len(df)} scénarios scorés en un seul appel à l'API. "
+               "Les pointillés du risque à 2 ans marquent les seuils de statut (5, 10 et 20 %).")
+    with st.expander("📋 Tableau des scénarios", expanded=False):
+        st.dataframe(df.pivot_table(index="age", columns=["forme", "tranche"], values=col_h),
+                     use_container_width=True)
+
+def afficher_recherche():
+    """Recherche d'une entreprise existante par sa dénomination et risque actuel d'après la base scorée"""
+    with st.expander("🔎 Retrouver une entreprise existante", expanded=False):
+        requete = st.text_input("Dénomination", placeholder="ex. boulangerie du port", key="recherche_nom").strip()
+        if len(requete) < 2:
+            st.caption("Saisissez au moins deux caractères : casse, accents et fautes de frappe sont tolérés, "
+                       "le dernier mot peut être incomplet.")
+            return
+        if not api.hf_token():
+            st.error("❌ Clé d'authentification 'HF_TOKEN' manquante. Impossible de contacter l'API.")
+            return
+        try:
+            resultats = api.rechercher(requete)
+        except requests.HTTPError as e:
+            st.error(f"❌ Erreur API ({e.response.status_code}) : recherche indisponible.")
+            return
+        except Exception as e:
+            st.error(f"❌ Erreur de connexion avec l'API : {e}")
+            return
+        if not resultats:
+            st.info("Aucune entreprise de la base scorée ne correspond à cette recherche.")
+            return
+
+        choix = st.selectbox(f"{len(resultats)} suggestion(s)", options=range(len(resultats)),
+                             format_func=lambda i: f"{resultats[i]['denomination']} · SIREN {resultats[i]['siren']}"
+                                                   f" · dép. {resultats[i]['departement'] or '?'}")
+        societe = resultats[choix]
+        st.markdown(f"**{societe['denomination']}** (APE {societe['code_ape'] or '?'}) : "
+                    f"statut actuel **{societe['statut_expert']}**")
+        m1, m2, m3 = st.columns(3)
+        m1.metric("Risque à 1 an", f"{societe['prob_1an']:.1f}%")
+        m2.metric("Risque à 2 ans", f"{societe['prob_2ans']:.1f}%")
+        m3.metric("Risque à 3 ans", f"{societe['prob_3ans']:.1f}%")
+        st.caption("Scores de la dernière base scorée ; le formulaire ci-dessous simule d'autres profils.")
 
 def render_simulation_page():
     st.title("7. 🧪 Projection Personnalisée de Résilience")
@@ -17,11 +136,15 @@ def render_simulation_page():
     Saisissez les caractéristiques d'une structure pour interroger le moteur d'apprentissage et obtenir une analyse de survie sur-mesure.
     """)
     st.divider()
+
+    # --- 2. RECHERCHE D'UNE ENTREPRISE EXISTANTE ---
+    afficher_recherche()
     
-    # --- 2. RÉCUPÉRATION INTELLIGENTE DES DONNÉES ---
-    if 'df' in st.session_state and st.session_state['df'] is not None:
+    # --- 3. RÉCUPÉRATION INTELLIGENTE DES DONNÉES ---
+    sync_session_dataset()
+    if data_available():
         # 🎯 Récupération instantanée du dataset global chargé à l'accueil
-        df = st.session_state['df']
+        df = get_page_data(["Code du département de l'établissement", "code_ape", "libelle_section_ape"])
     else:
         # Sécurité Hugging Face si la session a sauté en cours de route
         st.warning("⚠️ Session rafraîchie ou expirée. Veuillez repasser brièvement par la page d'accueil pour réinitialiser l'intelligence économique.")
@@ -54,18 +177,23 @@ def render_simulation_page():
         st.error(f"💥 Erreur lors de la préparation des filtres : {e}")
         return
 
-    # --- 3. FORMULAIRE DE SIMULATION ---
+    # --- 4. FORMULAIRE DE SIMULATION ---
+    mode = st.radio("Mode de simulation", options=[MODE_UNIQUE, MODE_BALAYAGE], horizontal=True)
     with st.container(border=True):
         with st.form("simulation_form"):
             col1, col2 = st.columns(2)
             with col1:
                 st.subheader("🏢 Identité & Taille")
-                age = st.slider("Âge de l'entreprise (années)", 0.0, 8.0, 0.0, 0.5)
-                effectif = st.selectbox("Tranche d'effectif", 
-                                       options=[0, 1, 2, 3, 11, 12], 
-                                       format_func=lambda x: {0:"0 salarié", 1:"1-2 salariés", 2:"3-5 salariés", 
-                                                              3:"6-9 salariés", 11:"10-19 salariés", 12:"20-49 salariés"}.get(x, f"Code {x}"),
-                                       index=1)
+                if mode == MODE_UNIQUE:
+                    age = st.slider("Âge de l'entreprise (années)", 0.0, 8.0, 0.0, 0.5)
+                    effectif = st.selectbox("Tranche d'effectif", 
+                                           options=list(api.TRANCHES), 
+                                           format_func=lambda x: api.TRANCHES.get(x, f"Code {x}"),
+                                           index=1)
+                else:
+                    st.caption(f"Balayage : âge de 0 à 8 ans par pas de 0,5, {len(api.TRANCHES)} tranches "
+                               f"d'effectif et {len(api.FORMES_JURIDIQUES)} formes juridiques "
+                               f"({len(api.AGES_BALAYAGE) * len(api.TRANCHES) * len(api.FORMES_JURIDIQUES)} scénarios).")
                 is_ess = st.selectbox("Structure ESS", options=[0, 1], 
                                     format_func=lambda x: "Oui (Économie Sociale)" if x == 1 else "Non")
 
@@ -75,87 +203,50 @@ def render_simulation_page():
                                         index=liste_deps.index("13") if "13" in liste_deps else 0)
                 ape_label = st.selectbox("Secteur d'activité (APE)", options=liste_labels_ape)
                 ape_code = str(dict_ape[ape_label]).zfill(2)[:2]
-                juridique = st.selectbox("Forme Juridique", options=["5499", "5710"], 
-                                       format_func=lambda x: "SARL / EURL" if x == "5499" else "SAS / SASU")
+                if mode == MODE_UNIQUE:
+                    juridique = st.selectbox("Forme Juridique", options=list(api.FORMES_JURIDIQUES), 
+                                           format_func=api.FORMES_JURIDIQUES.get)
 
-            submit = st.form_submit_button("Lancer le diagnostic prédictif 🚀", use_container_width=True)
+            libelle = "Lancer le diagnostic prédictif 🚀" if mode == MODE_UNIQUE else "Lancer le balayage 📈"
+            submit = st.form_submit_button(libelle, use_container_width=True)
 
-    # --- 4. TRAITEMENT ET AFFICHAGE DES RÉSULTATS ---
+    # --- 5. TRAITEMENT ET AFFICHAGE DES RÉSULTATS ---
     if submit:
-        # Headers avec authentification sécurisée par Token
-        hf_token = os.environ.get("HF_TOKEN")
-        if not hf_token:
-            try:
-                hf_token = st.secrets.get("HF_TOKEN")
-            except:
-                hf_token = None
-
-        if not hf_token:
+        # Authentification sécurisée par Token (en-tête posé par la session du client API)
+        if not api.hf_token():
             st.error("❌ Clé d'authentification 'HF_TOKEN' manquante. Impossible de contacter l'API.")
             return
 
-        headers = {
-            "Authorization": f"Bearer {hf_token}",
-            "Content-Type": "application/json"
-        }
-        
-        payload = {
-            "age_estime": float(age),
-            "Tranche_effectif_num": int(effectif),
+        base = {
             "code_departement": str(dep_choisi),
             "code_ape": ape_code,
-            "categorie_juridique": str(juridique),
             "is_ess": int(is_ess)
         }
 
         try:
-            with st.spinner("Analyse par l'IA en cours..."):
-                response = requests.post(API_URL, json=payload, headers=headers, timeout=15)
-                
-            if response.status_code == 200:
-                res = response.json()
-                diag = res.get("diagnostic", {})
-                profil = str(diag.get("profil_global", "INCONNU")).upper().strip()
-                
-                # --- LOGIQUE D'AFFICHAGE COMPLÈTE ET EFFETS ANIMÉS ---
-                color, icon, comment = "grey", "❓", "Diagnostic atypique détecté."
-                
-                if "SAIN" in profil:
-                    st.balloons()
-                    color, icon = "green", "✅"
-                    comment = "La structure présente des indicateurs favorables de résilience. Votre modèle économique semble solide face aux contraintes actuelles."
-                elif "OBSERVATION" in profil:
-                    color, icon = "blue", "🧐"
-                    comment = "Profil stable, mais certains indicateurs sectoriels suggèrent de rester attentif à l'évolution du marché."
-                elif "VIGILANCE" in profil:
-                    color, icon = "orange", "⚠️"
-                    comment = "Attention : Des facteurs de vulnérabilité (âge, secteur ou zone géographique) pèsent sur la pérennité statistique."
-                elif "CRITIQUE" in profil:
-                    st.snow()
-                    color, icon = "red", "🚨"
-                    comment = "Attention : Des éléments laissent à penser que des difficultés pourraient survenir à moyen terme. Il est recommandé de renforcer votre stratégie et de solliciter un accompagnement spécialisé."
-
-                st.divider()
-                st.markdown(f"### {icon} Diagnostic : :{color}[{profil}]")
-                
-                # Bloc des Métriques de Risque Temporel
-                probs = res.get("probabilites_fermeture", {})
-                m1, m2, m3 = st.columns(3)
-                m1.metric("Risque à 1 an", probs.get("1_an", "N/A"))
-                m2.metric("Risque à 2 ans", probs.get("2_ans", "N/A"))
-                m3.metric("Risque à 3 ans", probs.get("3_ans", "N/A"))
-
-                # Affichage de l'analyse textuelle
-                st.subheader("💡 Analyse Stratégique")
-                st.info(comment)
-
+            if mode == MODE_UNIQUE:
+                payload = {
+                    **base,
+                    "age_estime": float(age),
+                    "Tranche_effectif_num": int(effectif),
+                    "categorie_juridique": str(juridique)
+                }
+                with st.spinner("Analyse par l'IA en cours..."):
+                    res = api.expliquer(payload)
+                afficher_diagnostic(res)
             else:
-                st.error(f"❌ Erreur API ({response.status_code}) : Impossible de récupérer les prédictions.")
-                
+                with st.spinner("Balayage des scénarios en cours..."):
+                    # Conservé en session : le choix de l'horizon relance la page sans nouvel appel
+                    st.session_state["balayage"] = api.balayer(base)
+        except requests.HTTPError as e:
+            st.error(f"❌ Erreur API ({e.response.status_code}) : Impossible de récupérer les prédictions.")
         except Exception as e:
             st.error(f"❌ Erreur de connexion avec l'API : {e}")
 
-    # --- 5. MENTION LÉGALE (DISCLAIMER) ---
+    if mode == MODE_BALAYAGE and st.session_state.get("balayage") is not None:
+        afficher_balayage(st.session_state["balayage"])
+
+    # --- 6. MENTION LÉGALE (DISCLAIMER) ---
     st.markdown("---")
     with st.expander("⚖️ Mentions légales et limites de responsabilité", expanded=False):
         st.caption("""
@@ -169,4 +260,5 @@ def render_simulation_page():
         """)
 
 if __name__ == "__main__":
-    render_simulation_page()
\ No newline at end of file
+    render_simulation_page()
+    end_page()
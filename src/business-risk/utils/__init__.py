@@ -0,0 +1 @@
+"""Briques partagées entre les pages du dashboard Égide."""
@@ -0,0 +1,125 @@
+import os
+import time
+
+import pandas as pd
+import requests
+import streamlit as st
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from utils.data import get_setting
+from utils.profiling import bloc
+
+# --- 1. CONFIGURATION ---
+API_BASE_URL = os.environ.get("API_BASE_URL", "https://djohell-api-business-risk.hf.space").rstrip("/")
+# (connexion, lecture) : le Space peut être en réveil, la lecture est plus tolérante que la connexion
+TIMEOUT = (float(os.environ.get("API_CONNECT_TIMEOUT", 5)), float(os.environ.get("API_READ_TIMEOUT", 30)))
+RETRIES = int(os.environ.get("API_RETRIES", 3))
+POOL_SIZE = 10
+# Lectures de confort (importance globale) : pas de rejeu, connexion courte, échec mémorisé ECHEC_TTL secondes
+TIMEOUT_RAPIDE = (2.0, TIMEOUT[1])
+ECHEC_TTL = 60
+
+# Âges du curseur du simulateur et tranches / formes proposées par le formulaire
+AGES_BALAYAGE = [i / 2 for i in range(17)]
+TRANCHES = {0: "0 salarié", 1: "1-2 salariés", 2: "3-5 salariés", 3: "6-9 salariés", 11: "10-19 salariés",
+            12: "20-49 salariés"}
+FORMES_JURIDIQUES = {"5499": "SARL / EURL", "5710": "SAS / SASU"}
+
+
+# --- 2. SESSION HTTP PARTAGÉE ---
+def hf_token():
+    return get_setting("HF_TOKEN")
+
+
+@st.cache_resource(show_spinner=False)
+def _session(token, retries=RETRIES):
+    """Session keep-alive partagée par les pages et les utilisateurs : le pool urllib3 est thread-safe,
+    la poignée TLS avec le Space n'est payée qu'une fois par connexion"""
+    session = requests.Session()
+    # Rejeu (POST compris, les routes de scoring sont sans effet de bord) uniquement sur erreur transitoire du
+    # Space : connexion refusée, 429 et passerelle (502/503/504). Pas sur 500 (l'API y répond à toute entrée
+    # invalide) ni sur une lecture expirée (TIMEOUT déjà long)
+    retry = Retry(total=retries, connect=retries, read=0, backoff_factor=0.5,
+                  status_forcelist=(429, 502, 503, 504), allowed_methods=frozenset({"GET", "POST"}),
+                  raise_on_status=False)
+    adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({"Content-Type": "application/json"})
+    if token:
+        session.headers["Authorization"] = f"Bearer {token}"
+    return session
+
+
+def _appel(methode, route, retries=RETRIES, timeout=TIMEOUT, **kwargs):
+    """Réponse JSON ; requests.HTTPError (code dans e.response) ou requests.RequestException sinon"""
+    with bloc(f"api:{route.strip('/').replace('/', '_')}"):
+        response = _session(hf_token(), retries).request(methode, f"{API_BASE_URL}{route}", timeout=timeout,
+                                                         **kwargs)
+    response.raise_for_status()
+    return response.json()
+
+
+_echecs = {}
+
+
+def _appel_rapide(methode, route, **kwargs):
+    """Sans rejeu et à connexion courte ; un échec est mémorisé ECHEC_TTL secondes et relevé aussitôt (st.cache_data
+    ne garde pas les exceptions : sans cela, chaque rerun repasserait par l'attente de l'API arrêtée)"""
+    echec = _echecs.get(route)
+    if echec and time.monotonic() < echec[0]:
+        raise echec[1]
+    try:
+        return _appel(methode, route, retries=0, timeout=TIMEOUT_RAPIDE, **kwargs)
+    except requests.RequestException as e:
+        _echecs[route] = (time.monotonic() + ECHEC_TTL, e)
+        raise
+
+
+# --- 3. ROUTES ---
+def predire(payload):
+    return _appel("POST", "/predict", json=payload)
+
+
+def predire_lot(payloads):
+    """Plusieurs entreprises en un seul aller-retour (une ligne de résultat par entreprise)"""
+    return _appel("POST", "/predict", json={"entreprises": list(payloads)})["resultats"]
+
+
+def expliquer(payload):
+    return _appel("POST", "/explain", json=payload)
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def importance_globale():
+    return _appel_rapide("GET", "/explain/global")
+
+
+# --- 4. BALAYAGE DE SCÉNARIOS ---
+def grille_scenarios(base, ages=AGES_BALAYAGE, tranches=TRANCHES, formes=FORMES_JURIDIQUES):
+    """Produit cartésien âge x tranche d'effectif x forme juridique autour d'un profil de base"""
+    return [{**base, "age_estime": float(age), "Tranche_effectif_num": int(tranche), "categorie_juridique": forme}
+            for forme in formes for tranche in tranches for age in ages]
+
+
+def balayer(base):
+    """Grille complète scorée en un appel : DataFrame (âge, tranche, forme, Prob_1an/2ans/3ans, statut)"""
+    scenarios = grille_scenarios(base)
+    resultats = predire_lot(scenarios)
+    return pd.DataFrame({
+        "age": [s["age_estime"] for s in scenarios],
+        "tranche": [TRANCHES[s["Tranche_effectif_num"]] for s in scenarios],
+        "forme": [FORMES_JURIDIQUES[s["categorie_juridique"]] for s in scenarios],
+        **{col: [float(r["probabilites_fermeture"][cle].rstrip("%")) for r in resultats]
+           for col, cle in (("Prob_1an", "1_an"), ("Prob_2ans", "2_ans"), ("Prob_3ans", "3_ans"))},
+        "statut": [r["diagnostic"]["profil_global"] for r in resultats],
+    })
+
+
+# --- 5. ANNUAIRE DES ENTREPRISES SCORÉES ---
+@st.cache_data(ttl=600, show_spinner=False)
+def rechercher(q, limite=10):
+    """Entreprises dont la dénomination répond à `q` (saisie partielle, accents et fautes de frappe tolérés),
+    avec leur risque actuel d'après la base scorée et un score de pertinence"""
+    return _appel("GET", "/search", params={"q": q, "limite": limite})["resultats"]
@@ -0,0 +1,232 @@
+import hashlib
+import os
+import re
+import threading
+import time
+from datetime import datetime
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as pads
+import s3fs
+import streamlit as st
+
+from utils.profiling import bloc
+from utils.projection import clean_dep_codes, COL_DEPT
+
+# --- 1. CONFIGURATION ---
+# Intervalle minimal entre deux vérifications d'ETag sur S3 (une requête HEAD/LIST, pas de téléchargement)
+REFRESH_INTERVAL_S = int(os.environ.get("DATA_REFRESH_SECONDS", 300))
+HIVE_SEGMENT = re.compile(r"^([^=/]+)=([^/]+)$")
+
+# Mode paresseux : pas de chargement national, chaque page lit ses colonnes (et son département)
+# directement dans le dataset partitionné par département (dep=XX/).
+LAZY_MODE = os.environ.get("DATA_LAZY_MODE", "false").lower() in ("1", "true", "yes")
+PARTITION_KEY = "dep"
+PARTITIONING = pads.partitioning(pa.schema([(PARTITION_KEY, pa.string())]), flavor="hive")
+
+
+def get_setting(key):
+    try:
+        return os.environ.get(key) or st.secrets.get(key)
+    except Exception:
+        return None
+
+
+def get_s3_filesystem():
+    aws_key = get_setting("AWS_ACCESS_KEY_ID")
+    if not aws_key:
+        return None
+    return s3fs.S3FileSystem(key=aws_key, secret=get_setting("AWS_SECRET_ACCESS_KEY"), anon=False)
+
+
+def get_dataset_path():
+    return f"s3://{get_setting('AWS_BUCKET_NAME')}/{get_setting('AWS_FILE_PATH')}".rstrip("/")
+
+
+# --- 2. ÉTAT PARTAGÉ PAR PROCESSUS ---
+@st.cache_resource(show_spinner=False)
+def get_dataset_store():
+    """
+    Dataset unique partagé par toutes les sessions (plus de copie par session).
+    `snapshot` est remplacé d'un seul bloc : un lecteur voit toujours un état cohérent.
+    """
+    return {
+        "lock": threading.Lock(),
+        "checked_at": 0.0,
+        "ranges": {},
+        "snapshot": {"df": None, "n_rows": 0, "etags": {}, "version": None, "refreshed_at": None},
+    }
+
+
+# --- 3. VERSIONNAGE & CHARGEMENT ---
+def _list_etags(fs, path):
+    """ETag (ou VersionId) de chaque fichier Parquet : un fichier simple ou un dossier partitionné"""
+    fs.invalidate_cache(path)
+    if fs.isdir(path):
+        files = fs.find(path, detail=True)
+        return {p: str(info.get("VersionId") or info.get("ETag", "")).strip('"')
+                for p, info in files.items() if p.endswith(".parquet")}
+    info = fs.info(path)
+    return {path: str(info.get("VersionId") or info.get("ETag", "")).strip('"')}
+
+
+def _version_of(etags):
+    digest = hashlib.sha1("|".join(f"{k}:{v}" for k, v in sorted(etags.items())).encode()).hexdigest()
+    return digest[:10]
+
+
+def _read_partition(fs, file_path, root):
+    """Lit un fichier Parquet et restaure les colonnes de partition encodées dans le chemin (clé=valeur)"""
+    with fs.open(file_path, mode='rb') as f:
+        part = pd.read_parquet(f)
+    relative = file_path[len(root.replace("s3://", "")):].strip("/").split("/")[:-1]
+    for segment in relative:
+        match = HIVE_SEGMENT.match(segment)
+        if match and match.group(1) not in part.columns:
+            part[match.group(1)] = match.group(2)
+    return part
+
+
+def _finalize(df):
+    # Formatage de sécurité pour les dates
+    if "Date_fermeture_finale" in df.columns:
+        df["Date_fermeture_finale"] = pd.to_datetime(df["Date_fermeture_finale"], errors='coerce')
+    return df
+
+
+def refresh_dataset(force=False):
+    """
+    Vérifie la version S3 au plus toutes les REFRESH_INTERVAL_S secondes.
+    Seules les partitions dont l'ETag a changé sont re-téléchargées, puis le dataset est échangé atomiquement.
+    """
+    store = get_dataset_store()
+    if not force and time.time() - store["checked_at"] < REFRESH_INTERVAL_S:
+        return store["snapshot"]
+
+    with store["lock"]:
+        if not force and time.time() - store["checked_at"] < REFRESH_INTERVAL_S:
+            return store["snapshot"]
+        fs = get_s3_filesystem()
+        if fs is None:
+            return store["snapshot"]
+        try:
+            root = get_dataset_path()
+            etags = _list_etags(fs, root)
+            current = store["snapshot"]
+            if LAZY_MODE and etags != current["etags"]:
+                # Seules les métadonnées sont lues (pieds de fichiers Parquet)
+                store["snapshot"] = {
+                    "df": None, "n_rows": _open_dataset(fs, root).count_rows(), "etags": etags,
+                    "version": _version_of(etags), "refreshed_at": datetime.now(),
+                }
+            elif not LAZY_MODE and (etags != current["etags"] or current["df"] is None):
+                # Partitions inchangées : relues depuis le dataset en mémoire (plages de lignes), sans téléchargement
+                frames = []
+                for p, tag in sorted(etags.items()):
+                    if current["df"] is not None and current["etags"].get(p) == tag and p in store["ranges"]:
+                        start, stop = store["ranges"][p]
+                        frames.append(current["df"].iloc[start:stop])
+                    else:
+                        frames.append(_read_partition(fs, p, root))
+                df = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+                bounds = [0]
+                for frame in frames:
+                    bounds.append(bounds[-1] + len(frame))
+                store["ranges"] = {p: (a, b) for p, a, b in zip(sorted(etags), bounds, bounds[1:])}
+                store["snapshot"] = {
+                    "df": _finalize(df), "n_rows": len(df), "etags": etags,
+                    "version": _version_of(etags), "refreshed_at": datetime.now(),
+                }
+            store["checked_at"] = time.time()
+        except Exception as e:
+            # Au premier chargement on réessaie au prochain rerun ; ensuite on garde la version en mémoire
+            if store["snapshot"]["version"] is None:
+                st.error(f"Erreur critique S3 lors du chargement initial : {e}")
+            else:
+                store["checked_at"] = time.time()
+        return store["snapshot"]
+
+
+def sync_session_dataset():
+    """Aligne la session sur la dernière version chargée (appel peu coûteux, à placer en tête de page)"""
+    with bloc("donnees:synchronisation"):
+        snapshot = refresh_dataset()
+    if snapshot["version"] is not None and st.session_state.get('data_version') != snapshot["version"]:
+        st.session_state['df'] = snapshot["df"]
+        st.session_state['total_rows'] = snapshot["n_rows"]
+        st.session_state['data_version'] = snapshot["version"]
+        st.session_state['data_refreshed_at'] = snapshot["refreshed_at"]
+    return snapshot
+
+
+# --- 4. LECTURE CIBLÉE (PREDICATE PUSHDOWN) ---
+def _open_dataset(fs, root):
+    return pads.dataset(root.replace("s3://", ""), filesystem=fs, format="parquet", partitioning=PARTITIONING)
+
+
+@st.cache_resource(show_spinner="Chargement ciblé des données...", max_entries=32)
+def read_scoped(version, columns, dep=None):
+    """
+    Lit uniquement les colonnes demandées, et uniquement la partition du département si `dep` est fourni.
+    Les statistiques des row groups permettent à pyarrow d'ignorer les blocs hors filtre.
+    Le DataFrame est partagé par les sessions sans copie (cache_data le sérialiserait à chaque accès) :
+    il est en lecture seule, comme le dataset complet de la session.
+    """
+    fs = get_s3_filesystem()
+    if fs is None:
+        return None
+    dataset = _open_dataset(fs, get_dataset_path())
+    filtre = (pads.field(PARTITION_KEY) == dep) if dep else None
+    table = dataset.to_table(columns=[c for c in columns if c in dataset.schema.names], filter=filtre)
+    return _finalize(table.to_pandas())
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _dep_index(_df, version):
+    """Codes départements normalisés du dataset en mémoire, calculés une fois par version"""
+    return clean_dep_codes(_df[COL_DEPT])
+
+
+@st.cache_data(show_spinner=False, max_entries=2)
+def _list_partitions(version):
+    fs = get_s3_filesystem()
+    if fs is None:
+        return []
+    names = [p.rstrip("/").split("/")[-1] for p in fs.ls(get_dataset_path().replace("s3://", ""), detail=False)]
+    return sorted(n.split("=", 1)[1] for n in names if n.startswith(f"{PARTITION_KEY}="))
+
+
+def list_departements():
+    """Codes départements disponibles (normalisés : 01, 2A, 971...)"""
+    df = st.session_state.get('df')
+    if df is not None:
+        labels, _ = _dep_index(df, st.session_state.get('data_version'))
+        return sorted(labels.tolist())
+    if LAZY_MODE:
+        return _list_partitions(st.session_state.get('data_version'))
+    return []
+
+
+def get_page_data(columns, dep=None):
+    """
+    Données utiles à une page : le dataset complet en mémoire (filtré sur `dep` le cas échéant),
+    ou, en mode paresseux, une lecture limitée aux colonnes et à la partition du département.
+    Le DataFrame renvoyé est partagé (lecture seule : le copier avant de le modifier).
+    Renvoie None si aucune donnée n'est disponible.
+    """
+    df = st.session_state.get('df')
+    if df is not None:
+        if dep is None:
+            return df
+        labels, codes = _dep_index(df, st.session_state.get('data_version'))
+        return df[codes == labels.get_loc(dep)] if dep in labels else df.iloc[0:0]
+    if LAZY_MODE and st.session_state.get('data_version'):
+        with bloc("donnees:lecture_ciblee"):
+            return read_scoped(st.session_state['data_version'], tuple(columns), dep)
+    return None
+
+
+def data_available():
+    """Vrai si la session dispose du dataset complet, ou d'une version lisible en mode paresseux"""
+    return st.session_state.get('df') is not None or (LAZY_MODE and bool(st.session_state.get('data_version')))
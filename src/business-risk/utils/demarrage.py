@@ -0,0 +1,109 @@
+"""
+Initialisation de la page d'accueil, partagée par processus.
+
+- statuts des Spaces (API, MLflow) : un poller d'arrière-plan les interroge en parallèle toutes les
+  SPACE_STATUS_REFRESH_S secondes ; les sessions lisent le dernier état connu, sans appel réseau ;
+- dataset et photo : chargés en parallèle dans un pool de threads dès l'ouverture de la session,
+  la page s'affiche pendant le chargement et n'attend les résultats qu'en fin de rendu.
+"""
+import io
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+import streamlit as st
+from PIL import Image
+
+from utils.data import get_s3_filesystem, get_setting, refresh_dataset
+
+# --- 1. CONFIGURATION ---
+SPACE_STATUS_REFRESH_S = int(os.environ.get("SPACE_STATUS_REFRESH_SECONDS", 60))
+SPACE_TIMEOUT_S = 3
+SPACES = {"API": "SPACE_API_ID", "MLflow": "SPACE_MLFLOW_ID"}
+STATUT_INCONNU = "VERIFICATION"
+
+
+# --- 2. SONDES & CHARGEMENTS ---
+def check_space(space_id, token):
+    if not space_id or not token:
+        return "OFFLINE"
+    try:
+        res = requests.get(f"https://huggingface.co/api/spaces/{space_id}",
+                           headers={"Authorization": f"Bearer {token}"}, timeout=SPACE_TIMEOUT_S)
+        return res.json().get("runtime", {}).get("stage", "UNKNOWN")
+    except Exception:
+        return "OFFLINE"
+
+
+def load_s3_image(file_key_name):
+    fs = get_s3_filesystem()
+    file_path = get_setting(file_key_name)
+    if fs is None or not file_path:
+        return None
+    try:
+        with fs.open(f"s3://{get_setting('AWS_BUCKET_NAME')}/{file_path}", mode='rb') as f:
+            return Image.open(io.BytesIO(f.read()))
+    except Exception:
+        return None
+
+
+@st.cache_resource(show_spinner=False)
+def _pool():
+    return ThreadPoolExecutor(max_workers=4, thread_name_prefix="accueil")
+
+
+# --- 3. STATUTS DES SPACES (POLLER PAR PROCESSUS) ---
+def _sonder(store, pool):
+    token = get_setting("HF_TOKEN")
+    futures = {label: pool.submit(check_space, get_setting(cle), token) for label, cle in SPACES.items()}
+    # Remplacement d'un seul bloc : un lecteur voit toujours un état cohérent
+    store["statuts"] = {label: f.result() for label, f in futures.items()}
+    store["checked_at"] = time.time()
+    store["pret"].set()
+
+
+def _boucle(store, pool):
+    while True:
+        try:
+            _sonder(store, pool)
+        except Exception as e:
+            print(f"⚠️ Statut des Spaces indisponible : {e}")
+        time.sleep(SPACE_STATUS_REFRESH_S)
+
+
+@st.cache_resource(show_spinner=False)
+def get_space_poller():
+    store = {"statuts": {label: STATUT_INCONNU for label in SPACES}, "checked_at": None, "pret": threading.Event()}
+    threading.Thread(target=_boucle, args=(store, _pool()), name="statut-spaces", daemon=True).start()
+    return store
+
+
+def statuts_spaces(attente_s=0.0):
+    """Dernier état connu des Spaces ; attend au plus `attente_s` la toute première sonde du processus"""
+    store = get_space_poller()
+    store["pret"].wait(attente_s)
+    return store["statuts"]
+
+
+# --- 4. CHARGEMENTS EN ARRIÈRE-PLAN ---
+@st.cache_resource(show_spinner=False)
+def _photos():
+    return {"lock": threading.Lock(), "futures": {}}
+
+
+def photo(file_key_name):
+    """Future de l'image, partagée par les sessions ; un échec (None) est retenté à la session suivante"""
+    store = _photos()
+    with store["lock"]:
+        future = store["futures"].get(file_key_name)
+        if future is None or (future.done() and future.result() is None):
+            future = store["futures"][file_key_name] = _pool().submit(load_s3_image, file_key_name)
+        return future
+
+
+def lancer_initialisation():
+    """Démarre en parallèle le poller des Spaces, le chargement du dataset et celui de la photo"""
+    get_space_poller()
+    return {"donnees": _pool().submit(refresh_dataset), "photo": photo("AWS_MY_PHOTO_PATH")}
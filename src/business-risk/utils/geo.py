@@ -0,0 +1,201 @@
+import json
+import math
+from pathlib import Path
+
+import plotly.graph_objects as go
+import requests
+import streamlit as st
+
+# --- 1. CONFIGURATION ---
+APP_DIR = Path(__file__).resolve().parent.parent
+
+# Le fond de carte est servi en statique par Streamlit (server.enableStaticServing) :
+# le navigateur le télécharge une seule fois et les figures ne transportent plus que l'URL.
+# L'asset se génère avec `python -m utils.geo [source]` (fichier local ou, par défaut, la source france-geojson) ;
+# tant qu'il n'est pas versionné dans static/, le build puis l'exécution le téléchargent en secours.
+GEOJSON_LOCAL_PATH = APP_DIR / "static" / "departements.geojson"
+GEOJSON_STATIC_URL = "app/static/departements.geojson"
+GEOJSON_SOURCE_URL = "https://raw.githubusercontent.com/gregoiredavid/france-geojson/master/departements-version-simplifiee.geojson"
+FEATURE_ID_KEY = "properties.code"
+
+# Tolérance de simplification en degrés (~500 m) et précision des coordonnées (~10 m)
+SIMPLIFY_TOLERANCE = 0.005
+COORD_PRECISION = 4
+
+
+# --- 2. SIMPLIFICATION TOPOLOGIQUE ---
+def _douglas_peucker(points, tolerance):
+    """Douglas-Peucker itératif : conserve les extrémités et les sommets significatifs"""
+    if len(points) < 3:
+        return points
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        i, j = stack.pop()
+        (x1, y1), (x2, y2) = points[i], points[j]
+        dx, dy = x2 - x1, y2 - y1
+        norm = math.hypot(dx, dy)
+        d_max, idx = 0.0, None
+        for k in range(i + 1, j):
+            px, py = points[k]
+            d = abs(dy * (px - x1) - dx * (py - y1)) / norm if norm else math.hypot(px - x1, py - y1)
+            if d > d_max:
+                d_max, idx = d, k
+        if idx is not None and d_max > tolerance:
+            keep[idx] = True
+            stack.extend([(i, idx), (idx, j)])
+    return [p for p, k in zip(points, keep) if k]
+
+
+def _iter_rings(geometry):
+    if geometry["type"] == "Polygon":
+        yield from geometry["coordinates"]
+    elif geometry["type"] == "MultiPolygon":
+        for polygon in geometry["coordinates"]:
+            yield from polygon
+
+
+def simplify_geojson(geojson, tolerance=SIMPLIFY_TOLERANCE, precision=COORD_PRECISION):
+    """
+    Simplifie les contours en préservant la topologie : une frontière commune à deux
+    départements est découpée aux mêmes sommets pivots et simplifiée dans le même sens,
+    ce qui évite les trous et chevauchements entre voisins.
+    """
+    features = [
+        {
+            "type": "Feature",
+            "properties": {k: f["properties"].get(k) for k in ("code", "nom")},
+            "geometry": f["geometry"],
+        }
+        for f in geojson["features"]
+    ]
+
+    # 1. Quantification des coordonnées et suppression des doublons consécutifs
+    def quantize(ring):
+        out = []
+        for x, y in ring:
+            p = (round(x, precision), round(y, precision))
+            if not out or out[-1] != p:
+                out.append(p)
+        return out
+
+    rings_by_feature = [[quantize(r) for r in _iter_rings(f["geometry"])] for f in features]
+
+    # 2. Propriétaires de chaque sommet (départements qui le partagent)
+    owners = {}
+    for i, rings in enumerate(rings_by_feature):
+        for ring in rings:
+            for p in ring:
+                owners.setdefault(p, set()).add(i)
+
+    # 3. Simplification arc par arc entre sommets pivots
+    def simplify_ring(ring):
+        closed = ring[:-1] if ring[0] == ring[-1] else ring
+        n = len(closed)
+        if n < 4:
+            return ring
+        pivots = [
+            k for k in range(n)
+            if owners[closed[k]] != owners[closed[k - 1]] or owners[closed[k]] != owners[closed[(k + 1) % n]]
+        ]
+        if not pivots:
+            # Île ou contour sans voisin : on fixe deux sommets opposés
+            pivots = [0, n // 2]
+        out = []
+        for a, b in zip(pivots, pivots[1:] + [pivots[0] + n]):
+            arc = [closed[k % n] for k in range(a, b + 1)]
+            # Sens canonique pour que les deux voisins obtiennent exactement le même arc
+            reverse = arc[0] > arc[-1]
+            arc = _douglas_peucker(arc[::-1] if reverse else arc, tolerance)
+            out.extend((arc[::-1] if reverse else arc)[:-1])
+        if len(out) < 3:
+            return ring
+        return [list(p) for p in out] + [list(out[0])]
+
+    for feature, rings in zip(features, rings_by_feature):
+        simplified = iter([simplify_ring(r) for r in rings])
+        geom = feature["geometry"]
+        if geom["type"] == "Polygon":
+            coords = [next(simplified) for _ in geom["coordinates"]]
+        else:
+            coords = [[next(simplified) for _ in polygon] for polygon in geom["coordinates"]]
+        feature["geometry"] = {"type": geom["type"], "coordinates": coords}
+
+    return {"type": "FeatureCollection", "features": features}
+
+
+def _lire_source(source):
+    """GeoJSON source : fichier local ou URL"""
+    if str(source).startswith(("http://", "https://")):
+        return requests.get(source, timeout=30).json()
+    return json.loads(Path(source).read_text(encoding="utf-8"))
+
+
+def build_geojson_asset(source=GEOJSON_SOURCE_URL, path=GEOJSON_LOCAL_PATH):
+    """Simplifie un GeoJSON source (fichier local ou URL) et l'écrit en JSON compact"""
+    raw = _lire_source(source)
+    simplified = simplify_geojson(raw)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(simplified, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+    return simplified
+
+
+# --- 3. CHARGEMENT UNIQUE (PARTAGÉ PAR TOUTES LES PAGES) ---
+@st.cache_resource(show_spinner=False)
+def get_departements_geojson():
+    """Fond de carte des départements : asset embarqué, sinon téléchargement de secours (None si tout échoue)"""
+    try:
+        if GEOJSON_LOCAL_PATH.exists():
+            return json.loads(GEOJSON_LOCAL_PATH.read_text(encoding="utf-8"))
+        print(f"⚠️ {GEOJSON_LOCAL_PATH} absent : téléchargement de secours depuis {GEOJSON_SOURCE_URL}")
+        return simplify_geojson(_lire_source(GEOJSON_SOURCE_URL))
+    except Exception as e:
+        print(f"⚠️ Fond de carte indisponible : {e}")
+        return None
+
+
+def get_geojson_source():
+    """URL statique si l'asset est embarqué (aucune géométrie sérialisée), sinon le dictionnaire"""
+    if GEOJSON_LOCAL_PATH.exists() and st.get_option("server.enableStaticServing"):
+        return GEOJSON_STATIC_URL
+    return get_departements_geojson()
+
+
+# --- 4. GABARITS DE CHOROPLÈTHES ---
+@st.cache_resource(show_spinner=False)
+def _choropleth_template(height):
+    """Figure de base (géométrie + projection) construite une seule fois par processus"""
+    source = get_geojson_source()
+    if source is None:
+        return None
+    fig = go.Figure(go.Choropleth(geojson=source, featureidkey=FEATURE_ID_KEY, marker_line_width=0.5))
+    fig.update_geos(scope="europe", fitbounds="locations", visible=False)
+    fig.update_layout(height=height, margin={"r": 0, "t": 0, "l": 0, "b": 0})
+    return fig
+
+
+def choropleth_departements(locations, z, colorscale, zmin=None, zmax=None, customdata=None,
+                            hovertemplate=None, colorbar=None, height=600):
+    """Clone le gabarit et n'y injecte que les valeurs (codes, couleurs, survol)"""
+    template = _choropleth_template(height)
+    if template is None:
+        return None
+    fig = go.Figure(template)
+    fig.update_traces(
+        locations=list(locations), z=list(z), colorscale=colorscale,
+        zmin=zmin, zmax=zmax, zauto=zmin is None and zmax is None,
+        customdata=customdata, hovertemplate=hovertemplate, colorbar=colorbar or {},
+    )
+    return fig
+
+
+if __name__ == "__main__":
+    # Génération de l'asset : python -m utils.geo [departements-version-simplifiee.geojson]
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Simplifie le GeoJSON des départements vers static/")
+    parser.add_argument("source", nargs="?", default=GEOJSON_SOURCE_URL,
+                        help="GeoJSON source, fichier local ou URL (défaut : france-geojson)")
+    data = build_geojson_asset(parser.parse_args().source)
+    print(f"✅ {len(data['features'])} départements écrits dans {GEOJSON_LOCAL_PATH}")
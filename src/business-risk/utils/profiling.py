@@ -0,0 +1,199 @@
+"""
+Profilage du rendu des pages (opt-in : PROFILING_ENABLED=1).
+
+- start_page(__file__) en tête de page, end_page() en fin de page ;
+- etape("figure:...") attribue le temps écoulé depuis l'étape précédente au bloc nommé ;
+- bloc("...") chronomètre un bloc précis (synchronisation S3, agrégats, émission des graphiques),
+  son temps est retiré de l'étape en cours pour ne pas être compté deux fois (blocs les plus externes
+  seulement : un bloc imbriqué est déjà inclus dans celui qui le contient) ;
+- jalon("...") note l'instant (ms depuis le début du rerun) où un point du rendu est atteint,
+  par exemple le premier affichage avant la fin des chargements.
+
+Chaque rerun ajoute une ligne JSON au journal ; un récapitulatif p50/p95 s'obtient avec :
+    python -m utils.profiling logs/render_profile.jsonl --page 02_Les_secteurs
+"""
+import argparse
+import hmac
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+import streamlit as st
+
+# --- 1. CONFIGURATION ---
+APP_DIR = Path(__file__).resolve().parent.parent
+PROFILING_ENABLED = os.environ.get("PROFILING_ENABLED", "false").lower() in ("1", "true", "yes")
+PROFILING_LOG = Path(os.environ.get("PROFILING_LOG", APP_DIR / "logs" / "render_profile.jsonl"))
+# Overlay réservé aux administrateurs (?admin=<jeton>) ; sans jeton configuré il n'est affiché à personne,
+# le journal reste écrit (en local : PROFILING_ADMIN_TOKEN=dev puis ?admin=dev)
+ADMIN_TOKEN = os.environ.get("PROFILING_ADMIN_TOKEN")
+
+RERUN_KEY = "_profil_rerun"
+_LOG_LOCK = threading.Lock()
+
+
+# --- 2. CHRONOMÉTRAGE ---
+def start_page(page_file):
+    if not PROFILING_ENABLED:
+        return
+    now = time.perf_counter()
+    st.session_state[RERUN_KEY] = {
+        "page": Path(page_file).stem, "debut": now, "derniere_etape": now, "en_blocs": 0.0, "profondeur": 0,
+        "blocs": {}, "jalons": {},
+    }
+
+
+def _ajouter(rerun, nom, ms):
+    rerun["blocs"][nom] = rerun["blocs"].get(nom, 0.0) + ms
+
+
+@contextmanager
+def _chrono(nom):
+    rerun = st.session_state.get(RERUN_KEY)
+    if rerun is not None:
+        rerun["profondeur"] += 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if rerun is not None:
+            ms = (time.perf_counter() - start) * 1000
+            _ajouter(rerun, nom, ms)
+            rerun["profondeur"] -= 1
+            if not rerun["profondeur"]:
+                rerun["en_blocs"] += ms
+
+
+def bloc(nom):
+    """Chronomètre un bloc nommé (aucun coût si le profilage est désactivé)"""
+    return _chrono(nom) if PROFILING_ENABLED else nullcontext()
+
+
+def etape(nom):
+    """Attribue à `nom` le temps écoulé depuis l'étape précédente, hors blocs déjà chronométrés"""
+    rerun = st.session_state.get(RERUN_KEY) if PROFILING_ENABLED else None
+    if rerun is None:
+        return
+    now = time.perf_counter()
+    _ajouter(rerun, nom, max((now - rerun["derniere_etape"]) * 1000 - rerun["en_blocs"], 0.0))
+    rerun["derniere_etape"], rerun["en_blocs"] = now, 0.0
+
+
+def jalon(nom):
+    """Instant, depuis le début du rerun, où le rendu atteint `nom` (premier passage seulement)"""
+    rerun = st.session_state.get(RERUN_KEY) if PROFILING_ENABLED else None
+    if rerun is not None:
+        rerun["jalons"].setdefault(nom, round((time.perf_counter() - rerun["debut"]) * 1000, 2))
+
+
+def emettre_graphique(fig, nom, **kwargs):
+    """st.plotly_chart chronométré : sérialisation Plotly et envoi au navigateur"""
+    with bloc(f"emission:{nom}"):
+        return st.plotly_chart(fig, **kwargs)
+
+
+# --- 3. JOURNAL & OVERLAY ---
+def _append_log(record):
+    with _LOG_LOCK:
+        PROFILING_LOG.parent.mkdir(parents=True, exist_ok=True)
+        with open(PROFILING_LOG, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def _is_admin():
+    if st.session_state.get("_profil_admin"):
+        return True
+    jeton = st.query_params.get("admin")
+    ok = bool(ADMIN_TOKEN) and jeton is not None and hmac.compare_digest(str(jeton), ADMIN_TOKEN)
+    if ok:
+        st.session_state["_profil_admin"] = True
+    return ok
+
+
+def _render_overlay(record):
+    with st.sidebar.expander(f"⏱️ Profil de rendu : {record['total_ms']:.0f} ms", expanded=False):
+        blocs = pd.DataFrame(
+            sorted(record["blocs"].items(), key=lambda kv: kv[1], reverse=True), columns=["Bloc", "ms"]
+        )
+        blocs["%"] = (blocs["ms"] / max(record["total_ms"], 1e-9) * 100).round(1)
+        st.dataframe(blocs.round({"ms": 1}), hide_index=True, use_container_width=True)
+        if record["jalons"]:
+            st.caption(" · ".join(f"{nom} à {ms:.0f} ms" for nom, ms in record["jalons"].items()))
+        st.caption(f"Session {record['session']} · données v{record['data_version']}")
+
+
+def end_page():
+    """Clôture le rerun : dernière étape, ligne de journal et overlay administrateur"""
+    if not PROFILING_ENABLED:
+        return
+    rerun = st.session_state.get(RERUN_KEY)
+    if rerun is None:
+        return
+    etape("autres")
+    del st.session_state[RERUN_KEY]
+    record = {
+        "ts": datetime.now().isoformat(timespec="seconds"),
+        "page": rerun["page"],
+        "session": st.session_state.setdefault("_profil_session", uuid.uuid4().hex[:8]),
+        "data_version": st.session_state.get("data_version"),
+        "total_ms": round((time.perf_counter() - rerun["debut"]) * 1000, 2),
+        "blocs": {nom: round(ms, 2) for nom, ms in rerun["blocs"].items()},
+        "jalons": rerun["jalons"],
+    }
+    try:
+        _append_log(record)
+    except OSError:
+        pass
+    if _is_admin():
+        _render_overlay(record)
+
+
+# --- 4. RAPPORT (CLI) ---
+def load_log(path):
+    rows = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            rows.append({"ts": record["ts"], "page": record["page"], "bloc": "TOTAL", "ms": record["total_ms"]})
+            rows.extend({"ts": record["ts"], "page": record["page"], "bloc": nom, "ms": ms}
+                        for nom, ms in record["blocs"].items())
+            rows.extend({"ts": record["ts"], "page": record["page"], "bloc": f"jalon:{nom}", "ms": ms}
+                        for nom, ms in record.get("jalons", {}).items())
+    return pd.DataFrame(rows, columns=["ts", "page", "bloc", "ms"])
+
+
+def report(df):
+    """p50 / p95 / max par page et par bloc (un bloc absent d'un rerun n'est pas compté comme 0)"""
+    stats = df.groupby(["page", "bloc"])["ms"].agg(
+        n="count", p50="median", p95=lambda s: s.quantile(0.95), max="max",
+    ).reset_index()
+    return stats.sort_values(["page", "p95"], ascending=[True, False]).round(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Récapitulatif p50/p95 du journal de rendu")
+    parser.add_argument("log", nargs="?", default=str(PROFILING_LOG))
+    parser.add_argument("--page", help="Filtre sur une page (ex. 02_Les_secteurs)")
+    parser.add_argument("--since", help="Date ISO minimale (ex. 2026-10-01)")
+    args = parser.parse_args()
+
+    df = load_log(args.log)
+    if args.page:
+        df = df[df["page"] == args.page]
+    if args.since:
+        df = df[df["ts"] >= args.since]
+    if df.empty:
+        print("Aucune mesure dans le journal pour ces critères.")
+    else:
+        with pd.option_context("display.max_rows", None, "display.width", 160):
+            for page, stats in report(df).groupby("page", sort=False):
+                print(f"\n📄 {page}")
+                print(stats.drop(columns="page").to_string(index=False))
@@ -0,0 +1,142 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+# --- 1. CONFIGURATION ---
+HORIZONS = {1: "Prob_1an", 2: "Prob_2ans", 3: "Prob_3ans"}
+COL_DEPT = "Code du département de l'établissement"
+COL_SECTEUR = "libelle_section_ape"
+COL_FORME = "Catégorie juridique de l'unité légale"
+FORMES = {5499: "SARL", 5710: "SAS"}
+
+# Bandes de statut du moteur (map_statut_expert, sur Prob_2ans) : bornes hautes incluses
+STATUS_CUTOFFS = [5.0, 10.0, 20.0]
+STATUS_LABELS = ['🟢 SAIN', '🟡 OBSERVATION', '🟠 VIGILANCE', '🔴 CRITIQUE']
+
+# Histogrammes en pas de 0,1 point de probabilité : tout seuil multiple de 0,1 est exact
+BIN_STEP = 0.1
+N_BINS = int(100 / BIN_STEP)
+
+
+# --- 2. OUTILS VECTORISÉS ---
+def clean_dep_codes(series):
+    """Normalise les codes départements sur les valeurs uniques uniquement (pas de regex sur 5M lignes)"""
+    codes, uniques = pd.factorize(series)
+    cleaned = pd.Index(uniques).astype(str).str.strip().str.replace(r'\.0$', '', regex=True).str.zfill(2)
+    # Fusion des variantes d'écriture d'un même département ("1", "01", 1.0)
+    merged_codes, labels = pd.factorize(cleaned)
+    if len(labels) == 0:
+        return pd.Index(labels), codes
+    return pd.Index(labels), np.where(codes >= 0, merged_codes[np.maximum(codes, 0)], -1)
+
+
+def prob_to_bins(values):
+    """Indice de bin fermé à droite : P <= k * BIN_STEP  <=>  bin <= k (NaN = non fragile)"""
+    v = np.nan_to_num(np.asarray(values, dtype="float64"), nan=0.0)
+    return np.clip(np.ceil(v / BIN_STEP), 0, N_BINS).astype(np.int64)
+
+
+def threshold_index(seuil):
+    return int(np.clip(round(seuil / BIN_STEP), 0, N_BINS))
+
+
+def cumulative_histograms(group_codes, n_groups, values):
+    """Histogramme cumulé par groupe : cum[g, k] = nombre de lignes du groupe g avec P <= k * BIN_STEP"""
+    mask = group_codes >= 0
+    flat = group_codes[mask] * (N_BINS + 1) + prob_to_bins(values)[mask]
+    counts = np.bincount(flat, minlength=n_groups * (N_BINS + 1)).reshape(n_groups, N_BINS + 1)
+    return counts.cumsum(axis=1)
+
+
+def clean_forme_codes(series):
+    """Libellé de forme juridique (SARL / SAS / Autre) calculé sur les valeurs uniques"""
+    codes, uniques = pd.factorize(series)
+    labels = pd.to_numeric(pd.Series(uniques), errors='coerce').map(FORMES).fillna("Autre")
+    merged_codes, merged_labels = pd.factorize(labels)
+    if len(merged_labels) == 0:
+        return pd.Index(merged_labels), codes
+    return pd.Index(merged_labels), np.where(codes >= 0, merged_codes[np.maximum(codes, 0)], -1)
+
+
+# --- 3. PRÉCALCUL UNIQUE PAR PROCESSUS ---
+@st.cache_data(show_spinner="Précalcul des distributions de risque...", max_entries=2)
+def get_projection_cube(_df, cache_key):
+    """
+    Agrège une fois pour toutes les probabilités des sociétés actives (hors DOM) en histogrammes
+    cumulés par département, secteur et forme juridique, pour les trois horizons.
+    Changer d'horizon, de seuil ou de bandes de statut devient une lecture en O(bins).
+    """
+    actives = (_df["Statut_Expert"] != '⚫ FERMÉ').to_numpy()
+    dep_labels, dep_codes = clean_dep_codes(_df[COL_DEPT])
+    # Exclusion des DOM-TOM pour focaliser l'analyse cartographique métropolitaine
+    hors_dom = ~dep_labels.str.startswith('97')
+    keep = actives & (dep_codes >= 0) & hors_dom[np.maximum(dep_codes, 0)]
+
+    dep_keep = np.flatnonzero(hors_dom)
+    dep_remap = np.full(len(dep_labels), -1)
+    dep_remap[dep_keep] = np.arange(len(dep_keep))
+    dep_codes = np.where(keep, dep_remap[np.maximum(dep_codes, 0)], -1)
+
+    sect_codes, sect_labels = pd.factorize(_df[COL_SECTEUR])
+    forme_labels, forme_codes = clean_forme_codes(_df[COL_FORME])
+
+    levels = {
+        "france": (["France"], np.where(keep, 0, -1)),
+        "dep": (dep_labels[dep_keep].tolist(), dep_codes),
+        "secteur": (pd.Index(sect_labels).astype(str).tolist(), np.where(keep, sect_codes, -1)),
+        "forme": (forme_labels.tolist(), np.where(keep, forme_codes, -1)),
+    }
+
+    probs = {h: _df[col].to_numpy(dtype="float64") for h, col in HORIZONS.items()}
+    cube = {}
+    for level, (labels, codes) in levels.items():
+        n = len(labels)
+        cube[level] = {"labels": labels, "total": np.bincount(codes[codes >= 0], minlength=n)}
+        for h, ph in probs.items():
+            cube[level][f"cum_{h}"] = cumulative_histograms(codes, n, ph)
+            if h > 1:
+                # Basculement = sain en N+1 et fragile en N+h : P1 <= s < Ph
+                # soit #(P1 <= s) - #(max(P1, Ph) <= s), exact sans hypothèse de monotonie
+                cube[level][f"cum_max_{h}"] = cumulative_histograms(codes, n, np.fmax(probs[1], ph))
+    return cube
+
+
+def fragility_table(cube, level, h_val, seuil):
+    """Taux de fragilité et volume métier (stock à N+1, flux de basculement au-delà) par groupe"""
+    data = cube[level]
+    k = threshold_index(seuil)
+    total = data["total"]
+    fragiles = total - data[f"cum_{h_val}"][:, k]
+    if h_val == 1:
+        val_metier = fragiles
+    else:
+        val_metier = data["cum_1"][:, k] - data[f"cum_max_{h_val}"][:, k]
+    out = pd.DataFrame({"groupe": data["labels"], "total": total, "fragiles": fragiles, "val_metier": val_metier})
+    out = out[out["total"] > 0].reset_index(drop=True)
+    out["Taux_Fragilite"] = out["fragiles"] / out["total"] * 100
+    return out
+
+
+def band_table(cube, level, h_val, cutoffs=STATUS_CUTOFFS, labels=STATUS_LABELS):
+    """Répartition par bandes de statut pour un jeu de bornes quelconque (bornes hautes incluses)"""
+    data = cube[level]
+    cum = data[f"cum_{h_val}"]
+    ks = [threshold_index(c) for c in sorted(cutoffs)]
+    bounds = np.column_stack([np.zeros(len(cum), dtype=cum.dtype)] + [cum[:, k] for k in ks] + [data["total"]])
+    counts = np.diff(bounds, axis=1)
+    out = pd.DataFrame(counts, columns=list(labels))
+    out.insert(0, "groupe", data["labels"])
+    out.insert(1, "total", data["total"])
+    return out[out["total"] > 0].reset_index(drop=True)
+
+
+def threshold_sweep(cube, level, h_val, group=None):
+    """Part de sociétés fragiles (P > seuil) pour tous les seuils de la grille, en une lecture"""
+    data = cube[level]
+    if group is None:
+        total, cum = data["total"].sum(), data[f"cum_{h_val}"].sum(axis=0)
+    else:
+        idx = data["labels"].index(group)
+        total, cum = data["total"][idx], data[f"cum_{h_val}"][idx]
+    part = (total - cum) / max(int(total), 1) * 100
+    return pd.DataFrame({"seuil": np.arange(N_BINS + 1) * BIN_STEP, "part_fragiles": part})
@@ -0,0 +1,378 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import streamlit as st
+
+try:
+    import duckdb
+except ImportError:  # moteur optionnel : repli sur le chemin pandas
+    duckdb = None
+
+from utils.data import (
+    LAZY_MODE, PARTITION_KEY, _open_dataset, get_dataset_path, get_page_data, get_s3_filesystem,
+)
+from utils.profiling import bloc
+from utils.projection import clean_dep_codes, COL_DEPT, COL_FORME, COL_SECTEUR, FORMES
+
+# --- 1. CONFIGURATION ---
+# "duckdb" (défaut) : agrégats SQL multi-threads exécutés sur une vue Arrow du dataset partagé (construite
+# une fois par version) ou, en mode paresseux, sur le dataset Parquet partitionné (lecture en flux,
+# colonnes et partitions utiles uniquement).
+# "pandas" : chemin historique, conservé comme référence et pour les benchmarks.
+QUERY_ENGINE = os.environ.get("DATA_QUERY_ENGINE", "duckdb").lower()
+if duckdb is None:
+    QUERY_ENGINE = "pandas"
+
+COL_DATE = "Date_fermeture_finale"
+COL_TRANCHE = "Tranche_effectif_num"
+AGE_MAX_RISQUE = 36
+SEUIL_EXPOSITION = 30
+
+
+def _q(col):
+    return '"' + col.replace('"', '""') + '"'
+
+
+DATE_SQL = f"TRY_CAST({_q(COL_DATE)} AS TIMESTAMP)"
+AGE, FERMETURE, DEP = _q("age_estime"), _q("fermeture"), _q(PARTITION_KEY)
+
+
+# --- 2. REQUÊTES SQL (table `perimetre` = périmètre géographique déjà filtré) ---
+SQL = {
+    "synthese": f"""
+        SELECT count(*) AS n_total,
+               count(*) FILTER (WHERE {FERMETURE} = 1) AS n_fermes,
+               avg({FERMETURE}) AS taux_fermeture,
+               avg({AGE}) FILTER (WHERE {FERMETURE} = 1) AS age_moyen_fermes,
+               min(year({DATE_SQL})) AS annee_min,
+               max(year({DATE_SQL})) AS annee_max,
+               min(year({DATE_SQL})) FILTER (WHERE {FERMETURE} = 1) AS annee_min_fermes,
+               max(year({DATE_SQL})) FILTER (WHERE {FERMETURE} = 1) AS annee_max_fermes
+        FROM perimetre
+    """,
+    "ages": f"""
+        SELECT CAST(round_even({AGE}, 0) AS INTEGER) AS age_ans, CAST({FERMETURE} AS INTEGER) AS fermeture,
+               count(*) AS nb
+        FROM perimetre
+        WHERE {AGE} IS NOT NULL AND {FERMETURE} IN (0, 1)
+        GROUP BY ALL ORDER BY ALL
+    """,
+    "fermetures_par_mois": f"""
+        SELECT year({DATE_SQL}) AS annee, month({DATE_SQL}) AS mois, count(*) AS nb
+        FROM perimetre
+        WHERE {FERMETURE} = 1 AND year({DATE_SQL}) >= $annee_min
+        GROUP BY ALL ORDER BY ALL
+    """,
+    "annees": f"""
+        SELECT DISTINCT year({DATE_SQL}) AS annee FROM perimetre WHERE {DATE_SQL} IS NOT NULL ORDER BY 1
+    """,
+    "top_ape_fermes": f"""
+        SELECT CAST(code_ape AS VARCHAR) AS code_ape, any_value(CAST({_q(COL_SECTEUR)} AS VARCHAR)) AS {_q(COL_SECTEUR)},
+               count(*) AS nb_fermetures
+        FROM perimetre
+        WHERE {FERMETURE} = 1 AND code_ape IS NOT NULL
+        GROUP BY 1 ORDER BY nb_fermetures DESC, code_ape LIMIT $limite
+    """,
+    "top_secteurs_fermes": f"""
+        SELECT CAST({_q(COL_SECTEUR)} AS VARCHAR) AS secteur, count(*) AS nb
+        FROM perimetre
+        WHERE {FERMETURE} = 1 AND {_q(COL_SECTEUR)} IS NOT NULL
+        GROUP BY 1 ORDER BY nb DESC, secteur LIMIT $limite
+    """,
+    # Risque annuel par âge entier : décès à l'âge exact / sociétés ayant atteint cet âge.
+    # Les âges sont regroupés par partie entière (age >= a <=> floor(age) >= a) puis cumulés depuis le haut.
+    "risque_secteur_age": f"""
+        WITH agg AS (
+            SELECT CAST({_q(COL_SECTEUR)} AS VARCHAR) AS secteur,
+                   least(floor({AGE}), {AGE_MAX_RISQUE}) AS k,
+                   count(*) AS n,
+                   count(*) FILTER (WHERE {FERMETURE} = 1 AND {AGE} = floor({AGE})) AS morts
+            FROM perimetre
+            WHERE {AGE} >= 0 AND list_contains($secteurs, CAST({_q(COL_SECTEUR)} AS VARCHAR))
+            GROUP BY ALL
+        ),
+        courbe AS (
+            SELECT secteur, a.range AS age_estime,
+                   coalesce(sum(morts) FILTER (WHERE k = a.range), 0) AS morts,
+                   coalesce(sum(n) FILTER (WHERE k >= a.range), 0) AS exposes
+            FROM agg CROSS JOIN range({AGE_MAX_RISQUE}) a
+            GROUP BY ALL
+        )
+        SELECT secteur AS "Secteur", age_estime, morts / exposes * 100 AS proba
+        FROM courbe
+        WHERE exposes > {SEUIL_EXPOSITION}
+        ORDER BY list_position($secteurs, secteur), age_estime
+    """,
+    "heatmap_secteur_mois": f"""
+        SELECT CAST({_q(COL_SECTEUR)} AS VARCHAR) AS secteur, month({DATE_SQL}) AS mois, count(*) AS nb
+        FROM perimetre
+        WHERE {FERMETURE} = 1 AND year({DATE_SQL}) = $annee
+              AND list_contains($secteurs, CAST({_q(COL_SECTEUR)} AS VARCHAR))
+        GROUP BY ALL ORDER BY ALL
+    """,
+    "formes_par_statut": f"""
+        SELECT CAST(TRY_CAST({_q(COL_FORME)} AS DOUBLE) AS INTEGER) AS forme, CAST({FERMETURE} AS INTEGER) AS fermeture,
+               count(*) AS nb
+        FROM perimetre
+        WHERE TRY_CAST({_q(COL_FORME)} AS DOUBLE) IN ({", ".join(str(c) for c in FORMES)})
+        GROUP BY ALL ORDER BY ALL
+    """,
+    "effectifs_par_statut": f"""
+        SELECT {_q(COL_TRANCHE)} AS tranche, CAST({FERMETURE} AS INTEGER) AS fermeture, count(*) AS nb
+        FROM perimetre
+        WHERE {_q(COL_TRANCHE)} IS NOT NULL
+        GROUP BY ALL ORDER BY ALL
+    """,
+    "indicateurs_departement": f"""
+        SELECT {DEP} AS dept_code,
+               avg({FERMETURE}) AS taux_brut,
+               count(*) FILTER (WHERE {FERMETURE} = 0) AS n_actifs,
+               count({AGE}) FILTER (WHERE {FERMETURE} = 0) AS total,
+               count(*) FILTER (WHERE {FERMETURE} = 0 AND {AGE} > 10) AS plus_de_10ans,
+               avg({AGE}) FILTER (WHERE {FERMETURE} = 1) AS age_moyen_fermes
+        FROM perimetre
+        WHERE {DEP} IS NOT NULL
+        GROUP BY 1 ORDER BY 1
+    """,
+}
+
+
+# --- 3. CHEMIN PANDAS (RÉFÉRENCE) ---
+def _pd_synthese(df):
+    annees = df[COL_DATE].dt.year
+    fermes = df["fermeture"] == 1
+    return pd.DataFrame([{
+        "n_total": len(df), "n_fermes": int(fermes.sum()), "taux_fermeture": df["fermeture"].mean(),
+        "age_moyen_fermes": df.loc[fermes, "age_estime"].mean(),
+        "annee_min": annees.min(), "annee_max": annees.max(),
+        "annee_min_fermes": annees[fermes].min(), "annee_max_fermes": annees[fermes].max(),
+    }])
+
+
+def _pd_ages(df):
+    d = df[df["age_estime"].notna() & df["fermeture"].isin([0, 1])]
+    return (d.groupby([d["age_estime"].round(0).astype(int).rename("age_ans"), d["fermeture"].astype(int)])
+            .size().rename("nb").reset_index())
+
+
+def _pd_fermetures_par_mois(df, annee_min):
+    d = df[df["fermeture"] == 1]
+    annees = d[COL_DATE].dt.year
+    d = d[annees >= annee_min]
+    return (d.groupby([d[COL_DATE].dt.year.astype(int).rename("annee"), d[COL_DATE].dt.month.astype(int).rename("mois")])
+            .size().rename("nb").reset_index())
+
+
+def _pd_annees(df):
+    return pd.DataFrame({"annee": sorted(df[COL_DATE].dt.year.dropna().unique().astype(int))})
+
+
+def _pd_top_ape_fermes(df, limite):
+    d = df[df["fermeture"] == 1]
+    return (
+        d["code_ape"].astype(str).value_counts().sort_index().sort_values(ascending=False, kind="stable").head(limite)
+        .rename_axis("code_ape").reset_index(name="nb_fermetures")
+        .merge(df[["code_ape", COL_SECTEUR]].astype(str).drop_duplicates("code_ape"), on="code_ape", how="left")
+        [["code_ape", COL_SECTEUR, "nb_fermetures"]]
+    )
+
+
+def _pd_top_secteurs_fermes(df, limite):
+    d = df[df["fermeture"] == 1]
+    counts = d[COL_SECTEUR].astype(str).value_counts().sort_index().sort_values(ascending=False, kind="stable")
+    return counts.head(limite).rename_axis("secteur").reset_index(name="nb")
+
+
+def _pd_risque_secteur_age(df, secteurs):
+    rows = []
+    for sector in secteurs:
+        df_s = df[df[COL_SECTEUR].astype(str) == sector]
+        for age in range(AGE_MAX_RISQUE):
+            morts = len(df_s[(df_s["age_estime"] == age) & (df_s["fermeture"] == 1)])
+            exposes = len(df_s[df_s["age_estime"] >= age])
+            if exposes > SEUIL_EXPOSITION:
+                rows.append({"Secteur": sector, "age_estime": age, "proba": (morts / exposes) * 100})
+    return pd.DataFrame(rows, columns=["Secteur", "age_estime", "proba"])
+
+
+def _pd_heatmap_secteur_mois(df, annee, secteurs):
+    d = df[(df["fermeture"] == 1) & (df[COL_DATE].dt.year == annee) & (df[COL_SECTEUR].astype(str).isin(secteurs))]
+    return (d.groupby([d[COL_SECTEUR].astype(str).rename("secteur"), d[COL_DATE].dt.month.rename("mois")])
+            .size().rename("nb").reset_index())
+
+
+def _pd_formes_par_statut(df):
+    formes = pd.to_numeric(df[COL_FORME], errors='coerce')
+    d = df[formes.isin(list(FORMES))]
+    return (d.groupby([formes[d.index].astype(int).rename("forme"), d["fermeture"].astype(int)])
+            .size().rename("nb").reset_index())
+
+
+def _pd_effectifs_par_statut(df):
+    d = df[df[COL_TRANCHE].notna()]
+    return d.groupby([d[COL_TRANCHE].rename("tranche"), d["fermeture"].astype(int)]).size().rename("nb").reset_index()
+
+
+def _pd_indicateurs_departement(df):
+    labels, codes = clean_dep_codes(df[COL_DEPT])
+    d = df.assign(dept_code=np.where(codes >= 0, labels.to_numpy(dtype=object)[np.maximum(codes, 0)], None))
+    d = d[d["dept_code"].notna()]
+    actifs, fermes = d[d["fermeture"] == 0], d[d["fermeture"] == 1]
+    out = pd.DataFrame({"taux_brut": d.groupby("dept_code")["fermeture"].mean()})
+    out["n_actifs"] = actifs.groupby("dept_code").size()
+    out["total"] = actifs.groupby("dept_code")["age_estime"].count()
+    out["plus_de_10ans"] = (actifs["age_estime"] > 10).groupby(actifs["dept_code"]).sum()
+    out["age_moyen_fermes"] = fermes.groupby("dept_code")["age_estime"].mean()
+    out[["n_actifs", "total", "plus_de_10ans"]] = out[["n_actifs", "total", "plus_de_10ans"]].fillna(0).astype(int)
+    return out.rename_axis("dept_code").reset_index()
+
+
+PANDAS = {
+    "synthese": _pd_synthese,
+    "ages": _pd_ages,
+    "fermetures_par_mois": _pd_fermetures_par_mois,
+    "annees": _pd_annees,
+    "top_ape_fermes": _pd_top_ape_fermes,
+    "top_secteurs_fermes": _pd_top_secteurs_fermes,
+    "risque_secteur_age": _pd_risque_secteur_age,
+    "heatmap_secteur_mois": _pd_heatmap_secteur_mois,
+    "formes_par_statut": _pd_formes_par_statut,
+    "effectifs_par_statut": _pd_effectifs_par_statut,
+    "indicateurs_departement": _pd_indicateurs_departement,
+}
+
+# Colonnes lues par chaque requête (chemin pandas en mode paresseux)
+COLONNES = {
+    "synthese": ["fermeture", "age_estime", COL_DATE],
+    "ages": ["fermeture", "age_estime"],
+    "fermetures_par_mois": ["fermeture", COL_DATE],
+    "annees": [COL_DATE],
+    "top_ape_fermes": ["fermeture", "code_ape", COL_SECTEUR],
+    "top_secteurs_fermes": ["fermeture", COL_SECTEUR],
+    "risque_secteur_age": ["fermeture", "age_estime", COL_SECTEUR],
+    "heatmap_secteur_mois": ["fermeture", COL_DATE, COL_SECTEUR],
+    "formes_par_statut": ["fermeture", COL_FORME],
+    "effectifs_par_statut": ["fermeture", COL_TRANCHE],
+    "indicateurs_departement": [COL_DEPT, "fermeture", "age_estime"],
+}
+
+
+# --- 4. EXÉCUTION ---
+@st.cache_resource(show_spinner=False)
+def get_connection():
+    """Connexion DuckDB en mémoire partagée par le processus (un curseur par requête)"""
+    return duckdb.connect(config={"threads": os.cpu_count() or 1})
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _arrow_dataset(version):
+    """Dataset Parquet partitionné (mode paresseux) : DuckDB y pousse projections et filtres de partition"""
+    return _open_dataset(get_s3_filesystem(), get_dataset_path())
+
+
+def _dep_key(column):
+    """Code département normalisé ('1' / '1.0' -> '01'), calculé sur le dictionnaire de la colonne uniquement"""
+    column = column.combine_chunks() if isinstance(column, pa.ChunkedArray) else column
+    if not pa.types.is_dictionary(column.type):
+        column = pc.dictionary_encode(pc.cast(column, pa.string()))
+    codes = pc.utf8_trim_whitespace(pc.cast(column.dictionary, pa.string()))
+    codes = pc.replace_substring_regex(codes, pattern=r"\.0$", replacement="")
+    codes = pc.if_else(pc.less(pc.utf8_length(codes), 2), pc.utf8_lpad(codes, width=2, padding="0"), codes)
+    return pa.DictionaryArray.from_arrays(column.indices, codes)
+
+
+@st.cache_resource(show_spinner="Préparation du moteur de requêtes...", max_entries=2)
+def _arrow_snapshot(_df, cle):
+    """
+    Vue Arrow des seules colonnes interrogées, construite une fois par version : DuckDB la lit sans copie
+    (un DataFrame pandas à colonnes objet serait ré-analysé à chaque requête). Les libellés sont encodés
+    en dictionnaire et la colonne `dep` normalisée est ajoutée si le dataset ne la porte pas déjà.
+    Les lignes sont regroupées par département : un périmètre départemental est une tranche contiguë
+    (table.slice, sans copie ni filtre sur l'ensemble des lignes).
+    """
+    colonnes = [c for c in dict.fromkeys(c for cols in COLONNES.values() for c in cols) if c in _df.columns]
+    if PARTITION_KEY in _df.columns:
+        colonnes.append(PARTITION_KEY)
+    table = pa.Table.from_pandas(_df[colonnes], preserve_index=False)
+    arrays = {
+        c: pc.dictionary_encode(table[c]) if pa.types.is_string(table[c].type) or pa.types.is_large_string(table[c].type)
+        else table[c]
+        for c in table.column_names
+    }
+    if PARTITION_KEY not in arrays and COL_DEPT in arrays:
+        arrays[PARTITION_KEY] = _dep_key(arrays[COL_DEPT])
+    table = pa.table(arrays)
+
+    deps = pc.cast(table[PARTITION_KEY], pa.string())
+    table = table.take(pc.array_sort_indices(deps, null_placement="at_end"))
+    comptes = pc.value_counts(deps).to_pylist()
+    tranches, debut = {}, 0
+    for item in sorted((c for c in comptes if c["values"] is not None), key=lambda c: c["values"]):
+        tranches[item["values"]] = (debut, item["counts"])
+        debut += item["counts"]
+    return table, tranches
+
+
+def _run_duckdb(nom, dep, params):
+    df = st.session_state.get('df')
+    version = st.session_state.get('data_version')
+    perimetre = "SELECT * FROM src"
+    if df is not None:
+        source, tranches = _arrow_snapshot(df, version or id(df))
+        if dep is not None:
+            source = source.slice(*tranches.get(dep, (0, 0)))
+    elif LAZY_MODE and version:
+        source = _arrow_dataset(version)
+        if dep is not None:
+            # Filtre de partition : seuls les fichiers dep=XX/ sont lus
+            perimetre += f" WHERE {DEP} = $dep"
+            params = {**params, "dep": dep}
+    else:
+        return None
+
+    corps = SQL[nom].strip()
+    requete_sql = (
+        f"WITH perimetre AS ({perimetre}), {corps[len('WITH'):]}" if corps.startswith("WITH")
+        else f"WITH perimetre AS ({perimetre}) {corps}"
+    )
+    cur = get_connection().cursor()
+    try:
+        cur.register("src", source)
+        return cur.execute(requete_sql, params).df()
+    finally:
+        cur.close()
+
+
+def _run_pandas(nom, dep, params):
+    df = get_page_data(COLONNES[nom], dep=dep)
+    if df is None:
+        return None
+    return PANDAS[nom](df, **params)
+
+
+def _run(nom, dep, params):
+    if QUERY_ENGINE == "duckdb":
+        return _run_duckdb(nom, dep, params)
+    return _run_pandas(nom, dep, params)
+
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def _run_cached(nom, version, dep, params, engine):
+    return _run(nom, dep, {k: list(v) if isinstance(v, tuple) else v for k, v in params})
+
+
+def requete(nom, dep=None, **params):
+    """
+    Agrégat nommé sur le périmètre (France entière ou un département), mis en cache par version des données.
+    Les paramètres de type liste sont figés en tuples pour la clé de cache.
+    """
+    params = {k: list(v) if isinstance(v, (list, tuple)) else v for k, v in params.items()}
+    version = st.session_state.get('data_version')
+    with bloc(f"agregation:{nom}"):
+        if version is None:
+            return _run(nom, dep, params)
+        cle = tuple(sorted((k, tuple(v) if isinstance(v, list) else v) for k, v in params.items()))
+        return _run_cached(nom, version, dep, cle, QUERY_ENGINE)
@@ -0,0 +1,383 @@
+"""
+Extraction SIRENE (export CSV opendatasoft) vers Parquet en flux : mémoire bornée, reprise sur incident,
+partitions téléchargées en parallèle.
+
+- le CSV est lu en flux et découpé en enregistrements par csv.reader, sans jamais être chargé en entier ;
+- schéma Arrow explicite (toutes les colonnes en string, noms de l'en-tête sans BOM) : aucune inférence
+  de type bloc par bloc, donc aucun conflit de schéma d'un row group à l'autre ;
+- chaque bloc de --row-group lignes est écrit directement comme un row group ; les fichiers sont découpés
+  en segments de --lignes-par-segment lignes, validés un par un (fsync + renommage) ;
+- etat.json garde, par partition, l'offset en octets et le nombre de lignes validés :
+  une coupure réseau reprend à l'octet du dernier enregistrement lu (Range: bytes=N-, ou saut des
+  N premiers octets si le serveur ignore Range), un crash reprend au dernier segment validé ;
+- l'export est trié (order_by) pour que le flux soit identique d'une requête à l'autre ;
+- --par-departement découpe la clause `where` par département (plus une partition « autres »)
+  et télécharge les partitions en parallèle (--workers).
+
+Usage :
+    python extraction.py --out extraction_sirene --fichier extraction_sas_sarl_2026.parquet
+    python extraction.py --out extraction_sirene --par-departement --workers 4
+    python mock_sirene.py --check 20000      # vérification contre un serveur local
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+import httpx
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# --- 1. CONFIGURATION ---
+DATASET_ID = "economicref-france-sirene-v3"
+EXPORT_URL = os.getenv(
+    "SIRENE_EXPORT_URL",
+    f"https://public.opendatasoft.com/api/explore/v2.1/catalog/datasets/{DATASET_ID}/exports/csv",
+)
+WHERE_SAS_SARL = (
+    "etablissementsiege='oui' AND "
+    "naturejuridiqueunitelegale IN ("
+    "'Société à responsabilité limitée (sans autre indication)', "
+    "'SAS, société par actions simplifiée', "
+    "'Société à responsabilité limitée (SARL)'"
+    ")"
+)
+ORDER_BY = "siret"
+DELIMITER = ";"
+ROW_GROUP = 50_000
+LIGNES_PAR_SEGMENT = 1_000_000
+COLONNE_DEPARTEMENT = "codedepartementetablissement"
+DEPARTEMENTS = [f"{i:02d}" for i in range(1, 96) if i != 20] + ["2A", "2B", "971", "972", "973", "974", "976"]
+STATUTS_REESSAI = {429, 500, 502, 503, 504}
+BACKOFF_BASE_S = float(os.getenv("SIRENE_BACKOFF_BASE_S", 1.0))
+BACKOFF_MAX_S = 60.0
+TAILLE_BLOC = 1 << 16
+
+
+def _litteral(valeur):
+    return "'" + valeur.replace("'", "''") + "'"
+
+
+def partitions(where, par_departement=False, departements=DEPARTEMENTS):
+    """{nom: clause where} ; la partition « autres » couvre les codes hors liste et les départements vides"""
+    if not par_departement:
+        return {"tout": where}
+    parts = {f"dep_{d}": f"({where}) AND {COLONNE_DEPARTEMENT} = {_litteral(d)}" for d in departements}
+    liste = ", ".join(_litteral(d) for d in departements)
+    parts["dep_autres"] = (
+        f"({where}) AND ({COLONNE_DEPARTEMENT} IS NULL OR NOT {COLONNE_DEPARTEMENT} IN ({liste}))"
+    )
+    return parts
+
+
+def schema_sirene(colonnes):
+    return pa.schema([pa.field(c, pa.string()) for c in colonnes])
+
+
+# --- 2. LECTURE EN FLUX ---
+class LecteurLignes:
+    """Lignes décodées d'un flux d'octets ; `octets` = position absolue de la fin de la dernière ligne rendue"""
+
+    def __init__(self, blocs, depart=0):
+        self.blocs = iter(blocs)
+        self.buffer = b""
+        self.pos = 0
+        self.octets = depart
+
+    def _remplir(self):
+        bloc = next(self.blocs, None)
+        if bloc is None:
+            return False
+        self.buffer = self.buffer[self.pos:] + bloc
+        self.pos = 0
+        return True
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        # Découpe sur l'octet \n : un caractère UTF-8 multi-octets n'est jamais coupé en deux
+        while True:
+            fin = self.buffer.find(b"\n", self.pos)
+            if fin >= 0:
+                ligne = self.buffer[self.pos:fin + 1]
+                self.pos = fin + 1
+                break
+            if not self._remplir():
+                if self.pos >= len(self.buffer):
+                    raise StopIteration
+                ligne = self.buffer[self.pos:]
+                self.pos = len(self.buffer)
+                break
+        self.octets += len(ligne)
+        return ligne.decode("utf-8")
+
+    def sauter(self, n):
+        """Ignore n octets (serveur qui renvoie le fichier complet malgré l'en-tête Range)"""
+        while n > 0:
+            dispo = len(self.buffer) - self.pos
+            if not dispo:
+                if not self._remplir():
+                    raise EOFError(f"Flux plus court que l'offset de reprise ({n} octets manquants)")
+                continue
+            k = min(n, dispo)
+            self.pos += k
+            self.octets += k
+            n -= k
+
+
+def _entete(ligne):
+    return [c.replace('\ufeff', '') for c in next(csv.reader([ligne], delimiter=DELIMITER), [])]
+
+
+# --- 3. POINT DE REPRISE & ÉCRITURE ---
+class EtatPartition:
+    """etat.json d'une partition : offset et lignes validés, segments écrits, colonnes (schéma figé au 1er passage)"""
+
+    def __init__(self, out_dir, nom, where):
+        self.nom = nom
+        self.dossier = Path(out_dir) / nom
+        self.dossier.mkdir(parents=True, exist_ok=True)
+        self.chemin = self.dossier / "etat.json"
+        data = json.loads(self.chemin.read_text(encoding="utf-8")) if self.chemin.exists() else {}
+        if data.get("where", where) != where:
+            raise ValueError(f"❌ [{nom}] clause where différente de l'extraction en cours dans {self.dossier}")
+        self.where = where
+        self.colonnes = data.get("colonnes")
+        self.octets = data.get("octets", 0)
+        self.lignes = data.get("lignes", 0)
+        self.lignes_ajustees = data.get("lignes_ajustees", 0)
+        self.segments = data.get("segments", [])
+        self.termine = data.get("termine", False)
+        # Segment en cours au moment d'un crash : jamais validé, on repart de l'offset enregistré
+        for tmp in self.dossier.glob("*.tmp"):
+            tmp.unlink()
+
+    def sauver(self):
+        tmp = self.chemin.with_name("etat.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({
+                "where": self.where, "colonnes": self.colonnes, "octets": self.octets, "lignes": self.lignes,
+                "lignes_ajustees": self.lignes_ajustees, "segments": self.segments, "termine": self.termine,
+            }, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.chemin)
+
+
+class EcrivainSegments:
+    """Row groups écrits au fil de l'eau ; un segment n'est visible (et l'offset avancé) qu'une fois fermé"""
+
+    def __init__(self, etat, row_group=ROW_GROUP, lignes_par_segment=LIGNES_PAR_SEGMENT):
+        self.etat = etat
+        self.row_group = row_group
+        self.lignes_par_segment = lignes_par_segment
+        self.octets = etat.octets  # fin du dernier enregistrement reçu (validé ou encore en mémoire)
+        self.lignes = []
+        self.lignes_segment = 0
+        self.writer = None
+        self.chemin = None
+
+    def ajouter(self, ligne, octets):
+        self.lignes.append(ligne)
+        self.octets = octets
+        if len(self.lignes) >= self.row_group:
+            self._ecrire_row_group()
+            if self.lignes_segment >= self.lignes_par_segment:
+                self.valider()
+
+    def _ecrire_row_group(self):
+        if not self.lignes:
+            return
+        schema = schema_sirene(self.etat.colonnes)
+        if self.writer is None:
+            self.chemin = self.etat.dossier / f"seg-{len(self.etat.segments):05d}.parquet"
+            self.writer = pq.ParquetWriter(f"{self.chemin}.tmp", schema, compression='snappy')
+        # Colonnes construites directement avec le type du schéma : pas de DataFrame ni d'inférence
+        colonnes = [pa.array(valeurs, type=pa.string()) for valeurs in zip(*self.lignes)]
+        self.writer.write_batch(pa.RecordBatch.from_arrays(colonnes, schema=schema), row_group_size=len(self.lignes))
+        self.lignes_segment += len(self.lignes)
+        self.lignes = []
+
+    def valider(self):
+        """Ferme le segment et le rend durable, PUIS avance etat.json : l'offset ne précède jamais les données"""
+        self._ecrire_row_group()
+        if self.writer is not None:
+            self.writer.close()
+            with open(f"{self.chemin}.tmp", "rb") as f:
+                os.fsync(f.fileno())
+            os.replace(f"{self.chemin}.tmp", self.chemin)
+            self.etat.segments.append(self.chemin.name)
+            self.etat.lignes += self.lignes_segment
+            self.writer, self.lignes_segment = None, 0
+        self.etat.octets = self.octets
+        self.etat.sauver()
+
+
+# --- 4. EXTRACTION D'UNE PARTITION ---
+class Interruption(Exception):
+    pass
+
+
+class _Reessai(Exception):
+    pass
+
+
+def _backoff(essai):
+    return random.uniform(0, min(BACKOFF_MAX_S, BACKOFF_BASE_S * 2 ** essai))
+
+
+def extraire_partition(client, url, etat, params, row_group=ROW_GROUP, lignes_par_segment=LIGNES_PAR_SEGMENT,
+                       max_essais=8, arret=None):
+    if etat.termine:
+        return etat
+    ecrivain = EcrivainSegments(etat, row_group, lignes_par_segment)
+    essai = 0
+    while True:
+        offset = ecrivain.octets
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+        try:
+            with client.stream("GET", url, params={**params, "where": etat.where}, headers=headers) as r:
+                if r.status_code in STATUTS_REESSAI:
+                    raise _Reessai(f"HTTP {r.status_code}")
+                r.raise_for_status()
+                if offset and r.status_code == 206:
+                    lignes = LecteurLignes(r.iter_bytes(TAILLE_BLOC), depart=offset)
+                else:
+                    lignes = LecteurLignes(r.iter_bytes(TAILLE_BLOC))
+                    colonnes = _entete(next(lignes, ""))
+                    if etat.colonnes is None:
+                        etat.colonnes = colonnes
+                        etat.sauver()
+                    elif colonnes != etat.colonnes:
+                        raise ValueError(f"❌ [{etat.nom}] en-tête différent de l'extraction en cours : relancer avec un autre --out")
+                    if offset:
+                        lignes.sauter(offset - lignes.octets)
+                n = len(etat.colonnes)
+                for parts in csv.reader(lignes, delimiter=DELIMITER):
+                    if arret is not None and arret.is_set():
+                        raise Interruption()
+                    if not parts:
+                        continue
+                    # Correction de structure si nécessaire (même règle que le notebook d'origine)
+                    if len(parts) != n:
+                        parts = parts[:n] if len(parts) > n else parts + [''] * (n - len(parts))
+                        etat.lignes_ajustees += 1
+                    ecrivain.ajouter(parts, lignes.octets)
+            etat.termine = True
+            ecrivain.valider()
+            return etat
+        except Interruption:
+            # Arrêt demandé entre deux enregistrements : le segment en cours est validé, rien n'est perdu
+            ecrivain.valider()
+            raise
+        except (httpx.TransportError, _Reessai) as e:
+            essai += 1
+            if essai >= max_essais:
+                ecrivain.valider()
+                raise
+            print(f"\n🔁 [{etat.nom}] {type(e).__name__} {e} : reprise à l'octet {ecrivain.octets:,} (essai {essai})")
+            time.sleep(_backoff(essai))
+
+
+# --- 5. ORCHESTRATION ---
+def extraire(out_dir, url=EXPORT_URL, where=WHERE_SAS_SARL, par_departement=False, departements=DEPARTEMENTS,
+             workers=1, row_group=ROW_GROUP, lignes_par_segment=LIGNES_PAR_SEGMENT, max_essais=8,
+             order_by=ORDER_BY, timeout=120):
+    etats = [EtatPartition(out_dir, nom, w) for nom, w in partitions(where, par_departement, departements).items()]
+    restantes = [e for e in etats if not e.termine]
+    print("-" * 50)
+    print(f"✅ Partitions déjà extraites : {len(etats) - len(restantes)}/{len(etats)}")
+    print(f"🚀 Partitions à extraire    : {len(restantes)} ({workers} en parallèle)")
+    print("-" * 50)
+
+    params = {"delimiter": DELIMITER, "lang": "fr", "order_by": order_by}
+    arret = threading.Event()
+    erreurs = {}
+    start = time.perf_counter()
+    limits = httpx.Limits(max_connections=workers, max_keepalive_connections=workers)
+    with httpx.Client(timeout=timeout, limits=limits, follow_redirects=True) as client:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(extraire_partition, client, url, e, params, row_group, lignes_par_segment,
+                                   max_essais, arret): e for e in restantes}
+            try:
+                for future in as_completed(futures):
+                    etat = futures[future]
+                    try:
+                        future.result()
+                        print(f"📥 [{etat.nom}] {etat.lignes:,} lignes ({len(etat.segments)} segments)")
+                    except Interruption:
+                        pass
+                    except Exception as e:
+                        erreurs[etat.nom] = str(e)
+                        print(f"❌ [{etat.nom}] {e}")
+            except KeyboardInterrupt:
+                arret.set()
+                for future in futures:
+                    future.cancel()
+                raise
+
+    total = sum(e.lignes for e in etats)
+    ajustees = sum(e.lignes_ajustees for e in etats)
+    print(f"\n✨ {total:,} lignes en {time.perf_counter() - start:.1f}s"
+          f" ({ajustees} lignes ajustées au nombre de colonnes, {len(erreurs)} partitions en échec)")
+    if erreurs:
+        raise RuntimeError(f"Partitions en échec (relancer pour reprendre) : {', '.join(erreurs)}")
+    return etats
+
+
+def consolider(etats, fichier):
+    """Concatène les segments de toutes les partitions en un seul Parquet, un row group à la fois"""
+    colonnes = next((e.colonnes for e in etats if e.colonnes), None)
+    if colonnes is None:
+        print("⚠️ Aucune donnée extraite : pas de fichier consolidé")
+        return 0
+    schema = schema_sirene(colonnes)
+    tmp = f"{fichier}.tmp"
+    total = 0
+    with pq.ParquetWriter(tmp, schema, compression='snappy') as writer:
+        for etat in etats:
+            if etat.colonnes and etat.colonnes != colonnes:
+                raise ValueError(f"❌ [{etat.nom}] colonnes différentes des autres partitions")
+            for segment in etat.segments:
+                pf = pq.ParquetFile(etat.dossier / segment)
+                for i in range(pf.num_row_groups):
+                    table = pf.read_row_group(i)
+                    writer.write_table(table)
+                    total += table.num_rows
+    os.replace(tmp, fichier)
+    print(f"📦 {fichier} : {total:,} lignes x {len(colonnes)} colonnes")
+    return total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extraction SIRENE en flux vers Parquet, avec reprise")
+    parser.add_argument("--out", default="extraction_sirene", help="Dossier des segments et des points de reprise")
+    parser.add_argument("--fichier", default="extraction_sas_sarl_2026.parquet", help="Parquet consolidé final")
+    parser.add_argument("--url", default=EXPORT_URL)
+    parser.add_argument("--where", default=WHERE_SAS_SARL)
+    parser.add_argument("--order-by", default=ORDER_BY)
+    parser.add_argument("--par-departement", action="store_true", help="Une partition (et une requête) par département")
+    parser.add_argument("--workers", type=int, default=1, help="Partitions téléchargées en parallèle")
+    parser.add_argument("--row-group", type=int, default=ROW_GROUP)
+    parser.add_argument("--lignes-par-segment", type=int, default=LIGNES_PAR_SEGMENT)
+    parser.add_argument("--max-essais", type=int, default=8)
+    args = parser.parse_args()
+
+    try:
+        etats = extraire(
+            args.out, args.url, args.where, args.par_departement, DEPARTEMENTS, args.workers, args.row_group,
+            args.lignes_par_segment, args.max_essais, args.order_by,
+        )
+    except KeyboardInterrupt:
+        print("\n⏸️ Interrompu : relancer la même commande pour reprendre.")
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        raise SystemExit(1)
+    else:
+        consolider(etats, args.fichier)
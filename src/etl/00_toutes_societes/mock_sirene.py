@@ -0,0 +1,306 @@
+"""
+Serveur d'export SIRENE local (bouchon) pour développer et vérifier extraction.py hors ligne.
+
+- GET .../exports/csv : CSV déterministe au format opendatasoft (BOM, séparateur « ; », guillemets,
+  retours à la ligne dans les dénominations), filtré par la clause `where` et trié par `order_by` ;
+- Range: bytes=N- pris en charge (206), ou ignoré avec --ignore-range (200 + fichier complet) ;
+- coupures de connexion en cours de corps (--drop-rate), erreurs 503 (--error-rate), débit bridé ;
+- GET /__stats : compteurs (requêtes, 206, Range ignorés, coupures, 503).
+
+Usage :
+    python mock_sirene.py --port 8766            # puis SIRENE_EXPORT_URL=http://127.0.0.1:8766/exports/csv
+    python mock_sirene.py --check 20000          # scénario complet : crash, reprises, partitions parallèles
+"""
+import argparse
+import csv
+import io
+import json
+import random
+import re
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+# --- 1. DONNÉES DÉTERMINISTES ---
+COLONNES = [
+    "siren", "nic", "siret", "denominationunitelegale", "etablissementsiege", "naturejuridiqueunitelegale",
+    "codedepartementetablissement", "codecommuneetablissement", "datecreationunitelegale",
+    "activiteprincipaleunitelegale", "trancheeffectifsunitelegale", "etatadministratifunitelegale",
+]
+NATURES = [
+    "SAS, société par actions simplifiée",
+    "Société à responsabilité limitée (sans autre indication)",
+    "Société à responsabilité limitée (SARL)",
+    "Société anonyme à conseil d'administration",
+]
+DEPARTEMENTS_FIXTURE = ["01", "2A", "2B", "13", "75", "971"]
+NOMS = ["Boulangerie", "Garage", "Société", "Atelier", "Holding", "Café", "Bâtiment", "Conseil"]
+TRANCHES = ["Etablissement non employeur", "1 ou 2 salariés", "3 à 5 salariés", "10 à 19 salariés", ""]
+
+
+def generer_lignes(n, seed=0):
+    rng = random.Random(seed)
+    lignes = []
+    for _ in range(n):
+        siren = f"{rng.randint(100_000_000, 999_999_999)}"
+        nic = f"{rng.randint(1, 99):05d}"
+        nom = f"{rng.choice(NOMS)} {rng.choice(['du Port', 'Élan', 'Martin & Fils', 'L’Étoile'])}"
+        r = rng.random()
+        if r < 0.03:
+            nom += ' "LE SPÉCIALISTE"; depuis 1990'
+        elif r < 0.05:
+            nom += "\nSuite de l'enseigne"
+        dep = rng.choice(DEPARTEMENTS_FIXTURE + ["", "99", "977"])
+        lignes.append([
+            siren, nic, siren + nic, nom, rng.choice(["oui", "oui", "non"]), rng.choice(NATURES), dep,
+            f"{dep or '00'}{rng.randint(1, 999):03d}", f"{rng.randint(1950, 2025)}-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}",
+            f"{rng.randint(1, 99):02d}.{rng.randint(10, 99)}Z", rng.choice(TRANCHES),
+            rng.choice(["Active", "Active", "Cessée"]),
+        ])
+    return lignes
+
+
+# --- 2. CLAUSES WHERE (sous-ensemble ODSQL utilisé par extraction.py) ---
+_LISTE = r"\(((?:\s*'(?:[^']|'')*'\s*,?)*)\)"
+RE_AUTRES = re.compile(r"\((\w+) IS NULL OR NOT \1 IN " + _LISTE + r"\)")
+RE_IN = re.compile(r"(\w+) IN " + _LISTE)
+RE_EGAL = re.compile(r"(\w+)\s*=\s*'((?:[^']|'')*)'")
+
+
+def _valeurs(liste):
+    return {v.replace("''", "'") for v in re.findall(r"'((?:[^']|'')*)'", liste)}
+
+
+def filtre(where):
+    """Conjonction de conditions -> prédicat sur un dict de ligne"""
+    conditions = []
+    reste = where or ""
+    for m in RE_AUTRES.finditer(reste):
+        champ, exclus = m.group(1), _valeurs(m.group(2))
+        conditions.append(lambda l, c=champ, e=exclus: l[c] == "" or l[c] not in e)
+    reste = RE_AUTRES.sub("", reste)
+    for m in RE_IN.finditer(reste):
+        champ, permis = m.group(1), _valeurs(m.group(2))
+        conditions.append(lambda l, c=champ, p=permis: l[c] in p)
+    reste = RE_IN.sub("", reste)
+    for m in RE_EGAL.finditer(reste):
+        champ, valeur = m.group(1), m.group(2).replace("''", "'")
+        conditions.append(lambda l, c=champ, v=valeur: l[c] == v)
+    return lambda ligne: all(cond(ligne) for cond in conditions)
+
+
+# --- 3. SERVEUR ---
+class FixtureState:
+    def __init__(self, n_lignes, drop_rate, error_rate, ignore_range=False, seed=0):
+        self.lignes = generer_lignes(n_lignes, seed)
+        self.drop_rate = drop_rate
+        self.error_rate = error_rate
+        self.ignore_range = ignore_range
+        self.debit = None  # octets/s, None = pas de bridage
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.cache = {}
+        self.stats = Counter()
+
+    def selection(self, where, order_by=None):
+        garde = filtre(where)
+        lignes = [l for l in self.lignes if garde(dict(zip(COLONNES, l)))]
+        if order_by in COLONNES:
+            i = COLONNES.index(order_by)
+            lignes.sort(key=lambda l: l[i])
+        return lignes
+
+    def corps(self, where, order_by):
+        cle = (where, order_by)
+        with self.lock:
+            if cle not in self.cache:
+                buffer = io.StringIO()
+                writer = csv.writer(buffer, delimiter=";", lineterminator="\r\n")
+                writer.writerow(COLONNES)
+                writer.writerows(self.selection(where, order_by))
+                self.cache[cle] = "\ufeff".encode("utf-8") + buffer.getvalue().encode("utf-8")
+            return self.cache[cle]
+
+
+def make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _json(self, code, body):
+            data = json.dumps(body).encode()
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path == "/__stats":
+                with state.lock:
+                    return self._json(200, dict(state.stats))
+            if not url.path.endswith("/exports/csv"):
+                return self._json(404, {"message": "Route inconnue"})
+            params = {k: v[0] for k, v in parse_qs(url.query).items()}
+            data = state.corps(params.get("where"), params.get("order_by"))
+            with state.lock:
+                state.stats["requetes"] += 1
+                erreur = state.rng.random() < state.error_rate
+                coupure = state.rng.random() < state.drop_rate
+            if erreur:
+                with state.lock:
+                    state.stats["503"] += 1
+                return self._json(503, {"message": "Service indisponible"})
+
+            plage = re.match(r"bytes=(\d+)-$", self.headers.get("Range", ""))
+            debut = int(plage.group(1)) if plage and not state.ignore_range else 0
+            if plage and state.ignore_range:
+                with state.lock:
+                    state.stats["range_ignore"] += 1
+            corps = data[debut:]
+            self.send_response(206 if debut else 200)
+            if debut:
+                self.send_header("Content-Range", f"bytes {debut}-{len(data) - 1}/{len(data)}")
+                with state.lock:
+                    state.stats["206"] += 1
+            self.send_header("Content-Type", "text/csv; charset=utf-8")
+            self.send_header("Content-Length", str(len(corps)))
+            self.send_header("Accept-Ranges", "none" if state.ignore_range else "bytes")
+            self.end_headers()
+
+            # Coupure franche à une position aléatoire : le client reçoit un corps incomplet
+            limite = state.rng.randint(0, len(corps)) if coupure and corps else len(corps)
+            for i in range(0, limite, 16_384):
+                self.wfile.write(corps[i:min(i + 16_384, limite)])
+                if state.debit:
+                    time.sleep(16_384 / state.debit)
+            if limite < len(corps):
+                with state.lock:
+                    state.stats["coupures"] += 1
+                self.wfile.flush()
+                self.connection.shutdown(socket.SHUT_RDWR)
+                self.close_connection = True
+
+    return Handler
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Client tué ou connexion coupée volontairement : attendu, pas d'alerte
+        pass
+
+
+def start_server(port=0, n_lignes=20_000, drop_rate=0.0, error_rate=0.0, ignore_range=False):
+    state = FixtureState(n_lignes, drop_rate, error_rate, ignore_range)
+    server = MockServer(("127.0.0.1", port), make_handler(state))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state, f"http://127.0.0.1:{server.server_address[1]}/exports/csv"
+
+
+# --- 4. SCÉNARIO DE VÉRIFICATION ---
+def _controler(fichier, attendu, libelle):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    table = pq.read_table(fichier)
+    erreurs = []
+    if table.column_names != COLONNES:
+        erreurs.append(f"{libelle} : colonnes {table.column_names[:3]}... différentes de l'en-tête")
+    if any(t != pa.string() for t in table.schema.types):
+        erreurs.append(f"{libelle} : schéma non string")
+    lignes = sorted(zip(*[table.column(c).to_pylist() for c in table.column_names]))
+    if table.num_rows != len(attendu):
+        erreurs.append(f"{libelle} : {table.num_rows} lignes au lieu de {len(attendu)}")
+    elif lignes != sorted(map(tuple, attendu)):
+        erreurs.append(f"{libelle} : contenu différent de la source")
+    pf = pq.ParquetFile(fichier)
+    print(f"📁 {libelle} : {table.num_rows:,} lignes, {pf.num_row_groups} row groups")
+    return erreurs
+
+
+def check(n_lignes, workers):
+    """Extraction tuée puis reprise, puis extraction partitionnée sur un serveur sans Range : exhaustivité, unicité, contenu"""
+    import extraction
+
+    extraction.BACKOFF_BASE_S = 0.02
+    server, state, url = start_server(n_lignes=n_lignes, drop_rate=0.3, error_rate=0.05)
+    attendu = state.selection(extraction.WHERE_SAS_SARL)
+    out = Path(tempfile.mkdtemp(prefix="mock_sirene_"))
+    reglages = {"row_group": 500, "lignes_par_segment": 2_000, "max_essais": 50}
+    erreurs = []
+    try:
+        # 1. Flux unique, processus tué (SIGKILL) après le premier segment validé, puis reprise
+        state.debit = len(state.corps(extraction.WHERE_SAS_SARL, extraction.ORDER_BY)) / 4
+        etat_json = out / "flux" / "tout" / "etat.json"
+        proc = subprocess.Popen(
+            [sys.executable, str(Path(__file__).with_name("extraction.py")), "--url", url, "--out", str(out / "flux"),
+             "--fichier", str(out / "flux.parquet"), "--row-group", "500", "--lignes-par-segment", "2000",
+             "--max-essais", "50"],
+            stdout=subprocess.DEVNULL, env={**__import__("os").environ, "SIRENE_BACKOFF_BASE_S": "0.02"},
+        )
+        while proc.poll() is None:
+            if etat_json.exists() and json.loads(etat_json.read_text(encoding="utf-8")).get("segments"):
+                proc.kill()
+                break
+            time.sleep(0.05)
+        proc.wait()
+        if (out / "flux.parquet").exists():
+            erreurs.append("extraction terminée avant l'interruption (crash non testé)")
+        avant = json.loads(etat_json.read_text(encoding="utf-8"))
+        print(f"\n💥 Processus tué : {avant['lignes']:,} lignes validées, offset {avant['octets']:,} octets")
+        state.debit = None
+        etats = extraction.extraire(out / "flux", url, **reglages)
+        extraction.consolider(etats, out / "flux.parquet")
+        erreurs += _controler(out / "flux.parquet", attendu, "Flux unique repris")
+        if not state.stats["206"]:
+            erreurs.append("aucune reprise par Range observée")
+
+        # 2. Partitions par département en parallèle, serveur qui ignore Range (reprise par saut d'octets)
+        state.ignore_range, state.drop_rate = True, 0.6
+        etats = extraction.extraire(out / "dep", url, par_departement=True, departements=DEPARTEMENTS_FIXTURE,
+                                    workers=workers, **reglages)
+        extraction.consolider(etats, out / "dep.parquet")
+        erreurs += _controler(out / "dep.parquet", attendu, "Partitions par département")
+        print(f"📊 Serveur : {dict(state.stats)}")
+        if not state.stats["range_ignore"]:
+            erreurs.append("aucune reprise par saut d'octets observée")
+    finally:
+        server.shutdown()
+        shutil.rmtree(out, ignore_errors=True)
+
+    print("✅ Vérification réussie" if not erreurs else "❌ " + " ; ".join(erreurs))
+    return not erreurs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bouchon local de l'export CSV SIRENE (opendatasoft)")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--lignes", type=int, default=20_000)
+    parser.add_argument("--drop-rate", type=float, default=0.1)
+    parser.add_argument("--error-rate", type=float, default=0.02)
+    parser.add_argument("--ignore-range", action="store_true")
+    parser.add_argument("--check", type=int, metavar="N", help="Lance le scénario de vérification sur N lignes")
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    if args.check:
+        raise SystemExit(0 if check(args.check, args.workers) else 1)
+    server, _, url = start_server(args.port, args.lignes, args.drop_rate, args.error_rate, args.ignore_range)
+    print(f"🧪 Bouchon SIRENE sur {url} ({args.lignes} lignes) — Ctrl+C pour arrêter")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
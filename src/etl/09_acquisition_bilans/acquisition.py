@@ -0,0 +1,405 @@
+"""
+Acquisition des bilans INPI / RNE : moteur asynchrone à débit plafonné, avec reprise sur incident.
+
+- N workers asyncio partagent un client HTTP (keep-alive) et un seau à jetons calé sur le quota de l'API ;
+- 401 : un seul renouvellement du token, partagé par tous les workers ;
+- 429 / 5xx / erreurs réseau : nouvel essai avec backoff exponentiel et jitter ;
+  un Retry-After met tout le pool en pause (plus de rafales pendant un blocage) ;
+- chaque SIREN traité est écrit dans bilans.jsonl, puis dans sirens_traites.txt une fois la sauvegarde
+  synchronisée sur disque : une interruption (Ctrl+C, crash) ne refait que les SIREN en vol ;
+- les échecs définitifs vont dans echecs.jsonl et sont retentés au lancement suivant.
+
+Usage :
+    python acquisition.py siren_batch_20000_nouveaux.json --out backup_bilans --rate 5 --workers 16
+    python acquisition.py sirens.json --out backup_bilans --legacy-backup-dir backup_bilans_batch_2 --db
+"""
+import argparse
+import asyncio
+import json
+import os
+import queue
+import random
+import threading
+import time
+from pathlib import Path
+
+import httpx
+
+try:
+    from dotenv import load_dotenv
+except ImportError:
+    load_dotenv = None
+
+# --- 1. CONFIGURATION ---
+BASE_URL = os.getenv("INPI_BASE_URL", "https://registre-national-entreprises.inpi.fr")
+MOTS_CLES = ["bilan", "comptes annuels", "liasse", "comptes de l'exercice", "clôture"]
+STATUTS_REESSAI = {429, 500, 502, 503, 504}
+BACKOFF_BASE_S = 1.0
+BACKOFF_MAX_S = 120.0
+
+
+# --- 2. EXTRACTION ---
+def extraire_bilans(data):
+    """
+    Toute l'antériorité disponible, un exercice par date de clôture :
+    données structurées (bilansSaisis) en priorité, complétées par les PDF de bilans et d'actes.
+    """
+    if not data:
+        return []
+    bilans_par_date = {}
+
+    for b in data.get('bilansSaisis', []):
+        date_c = b.get('dateCloture')
+        if date_c:
+            bilans_par_date[str(date_c)] = {
+                'siren': b.get('siren'),
+                'date_cloture': date_c,
+                'confidentialite': b.get('confidentiality', 'Public'),
+                'liasses': b.get('bilanSaisi', b),
+                'source': 'STRUCT',
+            }
+
+    for doc in data.get('bilans', []) + data.get('actes', []):
+        libelle = str(doc.get('libelle', '')).lower()
+        rdd_decisions = " ".join(str(r.get('decision', '')).lower() for r in doc.get('typeRdd', []))
+        date_c = doc.get('dateCloture') or doc.get('dateDepot')
+        if any(mot in libelle or mot in rdd_decisions for mot in MOTS_CLES):
+            if date_c and str(date_c) not in bilans_par_date:
+                bilans_par_date[str(date_c)] = {
+                    'siren': doc.get('siren'),
+                    'date_cloture': date_c,
+                    'confidentialite': doc.get('confidentiality', 'Public'),
+                    'liasses': doc,
+                    'source': 'PDF_DOCUMENT',
+                }
+    return list(bilans_par_date.values())
+
+
+# --- 3. DÉBIT & AUTHENTIFICATION ---
+class TokenBucket:
+    """Seau à jetons : `rate` requêtes/s en régime établi, rafales limitées à `capacity`.
+    Le seau part vide et la capacité vaut 1 par défaut : aucune fenêtre d'une seconde ne dépasse le quota,
+    y compris au démarrage ; une rafale plus large se demande explicitement."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or 1.0)
+        self.tokens = 0.0
+        self.updated = time.monotonic()
+        self.pause_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds):
+        """Suspend tout le pool (429) ; le seau repart vide à la fin de la pause"""
+        self.pause_until = max(self.pause_until, time.monotonic() + seconds)
+        self.tokens = 0.0
+        self.updated = self.pause_until
+
+    async def acquire(self):
+        # Le verrou (FIFO) sert les workers dans l'ordre d'arrivée
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.pause_until:
+                    await asyncio.sleep(self.pause_until - now)
+                    continue
+                self.tokens = min(self.capacity, self.tokens + max(now - self.updated, 0.0) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class InpiAuth:
+    """Token Bearer partagé ; `generation` évite que plusieurs 401 simultanés déclenchent plusieurs logins"""
+
+    def __init__(self, client, base_url, username, password):
+        self.client = client
+        self.login_url = f"{base_url}/api/sso/login"
+        self.credentials = {"username": username, "password": password}
+        self.token = None
+        self.generation = 0
+        self.renouvellements = 0
+        self._lock = asyncio.Lock()
+
+    async def headers(self):
+        if self.token is None:
+            await self.refresh(self.generation)
+        return {"Authorization": f"Bearer {self.token}"}, self.generation
+
+    async def refresh(self, generation_vue):
+        async with self._lock:
+            if self.token is not None and self.generation != generation_vue:
+                return  # Déjà renouvelé par un autre worker
+            response = await self.client.post(self.login_url, json=self.credentials, timeout=15)
+            response.raise_for_status()
+            token = response.json().get("token")
+            if not token:
+                raise ValueError("Le format de réponse de l'API ne contient pas de token.")
+            self.token = token
+            self.generation += 1
+            self.renouvellements += 1
+            print(f"\n🔑 Token INPI renouvelé (n°{self.renouvellements})")
+
+
+def _retry_after(response):
+    try:
+        return float(response.headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _backoff(essai):
+    # Full jitter : étale les reprises des workers au lieu de les resynchroniser
+    return random.uniform(0, min(BACKOFF_MAX_S, BACKOFF_BASE_S * 2 ** essai))
+
+
+async def fetch_bilans(client, auth, bucket, base_url, siren, max_essais=6):
+    """(statut, bilans) ; bilans vaut None en cas d'échec définitif"""
+    erreur = None
+    for essai in range(max_essais):
+        await bucket.acquire()
+        try:
+            headers, generation = await auth.headers()
+            res = await client.get(f"{base_url}/api/companies/{siren}/attachments", headers=headers)
+            if res.status_code == 401:
+                await auth.refresh(generation)
+                continue
+            if res.status_code == 200:
+                return 200, extraire_bilans(res.json())
+        except (httpx.HTTPError, ValueError) as e:
+            # Réseau, renouvellement du token ou réponse illisible : même politique de nouvel essai
+            erreur = f"{type(e).__name__}: {e}"
+        else:
+            if res.status_code == 404:
+                return 404, []
+            erreur = f"HTTP {res.status_code}"
+            if res.status_code not in STATUTS_REESSAI:
+                return erreur, None
+            if res.status_code == 429:
+                bucket.pause(_retry_after(res) or _backoff(essai))
+        await asyncio.sleep(_backoff(essai))
+    return erreur, None
+
+
+# --- 4. POINT DE REPRISE & SORTIES ---
+class Checkpoint:
+    """
+    bilans.jsonl (une ligne par SIREN ayant des bilans) puis sirens_traites.txt.
+    Un SIREN n'est marqué traité qu'après fsync de sa sauvegarde : l'ordre est garanti même en cas de coupure.
+    """
+
+    def __init__(self, out_dir, sync_every=200):
+        self.out_dir = Path(out_dir)
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        self.bilans = open(self.out_dir / "bilans.jsonl", "a", encoding="utf-8")
+        self.traites = open(self.out_dir / "sirens_traites.txt", "a", encoding="utf-8")
+        self.echecs = open(self.out_dir / "echecs.jsonl", "a", encoding="utf-8")
+        self.sync_every = sync_every
+        self.en_attente = []
+
+    @staticmethod
+    def deja_traites(out_dir, legacy_dirs=()):
+        path = Path(out_dir) / "sirens_traites.txt"
+        traites = set(path.read_text(encoding="utf-8").split()) if path.exists() else set()
+        # Sauvegardes des notebooks précédents : un fichier <siren>.json par SIREN balayé
+        for legacy in legacy_dirs:
+            traites.update(p.stem for p in Path(legacy).glob("*.json"))
+        return traites
+
+    def enregistrer(self, siren, statut, bilans):
+        if bilans:
+            self.bilans.write(json.dumps({"siren": siren, "bilans": bilans}, ensure_ascii=False) + "\n")
+        self.en_attente.append(siren)
+        if len(self.en_attente) >= self.sync_every:
+            self.sync()
+
+    def echec(self, siren, erreur):
+        self.echecs.write(json.dumps({"siren": siren, "erreur": erreur, "ts": time.time()}) + "\n")
+
+    def sync(self):
+        for f in (self.bilans, self.echecs):
+            f.flush()
+            os.fsync(f.fileno())
+        if self.en_attente:
+            self.traites.write("".join(f"{s}\n" for s in self.en_attente))
+            self.traites.flush()
+            os.fsync(self.traites.fileno())
+            self.en_attente = []
+
+    def close(self):
+        self.sync()
+        for f in (self.bilans, self.traites, self.echecs):
+            f.close()
+
+
+class PostgresSink:
+    """
+    Écriture Neon dans un thread dédié via BilanWriter (COPY par lots) : la boucle HTTP n'attend jamais la base.
+    Le tampon est vidé à `batch_size` exercices ou toutes les `flush_interval` secondes.
+    """
+
+    def __init__(self, database_url, batch_size=2_000, flush_interval=30.0):
+        import psycopg2
+        from ecriture_postgres import BilanWriter, creer_tables
+
+        self.conn = psycopg2.connect(database_url)
+        creer_tables(self.conn)
+        self.writer = BilanWriter(self.conn, batch_size)
+        self.flush_interval = flush_interval
+        self.perdus = 0
+        self.debordes = 0
+        self.file = queue.Queue(maxsize=10_000)
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    @property
+    def inseres(self):
+        return self.writer.stats["exercices"]
+
+    def put(self, bilans):
+        """Jamais d'attente : appelé depuis les workers asyncio, un put bloquant sur file pleine (Neon lent) gèlerait
+        tout le pool HTTP et le token bucket. Les bilans écartés sont comptés, ils restent rejouables depuis
+        bilans.jsonl"""
+        try:
+            self.file.put_nowait(bilans)
+        except queue.Full:
+            if not self.debordes:
+                print("\n⚠️ Neon en retard : file d'écriture pleine, bilans écartés (rejouables depuis bilans.jsonl)")
+            self.debordes += len(bilans)
+
+    def _flush(self):
+        try:
+            self.writer.flush()
+        except Exception as e:
+            # Lot abandonné pour ne pas bloquer le thread, mais compté : les bilans restent dans bilans.jsonl,
+            # rejouables avec ecriture_postgres.py
+            self.perdus += len(self.writer.tampon)
+            print(f"\n⚠️ Erreur BDD : lot de {len(self.writer.tampon)} exercices non écrit"
+                  f" ({self.perdus} au total) : {e}")
+            self.writer.tampon = {}
+
+    def _run(self):
+        while True:
+            try:
+                bilans = self.file.get(timeout=self.flush_interval)
+            except queue.Empty:
+                self._flush()
+                continue
+            if bilans is None:
+                self._flush()
+                return
+            try:
+                self.writer.add(bilans)
+            except Exception:
+                self._flush()
+
+    def close(self):
+        self.file.put(None)
+        self.thread.join()
+        self.conn.close()
+
+
+# --- 5. ORCHESTRATION ---
+async def acquerir(sirens, out_dir, base_url=BASE_URL, username=None, password=None, rate=5.0, burst=None,
+                   workers=16, max_essais=6, legacy_dirs=(), sink=None, progress_every=100):
+    deja = Checkpoint.deja_traites(out_dir, legacy_dirs)
+    restants = [s for s in dict.fromkeys(str(s).strip() for s in sirens) if s and s not in deja]
+    print("-" * 50)
+    print(f"✅ SIREN déjà traités : {len(deja)}")
+    print(f"🚀 SIREN à traiter    : {len(restants)} ({workers} workers, {rate} req/s)")
+    print("-" * 50)
+
+    stats = {"traites": 0, "bilans": 0, "404": 0, "echecs": 0}
+    if not restants:
+        return stats
+    file = asyncio.Queue()
+    for s in restants:
+        file.put_nowait(s)
+
+    bucket = TokenBucket(rate, burst)
+    limits = httpx.Limits(max_connections=workers, max_keepalive_connections=workers)
+    async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+        auth = InpiAuth(client, base_url, username, password)
+        # Identifiants vérifiés avant de lancer le pool : une erreur ici arrête tout de suite
+        await auth.refresh(auth.generation)
+        checkpoint = Checkpoint(out_dir)
+        start = time.perf_counter()
+
+        async def worker():
+            while True:
+                try:
+                    siren = file.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                statut, bilans = await fetch_bilans(client, auth, bucket, base_url, siren, max_essais)
+                if bilans is None:
+                    checkpoint.echec(siren, statut)
+                    stats["echecs"] += 1
+                else:
+                    checkpoint.enregistrer(siren, statut, bilans)
+                    stats["traites"] += 1
+                    stats["bilans"] += len(bilans)
+                    stats["404"] += statut == 404
+                    if sink is not None and bilans:
+                        sink.put(bilans)
+                n = stats["traites"] + stats["echecs"]
+                if n % progress_every == 0:
+                    debit = n / (time.perf_counter() - start)
+                    print(f"⏳ [{n}/{len(restants)}] Bilans : {stats['bilans']} | Échecs : {stats['echecs']}"
+                          f" | {debit:.1f} SIREN/s", end="\r", flush=True)
+
+        try:
+            await asyncio.gather(*[worker() for _ in range(workers)])
+        finally:
+            checkpoint.close()
+            stats["renouvellements_token"] = auth.renouvellements
+            stats["duree_s"] = round(time.perf_counter() - start, 2)
+
+    print(f"\n✨ Terminé en {stats['duree_s']}s : {stats['traites']} SIREN traités, {stats['bilans']} bilans,"
+          f" {stats['404']} sans dossier, {stats['echecs']} échecs (retentés au prochain lancement)")
+    return stats
+
+
+def lire_sirens(path):
+    """Liste JSON (format des notebooks) ou un SIREN par ligne"""
+    text = Path(path).read_text(encoding="utf-8")
+    return json.loads(text) if text.lstrip().startswith("[") else text.split()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Acquisition asynchrone des bilans INPI / RNE")
+    parser.add_argument("sirens", help="Fichier de SIREN (liste JSON ou un par ligne)")
+    parser.add_argument("--out", default="backup_bilans", help="Dossier de sauvegarde et de reprise")
+    parser.add_argument("--rate", type=float, default=float(os.getenv("INPI_RATE_PER_S", 5)), help="Requêtes/s (quota du compte)")
+    parser.add_argument("--burst", type=float, help="Rafale maximale (défaut : 1 requête)")
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--max-essais", type=int, default=6)
+    parser.add_argument("--legacy-backup-dir", nargs="*", default=[], help="Dossiers <siren>.json des notebooks")
+    parser.add_argument("--base-url", default=BASE_URL)
+    parser.add_argument("--db", action="store_true", help="Insère aussi les bilans dans Neon (NEON_DATABASE_URL)")
+    args = parser.parse_args()
+
+    if load_dotenv is not None:
+        load_dotenv()
+    username, password = os.getenv("INPI_USERNAME"), os.getenv("INPI_PASSWORD")
+    if not username or not password:
+        raise RuntimeError("❌ INPI_USERNAME ou INPI_PASSWORD manquant dans le .env")
+
+    sink = PostgresSink(os.environ["NEON_DATABASE_URL"]) if args.db else None
+    try:
+        asyncio.run(acquerir(
+            lire_sirens(args.sirens), args.out, args.base_url, username, password, args.rate, args.burst,
+            args.workers, args.max_essais, args.legacy_backup_dir, sink,
+        ))
+    except KeyboardInterrupt:
+        print("\n⏸️ Interrompu : relancer la même commande pour reprendre.")
+    finally:
+        if sink is not None:
+            sink.close()
+            print(f"☁️ {sink.inseres} exercices écrits dans Neon (bilans_entreprises + bilans_liasses)")
+            if sink.perdus or sink.debordes:
+                print(f"⚠️ {sink.perdus + sink.debordes} exercices non écrits ({sink.perdus} erreurs BDD,"
+                      f" {sink.debordes} sur file pleine) :"
+                      f" python ecriture_postgres.py {args.out} pour les rejouer")
@@ -0,0 +1,343 @@
+"""
+Écriture en masse des bilans dans Postgres (Neon) : COPY FROM STDIN ou execute_values, par lots.
+
+- bilans_entreprises : un exercice par (siren, date_cloture), JSON complet de la liasse ;
+  upsert par lot (mise à jour uniquement si le JSON a changé) ;
+- bilans_liasses : vue normalisée (siren, date_cloture, code, valeur) des postes saisis (m1),
+  remplacée exercice par exercice dans la même transaction : l'extraction de features interroge
+  directement les codes utiles au lieu de parser le JSON ;
+- les lots sont dédoublonnés côté Python (un même exercice deux fois dans un lot ferait échouer l'upsert).
+
+Usage :
+    python ecriture_postgres.py backup_bilans backup_bilans_batch_2      # rejoue bilans.jsonl / <siren>.json
+    python ecriture_postgres.py --check postgresql://localhost/test       # vérification et mesure sur données bouchon
+
+--check n'écrit que dans un schéma jetable (check_bilans_<pid>, supprimé à la fin) et refuse la base
+de NEON_DATABASE_URL : son DSN se donne toujours explicitement.
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import time
+from pathlib import Path
+
+# --- 1. SCHÉMA & REQUÊTES ---
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS bilans_entreprises (
+    siren TEXT NOT NULL,
+    date_cloture DATE NOT NULL,
+    confidentialite TEXT,
+    donnees_liasses JSONB,
+    PRIMARY KEY (siren, date_cloture)
+);
+CREATE TABLE IF NOT EXISTS bilans_liasses (
+    siren TEXT NOT NULL,
+    date_cloture DATE NOT NULL,
+    code TEXT NOT NULL,
+    valeur BIGINT,
+    PRIMARY KEY (siren, date_cloture, code)
+);
+CREATE INDEX IF NOT EXISTS bilans_liasses_code_idx ON bilans_liasses (code, date_cloture);
+"""
+
+STAGING_SQL = """
+CREATE TEMP TABLE IF NOT EXISTS _staging_bilans (
+    siren TEXT, date_cloture DATE, confidentialite TEXT, donnees_liasses JSONB
+) ON COMMIT DELETE ROWS;
+CREATE TEMP TABLE IF NOT EXISTS _staging_liasses (
+    siren TEXT, date_cloture DATE, code TEXT, valeur BIGINT
+) ON COMMIT DELETE ROWS;
+"""
+
+# Comparaison en jsonb : fonctionne que la colonne cible soit json ou jsonb
+CONFLIT_BILANS = """
+ON CONFLICT (siren, date_cloture) DO UPDATE
+SET confidentialite = EXCLUDED.confidentialite, donnees_liasses = EXCLUDED.donnees_liasses
+WHERE bilans_entreprises.donnees_liasses::jsonb IS DISTINCT FROM EXCLUDED.donnees_liasses::jsonb
+   OR bilans_entreprises.confidentialite IS DISTINCT FROM EXCLUDED.confidentialite
+"""
+UPSERT_BILANS_STAGING = f"""
+INSERT INTO bilans_entreprises (siren, date_cloture, confidentialite, donnees_liasses)
+SELECT siren, date_cloture, confidentialite, donnees_liasses FROM _staging_bilans
+{CONFLIT_BILANS}
+"""
+UPSERT_BILANS_VALUES = f"""
+INSERT INTO bilans_entreprises (siren, date_cloture, confidentialite, donnees_liasses) VALUES %s
+{CONFLIT_BILANS}
+"""
+# Postes remplacés par exercice : un code disparu d'une liasse corrigée ne doit pas subsister
+DELETE_LIASSES_STAGING = """
+DELETE FROM bilans_liasses l USING (SELECT DISTINCT siren, date_cloture FROM _staging_bilans) k
+WHERE l.siren = k.siren AND l.date_cloture = k.date_cloture
+"""
+INSERT_LIASSES_STAGING = """
+INSERT INTO bilans_liasses (siren, date_cloture, code, valeur)
+SELECT siren, date_cloture, code, valeur FROM _staging_liasses
+"""
+DELETE_LIASSES_VALUES = """
+DELETE FROM bilans_liasses l USING (VALUES %s) AS k (siren, date_cloture)
+WHERE l.siren = k.siren AND l.date_cloture = k.date_cloture::date
+"""
+INSERT_LIASSES_VALUES = "INSERT INTO bilans_liasses (siren, date_cloture, code, valeur) VALUES %s"
+
+INSERT_UNITAIRE = """
+INSERT INTO bilans_entreprises (siren, date_cloture, confidentialite, donnees_liasses)
+VALUES (%s, %s, %s, %s)
+ON CONFLICT (siren, date_cloture) DO NOTHING;
+"""
+
+
+# --- 2. NORMALISATION DES LIASSES ---
+def _to_int(valeur):
+    try:
+        return int(str(valeur).strip())
+    except (TypeError, ValueError):
+        return None
+
+
+def extraire_liasses(bilan):
+    """{code: valeur m1} d'un bilan saisi ; vide pour les PDF (pas de valeurs structurées)"""
+    contenu = bilan.get('liasses') or {}
+    if bilan.get('source') == 'PDF_DOCUMENT' or not isinstance(contenu, dict):
+        return {}
+    # Ancien format des sauvegardes : dictionnaire plat {code: valeur}
+    if contenu and all(not isinstance(v, (dict, list)) for v in contenu.values()) and 'bilan' not in contenu:
+        return {code: _to_int(v) for code, v in contenu.items()}
+    contenu = contenu.get('bilanSaisi', contenu)
+    pages = contenu.get('bilan', {}).get('detail', {}).get('pages', [])
+    postes = {}
+    for page in pages:
+        for liasse in page.get('liasses', []):
+            if liasse.get("code"):
+                postes[liasse["code"]] = _to_int(liasse.get("m1"))
+    return postes
+
+
+def _cle(bilan):
+    return str(bilan['siren']), str(bilan['date_cloture'])[:10]
+
+
+# --- 3. ÉCRIVAIN PAR LOTS ---
+class BilanWriter:
+    """
+    Tampon de bilans vidé par lots de `batch_size` exercices, une transaction par lot.
+    methode="copy" : COPY vers des tables temporaires puis INSERT ... SELECT (le plus rapide) ;
+    methode="values" : execute_values multi-lignes (pas de tables temporaires, ex. pooler en mode transaction).
+    """
+
+    def __init__(self, conn, batch_size=5_000, methode="copy"):
+        if methode not in ("copy", "values"):
+            raise ValueError(f"Méthode inconnue : {methode} (attendu : copy, values)")
+        self.conn = conn
+        self.batch_size = batch_size
+        self.methode = methode
+        self.tampon = {}
+        self.stats = {"exercices": 0, "postes": 0, "lots": 0, "duree_s": 0.0}
+        if methode == "copy":
+            with conn.cursor() as cur:
+                cur.execute(STAGING_SQL)
+            conn.commit()
+
+    def add(self, bilans):
+        for b in bilans:
+            if b.get('siren') and b.get('date_cloture'):
+                # Dernière version d'un exercice dans le lot
+                self.tampon[_cle(b)] = b
+        if len(self.tampon) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.tampon:
+            return
+        start = time.perf_counter()
+        lignes, postes = [], []
+        for (siren, date_c), b in self.tampon.items():
+            lignes.append((siren, date_c, b.get('confidentialite'), json.dumps(b.get('liasses'), ensure_ascii=False)))
+            postes.extend((siren, date_c, code, valeur) for code, valeur in extraire_liasses(b).items())
+        try:
+            with self.conn.cursor() as cur:
+                if self.methode == "copy":
+                    self._copy(cur, "_staging_bilans", lignes)
+                    self._copy(cur, "_staging_liasses", postes)
+                    cur.execute(UPSERT_BILANS_STAGING)
+                    cur.execute(DELETE_LIASSES_STAGING)
+                    cur.execute(INSERT_LIASSES_STAGING)
+                else:
+                    from psycopg2.extras import execute_values
+
+                    execute_values(cur, UPSERT_BILANS_VALUES, lignes, page_size=1_000)
+                    execute_values(cur, DELETE_LIASSES_VALUES, list(self.tampon), page_size=1_000)
+                    execute_values(cur, INSERT_LIASSES_VALUES, postes, page_size=5_000)
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        self.stats["exercices"] += len(lignes)
+        self.stats["postes"] += len(postes)
+        self.stats["lots"] += 1
+        self.stats["duree_s"] += time.perf_counter() - start
+        self.tampon = {}
+
+    @staticmethod
+    def _copy(cur, table, rows):
+        if not rows:
+            return
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        buffer.seek(0)
+        cur.copy_expert(f"COPY {table} FROM STDIN WITH (FORMAT csv)", buffer)
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *_):
+        if exc_type is None:
+            self.close()
+
+
+def creer_tables(conn):
+    with conn.cursor() as cur:
+        cur.execute(SCHEMA_SQL)
+    conn.commit()
+
+
+# --- 4. REJEU DES SAUVEGARDES ---
+def lire_sauvegardes(dossier):
+    """Bilans d'un dossier de sauvegarde : bilans.jsonl (acquisition.py) et/ou <siren>.json (notebooks)"""
+    dossier = Path(dossier)
+    jsonl = dossier / "bilans.jsonl"
+    if jsonl.exists():
+        with open(jsonl, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)["bilans"]
+    for path in dossier.glob("*.json"):
+        with open(path, encoding="utf-8") as f:
+            bilans = json.load(f)
+        if bilans:
+            yield bilans
+
+
+def charger_sauvegardes(conn, dossiers, batch_size=5_000, methode="copy"):
+    creer_tables(conn)
+    with BilanWriter(conn, batch_size, methode) as writer:
+        for dossier in dossiers:
+            for bilans in lire_sauvegardes(dossier):
+                writer.add(bilans)
+    print(f"✅ {writer.stats['exercices']} exercices et {writer.stats['postes']} postes écrits"
+          f" en {writer.stats['lots']} lots ({writer.stats['duree_s']:.1f}s en base)")
+    return writer.stats
+
+
+# --- 5. VÉRIFICATION (SCHÉMA JETABLE) ---
+def _meme_base(dsn, autre):
+    """Même serveur et même base, quelle que soit l'écriture du DSN (URI ou clé=valeur)"""
+    if not autre:
+        return False
+    from psycopg2.extensions import parse_dsn
+
+    def cible(d):
+        d = parse_dsn(d)
+        return d.get("host", "localhost"), str(d.get("port", "5432")), d.get("dbname", d.get("user"))
+    return cible(dsn) == cible(autre)
+
+
+def check(dsn, n_sirens):
+    """Compare ligne à ligne, execute_values et COPY sur les mêmes bilans : contenu identique, rejeu idempotent.
+    Les tables sont recréées dans un schéma dédié (search_path), supprimé à la fin, jamais dans la base."""
+    import psycopg2
+    from acquisition import extraire_bilans
+    from mock_rne import payload_siren
+
+    if _meme_base(dsn, os.getenv("NEON_DATABASE_URL")):
+        raise ValueError("--check refuse la base de NEON_DATABASE_URL : donner le DSN d'une base de test")
+    bilans = [b for i in range(n_sirens) for b in extraire_bilans(payload_siren(f"{100_000_000 + i * 7919}"))]
+    schema = f"check_bilans_{os.getpid()}"
+    conn = psycopg2.connect(dsn, options=f"-c search_path={schema}")
+    with conn.cursor() as cur:
+        cur.execute(f"CREATE SCHEMA {schema}")
+    conn.commit()
+    erreurs, empreintes = [], {}
+
+    def reset():
+        with conn.cursor() as cur:
+            cur.execute("DROP TABLE IF EXISTS bilans_entreprises, bilans_liasses")
+        conn.commit()
+        creer_tables(conn)
+
+    def empreinte():
+        with conn.cursor() as cur:
+            cur.execute("SELECT count(*), md5(string_agg(siren || date_cloture || coalesce(confidentialite, '')"
+                        " || donnees_liasses::text, '|' ORDER BY siren, date_cloture)) FROM bilans_entreprises")
+            return cur.fetchone()
+
+    try:
+        reset()
+        start = time.perf_counter()
+        with conn.cursor() as cur:
+            for b in bilans:
+                cur.execute(INSERT_UNITAIRE, (b['siren'], b['date_cloture'], b['confidentialite'],
+                                              json.dumps(b['liasses'], ensure_ascii=False)))
+                conn.commit()
+        print(f"   ligne à ligne : {time.perf_counter() - start:7.2f}s ({len(bilans)} exercices)")
+        empreintes["unitaire"] = empreinte()
+
+        for methode in ("values", "copy"):
+            reset()
+            start = time.perf_counter()
+            with BilanWriter(conn, methode=methode) as writer:
+                writer.add(bilans)
+            print(f"   {methode:<13} : {time.perf_counter() - start:7.2f}s"
+                  f" ({writer.stats['postes']} postes normalisés)")
+            empreintes[methode] = empreinte()
+            with conn.cursor() as cur:
+                cur.execute("SELECT count(*) FROM bilans_liasses")
+                n_postes = cur.fetchone()[0]
+            if n_postes != writer.stats["postes"]:
+                erreurs.append(f"{methode} : {n_postes} postes en base pour {writer.stats['postes']} écrits")
+            # Rejeu : aucune ligne en plus, aucun changement
+            with BilanWriter(conn, methode=methode) as writer:
+                writer.add(bilans)
+            if empreinte() != empreintes[methode]:
+                erreurs.append(f"{methode} : le rejeu modifie la base")
+    finally:
+        conn.rollback()
+        with conn.cursor() as cur:
+            cur.execute(f"DROP SCHEMA {schema} CASCADE")
+        conn.commit()
+        conn.close()
+
+    if len({v for v in empreintes.values()}) != 1:
+        erreurs.append(f"contenus différents selon la méthode : {empreintes}")
+    print("✅ Vérification réussie" if not erreurs else "❌ " + " ; ".join(erreurs))
+    return not erreurs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Écriture en masse des bilans dans Postgres")
+    parser.add_argument("dossiers", nargs="*", help="Dossiers de sauvegarde à rejouer")
+    parser.add_argument("--dsn", default=os.getenv("NEON_DATABASE_URL"))
+    parser.add_argument("--methode", choices=["copy", "values"], default="copy")
+    parser.add_argument("--batch-size", type=int, default=5_000)
+    parser.add_argument("--check", metavar="DSN",
+                        help="Vérification sur une base de test, dans un schéma jetable (jamais NEON_DATABASE_URL)")
+    parser.add_argument("--sirens", type=int, default=2_000, help="Nombre de SIREN bouchon pour --check")
+    args = parser.parse_args()
+
+    if args.check:
+        raise SystemExit(0 if check(args.check, args.sirens) else 1)
+    if not args.dsn:
+        raise ValueError("La variable NEON_DATABASE_URL n'est pas définie dans .env (ou --dsn)")
+
+    import psycopg2
+
+    connection = psycopg2.connect(args.dsn)
+    try:
+        charger_sauvegardes(connection, args.dossiers, args.batch_size, args.methode)
+    finally:
+        connection.close()
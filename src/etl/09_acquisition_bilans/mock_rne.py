@@ -0,0 +1,238 @@
+"""
+Serveur RNE local (bouchon) pour développer et vérifier acquisition.py sans toucher au quota INPI.
+
+- POST /api/sso/login : token valable --token-ttl secondes (401 ensuite) ;
+- GET /api/companies/<siren>/attachments : réponse déterministe au format INPI
+  (bilansSaisis + PDF de bilans/actes), 404 pour ~10 % des SIREN ;
+- quota serveur (seau à jetons) : 429 + Retry-After au-delà de --quota req/s ;
+- erreurs 5xx aléatoires (--error-rate) et latence simulée ;
+- GET /__stats : compteurs (requêtes, 401, 429, 5xx, pic de débit sur une seconde glissante).
+
+Usage :
+    python mock_rne.py --port 8765                     # puis INPI_BASE_URL=http://127.0.0.1:8765
+    python mock_rne.py --check 2000                    # scénario complet : interruption, reprise, contrôles
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# --- 1. DONNÉES DÉTERMINISTES ---
+ROUTE_BILANS = re.compile(r"^/api/companies/(\d{9})/attachments$")
+CODES_LIASSE = ["AA", "BJ", "CJ", "DA", "DL", "EE", "FL", "GG", "HN", "YP"]
+
+
+def _seed(siren):
+    return int(hashlib.sha1(siren.encode()).hexdigest()[:8], 16)
+
+
+def payload_siren(siren):
+    """Dossier INPI fictif mais stable pour un SIREN donné ; None = SIREN inconnu (404)"""
+    rng = random.Random(_seed(siren))
+    if rng.random() < 0.1:
+        return None
+    annees = sorted(rng.sample(range(2015, 2025), rng.randint(0, 4)))
+    saisis = [{
+        "siren": siren, "dateCloture": f"{a}-12-31", "confidentiality": rng.choice(["Public", "Confidentiel"]),
+        "bilanSaisi": {"bilan": {"detail": {"pages": [{"liasses": [
+            {"code": c, "m1": str(rng.randint(0, 2_000_000))} for c in rng.sample(CODES_LIASSE, 6)
+        ]}]}}},
+    } for a in annees[: len(annees) // 2 + 1]] if annees else []
+    pdfs = [{"siren": siren, "dateDepot": f"{a}-06-30", "libelle": "Comptes annuels", "confidentiality": "Public"}
+            for a in annees[len(annees) // 2 + 1:]]
+    actes = [{"siren": siren, "dateDepot": "2019-03-01", "libelle": "Acte",
+              "typeRdd": [{"decision": rng.choice(["Modification statutaire", "Approbation des comptes de l'exercice"])}]}]
+    return {"bilansSaisis": saisis, "bilans": pdfs, "actes": actes}
+
+
+# --- 2. SERVEUR ---
+class MockState:
+    def __init__(self, quota, token_ttl, error_rate, latency_ms, seed=0):
+        self.quota = quota
+        self.token_ttl = token_ttl
+        self.error_rate = error_rate
+        self.latency_ms = latency_ms
+        self.rng = random.Random(seed)
+        self.tokens = {}
+        self.lock = threading.Lock()
+        self.bucket = float(quota)
+        self.bucket_at = time.monotonic()
+        self.stats = Counter()
+        self.servis = Counter()
+        self.fenetre = deque()
+
+    def _quota_ok(self):
+        now = time.monotonic()
+        self.bucket = min(float(self.quota), self.bucket + (now - self.bucket_at) * self.quota)
+        self.bucket_at = now
+        # Pic de débit sur une fenêtre glissante d'une seconde
+        self.fenetre.append(now)
+        while self.fenetre and now - self.fenetre[0] > 1.0:
+            self.fenetre.popleft()
+        self.stats["pic_req_par_s"] = max(self.stats["pic_req_par_s"], len(self.fenetre))
+        if self.bucket >= 1:
+            self.bucket -= 1
+            return True
+        return False
+
+
+def make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, code, body=None, headers=None):
+            data = json.dumps(body if body is not None else {}, ensure_ascii=False).encode()
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+            if self.path != "/api/sso/login":
+                return self._send(404)
+            if not body.get("username") or not body.get("password"):
+                return self._send(401, {"message": "Identifiants invalides"})
+            token = uuid.uuid4().hex
+            with state.lock:
+                state.tokens[token] = time.monotonic() + state.token_ttl
+                state.stats["logins"] += 1
+            self._send(200, {"token": token})
+
+        def do_GET(self):
+            if self.path == "/__stats":
+                with state.lock:
+                    return self._send(200, {**state.stats, "sirens_servis": len(state.servis),
+                                            "servis_plusieurs_fois": sum(v > 1 for v in state.servis.values())})
+            match = ROUTE_BILANS.match(self.path)
+            if not match:
+                return self._send(404)
+            token = self.headers.get("Authorization", "").removeprefix("Bearer ")
+            with state.lock:
+                state.stats["requetes"] += 1
+                if state.tokens.get(token, 0) < time.monotonic():
+                    state.stats["401"] += 1
+                    return self._send(401, {"message": "Token expiré"})
+                if not state._quota_ok():
+                    state.stats["429"] += 1
+                    return self._send(429, {"message": "Quota dépassé"}, {"Retry-After": "1"})
+                erreur = state.rng.random() < state.error_rate
+                latence = state.rng.uniform(*state.latency_ms) / 1000
+            time.sleep(latence)
+            if erreur:
+                with state.lock:
+                    state.stats["5xx"] += 1
+                return self._send(state.rng.choice([500, 502, 503]))
+            siren = match.group(1)
+            data = payload_siren(siren)
+            with state.lock:
+                state.servis[siren] += 1
+            if data is None:
+                return self._send(404, {"message": "Entreprise inconnue"})
+            self._send(200, data)
+
+    return Handler
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Client interrompu en cours de réponse (scénario d'interruption) : attendu, pas d'alerte
+        pass
+
+
+def start_server(port=0, quota=50.0, token_ttl=600.0, error_rate=0.0, latency_ms=(5, 30)):
+    state = MockState(quota, token_ttl, error_rate, latency_ms)
+    server = MockServer(("127.0.0.1", port), make_handler(state))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+# --- 3. SCÉNARIO DE VÉRIFICATION ---
+def check(n_sirens, rate, workers):
+    """Acquisition interrompue puis reprise contre le bouchon : exhaustivité, unicité, contenu, quota"""
+    from acquisition import acquerir, extraire_bilans
+
+    server, state, url = start_server(quota=rate * 1.25, token_ttl=3.0, error_rate=0.05)
+    rng = random.Random(1)
+    sirens = [f"{rng.randint(100_000_000, 999_999_999)}" for _ in range(n_sirens)]
+    sirens = list(dict.fromkeys(sirens))
+    out = Path(tempfile.mkdtemp(prefix="mock_rne_"))
+    erreurs = []
+    try:
+        # 1er passage coupé au tiers du temps nominal (simule un Ctrl+C / crash)
+        try:
+            asyncio.run(asyncio.wait_for(
+                acquerir(sirens, out, url, "u", "p", rate=rate, workers=workers, progress_every=10**9),
+                timeout=len(sirens) / rate / 3,
+            ))
+        except (asyncio.TimeoutError, TimeoutError):
+            print("\n⏸️ Premier passage interrompu")
+        partiel = (out / "sirens_traites.txt").read_text().split()
+        # 2e et 3e passages : reprise, puis nouvel essai des échecs éventuels
+        for _ in range(2):
+            asyncio.run(acquerir(sirens, out, url, "u", "p", rate=rate, workers=workers, progress_every=10**9))
+
+        traites = (out / "sirens_traites.txt").read_text().split()
+        if sorted(set(traites)) != sorted(sirens):
+            erreurs.append(f"{len(set(sirens) - set(traites))} SIREN jamais traités")
+        if len(traites) != len(set(traites)):
+            erreurs.append(f"{len(traites) - len(set(traites))} SIREN marqués deux fois")
+        lignes = [json.loads(l) for l in (out / "bilans.jsonl").read_text(encoding="utf-8").splitlines()]
+        par_siren = {l["siren"]: l["bilans"] for l in lignes}
+        attendus = {s: extraire_bilans(payload_siren(s)) for s in sirens}
+        faux = [s for s, b in attendus.items() if b and par_siren.get(s) != b]
+        if faux:
+            erreurs.append(f"{len(faux)} SIREN avec des bilans différents de la source")
+        stats = json.loads(__import__("urllib.request").request.urlopen(f"{url}/__stats").read())
+        print(f"\n📊 Serveur : {stats}")
+        print(f"📁 {len(partiel)} SIREN traités avant l'interruption, {len(traites)} au total")
+        if stats.get("logins", 0) < 2:
+            erreurs.append("aucun renouvellement de token observé")
+        if stats.get("429", 0):
+            erreurs.append(f"{stats['429']} réponses 429 : le débit client a dépassé le quota serveur")
+    finally:
+        server.shutdown()
+        shutil.rmtree(out, ignore_errors=True)
+
+    print("✅ Vérification réussie" if not erreurs else "❌ " + " ; ".join(erreurs))
+    return not erreurs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bouchon local de l'API RNE (INPI)")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--quota", type=float, default=50.0, help="Requêtes/s tolérées avant 429")
+    parser.add_argument("--token-ttl", type=float, default=600.0)
+    parser.add_argument("--error-rate", type=float, default=0.02)
+    parser.add_argument("--check", type=int, metavar="N", help="Lance le scénario de vérification sur N SIREN")
+    parser.add_argument("--rate", type=float, default=40.0, help="Débit client pendant --check")
+    parser.add_argument("--workers", type=int, default=16)
+    args = parser.parse_args()
+
+    if args.check:
+        raise SystemExit(0 if check(args.check, args.rate, args.workers) else 1)
+    server, _, url = start_server(args.port, args.quota, args.token_ttl, args.error_rate)
+    print(f"🧪 Bouchon RNE sur {url} (quota {args.quota} req/s, token {args.token_ttl}s) — Ctrl+C pour arrêter")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,84 @@
+"""
+Étape de sortie ETL : écrit la base scorée partitionnée par département (dep=XX/part-0.parquet).
+
+- passe 1 : écriture en flux des lots Parquet dans une arborescence temporaire partitionnée
+  (mémoire bornée à un lot) ;
+- passe 2 : chaque partition est triée puis réécrite en row groups de taille fixe avec statistiques,
+  ce qui permet aux lecteurs pyarrow d'ignorer partitions et blocs hors filtre.
+
+Usage :
+    python partitionner.py dataset_scored.parquet ./dataset_partitionne
+"""
+import argparse
+import shutil
+import tempfile
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+# --- 1. CONFIGURATION ---
+COL_DEPT = "Code du département de l'établissement"
+PARTITION_KEY = "dep"
+PARTITIONING = ds.partitioning(pa.schema([(PARTITION_KEY, pa.string())]), flavor="hive")
+
+# Tri intra-partition : les filtres secteur / statut des pages deviennent sélectifs au niveau des row groups
+SORT_KEYS = [("fermeture", "ascending"), ("code_ape", "ascending"), ("age_estime", "ascending")]
+ROW_GROUP_SIZE = 64_000
+
+
+# --- 2. OUTILS ---
+def dep_key(column):
+    """Code département normalisé (même règle que le dashboard : '1' / '1.0' -> '01')"""
+    codes = pc.utf8_trim_whitespace(pc.cast(column, pa.string()))
+    codes = pc.replace_substring_regex(codes, pattern=r"\.0$", replacement="")
+    return pc.utf8_lpad(codes, width=2, padding="0")
+
+
+def write_partitions(source, destination, batch_size=250_000):
+    destination = Path(destination)
+    dataset = ds.dataset(source, format="parquet")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Passe 1 : répartition en flux, un lot à la fois
+        def batches():
+            for batch in dataset.to_batches(batch_size=batch_size):
+                yield batch.append_column(PARTITION_KEY, dep_key(batch.column(COL_DEPT)))
+
+        schema = dataset.schema.append(pa.field(PARTITION_KEY, pa.string()))
+        ds.write_dataset(
+            batches(), tmp, schema=schema, format="parquet", partitioning=PARTITIONING,
+            existing_data_behavior="overwrite_or_ignore", max_partitions=1024,
+        )
+
+        # Passe 2 : tri et réécriture partition par partition
+        if destination.exists():
+            shutil.rmtree(destination)
+        n_rows = 0
+        for part_dir in sorted(Path(tmp).iterdir()):
+            table = ds.dataset(part_dir, format="parquet").to_table()
+            keys = [(c, order) for c, order in SORT_KEYS if c in table.column_names]
+            if keys:
+                table = table.sort_by(keys)
+            out_dir = destination / part_dir.name
+            out_dir.mkdir(parents=True, exist_ok=True)
+            pq.write_table(
+                table, out_dir / "part-0.parquet", row_group_size=ROW_GROUP_SIZE,
+                write_statistics=True, compression="zstd",
+            )
+            n_rows += table.num_rows
+            print(f"   • {part_dir.name} : {table.num_rows:,} lignes".replace(",", " "))
+
+    print(f"✅ {n_rows:,} lignes écrites dans {destination}".replace(",", " "))
+    return n_rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Partitionnement de la base scorée par département")
+    parser.add_argument("source", help="Fichier (ou dossier) Parquet de la base scorée")
+    parser.add_argument("destination", help="Dossier de sortie partitionné (à synchroniser ensuite sur S3)")
+    parser.add_argument("--batch-size", type=int, default=250_000)
+    args = parser.parse_args()
+    write_partitions(args.source, args.destination, args.batch_size)
@@ -0,0 +1,15 @@
+"""
+Pipeline ETL reproductible : exports SIRENE -> dataset_full.parquet + mappings de l'API.
+
+Remplace l'exécution manuelle des notebooks 02_nettoyage, 02_cleaning, 03_datetime, 01_fusion et
+01_codes_ape. Les étapes sont explicites, leurs sorties sont mises en cache par empreinte de contenu,
+et les données circulent par lots entre les étapes.
+
+Usage (depuis src/etl) :
+    python -m pipeline --fermees economicref-france-sirene-v3.csv --ouvertes data.csv --out ./donnees
+    python -m pipeline --check 200000
+"""
+from .etapes import construire_etapes
+from .moteur import Etape, Pipeline, empreinte_code, hash_fichier
+
+__all__ = ["Etape", "Pipeline", "construire_etapes", "empreinte_code", "hash_fichier"]
@@ -0,0 +1,37 @@
+import argparse
+import os
+from pathlib import Path
+
+from .etapes import TAILLE_LOT, construire_etapes
+from .moteur import Pipeline
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pipeline ETL : exports SIRENE -> dataset_full.parquet + mappings")
+    parser.add_argument("--fermees", default=os.getenv("SIRENE_FERMEES", "economicref-france-sirene-v3.csv"),
+                        help="Export SIRENE des sociétés fermées")
+    parser.add_argument("--ouvertes", default=os.getenv("SIRENE_OUVERTES", "data.csv"),
+                        help="Export SIRENE des sociétés ouvertes")
+    parser.add_argument("--codes-ape", default="codes_ape.csv",
+                        help="Nomenclature APE (produite à partir de --naf-xls si fourni)")
+    parser.add_argument("--naf-xls", help="int_courts_naf_rev_2.xls (ajoute l'étape codes_ape)")
+    parser.add_argument("--out", default=os.getenv("PIPELINE_OUT", "."), help="Dossier des sorties et du cache")
+    parser.add_argument("--taille-lot", type=int, default=TAILLE_LOT, help="Lignes par lot")
+    parser.add_argument("--forcer", nargs="*", default=(), metavar="ETAPE", help="Étapes à rejouer malgré le cache")
+    parser.add_argument("--check", type=int, metavar="N", help="Vérification sur N lignes synthétiques par export")
+    args = parser.parse_args()
+
+    if args.check:
+        from .verification import check
+        raise SystemExit(0 if check(args.check) else 1)
+
+    out = Path(args.out)
+    out.mkdir(parents=True, exist_ok=True)
+    etapes = construire_etapes(Path(args.fermees), Path(args.ouvertes), Path(args.codes_ape), out,
+                               naf_xls=args.naf_xls, taille_lot=args.taille_lot)
+    try:
+        rapport = Pipeline(etapes, out).executer(forcer=set(args.forcer))
+    except Exception as e:
+        print(f"❌ Pipeline interrompu : {e}")
+        raise SystemExit(1)
+    print(f"🏁 {sum(v == 'executee' for v in rapport.values())} étape(s) exécutée(s), "
+          f"{sum(v == 'cache' for v in rapport.values())} en cache")
@@ -0,0 +1,423 @@
+"""
+Étapes du pipeline : portage par lots des notebooks de nettoyage.
+
+- codes_ape : 04_codes_ape/01_codes_ape (xls NAF -> codes_ape.csv), seulement si le xls est fourni ;
+- fermees   : 01_sociétés_fermées/01_sirene_v3 -> 02_nettoyage -> 03_eda -> 04_eda_2 ;
+- ouvertes  : 02_sociétés_ouvertes/02_cleaning -> 03_datetime ;
+- fusion    : 03_fusion_datasets/01_fusion (concaténation ouvertes puis fermées) ;
+- mappings  : mapping_dep_risk.json et mapping_ape_section.json (model/08_xgboost_v4).
+
+Chaque CSV est lu par lots, sans les colonnes que les notebooks suppriment sans les avoir utilisées.
+Chaque lot traverse toute la chaîne de transformations, puis est ajouté au Parquet de sortie.
+Les transformations sont ligne à ligne (filtres, conversions, jointure avec les sections APE).
+Le résultat ne dépend donc pas du découpage en lots.
+"""
+import contextlib
+import json
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# --- 1. CONFIGURATION ---
+TAILLE_LOT = 200_000
+SEP = ";"
+
+SIREN = "SIREN"
+NATURE = "Nature juridique de l'unité légale"
+CATEGORIE = "Catégorie juridique de l'unité légale"
+ESS = "Economie sociale et solidaire unité légale"
+FERMETURE_UL = "Date de fermeture de l'unité légale"
+FERMETURE_ETAB = "Date de fermeture de l'établissement"
+TRANCHE = "Tranche de l'effectif de l'unité légale"
+GEOLOC = "Géolocalisation de l'établissement"
+ACTIVITE = "Activité principale de l'unité légale"
+REGION = "Code de la région de l'établissement"
+DEPARTEMENT = "Code du département de l'établissement"
+ETAT_UL = "Etat administratif de l'unité légale"
+MAJ_ETAB = "Date de la dernière mise à jour de l'établissement"
+DATE_FINALE = "Date_fermeture_finale"
+
+SAS_SARL = ["SAS, société par actions simplifiée", "Société à responsabilité limitée (sans autre indication)"]
+
+# Typage à la lecture de 02_cleaning (+ région) ; le pipeline lit tout en texte, ce qui revient au même pour ces codes
+TYPES_FIXES = {
+    "Code postal de l'établissement": str,
+    "Code du département de l'établissement": str,
+    "SIREN": str,
+    "Code commune de l'établissement": str,
+    REGION: str,
+}
+
+# Colonnes supprimées par 02_nettoyage (fermées) et 02_cleaning (ouvertes, liste étendue)
+COLONNES_A_DROP = [
+    "Libellé cedex de l'établissement", "Numero de voie de l'établissement 2",
+    "Distribution spéciale de l'établissement", "Libellé du pays de l'établissement étranger.1",
+    "Prénom usuel de la personne physique", "Prénom de la personne physique 3",
+    "Indice de répétition de l'établissement 2", "Complément d'adresse de l'établissement 2",
+    "Code cedex de l'établissement", "Code pays de l'établissement", "Libellé cedex de l'établissement 2",
+    "Code cedex de l'établissement 2", "Code de la commune de l'établissement 2",
+    "Distribution spéciale de l'établissement 2", "Libellé de la commune de l'établissement étranger 2",
+    "Libellé de la commune de l'établissement 2", "Code postal de l'établissement 2",
+    "Libellé de la voie de l'établissement 2", "Type de voie de l'établissement 2",
+    "Pseudonyme de la personne physique", "Prénom de la personne physique 1", "Civilité de la personne physique",
+    "Prénom de la personne physique 4", "Caractère employeur de l'unité légale", "Première ligne de l'adressage",
+    "Nom de la personne physique", "Nom d'usage de la personne physique", "Prénom de la personne physique 2",
+    "Unité légale purgée", "Libellé de la commune de l'établissement à l'étranger",
+    "Code du pays de l'établissement étranger", "Identifiant association de l'unité légale",
+    "Libellé du pays de l'établissement étranger", "Dénomination usuelle de l'unité légale 3",
+    "Enseigne de l'établissement 3", "Dénomination usuelle de l'unité légale 2", "Enseigne de l'établissement 2",
+    "Société à mission unité légale", "Indice de répétition de l'établissement",
+    "Dénomination usuelle de l'unité légale 1", "Sigle de l'unité légale", "Enseigne de l'établissement 1",
+    "Complément d'adresse de l'établissement", "Année de la tranche d'effectif de l'établissement",
+    "Dénomination usuelle de l'établissement", "Activité principale de l'établissement",
+    "Année de la tranche de l'effectif de l'unité légale", "Etablissement siège",
+    "Statut de diffusion de l'établissement", "Statut de diffusion de l'unité légale",
+    "Tranche de l'effectif de l'établissement", "Tranche de l'effectif de l'établissement triable",
+    "Numéro de voie de l'établissement", "Type de voie de l'établissement", "Libellé de la voie de l'établissement",
+]
+COLONNES_A_DROP_OUVERTES = COLONNES_A_DROP + [
+    "NIC", "SIRET", "NIC du siège de l'unité légale", "Activité principale de l'établissement.1",
+    "Commune de l'établissement", "Caractère employeur de l'établissement",
+    "Date du dernier traitement de l'unité légale", "Nombre de périodes de l'unité légale",
+    "Etat administratif de l'établissement", "Code EPCI de l'établissement", "Libellé de l'EPCI de l'établissement",
+    "Département de l'établissement", "Région de l'établissement", "Section de l'établissement",
+    "Sous-section de l'établissement", "Division de l'établissement", "Groupe de l'établissement",
+    "Adresse de l'établissement", "SIRET du siège de l'unité légale", FERMETURE_ETAB,
+    "Tranche de l'effectif de l'unité légale triable", "Catégorie de l'entreprise",
+    "Année de la catégorie de l'entreprise", "Classe de l'établissement", "Section de l'unité légale",
+    "Sous-section de l'unité légale", "Division de l'unité légale", "Groupe de l'unité légale",
+    "Classe de l'unité légale", "Nombre de periodes de l'établissement",
+    "Nomenclature de l'activité principale de l'unité légale", "Nomenclature principale de l'établissement",
+    "Code de l'arrondissement de l'établissement",
+]
+
+# Fermées : lignes sans ces valeurs supprimées (02_nettoyage)
+COLS_NAN_FERMEES = [
+    GEOLOC, "Code EPCI de l'établissement", "Libellé de l'EPCI de l'établissement",
+    "Code de l'arrondissement de l'établissement", "Adresse de l'établissement", "Département de l'établissement",
+    "Région de l'établissement", DEPARTEMENT, REGION, "Code postal de l'établissement",
+    "Code commune de l'établissement", "Commune de l'établissement", "Caractère employeur de l'établissement",
+    "Dénomination de l'unité légale",
+]
+# Fermées : suppressions successives de 02_nettoyage et 04_eda_2
+COLONNES_A_DROP_FERMEES = COLONNES_A_DROP + [
+    "NIC", "NIC du siège de l'unité légale",
+    "Tranche de l'effectif de l'unité légale triable", "Catégorie de l'entreprise",
+    "Année de la catégorie de l'entreprise", "Classe de l'établissement", "Section de l'unité légale",
+    "Sous-section de l'unité légale", "Division de l'unité légale", "Groupe de l'unité légale",
+    "Classe de l'unité légale", "Nombre de periodes de l'établissement",
+    "Nomenclature de l'activité principale de l'unité légale", "Nomenclature principale de l'établissement",
+    "Code de l'arrondissement de l'établissement",
+    "Etat administratif de l'établissement", ETAT_UL, "SIRET du siège de l'unité légale",
+    MAJ_ETAB, "Date du début de la période de l'établissement", "Commune de l'établissement",
+    "Date du dernier traitement de l'unité légale", "Code EPCI de l'établissement",
+    "Libellé de l'EPCI de l'établissement", "Département de l'établissement", "Région de l'établissement",
+    NATURE, "Adresse de l'établissement", "Groupe de l'établissement", "Activité principale de l'établissement.1",
+    "SIRET", "Caractère employeur de l'établissement", "Nombre de périodes de l'unité légale",
+    "Section de l'établissement", "Sous-section de l'établissement", "Division de l'établissement",
+]
+
+# Tranches d'effectif (03_eda pour les fermées, 03_datetime pour les ouvertes)
+MAPPING_EFFECTIFS_FERMEES = {
+    "0 salarié": 0, "Etablissement non employeur": 0, "1 ou 2 salariés": 1, "3 à 5 salariés": 3,
+    "6 à 9 salariés": 6, "10 à 19 salariés": 10, "20 à 49 salariés": 20, "50 à 99 salariés": 50,
+    "100 à 199 salariés": 100, "250 à 499 salariés": 250,
+}
+MAPPING_EFFECTIFS_OUVERTES = {
+    **MAPPING_EFFECTIFS_FERMEES, "200 à 249 salariés": 200, "500 à 999 salariés": 500,
+    "1 000 à 1 999 salariés": 1000,
+}
+SEUIL_EFFECTIF = 50
+SEUIL_AGE_OUVERTES = 36
+SEUIL_DATE_FERMEES = "2026-01-23"
+
+# Âge estimé (03_eda / 03_datetime)
+COLS_DATES_AGE = ["Date de création de l'unité légale", "Date de début de l'unité légale",
+                  "Date de création de l'établissement"]
+COLS_DATES_OUVERTES = COLS_DATES_AGE + ["Date du début de la période de l'établissement"]
+BORNE_MIN = pd.Timestamp("1990-01-01")
+DATE_ABERRANTE = pd.Timestamp("1900-01-01")
+DATE_REF = pd.Timestamp("2025-12-31")
+
+# Colonnes supprimées par les notebooks après avoir servi (filtres, calculs) : elles restent lues
+UTILISEES_FERMEES = set(COLS_NAN_FERMEES) | {NATURE, ESS, FERMETURE_UL, FERMETURE_ETAB}
+UTILISEES_OUVERTES = {NATURE, ETAT_UL}
+# Ouvertes : convertie puis supprimée sans servir (03_datetime), inutile de la lire
+NON_UTILISEES_OUVERTES = {MAJ_ETAB}
+
+
+# --- 2. OUTILS ---
+@contextlib.contextmanager
+def semantique_notebooks():
+    """Chaînes en dtype object, comme sous pandas 2 où les notebooks ont été exécutés
+    (astype(str) d'un NaN donne 'nan', sélection par dtype == 'object'...)"""
+    try:
+        with pd.option_context("future.infer_string", False):
+            yield
+    except pd.errors.OptionError:
+        yield
+
+
+def _retirer(df, colonnes):
+    return df.drop(columns=[c for c in colonnes if c in df.columns])
+
+
+def entete(chemin):
+    """Noms de colonnes tels que pandas les lit (doublons suffixés '.1')"""
+    return pd.read_csv(chemin, sep=SEP, nrows=0).columns.tolist()
+
+
+def lire_par_lots(chemin, non_lues, requises, taille_lot):
+    """Lots de texte (dtype object), limités aux colonnes utiles"""
+    colonnes = entete(chemin)
+    manquantes = [c for c in requises if c not in colonnes]
+    if manquantes:
+        raise ValueError(f"{chemin} : colonnes absentes {manquantes}")
+    positions = [i for i, c in enumerate(colonnes) if c not in non_lues]
+    yield from pd.read_csv(chemin, sep=SEP, usecols=positions, dtype=str, chunksize=taille_lot)
+
+
+def charger_sections_ape(chemin):
+    ape = pd.read_csv(chemin)
+    ape["code_ape"] = ape["code_ape"].astype(str)
+    return ape[ape["code_ape"].str.len() == 2][["code_ape", "libelle_ape"]]
+
+
+def _ajouter_section_ape(df, ape_sections):
+    df[ACTIVITE] = df[ACTIVITE].astype(str)
+    df["ape_section"] = df[ACTIVITE].str[:2]
+    df = df.merge(ape_sections, how="left", left_on="ape_section", right_on="code_ape")
+    return df.rename(columns={"libelle_ape": "libelle_section_ape"})
+
+
+def _nettoyer_dates_age(df, colonnes):
+    for col in colonnes:
+        df[col] = pd.to_datetime(df[col], errors="coerce")
+        df.loc[df[col] == DATE_ABERRANTE, col] = pd.NaT
+        df.loc[df[col] < BORNE_MIN, col] = pd.NaT
+
+
+def _age_estime(df, date_fin):
+    ages = pd.concat([(date_fin - df[col]).dt.days / 365.25 for col in COLS_DATES_AGE], axis=1)
+    return ages.max(axis=1).round(0).astype("Int64")
+
+
+def _tranche_effectif(serie, mapping):
+    return serie.str.strip().map(mapping).astype("Int64")
+
+
+class EcrivainParquet:
+    """Ajoute des lots pandas à un Parquet ; schéma fixé par le premier lot non vide"""
+
+    def __init__(self, chemin):
+        self.chemin = chemin
+        self.writer = None
+        self.schema = None
+        self.vide = None
+        self.lignes = 0
+
+    def ecrire(self, df):
+        if df.empty:
+            self.vide = df if self.vide is None else self.vide
+            return
+        if self.writer is None:
+            self.schema = pa.Schema.from_pandas(df, preserve_index=False)
+            self.writer = pq.ParquetWriter(self.chemin, self.schema)
+        self.writer.write_table(pa.Table.from_pandas(df, schema=self.schema, preserve_index=False))
+        self.lignes += len(df)
+
+    def fermer(self):
+        if self.writer is None:
+            # Aucun lot non vide : fichier vide avec les colonnes attendues
+            (self.vide if self.vide is not None else pd.DataFrame()).to_parquet(self.chemin, index=False)
+        else:
+            self.writer.close()
+        return self.lignes
+
+
+# --- 3. TRANSFORMATIONS PAR LOT ---
+def transformer_fermees(df, ape_sections):
+    # 01_sirene_v3 : SAS classique et SARL sans autre indication
+    df = df[df[NATURE].isin(SAS_SARL)].copy()
+    # Colonne entière, comme l'inférence de read_csv dans le notebook (toujours renseignée après le filtre)
+    df[CATEGORIE] = df[CATEGORIE].astype("int64")
+
+    # 02_nettoyage. Le notebook remplace les NaN par '' puis '' par NaN : seul l'ESS en garde la trace ('N')
+    df[ESS] = df[ESS].fillna("N")
+    for col in (FERMETURE_UL, FERMETURE_ETAB):
+        df[col] = pd.to_datetime(df[col], errors="coerce")
+    df[DATE_FINALE] = df[[FERMETURE_ETAB, FERMETURE_UL]].max(axis=1)
+    df = df.drop(columns=[FERMETURE_ETAB, FERMETURE_UL])
+    df = df.dropna(subset=[DATE_FINALE])
+    df = df.dropna(subset=COLS_NAN_FERMEES)
+    df[REGION] = df[REGION].astype(str).str.replace(".0", "", regex=False)
+    df = df[df[DATE_FINALE] <= SEUIL_DATE_FERMEES].copy()
+
+    # 03_eda
+    df[DATE_FINALE] = pd.to_datetime(df[DATE_FINALE], errors="coerce", utc=True).dt.tz_localize(None).dt.normalize()
+    for col in COLS_DATES_AGE:
+        df[col] = pd.to_datetime(df[col], errors="coerce", utc=True).dt.tz_localize(None).dt.normalize()
+    df["Tranche_effectif_num"] = _tranche_effectif(df[TRANCHE], MAPPING_EFFECTIFS_FERMEES)
+    df = df.drop(columns=[TRANCHE])
+    _nettoyer_dates_age(df, COLS_DATES_AGE)
+    df["age_estime"] = _age_estime(df, df[DATE_FINALE].fillna(DATE_REF))
+    df = df.drop(columns=COLS_DATES_AGE)
+    df = df[df["Tranche_effectif_num"] < SEUIL_EFFECTIF].copy()
+    coords = df[GEOLOC].str.split(",", expand=True).reindex(columns=[0, 1])
+    df["latitude"] = pd.to_numeric(coords[0], errors="coerce")
+    df["longitude"] = pd.to_numeric(coords[1], errors="coerce")
+    df = df.dropna(subset=["latitude", "longitude"])
+    df = df.drop(columns=[GEOLOC])
+
+    # 04_eda_2
+    df = _retirer(df, COLONNES_A_DROP_FERMEES)
+    df = _ajouter_section_ape(df, ape_sections).drop(columns=["ape_section"])
+    df["fermeture"] = 1
+    df = df.dropna()
+    df[SIREN] = df[SIREN].astype(str).str.zfill(9)
+    return df
+
+
+def transformer_ouvertes(df, ape_sections):
+    # 02_cleaning
+    df = df[df[NATURE].isin(SAS_SARL)].copy()
+    df[CATEGORIE] = df[CATEGORIE].astype("int64")
+    df[ESS] = df[ESS].fillna("N")
+    df = df[df[FERMETURE_UL].isna()].copy()
+    df[FERMETURE_UL] = "2025-12-31"
+    df[REGION] = df[REGION].astype(str).str.replace(r"\.0$", "", regex=True)
+    for col in ("Date de création de l'établissement", "Date de création de l'unité légale", FERMETURE_UL):
+        df[col] = pd.to_datetime(df[col], errors="coerce")
+
+    # 03_datetime
+    df[DATE_FINALE] = df[[FERMETURE_UL]].max(axis=1)
+    df = df.drop(columns=[FERMETURE_UL])
+    df["Tranche_effectif_num"] = _tranche_effectif(df[TRANCHE], MAPPING_EFFECTIFS_OUVERTES)
+    df = df.drop(columns=[TRANCHE])
+    df = df[df["Tranche_effectif_num"] < SEUIL_EFFECTIF].copy()
+    _nettoyer_dates_age(df, COLS_DATES_OUVERTES)
+    df["age_estime"] = _age_estime(df, DATE_REF)
+    df = df.drop(columns=COLS_DATES_OUVERTES)
+    df = df[df["age_estime"] < SEUIL_AGE_OUVERTES].copy()
+    df = df[df[ETAT_UL] != "Cessée"]
+    df = _retirer(df, [ETAT_UL, MAJ_ETAB, NATURE])
+    coords = df[GEOLOC].str.split(",", expand=True).reindex(columns=[0, 1])
+    df["latitude"] = coords[0].astype(float)
+    df["longitude"] = coords[1].astype(float)
+    df = df.drop(columns=[GEOLOC])
+    df = _ajouter_section_ape(df, ape_sections).drop(columns=["ape_section"])
+    df["fermeture"] = 0
+    return df.dropna()
+
+
+# --- 4. ÉTAPES ---
+def etape_codes_ape(entrees, sorties):
+    with semantique_notebooks():
+        ape_df = pd.read_excel(entrees["naf_xls"], sheet_name="NAF rév. 2", engine="xlrd")
+        ape_df.columns = [c.strip().replace("\n", "") for c in ape_df.columns]
+        ape_df = ape_df[ape_df["Code"].notna()]
+        ape_df = ape_df[~ape_df["Code"].str.contains("SECTION")]
+        ape_df = ape_df[["Code", "Intitulés de la  NAF rév. 2, version finale"]]
+        ape_df.columns = ["code_ape", "libelle_ape"]
+        ape_df.reset_index(drop=True).to_csv(sorties["codes_ape"], index=False, encoding="utf-8-sig")
+    return {"codes": len(ape_df)}
+
+
+def _etape_branche(source, codes_ape, sortie, transformer, non_lues, requises, taille_lot):
+    with semantique_notebooks():
+        ape_sections = charger_sections_ape(codes_ape)
+        ecrivain = EcrivainParquet(sortie)
+        lues = 0
+        try:
+            for lot in lire_par_lots(source, non_lues, requises, taille_lot):
+                lues += len(lot)
+                ecrivain.ecrire(transformer(lot, ape_sections))
+        finally:
+            lignes = ecrivain.fermer()
+    return {"lues": lues, "ecrites": lignes}
+
+
+def etape_fermees(entrees, sorties, taille_lot=TAILLE_LOT):
+    non_lues = set(COLONNES_A_DROP_FERMEES) - UTILISEES_FERMEES
+    requises = set(COLONNES_A_DROP_FERMEES) | UTILISEES_FERMEES | {TRANCHE, GEOLOC, ACTIVITE, SIREN, CATEGORIE}
+    return _etape_branche(entrees["csv"], entrees["codes_ape"], sorties["parquet"], transformer_fermees,
+                          non_lues, sorted(requises | set(COLS_DATES_AGE)), taille_lot)
+
+
+def etape_ouvertes(entrees, sorties, taille_lot=TAILLE_LOT):
+    non_lues = (set(COLONNES_A_DROP_OUVERTES) | NON_UTILISEES_OUVERTES) - UTILISEES_OUVERTES
+    requises = set(COLONNES_A_DROP_OUVERTES) | UTILISEES_OUVERTES | {TRANCHE, GEOLOC, ACTIVITE, MAJ_ETAB, FERMETURE_UL}
+    return _etape_branche(entrees["csv"], entrees["codes_ape"], sorties["parquet"], transformer_ouvertes,
+                          non_lues, sorted(requises | set(COLS_DATES_OUVERTES)), taille_lot)
+
+
+def schema_fusion(fichiers):
+    """Schéma de pd.concat(...) sans lire les données : types Arrow des deux fichiers unifiés
+    (identiques ici, les deux branches produisant les mêmes colonnes), métadonnées pandas du premier"""
+    schemas = [pq.read_schema(f) for f in fichiers]
+    schema = pa.unify_schemas([s.remove_metadata() for s in schemas], promote_options="permissive")
+    return schema.with_metadata(schemas[0].metadata)
+
+
+def etape_fusion(entrees, sorties, taille_lot=TAILLE_LOT):
+    fichiers = [entrees["ouvertes"], entrees["fermees"]]
+    schema = schema_fusion(fichiers)
+    lignes = 0
+    with pq.ParquetWriter(sorties["parquet"], schema) as writer:
+        for f in fichiers:
+            for batch in pq.ParquetFile(f).iter_batches(batch_size=taille_lot):
+                colonnes = [batch.column(c.name) if c.name in batch.schema.names else pa.nulls(len(batch), c.type)
+                            for c in schema]
+                writer.write_table(pa.Table.from_arrays(colonnes, names=schema.names).cast(schema))
+                lignes += len(batch)
+    return {"lignes": lignes}
+
+
+def etape_mappings(entrees, sorties, taille_lot=TAILLE_LOT):
+    """Moyenne de fermeture par département et dictionnaire section APE -> libellé, en flux"""
+    colonnes = [DEPARTEMENT, "fermeture", "code_ape", "libelle_section_ape"]
+    sommes, comptes, ape = None, None, {}
+    with semantique_notebooks():
+        for batch in pq.ParquetFile(entrees["parquet"]).iter_batches(batch_size=taille_lot, columns=colonnes):
+            df = batch.to_pandas()
+            dep = df[DEPARTEMENT].astype(str).str.zfill(2)
+            agg = df["fermeture"].groupby(dep).agg(["sum", "count"])
+            sommes = agg["sum"] if sommes is None else sommes.add(agg["sum"], fill_value=0)
+            comptes = agg["count"] if comptes is None else comptes.add(agg["count"], fill_value=0)
+            codes = df["code_ape"].astype(str).str.replace(r"\.0$", "", regex=True).str.zfill(2)
+            # update conserve la position de première apparition et la dernière valeur, comme dict(zip(...))
+            ape.update(zip(codes, df["libelle_section_ape"]))
+
+        if sommes is None:
+            risque = pd.Series(dtype="float64")
+        else:
+            risque = (sommes / comptes).sort_index()
+        risque.index.name = DEPARTEMENT
+        risque.name = "fermeture"
+        risque.to_json(sorties["dep_risk"])
+    with open(sorties["ape_section"], "w") as f:
+        json.dump(ape, f)
+    return {"departements": len(risque), "sections_ape": len(ape)}
+
+
+# --- 5. ASSEMBLAGE ---
+def construire_etapes(sirene_fermees, sirene_ouvertes, codes_ape, dossier, naf_xls=None, taille_lot=TAILLE_LOT):
+    from .moteur import Etape
+
+    etapes = []
+    if naf_xls:
+        etapes.append(Etape("codes_ape", etape_codes_ape, {"naf_xls": naf_xls}, {"codes_ape": codes_ape}))
+    lot = {"taille_lot": taille_lot}
+    etapes += [
+        Etape("fermees", etape_fermees, {"csv": sirene_fermees, "codes_ape": codes_ape},
+              {"parquet": dossier / "dataset_closed_final.parquet"}, lot),
+        Etape("ouvertes", etape_ouvertes, {"csv": sirene_ouvertes, "codes_ape": codes_ape},
+              {"parquet": dossier / "dataset_open_final.parquet"}, lot),
+        Etape("fusion", etape_fusion,
+              {"ouvertes": dossier / "dataset_open_final.parquet", "fermees": dossier / "dataset_closed_final.parquet"},
+              {"parquet": dossier / "dataset_full.parquet"}, lot),
+        Etape("mappings", etape_mappings, {"parquet": dossier / "dataset_full.parquet"},
+              {"dep_risk": dossier / "mapping_dep_risk.json", "ape_section": dossier / "mapping_ape_section.json"}, lot),
+    ]
+    return etapes
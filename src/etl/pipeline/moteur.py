@@ -0,0 +1,161 @@
+"""
+Moteur du pipeline : étapes déclarées, cache par empreinte de contenu, sorties atomiques.
+
+Une étape n'est rejouée que si sa clé change. La clé combine :
+- l'empreinte SHA-256 du contenu de ses fichiers d'entrée ;
+- l'empreinte de son code (source de la fonction, des fonctions du même module qu'elle appelle
+  et des constantes qu'elle lit) ;
+- ses paramètres.
+Les empreintes des sorties sont aussi enregistrées. Une étape rejouée qui réécrit un fichier
+identique laisse donc les étapes suivantes en cache (coupure anticipée).
+"""
+import hashlib
+import inspect
+import json
+import os
+import time
+import types
+from pathlib import Path
+
+# --- 1. CONFIGURATION ---
+MANIFESTE = ".pipeline_cache.json"
+TAILLE_BLOC_HASH = 1 << 20
+CONSTANTES = (str, int, float, bool, tuple, list, dict, set, frozenset)
+
+
+# --- 2. EMPREINTES ---
+def hash_fichier(chemin, memo):
+    """SHA-256 du contenu ; mémorisé par (taille, mtime) pour ne pas relire un fichier inchangé"""
+    chemin = Path(chemin)
+    st = chemin.stat()
+    cle = str(chemin.resolve())
+    connu = memo.get(cle)
+    if connu and connu["taille"] == st.st_size and connu["mtime_ns"] == st.st_mtime_ns:
+        return connu["sha256"]
+    h = hashlib.sha256()
+    with open(chemin, "rb") as f:
+        for bloc in iter(lambda: f.read(TAILLE_BLOC_HASH), b""):
+            h.update(bloc)
+    memo[cle] = {"taille": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": h.hexdigest()}
+    return memo[cle]["sha256"]
+
+
+def _noms_references(code):
+    """Noms globaux lus par un objet code, y compris dans ses lambdas et compréhensions"""
+    noms = list(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            noms += _noms_references(const)
+    return noms
+
+
+def _repr_stable(valeur):
+    # L'ordre d'un set dépend du hachage aléatoire des chaînes : on le trie
+    if isinstance(valeur, (set, frozenset)):
+        return repr(sorted(valeur, key=repr))
+    return repr(valeur)
+
+
+def empreinte_code(fonction):
+    """Empreinte de la fonction, des fonctions de son module qu'elle appelle et des constantes lues"""
+    vues, morceaux = set(), []
+
+    def visiter(fn):
+        if fn in vues:
+            return
+        vues.add(fn)
+        morceaux.append(inspect.getsource(fn))
+        for nom in _noms_references(fn.__code__):
+            valeur = fn.__globals__.get(nom)
+            if isinstance(valeur, types.FunctionType) and valeur.__module__ == fn.__module__:
+                visiter(valeur)
+            elif isinstance(valeur, CONSTANTES):
+                morceaux.append(f"{nom}={_repr_stable(valeur)}")
+
+    visiter(fonction)
+    return hashlib.sha256("\n".join(morceaux).encode()).hexdigest()
+
+
+# --- 3. ÉTAPES ---
+class Etape:
+    """fonction(entrees, sorties, **params) -> dict de statistiques ; écrit chaque sortie au chemin fourni"""
+
+    def __init__(self, nom, fonction, entrees, sorties, params=None):
+        self.nom = nom
+        self.fonction = fonction
+        self.entrees = {k: Path(v) for k, v in entrees.items()}
+        self.sorties = {k: Path(v) for k, v in sorties.items()}
+        self.params = params or {}
+
+
+class Pipeline:
+    def __init__(self, etapes, dossier):
+        self.etapes = etapes
+        self.chemin_manifeste = Path(dossier) / MANIFESTE
+
+    def _charger(self):
+        try:
+            return json.loads(self.chemin_manifeste.read_text(encoding="utf-8"))
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {"fichiers": {}, "etapes": {}}
+
+    def _sauver(self, manifeste):
+        tmp = self.chemin_manifeste.with_name(self.chemin_manifeste.name + ".tmp")
+        tmp.write_text(json.dumps(manifeste, ensure_ascii=False, indent=1), encoding="utf-8")
+        os.replace(tmp, self.chemin_manifeste)
+
+    def cle(self, etape, memo):
+        contenu = {
+            "code": empreinte_code(etape.fonction),
+            "params": etape.params,
+            "entrees": {k: hash_fichier(p, memo) for k, p in sorted(etape.entrees.items())},
+        }
+        return hashlib.sha256(json.dumps(contenu, sort_keys=True, default=str).encode()).hexdigest()
+
+    def _a_jour(self, etape, cle, precedent, memo):
+        if not precedent or precedent["cle"] != cle:
+            return False
+        return all(p.exists() and hash_fichier(p, memo) == precedent["sorties"].get(k)
+                   for k, p in etape.sorties.items())
+
+    def executer(self, forcer=()):
+        """Exécute les étapes dans l'ordre ; renvoie {étape: 'cache' | 'executee'}"""
+        manifeste = self._charger()
+        memo = manifeste["fichiers"]
+        rapport = {}
+        for etape in self.etapes:
+            absentes = [str(p) for p in etape.entrees.values() if not p.exists()]
+            if absentes:
+                raise FileNotFoundError(f"[{etape.nom}] entrée(s) absente(s) : {', '.join(absentes)}")
+            cle = self.cle(etape, memo)
+            if etape.nom not in forcer and self._a_jour(etape, cle, manifeste["etapes"].get(etape.nom), memo):
+                print(f"♻️ [{etape.nom}] inchangée, ignorée")
+                rapport[etape.nom] = "cache"
+                continue
+
+            print(f"⚙️ [{etape.nom}] en cours...")
+            debut = time.perf_counter()
+            temporaires = {k: p.with_name(p.name + ".tmp") for k, p in etape.sorties.items()}
+            for p in etape.sorties.values():
+                p.parent.mkdir(parents=True, exist_ok=True)
+            try:
+                stats = etape.fonction(etape.entrees, temporaires, **etape.params) or {}
+            except Exception:
+                for tmp in temporaires.values():
+                    tmp.unlink(missing_ok=True)
+                raise
+            for k, tmp in temporaires.items():
+                os.replace(tmp, etape.sorties[k])
+
+            duree = time.perf_counter() - debut
+            manifeste["etapes"][etape.nom] = {
+                "cle": cle,
+                "sorties": {k: hash_fichier(p, memo) for k, p in etape.sorties.items()},
+                "duree_s": round(duree, 2),
+                "stats": stats,
+            }
+            # Manifeste écrit après chaque étape : une interruption ne perd que l'étape en cours
+            self._sauver(manifeste)
+            rapport[etape.nom] = "executee"
+            print(f"✅ [{etape.nom}] {duree:.1f}s {stats}")
+        return rapport
@@ -0,0 +1,201 @@
+"""
+Chaîne de référence : les cellules de traitement des notebooks, rejouées telles quelles
+(chargements complets en mémoire, un Parquet intermédiaire entre chaque notebook).
+
+Sert uniquement à la vérification (python -m pipeline --check) : mêmes sorties attendues,
+temps et pic mémoire comparés à ceux du pipeline.
+"""
+import json
+
+import numpy as np
+import pandas as pd
+
+from .etapes import (COLONNES_A_DROP, COLONNES_A_DROP_OUVERTES, COLS_NAN_FERMEES, MAPPING_EFFECTIFS_FERMEES,
+                     MAPPING_EFFECTIFS_OUVERTES, SAS_SARL, TYPES_FIXES, semantique_notebooks)
+
+
+def _sections_ape(codes_ape):
+    ape = pd.read_csv(codes_ape)
+    ape["code_ape"] = ape["code_ape"].astype(str)
+    return ape[ape["code_ape"].str.len() == 2][["code_ape", "libelle_ape"]]
+
+
+def _age(df, cols_dates, date_fin):
+    borne_min = pd.Timestamp("1990-01-01")
+    date_aberrante = pd.Timestamp("1900-01-01")
+    for col in cols_dates:
+        df[col] = pd.to_datetime(df[col], errors="coerce")
+        df.loc[df[col] == date_aberrante, col] = pd.NaT
+        df.loc[df[col] < borne_min, col] = pd.NaT
+    df["age_unite_legale"] = (date_fin - df["Date de création de l'unité légale"]).dt.days / 365.25
+    df["age_debut_unite"] = (date_fin - df["Date de début de l'unité légale"]).dt.days / 365.25
+    df["age_etablissement"] = (date_fin - df["Date de création de l'établissement"]).dt.days / 365.25
+    df["age_estime"] = df[["age_unite_legale", "age_debut_unite", "age_etablissement"]].max(axis=1)
+    df["age_estime"] = df["age_estime"].round(0).astype("Int64")
+    df["age_estime_incertain"] = df[cols_dates].isna().all(axis=1).astype(int)
+    df = df.drop(columns=cols_dates + ["age_unite_legale", "age_debut_unite", "age_etablissement"])
+    return df.drop(columns=["age_estime_incertain"])
+
+
+def _section_ape(df, codes_ape):
+    df["Activité principale de l'unité légale"] = df["Activité principale de l'unité légale"].astype(str)
+    df["ape_section"] = df["Activité principale de l'unité légale"].str[:2]
+    df = df.merge(_sections_ape(codes_ape), how="left", left_on="ape_section", right_on="code_ape")
+    return df.rename(columns={"libelle_ape": "libelle_section_ape"})
+
+
+def fermees(csv, codes_ape, tmp):
+    # 01_sirene_v3
+    df = pd.read_csv(csv, sep=";", dtype=TYPES_FIXES)
+    df = df[df["Nature juridique de l'unité légale"].isin(SAS_SARL)]
+    df_final = df.copy()
+    for col in df_final.columns:
+        if df_final[col].dtype == 'object':
+            df_final[col] = df_final[col].fillna('').astype(str)
+    df_final.to_parquet(tmp / "sas_sarl_filtered.parquet", index=False)
+    del df, df_final
+
+    # 02_nettoyage
+    df = pd.read_parquet(tmp / "sas_sarl_filtered.parquet")
+    df = df.drop(columns=COLONNES_A_DROP)
+    df['Economie sociale et solidaire unité légale'] = df['Economie sociale et solidaire unité légale'].replace('', 'N')
+    df = df.replace('', np.nan)
+    for col in ("Date de fermeture de l'unité légale", "Date de fermeture de l'établissement"):
+        df[col] = pd.to_datetime(df[col], errors="coerce")
+    df["Date_fermeture_finale"] = df[["Date de fermeture de l'établissement",
+                                      "Date de fermeture de l'unité légale"]].max(axis=1)
+    df.drop(columns=["Date de fermeture de l'établissement", "Date de fermeture de l'unité légale"], inplace=True)
+    df = df.dropna(subset=["Date_fermeture_finale"])
+    df_clean = df.dropna(subset=COLS_NAN_FERMEES)
+    df_clean = df_clean.drop(columns=["NIC", "NIC du siège de l'unité légale"]).reset_index(drop=True)
+    df_clean = df_clean.drop(columns=[
+        "Tranche de l'effectif de l'unité légale triable", "Catégorie de l'entreprise",
+        "Année de la catégorie de l'entreprise", "Classe de l'établissement", "Section de l'unité légale",
+        "Sous-section de l'unité légale", "Division de l'unité légale", "Groupe de l'unité légale",
+        "Classe de l'unité légale", "Nombre de periodes de l'établissement",
+        "Nomenclature de l'activité principale de l'unité légale", "Nomenclature principale de l'établissement",
+        "Code de l'arrondissement de l'établissement"])
+    df_clean = df_clean.drop(columns=["Etat administratif de l'établissement", "Etat administratif de l'unité légale",
+                                      "SIRET du siège de l'unité légale"])
+    for col in ("Code de la région de l'établissement", "Code EPCI de l'établissement"):
+        df_clean[col] = df_clean[col].astype(str).str.replace('.0', '', regex=False)
+    df_clean = df_clean[df_clean['Date_fermeture_finale'] <= '2026-01-23'].copy()
+    df_clean.to_parquet(tmp / "dataset_clean.parquet", index=False)
+    del df, df_clean
+
+    # 03_eda
+    df = pd.read_parquet(tmp / "dataset_clean.parquet")
+    df["Tranche de l'effectif de l'unité légale"] = df["Tranche de l'effectif de l'unité légale"].str.strip()
+    df['Tranche_effectif_num'] = df["Tranche de l'effectif de l'unité légale"].map(MAPPING_EFFECTIFS_FERMEES).astype('Int64')
+    df = df.drop(columns=["Tranche de l'effectif de l'unité légale"])
+    for col in ["Date de création de l'établissement", "Date de la dernière mise à jour de l'établissement",
+                "Date du début de la période de l'établissement", "Date de création de l'unité légale",
+                "Date du dernier traitement de l'unité légale", "Date de début de l'unité légale",
+                "Date_fermeture_finale"]:
+        df[col] = pd.to_datetime(df[col], errors='coerce', utc=True)
+        if pd.api.types.is_datetime64_any_dtype(df[col]):
+            df[col] = df[col].dt.tz_localize(None).dt.normalize()
+    cols_dates = ["Date de création de l'unité légale", "Date de début de l'unité légale",
+                  "Date de création de l'établissement"]
+    df = _age(df, cols_dates, df["Date_fermeture_finale"].fillna(pd.Timestamp("2025-12-31")))
+    df_map = df[df["Tranche_effectif_num"] < 50].copy()
+    coords = df_map["Géolocalisation de l'établissement"].str.split(",", expand=True)
+    df_map["latitude"] = pd.to_numeric(coords[0], errors='coerce')
+    df_map["longitude"] = pd.to_numeric(coords[1], errors='coerce')
+    df_map = df_map.dropna(subset=["latitude", "longitude"])
+    df_map = df_map.drop(columns=["Géolocalisation de l'établissement"])
+    df_map.to_parquet(tmp / "dataset_map.parquet", index=False)
+    del df, df_map
+
+    # 04_eda_2
+    df = pd.read_parquet(tmp / "dataset_map.parquet")
+    df.drop(columns=[
+        "Date de la dernière mise à jour de l'établissement", "Date du début de la période de l'établissement",
+        "Commune de l'établissement", "Date du dernier traitement de l'unité légale", "Code EPCI de l'établissement",
+        "Libellé de l'EPCI de l'établissement", "Département de l'établissement", "Région de l'établissement",
+        "Nature juridique de l'unité légale", "Adresse de l'établissement", "Groupe de l'établissement",
+        "Activité principale de l'établissement.1"], inplace=True)
+    df = _section_ape(df, codes_ape)
+    df = df.drop(columns=['SIRET', "Caractère employeur de l'établissement", "Nombre de périodes de l'unité légale",
+                          "Section de l'établissement", "Sous-section de l'établissement",
+                          "Division de l'établissement", "ape_section"])
+    df['fermeture'] = 1
+    df = df.dropna()
+    df['SIREN'] = df['SIREN'].astype(str).str.zfill(9)
+    df.to_parquet(tmp / "dataset_closed_final.parquet", index=False)
+
+
+def ouvertes(csv, codes_ape, tmp):
+    # 02_cleaning
+    df = pd.read_csv(csv, dtype=TYPES_FIXES, sep=";", low_memory=False)
+    df = df.drop(columns=COLONNES_A_DROP_OUVERTES)
+    df_filtered = df[df["Nature juridique de l'unité légale"].isin(SAS_SARL)]
+    df_filtered['Economie sociale et solidaire unité légale'] = (
+        df_filtered['Economie sociale et solidaire unité légale'].fillna("N"))
+    df_filtered = df_filtered[df_filtered["Date de fermeture de l'unité légale"].isna()]
+    df_filtered["Date de fermeture de l'unité légale"] = "2025-12-31"
+    df_filtered["Code de la région de l'établissement"] = (
+        df_filtered["Code de la région de l'établissement"].astype(str).str.replace(r'\.0$', '', regex=True))
+    for col in ["Date de création de l'établissement", "Date de création de l'unité légale",
+                "Date de fermeture de l'unité légale"]:
+        df_filtered[col] = pd.to_datetime(df_filtered[col], errors='coerce')
+    df_filtered.to_parquet(tmp / "sas_sarl_ouvertes.parquet", index=False)
+    del df, df_filtered
+
+    # 03_datetime
+    df = pd.read_parquet(tmp / "sas_sarl_ouvertes.parquet")
+    df["Date_fermeture_finale"] = df[["Date de fermeture de l'unité légale"]].max(axis=1)
+    df.drop(columns=["Date de fermeture de l'unité légale"], inplace=True)
+    df["Tranche de l'effectif de l'unité légale"] = df["Tranche de l'effectif de l'unité légale"].str.strip()
+    df['Tranche_effectif_num'] = df["Tranche de l'effectif de l'unité légale"].map(MAPPING_EFFECTIFS_OUVERTES).astype('Int64')
+    df = df.drop(columns=["Tranche de l'effectif de l'unité légale"])
+    df_filtered = df[df["Tranche_effectif_num"] < 50].copy()
+    cols_dates = ["Date de création de l'unité légale", "Date de début de l'unité légale",
+                  "Date de création de l'établissement", "Date du début de la période de l'établissement"]
+    df_filtered = _age(df_filtered, cols_dates, pd.Timestamp("2025-12-31"))
+    df_filtered = df_filtered[(df_filtered['age_estime'] < 36)].copy()
+    df_filtered = df_filtered[df_filtered["Etat administratif de l'unité légale"] != "Cessée"]
+    df_filtered = df_filtered.drop(columns=["Etat administratif de l'unité légale"])
+    df_filtered["Date de la dernière mise à jour de l'établissement"] = (
+        pd.to_datetime(df_filtered["Date de la dernière mise à jour de l'établissement"], errors="coerce", utc=True)
+        .dt.tz_convert(None).dt.normalize())
+    df_filtered.drop(columns=["Date de la dernière mise à jour de l'établissement"], inplace=True)
+    df_filtered.drop(columns=["Nature juridique de l'unité légale"], inplace=True)
+    df_map = df_filtered.copy()
+    coords = df_map["Géolocalisation de l'établissement"].str.split(",", expand=True)
+    df_map["latitude"] = coords[0].astype(float)
+    df_map["longitude"] = coords[1].astype(float)
+    df_map = df_map.drop(columns=['Géolocalisation de l\'établissement'])
+    df_map = _section_ape(df_map, codes_ape)
+    df_map = df_map.drop(columns=['ape_section'])
+    df_map['fermeture'] = 0
+    df_map = df_map.dropna()
+    df_map.to_parquet(tmp / "dataset_open_final.parquet", index=False)
+
+
+def fusion(tmp):
+    # 01_fusion
+    open = pd.read_parquet(tmp / "dataset_open_final.parquet")
+    closed = pd.read_parquet(tmp / "dataset_closed_final.parquet")
+    full = pd.concat([open, closed], ignore_index=True)
+    full.to_parquet(tmp / "dataset_full.parquet", index=False)
+
+
+def mappings(tmp):
+    # model/08_xgboost_v4
+    df = pd.read_parquet(tmp / "dataset_full.parquet")
+    df['Code du département de l\'établissement'] = df['Code du département de l\'établissement'].astype(str).str.zfill(2)
+    dep_risk_map = df.groupby("Code du département de l'établissement")["fermeture"].mean()
+    dep_risk_map.to_json(tmp / "mapping_dep_risk.json")
+    df['code_ape_str'] = df['code_ape'].astype(str).str.replace(r'\.0$', '', regex=True).str.zfill(2)
+    mapping_ape_dict = dict(zip(df['code_ape_str'], df['libelle_section_ape']))
+    with open(tmp / "mapping_ape_section.json", 'w') as f:
+        json.dump(mapping_ape_dict, f)
+
+
+def executer(sirene_fermees, sirene_ouvertes, codes_ape, dossier):
+    with semantique_notebooks():
+        fermees(sirene_fermees, codes_ape, dossier)
+        ouvertes(sirene_ouvertes, codes_ape, dossier)
+        fusion(dossier)
+        mappings(dossier)
@@ -0,0 +1,239 @@
+"""
+Vérification du pipeline sur des exports SIRENE synthétiques.
+
+- sorties identiques à la chaîne de notebooks (reference.py) : dataset_full.parquet (schéma et valeurs)
+  et les deux JSON de mapping ;
+- temps et pic mémoire (RSS) mesurés dans des processus séparés ;
+- cache : relance sans changement, fichier réécrit à l'identique, ajout d'une ligne écartée par les
+  filtres (l'étape rejouée produit la même sortie et les étapes suivantes restent en cache).
+"""
+import json
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from .etapes import (COLONNES_A_DROP_FERMEES, COLONNES_A_DROP_OUVERTES, COLS_DATES_OUVERTES, COLS_NAN_FERMEES,
+                     MAPPING_EFFECTIFS_OUVERTES)
+
+# --- 1. DONNÉES SYNTHÉTIQUES ---
+NATURES = {
+    "SAS, société par actions simplifiée": "5710",
+    "Société à responsabilité limitée (sans autre indication)": "5499",
+    "Société à responsabilité limitée unipersonnelle": "5498",
+    "Société anonyme à conseil d'administration (s.a.i.)": "5599",
+    "Entrepreneur individuel": "1000",
+}
+TRANCHES = list(MAPPING_EFFECTIFS_OUVERTES) + [" 1 ou 2 salariés", "3 à 5 salariés ", "Unités non employeuses", ""]
+SECTIONS_APE = {"01": "Culture et production animale", "41": "Construction de bâtiments",
+                "47": "Commerce de détail", "56": "Restauration", "62": "Programmation, conseil et autres activités informatiques",
+                "70": "Activités des sièges sociaux ; conseil de gestion"}
+ACTIVITES = ["01.11Z", "41.20A", "47.11B", "56.10A", "62.01Z", "70.22Z", "99.00Z", ""]
+DEPARTEMENTS = ["01", "2A", "13", "69", "75", "971"]
+REGIONS = ["84", "94", "93", "11", "01", ""]
+COLONNE_INCONNUE = "Date du dernier traitement de l'établissement"
+
+
+def colonnes_sirene():
+    """En-tête de l'export : toutes les colonnes nommées par les notebooks, doublons compris"""
+    noms = []
+    for c in (["SIREN", "Nature juridique de l'unité légale", "Catégorie juridique de l'unité légale",
+               "Economie sociale et solidaire unité légale", "Date de fermeture de l'unité légale",
+               "Tranche de l'effectif de l'unité légale", "Activité principale de l'unité légale",
+               "Etat administratif de l'unité légale", "Date de la dernière mise à jour de l'établissement",
+               "Dénomination de l'unité légale", COLONNE_INCONNUE]
+              + COLS_DATES_OUVERTES + COLS_NAN_FERMEES + COLONNES_A_DROP_OUVERTES + COLONNES_A_DROP_FERMEES):
+        if c not in noms:
+            noms.append(c)
+    # Les doublons ('.1' une fois lus par pandas) après leur première occurrence
+    return [c for c in noms if not c.endswith(".1")] + [c[:-2] for c in noms if c.endswith(".1")]
+
+
+def _dates(rng, n, debut, fin, manquantes=0.03, aberrantes=0.0):
+    jours = rng.integers(pd.Timestamp(debut).value // 86_400_000_000_000, pd.Timestamp(fin).value // 86_400_000_000_000, n)
+    dates = pd.to_datetime(jours, unit="D").strftime("%Y-%m-%d").to_numpy(dtype=object)
+    tirage = rng.random(n)
+    dates[tirage < aberrantes] = "1900-01-01"
+    dates[(tirage >= aberrantes) & (tirage < aberrantes + manquantes)] = ""
+    return dates
+
+
+def _lot_sirene(rng, n, fermees):
+    natures = rng.choice(list(NATURES), n, p=[0.45, 0.35, 0.1, 0.05, 0.05])
+    siren = np.char.zfill(rng.integers(0, 999_999_999, n).astype(str), 9)
+    nic = np.char.zfill(rng.integers(1, 99_999, n).astype(str), 5)
+    geoloc = np.char.add(np.char.add(rng.uniform(41, 51, n).round(4).astype(str), ","),
+                         rng.uniform(-5, 9, n).round(4).astype(str)).astype(object)
+    tirage = rng.random(n)
+    geoloc[tirage < 0.03] = ""
+    geoloc[(tirage >= 0.03) & (tirage < 0.04)] = "48.85"
+    fermeture_ul = _dates(rng, n, "2005-01-01", "2026-06-30", manquantes=0.2 if fermees else 0.9)
+    valeurs = {
+        "SIREN": siren, "NIC": nic, "SIRET": np.char.add(siren, nic),
+        "SIRET du siège de l'unité légale": np.char.add(siren, nic), "NIC du siège de l'unité légale": nic,
+        "Nature juridique de l'unité légale": natures,
+        "Catégorie juridique de l'unité légale": np.array([NATURES[x] for x in natures]),
+        "Economie sociale et solidaire unité légale": rng.choice(["O", "N", ""], n, p=[0.05, 0.45, 0.5]),
+        "Tranche de l'effectif de l'unité légale": rng.choice(TRANCHES, n),
+        "Activité principale de l'unité légale": rng.choice(ACTIVITES, n),
+        "Etat administratif de l'unité légale": rng.choice(["Active", "Cessée"], n, p=[0.9, 0.1]),
+        "Etat administratif de l'établissement": rng.choice(["Actif", "Fermé"], n),
+        "Date de fermeture de l'unité légale": fermeture_ul,
+        "Date de fermeture de l'établissement": _dates(rng, n, "2005-01-01", "2026-06-30", manquantes=0.5),
+        "Date de la dernière mise à jour de l'établissement": np.full(n, "2024-03-01T10:22:33+00:00"),
+        "Date du dernier traitement de l'unité légale": np.full(n, "2024-05-01T00:00:00"),
+        "Date de création de l'unité légale": _dates(rng, n, "1960-01-01", "2025-06-30", aberrantes=0.02),
+        "Date de début de l'unité légale": _dates(rng, n, "1960-01-01", "2025-06-30"),
+        "Date de création de l'établissement": _dates(rng, n, "1985-01-01", "2025-06-30"),
+        "Date du début de la période de l'établissement": _dates(rng, n, "1995-01-01", "2025-06-30"),
+        "Géolocalisation de l'établissement": geoloc,
+        "Code du département de l'établissement": rng.choice(DEPARTEMENTS, n),
+        "Code de la région de l'établissement": rng.choice(REGIONS, n, p=[0.3, 0.2, 0.2, 0.2, 0.08, 0.02]),
+        "Code postal de l'établissement": np.char.zfill(rng.integers(1000, 98000, n).astype(str), 5),
+        "Code commune de l'établissement": np.char.zfill(rng.integers(1000, 98000, n).astype(str), 5),
+        "Code EPCI de l'établissement": rng.choice(["200054781", "243500139", ""], n, p=[0.5, 0.48, 0.02]),
+        "Caractère employeur de l'établissement": rng.choice(["O", "N", ""], n, p=[0.4, 0.58, 0.02]),
+        "Dénomination de l'unité légale": np.char.add("SOCIETE ", rng.integers(0, 10**6, n).astype(str)),
+        "Nombre de périodes de l'unité légale": rng.integers(1, 6, n).astype(str),
+        "Code de l'arrondissement de l'établissement": rng.integers(1, 5, n).astype(str),
+        COLONNE_INCONNUE: np.full(n, "2024-01-01"),
+    }
+    colonnes = colonnes_sirene()
+    lot = {}
+    for i, c in enumerate(colonnes):
+        if c in valeurs:
+            lot[i] = valeurs[c]
+        elif c in COLS_NAN_FERMEES:
+            lot[i] = rng.choice(["Libellé", ""], n, p=[0.99, 0.01])
+        else:
+            lot[i] = rng.choice(["x", ""], n, p=[0.3, 0.7])
+    df = pd.DataFrame(lot)
+    df.columns = colonnes
+    return df
+
+
+def generer_sirene(chemin, n, fermees, seed, taille=50_000):
+    rng = np.random.default_rng(seed)
+    with open(chemin, "w", encoding="utf-8", newline="") as f:
+        for debut in range(0, n, taille):
+            _lot_sirene(rng, min(taille, n - debut), fermees).to_csv(f, sep=";", index=False, header=debut == 0)
+
+
+def generer_codes_ape(chemin):
+    lignes = []
+    for code, libelle in SECTIONS_APE.items():
+        lignes += [(code, libelle), (f"{code}.1", f"{libelle} (groupe)"), (f"{code}.11Z", f"{libelle} (sous-classe)")]
+    pd.DataFrame(lignes, columns=["code_ape", "libelle_ape"]).to_csv(chemin, index=False, encoding="utf-8-sig")
+
+
+# --- 2. MESURES (processus séparés) ---
+def _mesurer(role, sources, dossier, taille_lot):
+    """Lance un rôle dans un processus neuf : temps écoulé et pic RSS de ce seul traitement"""
+    commande = [sys.executable, "-m", "pipeline.verification", role, *map(str, sources), str(dossier), str(taille_lot)]
+    sortie = subprocess.run(commande, cwd=Path(__file__).resolve().parent.parent, capture_output=True, text=True)
+    if sortie.returncode:
+        raise RuntimeError(f"{role} a échoué :\n{sortie.stdout}\n{sortie.stderr}")
+    return json.loads(sortie.stdout.strip().splitlines()[-1])
+
+
+def _role(role, fermees, ouvertes, codes_ape, dossier, taille_lot):
+    dossier = Path(dossier)
+    debut = time.perf_counter()
+    if role == "reference":
+        from . import reference
+        reference.executer(Path(fermees), Path(ouvertes), Path(codes_ape), dossier)
+        rapport = {}
+    else:
+        from .etapes import construire_etapes
+        from .moteur import Pipeline
+        etapes = construire_etapes(fermees, ouvertes, codes_ape, dossier, taille_lot=int(taille_lot))
+        rapport = Pipeline(etapes, dossier).executer()
+    duree = time.perf_counter() - debut
+    print(json.dumps({"duree_s": duree, "rss_max_mo": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+                      "rapport": rapport}))
+
+
+# --- 3. SCÉNARIO ---
+def _comparer(ref, pipe, erreurs):
+    for nom in ("dataset_open_final.parquet", "dataset_closed_final.parquet", "dataset_full.parquet"):
+        a, b = pq.read_table(ref / nom), pq.read_table(pipe / nom)
+        if a.schema.remove_metadata() != b.schema.remove_metadata():
+            erreurs.append(f"{nom} : schémas différents\n{a.schema.remove_metadata()}\n{b.schema.remove_metadata()}")
+        elif not a.equals(b):
+            erreurs.append(f"{nom} : contenus différents ({a.num_rows} / {b.num_rows} lignes)")
+        else:
+            print(f"🟰 {nom} identique ({a.num_rows} lignes, {a.num_columns} colonnes)")
+        try:
+            pd.testing.assert_frame_equal(pd.read_parquet(ref / nom), pd.read_parquet(pipe / nom))
+        except AssertionError as e:
+            erreurs.append(f"{nom} relu par pandas : {e}")
+    for nom in ("mapping_dep_risk.json", "mapping_ape_section.json"):
+        if (ref / nom).read_bytes() != (pipe / nom).read_bytes():
+            erreurs.append(f"{nom} : contenus différents")
+        else:
+            print(f"🟰 {nom} identique")
+
+
+def check(n, taille_lot=None):
+    base = Path(tempfile.mkdtemp(prefix="pipeline_check_"))
+    erreurs = []
+    try:
+        fermees, ouvertes, codes_ape = base / "sirene_fermees.csv", base / "sirene_ouvertes.csv", base / "codes_ape.csv"
+        generer_sirene(fermees, n, fermees=True, seed=1)
+        generer_sirene(ouvertes, n, fermees=False, seed=2)
+        generer_codes_ape(codes_ape)
+        sources = (fermees, ouvertes, codes_ape)
+        # Lots plus petits que le fichier : le résultat ne doit pas dépendre du découpage
+        taille_lot = taille_lot or max(1_000, n // 7)
+        ref, pipe = base / "reference", base / "pipeline"
+        ref.mkdir()
+        pipe.mkdir()
+
+        m_ref = _mesurer("reference", sources, ref, taille_lot)
+        m_pipe = _mesurer("pipeline", sources, pipe, taille_lot)
+        print(f"⏱️ Notebooks : {m_ref['duree_s']:.1f}s, pic {m_ref['rss_max_mo']:.0f} Mo")
+        print(f"⏱️ Pipeline  : {m_pipe['duree_s']:.1f}s, pic {m_pipe['rss_max_mo']:.0f} Mo (lots de {taille_lot} lignes)")
+        _comparer(ref, pipe, erreurs)
+        if m_pipe["duree_s"] >= m_ref["duree_s"]:
+            erreurs.append("pipeline plus lent que les notebooks")
+        if m_pipe["rss_max_mo"] >= m_ref["rss_max_mo"]:
+            erreurs.append("pic mémoire du pipeline supérieur à celui des notebooks")
+
+        # Cache : relance sans changement puis fichier réécrit à l'identique (mtime modifié)
+        tout_cache = {nom: "cache" for nom in m_pipe["rapport"]}
+        rapport = _mesurer("pipeline", sources, pipe, taille_lot)["rapport"]
+        if rapport != tout_cache:
+            erreurs.append(f"relance sans changement : {rapport}")
+        ouvertes.write_bytes(ouvertes.read_bytes())
+        rapport = _mesurer("pipeline", sources, pipe, taille_lot)["rapport"]
+        if rapport != tout_cache:
+            erreurs.append(f"fichier réécrit à l'identique : {rapport}")
+
+        # Ligne écartée par le filtre de nature : seule l'étape fermees est rejouée
+        entete = pd.read_csv(fermees, sep=";", nrows=0).columns
+        ligne = ["" for _ in entete]
+        ligne[list(entete).index("Nature juridique de l'unité légale")] = "Entrepreneur individuel"
+        with open(fermees, "a", encoding="utf-8") as f:
+            f.write(";".join(ligne) + "\n")
+        rapport = _mesurer("pipeline", sources, pipe, taille_lot)["rapport"]
+        attendu = {**tout_cache, "fermees": "executee"}
+        if rapport != attendu:
+            erreurs.append(f"ligne écartée ajoutée : {rapport} (attendu {attendu})")
+        else:
+            print("♻️ Cache : relances ignorées, seule l'étape modifiée rejouée (sortie identique, suite en cache)")
+    finally:
+        shutil.rmtree(base, ignore_errors=True)
+
+    print("✅ Vérification réussie" if not erreurs else "❌ " + "\n❌ ".join(erreurs))
+    return not erreurs
+
+
+if __name__ == "__main__":
+    _role(*sys.argv[1:])
@@ -0,0 +1,18 @@
+"""
+Entraînement du modèle de survie AFT sans charger dataset_full en mémoire.
+
+Remplace la préparation des données de 08_xgboost_v4 (read_parquet, get_dummies, DMatrix en mémoire,
+test GPU) : dataset_full.parquet est lu par lots, encodé par features.py (même code que l'API) et
+esquissé dans une QuantileDMatrix ; l'entraînement se fait sur CPU (hist).
+
+Usage (depuis src/model) :
+    python -m entrainement --dataset dataset_full.parquet --out ./modele --params best_params.json
+    python -m entrainement --check 500000
+    python -m entrainement --check-metriques 1000000
+"""
+from .donnees import LotsAFT, ajuster_spec, lire_lots
+from .metriques import auc_dynamique, brier_integre, c_index, evaluer, nloglik_aft
+from .modele import PARAMS_DEFAUT, entrainer, matrices
+
+__all__ = ["LotsAFT", "PARAMS_DEFAUT", "ajuster_spec", "auc_dynamique", "brier_integre", "c_index", "entrainer",
+           "evaluer", "lire_lots", "matrices", "nloglik_aft"]
@@ -0,0 +1,42 @@
+import argparse
+import json
+import os
+
+from .donnees import TAILLE_LOT, VALID_FRAC
+from .modele import MAX_BIN, entrainer
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Entraînement AFT hors mémoire sur dataset_full.parquet")
+    parser.add_argument("--dataset", default=os.getenv("DATASET_FULL", "dataset_full.parquet"))
+    parser.add_argument("--out", default=os.getenv("MODEL_OUT", "."), help="Dossier du modèle et des artefacts API")
+    parser.add_argument("--params", help="JSON de paramètres XGBoost (ex. meilleurs paramètres Optuna)")
+    parser.add_argument("--rounds", type=int, default=2000, help="Nombre maximal d'arbres")
+    parser.add_argument("--early-stopping", type=int, default=100)
+    parser.add_argument("--valid", type=float, default=VALID_FRAC, help="Part de validation (tirage par SIREN)")
+    parser.add_argument("--taille-lot", type=int, default=TAILLE_LOT, help="Lignes par lot")
+    parser.add_argument("--max-bin", type=int, default=MAX_BIN)
+    parser.add_argument("--cache-externe", metavar="DOSSIER",
+                        help="Pages de la matrice d'entraînement sur disque (ExtMemQuantileDMatrix)")
+    parser.add_argument("--check", type=int, metavar="N", help="Vérification sur N lignes synthétiques")
+    parser.add_argument("--check-metriques", type=int, metavar="N",
+                        help="Métriques contre sksurv / XGBoost, puis durées sur N lignes de validation")
+    args = parser.parse_args()
+
+    if args.check_metriques:
+        from .verification import check_metriques
+        raise SystemExit(0 if check_metriques(args.check_metriques) else 1)
+    if args.check:
+        from .verification import check
+        raise SystemExit(0 if check(args.check, taille_lot=None) else 1)
+
+    params = None
+    if args.params:
+        with open(args.params, encoding="utf-8") as f:
+            params = json.load(f)
+    try:
+        entrainer(args.dataset, args.out, params, num_boost_round=args.rounds, early_stopping=args.early_stopping,
+                  valid_frac=args.valid, taille_lot=args.taille_lot, cache_externe=args.cache_externe,
+                  max_bin=args.max_bin)
+    except Exception as e:
+        print(f"❌ Entraînement interrompu : {e}")
+        raise SystemExit(1)
@@ -0,0 +1,190 @@
+"""
+Lecture de dataset_full.parquet par lots pour XGBoost : seules les colonnes utiles au modèle sont lues,
+l'encodage est celui de features.py (API), et les lots alimentent un DataIter (QuantileDMatrix).
+"""
+import json
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import xgboost as xgb
+
+# features.py vit avec l'API (image Docker autonome) : on l'importe depuis son dossier
+API_DIR = Path(__file__).resolve().parents[2] / "api" / "api-business-risk"
+if str(API_DIR) not in sys.path:
+    sys.path.append(str(API_DIR))
+
+from features import COL_CJ, COL_CODE_APE, COL_DEPT, COL_ESS, COL_SECTION, FeaturePipeline  # noqa: E402
+
+# --- 1. CONFIGURATION ---
+TAILLE_LOT = 200_000
+COLONNES = ["SIREN", COL_DEPT, COL_CJ, COL_ESS, COL_SECTION, COL_CODE_APE, "Tranche_effectif_num", "age_estime",
+            "fermeture"]
+# Part de validation : tirage stable par SIREN (indépendant du découpage en lots)
+VALID_FRAC = 0.2
+_GRAIN = 10_000
+
+
+# --- 2. LECTURE ---
+def lire_lots(chemin, taille_lot=TAILLE_LOT, colonnes=COLONNES):
+    """DataFrames successifs de taille_lot lignes, limités aux colonnes du modèle"""
+    fichier = pq.ParquetFile(chemin)
+    presentes = [c for c in colonnes if c in fichier.schema_arrow.names]
+    for lot in fichier.iter_batches(batch_size=taille_lot, columns=presentes):
+        yield lot.to_pandas()
+
+
+def masque_validation(df, valid_frac=VALID_FRAC):
+    if "SIREN" in df.columns:
+        cle = pd.util.hash_pandas_object(df["SIREN"].astype(str), index=False).to_numpy()
+    else:
+        cle = pd.util.hash_array(df.index.to_numpy())
+    return (cle % _GRAIN) < int(valid_frac * _GRAIN)
+
+
+def selectionner(df, partie, valid_frac=VALID_FRAC):
+    """Lignes d'entraînement du notebook (age_estime > 0), restreintes à la partie train ou valid"""
+    garde = (pd.to_numeric(df["age_estime"], errors="coerce") > 0).fillna(False).to_numpy(dtype=bool)
+    valid = masque_validation(df, valid_frac)
+    return df[garde & (valid if partie == "valid" else ~valid)]
+
+
+def cibles(df):
+    """Bornes AFT : censure à droite (y_upper = inf) pour les sociétés encore ouvertes"""
+    temps = pd.to_numeric(df["age_estime"], errors="coerce").to_numpy(dtype=np.float64)
+    evenement = pd.to_numeric(df["fermeture"], errors="coerce").fillna(0).to_numpy() == 1
+    return temps, np.where(evenement, temps, np.inf), evenement
+
+
+def ajuster_spec(chemin, taille_lot=TAILLE_LOT):
+    return FeaturePipeline.fit_lots(lire_lots(chemin, taille_lot))
+
+
+# --- 3. ITÉRATEUR XGBOOST ---
+class LotsAFT(xgb.DataIter):
+    """Lots encodés (float32 dense, taille_lot x n_features) : la matrice complète n'est jamais construite.
+    Le one-hot est posé directement par index de colonne (pas de get_dummies) ; les zéros restent explicites
+    car XGBoost traite une entrée absente d'une matrice creuse comme manquante, ce qui divergerait de l'API."""
+
+    def __init__(self, chemin, spec, partie, valid_frac=VALID_FRAC, taille_lot=TAILLE_LOT, cache_prefix=None):
+        self.chemin, self.spec, self.partie = chemin, spec, partie
+        self.valid_frac, self.taille_lot = valid_frac, taille_lot
+        self._lots = None
+        super().__init__(cache_prefix=cache_prefix)
+
+    def lots(self):
+        for df in lire_lots(self.chemin, self.taille_lot):
+            df = selectionner(df, self.partie, self.valid_frac)
+            if len(df):
+                yield df
+
+    def reset(self):
+        self._lots = None
+
+    def next(self, input_data):
+        if self._lots is None:
+            self._lots = self.lots()
+        df = next(self._lots, None)
+        if df is None:
+            return False
+        bas, haut, _ = cibles(df)
+        input_data(data=self.spec.transform(df), label_lower_bound=bas, label_upper_bound=haut,
+                   feature_names=self.spec.features)
+        return True
+
+
+def predire_lots(booster, chemin, spec, partie="valid", valid_frac=VALID_FRAC, taille_lot=TAILLE_LOT):
+    """Prédictions mu (log-durée, sortie brute du modèle) lot par lot, avec temps et événements"""
+    mus, temps, evenements = [], [], []
+    for df in LotsAFT(chemin, spec, partie, valid_frac, taille_lot).lots():
+        mus.append(booster.inplace_predict(spec.transform(df), predict_type="margin"))
+        t, _, e = cibles(df)
+        temps.append(t)
+        evenements.append(e)
+    if not mus:
+        return np.empty(0, dtype=np.float32), np.empty(0), np.empty(0, dtype=bool)
+    return np.concatenate(mus), np.concatenate(temps), np.concatenate(evenements)
+
+
+def cibles_lots(chemin, partie="train", valid_frac=VALID_FRAC, taille_lot=TAILLE_LOT):
+    """Temps et événements d'une partie (loi de censure des métriques IPCW), sans encoder les features"""
+    temps, evenements = [], []
+    for df in lire_lots(chemin, taille_lot, ["SIREN", "age_estime", "fermeture"]):
+        t, _, e = cibles(selectionner(df, partie, valid_frac))
+        temps.append(t)
+        evenements.append(e)
+    return np.concatenate(temps), np.concatenate(evenements)
+
+
+# --- 4. CACHE DES MATRICES ENCODÉES ---
+def _signature(chemin, valid_frac):
+    stat = Path(chemin).stat()
+    return {"dataset": str(Path(chemin).resolve()), "taille": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+            "valid_frac": valid_frac}
+
+
+def encoder_cache(chemin, dossier, valid_frac=VALID_FRAC, taille_lot=TAILLE_LOT):
+    """Encode une seule fois train et valid (float32 + bornes AFT) dans des fichiers binaires, relus en memmap
+    par tous les processus. Le cache est réutilisé tant que le Parquet (taille, mtime) n'a pas changé."""
+    dossier = Path(dossier)
+    dossier.mkdir(parents=True, exist_ok=True)
+    meta_path = dossier / "cache.json"
+    signature = _signature(chemin, valid_frac)
+    if meta_path.exists():
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta["signature"] == signature:
+            return meta
+
+    spec = ajuster_spec(chemin, taille_lot)
+    lignes = {}
+    for partie in ("train", "valid"):
+        fichiers = {nom: dossier / f"{partie}_{nom}.bin.tmp" for nom in ("X", "bas", "haut")}
+        n = 0
+        with open(fichiers["X"], "wb") as fx, open(fichiers["bas"], "wb") as fb, open(fichiers["haut"], "wb") as fh:
+            for df in LotsAFT(chemin, spec, partie, valid_frac, taille_lot).lots():
+                spec.transform(df).tofile(fx)
+                bas, haut, _ = cibles(df)
+                bas.astype(np.float32).tofile(fb)
+                haut.astype(np.float32).tofile(fh)
+                n += len(df)
+        for tmp in fichiers.values():
+            os.replace(tmp, tmp.with_suffix(""))
+        lignes[partie] = n
+    spec.save(dossier / "feature_spec.json")
+    # Écrit en dernier : sa présence signe un cache complet
+    meta = {"signature": signature, "lignes": lignes, "features": spec.features}
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    return meta
+
+
+def charger_cache(dossier, meta, partie):
+    n, k = meta["lignes"][partie], len(meta["features"])
+    ouvrir = lambda nom, forme: np.memmap(Path(dossier) / f"{partie}_{nom}.bin", np.float32, "r", shape=forme)  # noqa: E731
+    return ouvrir("X", (n, k)), ouvrir("bas", (n,)), ouvrir("haut", (n,))
+
+
+class LotsMemmap(xgb.DataIter):
+    """Relit un cache encodé par tranches : les pages memmap sont partagées par les processus via le cache du noyau"""
+
+    def __init__(self, X, bas, haut, features, taille_lot=TAILLE_LOT):
+        self.X, self.bas, self.haut, self.features = X, bas, haut, features
+        self.taille_lot = taille_lot
+        self._debut = 0
+        super().__init__()
+
+    def reset(self):
+        self._debut = 0
+
+    def next(self, input_data):
+        if self._debut >= len(self.X):
+            return False
+        tranche = slice(self._debut, self._debut + self.taille_lot)
+        input_data(data=np.asarray(self.X[tranche]), label_lower_bound=np.asarray(self.bas[tranche]),
+                   label_upper_bound=np.asarray(self.haut[tranche]), feature_names=self.features)
+        self._debut += self.taille_lot
+        return True
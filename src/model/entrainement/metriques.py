@@ -0,0 +1,274 @@
+"""
+Métriques d'évaluation du modèle de survie, vectorisées pour tenir sur l'ensemble de validation complet
+(remplace sksurv.metrics, dont les calculs par paires imposaient de sous-échantillonner).
+
+- C-index de Harrell en O(n log n) ;
+- AUC dépendante du temps (cumulative/dynamique, pondérée IPCW) aux horizons 1, 2 et 3 ans ;
+- score de Brier et score de Brier intégré (IPCW) ;
+- log-vraisemblance négative AFT, identique à la métrique aft-nloglik de XGBoost.
+
+Les conventions suivent sksurv (concordance_index_censored, cumulative_dynamic_auc, brier_score,
+integrated_brier_score) ; mu désigne la sortie brute du modèle (log-durée, predict_type="margin").
+"""
+import numpy as np
+from scipy.special import expit, ndtr
+
+
+# --- 1. COMPTAGES PAR TRI FUSION ---
+def _rangs(valeurs):
+    """Rangs denses (0..K-1) : les égalités partagent le même rang"""
+    _, rangs = np.unique(valeurs, return_inverse=True)
+    return rangs.astype(np.int64).ravel(), int(rangs.max()) + 1 if len(rangs) else 0
+
+
+def _inferieurs_avant(rangs, k):
+    """Pour chaque position p : nombre de q < p tels que rangs[q] < rangs[p] (équivalent vectorisé d'un
+    arbre de Fenwick). Tri fusion par bits de poids fort : au niveau b, les éléments sont ordonnés par
+    (rang >> (b + 1), position) ; dans chaque groupe, un élément de bit b à 1 est précédé de ses
+    inférieurs de bit b à 0. Chaque niveau est une partition stable en O(n) (cumsum), log2(k) niveaux."""
+    n = len(rangs)
+    indices = np.arange(n, dtype=np.int32)
+    r, positions = rangs.astype(np.int32), indices.copy()
+    comptes = np.zeros(n, dtype=np.int32)
+    for b in range(max(int(k - 1).bit_length(), 1) - 1, -1, -1):
+        groupe = r >> (b + 1)
+        zero = ((r >> b) & 1) == 0
+        debut = np.ones(n, dtype=bool)
+        debut[1:] = groupe[1:] != groupe[:-1]
+        starts = np.flatnonzero(debut)
+        longueurs = np.diff(np.append(starts, n))
+        idx_debut = np.repeat(starts, longueurs)
+        zeros_avant = np.cumsum(zero, dtype=np.int32) - zero
+        zeros_avant_groupe = zeros_avant - zeros_avant[idx_debut]
+        comptes += np.where(zero, 0, zeros_avant_groupe)
+        # Partition stable : les bits à 0 puis les bits à 1 de chaque groupe, ordre des positions conservé
+        total_zeros = np.repeat(np.add.reduceat(zero, starts, dtype=np.int32), longueurs)
+        destination = np.where(zero, idx_debut + zeros_avant_groupe, indices + total_zeros - zeros_avant_groupe)
+        for tableau in (r, positions, comptes):
+            tableau[destination] = tableau.copy()
+    resultat = np.empty(n, dtype=np.int64)
+    resultat[positions] = comptes
+    return resultat
+
+
+def _chercher(tri, requetes, ordre, side):
+    """np.searchsorted avec des requêtes parcourues dans l'ordre croissant (ordre = leur argsort) :
+    accès mémoire séquentiels, un ordre de grandeur plus rapide que des requêtes aléatoires sur 1M+ lignes"""
+    resultat = np.empty(len(requetes), dtype=np.int64)
+    resultat[ordre] = np.searchsorted(tri, requetes[ordre], side)
+    return resultat
+
+
+# --- 2. C-INDEX DE HARRELL ---
+def c_index(temps, evenement, risque):
+    """C-index de Harrell en O(n log n), mêmes conventions que sksurv.metrics.concordance_index_censored :
+    une paire (i, j) est comparable si i a subi l'événement et T_j > T_i (ou T_j == T_i avec j censuré) ;
+    concordante si risque_i > risque_j, égalité de risque comptée 1/2.
+    Pour le modèle AFT, risque = -mu (une durée de survie prédite plus courte = plus risqué)."""
+    temps = np.asarray(temps, dtype=np.float64)
+    evenement = np.asarray(evenement).astype(bool)
+    risque = np.asarray(risque, dtype=np.float64)
+    t, kt = _rangs(temps)
+    r, kr = _rangs(risque)
+
+    # Paires T_j > T_i : tri par temps décroissant puis risque décroissant ; à temps égal, les voisins
+    # placés avant ont un risque >= et ne sont donc pas comptés comme strictement inférieurs
+    cles_tr = t * kr + r
+    ordre_tr = np.argsort(cles_tr, kind="stable")
+    ordre = ordre_tr[::-1]
+    inferieurs = np.empty_like(t)
+    inferieurs[ordre] = _inferieurs_avant(r[ordre], kr)
+    plus_tard = len(t) - np.cumsum(np.bincount(t, minlength=kt))[t]
+    # Égalités de risque avec T_j > T_i : même risque, temps > T_i
+    cles_rt = r * kt + t
+    ordre_rt = np.argsort(cles_rt, kind="stable")
+    tri_rt = cles_rt[ordre_rt]
+    egaux_tard = (_chercher(tri_rt, r * kt + kt - 1, ordre_rt, "right")
+                  - _chercher(tri_rt, cles_rt, ordre_rt, "right"))
+
+    # Paires avec un censuré au même instant (inférieurs et égaux en risque)
+    tri_cens = cles_tr[ordre_tr][~evenement[ordre_tr]]
+    debut_temps = _chercher(tri_cens, t * kr, ordre_tr, "left")
+    cens_meme_temps = _chercher(tri_cens, t * kr + kr - 1, ordre_tr, "right") - debut_temps
+    cens_inferieurs = _chercher(tri_cens, cles_tr, ordre_tr, "left") - debut_temps
+    cens_egaux = _chercher(tri_cens, cles_tr, ordre_tr, "right") - debut_temps - cens_inferieurs
+
+    e = evenement
+    comparables = (plus_tard[e] + cens_meme_temps[e]).sum()
+    if comparables == 0:
+        return float("nan")
+    concordantes = (inferieurs[e] + cens_inferieurs[e]).sum()
+    egalites = (egaux_tard[e] + cens_egaux[e]).sum()
+    return float((concordantes + 0.5 * egalites) / comparables)
+
+
+def c_index_naif(temps, evenement, risque):
+    """Définition par paires en O(n²), pour la vérification sur petits échantillons"""
+    temps, evenement, risque = map(np.asarray, (temps, evenement, risque))
+    num = den = 0.0
+    for i in np.flatnonzero(evenement):
+        comparables = (temps > temps[i]) | ((temps == temps[i]) & ~evenement.astype(bool))
+        den += comparables.sum()
+        num += (risque[i] > risque[comparables]).sum() + 0.5 * (risque[i] == risque[comparables]).sum()
+    return num / den if den else float("nan")
+
+
+# --- 3. DISTRIBUTIONS AFT ---
+HORIZONS = (1, 2, 3)
+_EPS = 1e-12
+
+
+def _cdf(z, distribution):
+    if distribution == "logistic":
+        return expit(z)
+    if distribution == "normal":
+        return ndtr(z)
+    if distribution == "extreme":
+        return -np.expm1(-np.exp(z))
+    raise ValueError(f"Distribution AFT inconnue : {distribution}")
+
+
+def _pdf(z, distribution):
+    if distribution == "logistic":
+        p = expit(z)
+        return p * (1 - p)
+    if distribution == "normal":
+        return np.exp(-0.5 * z * z - 0.5 * np.log(2 * np.pi))
+    if distribution == "extreme":
+        return np.exp(z - np.exp(z))
+    raise ValueError(f"Distribution AFT inconnue : {distribution}")
+
+
+def _survie(z, distribution):
+    """1 - F(z), calculé sans annulation dans la queue droite"""
+    if distribution == "logistic":
+        return expit(-z)
+    if distribution == "normal":
+        return ndtr(-z)
+    if distribution == "extreme":
+        return np.exp(-np.exp(z))
+    raise ValueError(f"Distribution AFT inconnue : {distribution}")
+
+
+def survie_aft(mu, horizons, sigma, distribution="logistic"):
+    """S(t | x) = 1 - F((log t - mu) / sigma), matrice (n, len(horizons))"""
+    z = (np.log(np.asarray(horizons, dtype=np.float64))[None, :] - np.asarray(mu, dtype=np.float64)[:, None]) / sigma
+    return _survie(z, distribution)
+
+
+def nloglik_aft(mu, bas, haut, sigma, distribution="logistic"):
+    """Moyenne de -log L, formule de aft-nloglik (XGBoost) : densité si bas == haut, sinon F(haut) - F(bas),
+    coût borné à 1e-12"""
+    mu = np.asarray(mu, dtype=np.float64)
+    bas, haut = np.asarray(bas, dtype=np.float64), np.asarray(haut, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z_bas = (np.log(bas) - mu) / sigma
+        z_haut = (np.log(haut) - mu) / sigma
+        exact = bas == haut
+        cout = np.where(exact, _pdf(z_bas, distribution) / (sigma * bas),
+                        np.where(np.isinf(haut), 1.0, _cdf(z_haut, distribution))
+                        - np.where(bas <= 0, 0.0, _cdf(z_bas, distribution)))
+    return float(np.mean(-np.log(np.maximum(cout, _EPS))))
+
+
+# --- 4. PONDÉRATION PAR LA CENSURE (IPCW) ---
+def km_censure(temps, evenement):
+    """Kaplan-Meier de la loi de censure G (sksurv : reverse=True, événements avant censures à temps égal).
+    Renvoie les temps distincts et G à ces temps."""
+    temps = np.asarray(temps, dtype=np.float64)
+    evenement = np.asarray(evenement).astype(bool)
+    uniques, inverse = np.unique(temps, return_inverse=True)
+    n_evenements = np.bincount(inverse, weights=evenement, minlength=len(uniques))
+    n_total = np.bincount(inverse, minlength=len(uniques))
+    a_risque = len(temps) - np.concatenate(([0], np.cumsum(n_total)[:-1]))
+    censures = n_total - n_evenements
+    restants = a_risque - n_evenements
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = np.where(restants > 0, censures / restants, 0.0)
+    return uniques, np.cumprod(1.0 - ratio)
+
+
+def _g(censure, t):
+    """G(t) en escalier (continu à droite), 1 avant le premier temps"""
+    uniques, g = censure
+    i = np.searchsorted(uniques, np.asarray(t, dtype=np.float64), "right") - 1
+    return np.where(i >= 0, g[np.maximum(i, 0)], 1.0)
+
+
+def _poids_ipcw(censure, temps, evenement):
+    """1 / G(T_i) pour les événements, 0 sinon (et 0 si G s'annule, au lieu de l'erreur de sksurv)"""
+    g = _g(censure, temps)
+    with np.errstate(divide="ignore"):
+        return np.where(evenement & (g > 0), 1.0 / np.where(g > 0, g, 1.0), 0.0)
+
+
+# --- 5. AUC DÉPENDANTE DU TEMPS ---
+def auc_dynamique(temps_train, evenement_train, temps, evenement, risque, horizons=HORIZONS):
+    """AUC cumulative/dynamique : cas = événement avant t (pondéré 1/G(T_i)), témoins = encore en vie en t.
+    risque : (n,) ou (n, len(horizons)). Égalités de risque comptées 1/2 (trapèzes de la courbe ROC)."""
+    temps = np.asarray(temps, dtype=np.float64)
+    evenement = np.asarray(evenement).astype(bool)
+    risque = np.asarray(risque, dtype=np.float64)
+    poids = _poids_ipcw(km_censure(temps_train, evenement_train), temps, evenement)
+    scores = []
+    for j, t in enumerate(horizons):
+        r = risque[:, j] if risque.ndim == 2 else risque
+        cas = (temps <= t) & evenement
+        temoins = np.sort(r[temps > t])
+        if not cas.any() or not len(temoins):
+            scores.append(float("nan"))
+            continue
+        r_cas = r[cas]
+        ordre = np.argsort(r_cas, kind="stable")
+        inferieurs = _chercher(temoins, r_cas, ordre, "left")
+        egaux = _chercher(temoins, r_cas, ordre, "right") - inferieurs
+        w = poids[cas]
+        scores.append(float((w * (inferieurs + 0.5 * egaux)).sum() / (w.sum() * len(temoins))))
+    return np.array(scores)
+
+
+# --- 6. SCORE DE BRIER ---
+def brier(temps_train, evenement_train, temps, evenement, survie, horizons=HORIZONS):
+    """Score de Brier IPCW (Graf) à chaque horizon ; survie : (n, len(horizons)) = S(t | x)"""
+    temps = np.asarray(temps, dtype=np.float64)
+    evenement = np.asarray(evenement).astype(bool)
+    survie = np.asarray(survie, dtype=np.float64)
+    censure = km_censure(temps_train, evenement_train)
+    g_individus = _g(censure, temps)
+    g_individus = np.where(g_individus > 0, g_individus, np.inf)
+    g_horizons = _g(censure, horizons)
+    scores = []
+    for j, t in enumerate(horizons):
+        cas = ((temps <= t) & evenement) / g_individus
+        temoins = (temps > t) / g_horizons[j]
+        scores.append(float(np.mean(survie[:, j] ** 2 * cas + (1.0 - survie[:, j]) ** 2 * temoins)))
+    return np.array(scores)
+
+
+def brier_integre(temps_train, evenement_train, temps, evenement, survie, horizons):
+    """Intégrale (trapèzes) du score de Brier sur horizons, divisée par la durée couverte"""
+    horizons = np.asarray(horizons, dtype=np.float64)
+    scores = brier(temps_train, evenement_train, temps, evenement, survie, horizons)
+    integrale = np.sum(np.diff(horizons) * (scores[1:] + scores[:-1]) / 2)
+    return float(integrale / (horizons[-1] - horizons[0]))
+
+
+# --- 7. RAPPORT ---
+def evaluer(mu, temps, evenement, sigma, temps_train, evenement_train, distribution="logistic",
+            horizons=HORIZONS, grille_brier=None):
+    """Toutes les métriques d'un modèle AFT sur un ensemble de validation"""
+    mu = np.asarray(mu, dtype=np.float64)
+    temps = np.asarray(temps, dtype=np.float64)
+    evenement = np.asarray(evenement).astype(bool)
+    grille = np.linspace(min(horizons), max(horizons), 21) if grille_brier is None else np.asarray(grille_brier)
+    # Avec une échelle commune, le classement par -mu est celui du risque à tout horizon
+    auc = auc_dynamique(temps_train, evenement_train, temps, evenement, -mu, horizons)
+    haut = np.where(evenement, temps, np.inf)
+    metriques = {
+        "nloglik": nloglik_aft(mu, temps, haut, sigma, distribution),
+        "c_index": c_index(temps, evenement, -mu),
+        "brier_integre": brier_integre(temps_train, evenement_train, temps, evenement,
+                                       survie_aft(mu, grille, sigma, distribution), grille),
+    }
+    metriques.update({f"auc_{t}an{'s' if t > 1 else ''}": a for t, a in zip(horizons, auc)})
+    return metriques
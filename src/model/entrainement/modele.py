@@ -0,0 +1,125 @@
+"""
+Entraînement AFT hors mémoire : QuantileDMatrix alimentée par lots (ou ExtMemQuantileDMatrix avec un
+cache disque), CPU hist, early stopping sur la validation et journalisation des métriques.
+"""
+import json
+import os
+import time
+from pathlib import Path
+
+import xgboost as xgb
+
+from .donnees import TAILLE_LOT, VALID_FRAC, LotsAFT, ajuster_spec, cibles_lots, predire_lots
+from .metriques import evaluer
+from monitoring import REFERENCE_FILE, construire_reference  # noqa: E402 (dossier de l'API, ajouté par .donnees)
+
+# --- 1. CONFIGURATION ---
+# Espace de recherche des notebooks (08_xgboost_v4), sans GPU : hist sur CPU
+PARAMS_DEFAUT = {
+    "objective": "survival:aft",
+    "eval_metric": "aft-nloglik",
+    "tree_method": "hist",
+    "device": "cpu",
+    "aft_loss_distribution": "logistic",
+    "aft_loss_distribution_scale": 1.0,
+    "max_depth": 5,
+    "learning_rate": 0.01,
+    "min_child_weight": 20,
+    "lambda": 5.0,
+    "alpha": 1.0,
+    "subsample": 0.7,
+    "colsample_bytree": 0.7,
+    "seed": 42,
+}
+MAX_BIN = 256
+MODELE = "model_survie_V3_final.json"
+EXPERIENCE = os.getenv("MLFLOW_EXPERIMENT", "XGBoost_Survival_V3_Equilibre")
+
+
+# --- 2. MATRICES ---
+def matrices(chemin, spec, valid_frac=VALID_FRAC, taille_lot=TAILLE_LOT, cache_externe=None, max_bin=MAX_BIN):
+    """(dtrain, dvalid) : les quantiles sont esquissés lot par lot, seuls les index de bins restent en mémoire
+    (ou sur disque avec cache_externe)"""
+    train = LotsAFT(chemin, spec, "train", valid_frac, taille_lot,
+                    cache_prefix=str(Path(cache_externe) / "train") if cache_externe else None)
+    if cache_externe:
+        Path(cache_externe).mkdir(parents=True, exist_ok=True)
+        dtrain = xgb.ExtMemQuantileDMatrix(train, max_bin=max_bin)
+    else:
+        dtrain = xgb.QuantileDMatrix(train, max_bin=max_bin)
+    dvalid = xgb.QuantileDMatrix(LotsAFT(chemin, spec, "valid", valid_frac, taille_lot), ref=dtrain)
+    return dtrain, dvalid
+
+
+# --- 3. ENTRAÎNEMENT ---
+def entrainer(chemin, dossier, params=None, num_boost_round=2000, early_stopping=100, valid_frac=VALID_FRAC,
+              taille_lot=TAILLE_LOT, cache_externe=None, max_bin=MAX_BIN, verbose_eval=100):
+    """Apprend la spécification des features, entraîne le modèle et écrit dans dossier :
+    modèle, feature_spec.json, features_config.json, drift_reference.json et metriques.json"""
+    dossier = Path(dossier)
+    dossier.mkdir(parents=True, exist_ok=True)
+    params = {**PARAMS_DEFAUT, **(params or {})}
+    debut = time.perf_counter()
+
+    spec = ajuster_spec(chemin, taille_lot)
+    dtrain, dvalid = matrices(chemin, spec, valid_frac, taille_lot, cache_externe, max_bin)
+    print(f"📦 Matrices prêtes : {dtrain.num_row()} lignes train, {dvalid.num_row()} valid, "
+          f"{len(spec.features)} features")
+
+    booster = xgb.train(params, dtrain, num_boost_round=num_boost_round, evals=[(dvalid, "valid")],
+                        early_stopping_rounds=early_stopping, verbose_eval=verbose_eval)
+    # On ne garde que les arbres jusqu'à la meilleure itération (l'API utilise le modèle complet)
+    meilleure = booster.best_iteration
+    booster = booster[: meilleure + 1]
+    duree_entrainement = time.perf_counter() - debut
+
+    mu, temps, evenement = predire_lots(booster, chemin, spec, "valid", valid_frac, taille_lot)
+    temps_train, evenement_train = cibles_lots(chemin, "train", valid_frac, taille_lot)
+    evaluation = evaluer(mu, temps, evenement, float(params["aft_loss_distribution_scale"]), temps_train,
+                         evenement_train, params["aft_loss_distribution"])
+    metriques = {
+        **{f"valid_{nom}": valeur for nom, valeur in evaluation.items()},
+        "best_iteration": meilleure,
+        "n_train": dtrain.num_row(),
+        "n_valid": dvalid.num_row(),
+        "duree_entrainement_s": round(duree_entrainement, 2),
+    }
+
+    booster.save_model(dossier / MODELE)
+    spec.save(dossier / "feature_spec.json")
+    with open(dossier / "features_config.json", "w", encoding="utf-8") as f:
+        json.dump(spec.features, f)
+    # Profil de référence du moniteur de dérive de l'API, sur la partie validation
+    valid = LotsAFT(chemin, spec, "valid", valid_frac, taille_lot).lots()
+    reference = construire_reference(((df, booster.inplace_predict(spec.transform(df))) for df in valid), spec,
+                                     float(params["aft_loss_distribution_scale"]))
+    with open(dossier / REFERENCE_FILE, "w", encoding="utf-8") as f:
+        json.dump(reference, f, ensure_ascii=False)
+    journaliser(params, metriques, dossier)
+    return booster, spec, metriques
+
+
+# --- 4. JOURNALISATION ---
+def journaliser(params, metriques, dossier):
+    """metriques.json dans le dossier de sortie, et run MLflow si MLFLOW_TRACKING_URI est défini"""
+    with open(Path(dossier) / "metriques.json", "w", encoding="utf-8") as f:
+        json.dump({"params": params, "metriques": metriques}, f, indent=2, ensure_ascii=False)
+    print(f"📊 Valid NLogLik={metriques['valid_nloglik']:.4f} | C-index={metriques['valid_c_index']:.4f} "
+          f"| AUC 1/2/3 ans={metriques['valid_auc_1an']:.3f}/{metriques['valid_auc_2ans']:.3f}/"
+          f"{metriques['valid_auc_3ans']:.3f} | IBS={metriques['valid_brier_integre']:.4f} "
+          f"| {metriques['best_iteration'] + 1} arbres")
+
+    if not os.getenv("MLFLOW_TRACKING_URI"):
+        return
+    try:
+        import mlflow
+
+        mlflow.set_experiment(EXPERIENCE)
+        with mlflow.start_run(run_name="Train_AFT_hors_memoire"):
+            mlflow.log_params(params)
+            mlflow.log_metrics({k: v for k, v in metriques.items() if isinstance(v, (int, float))})
+            mlflow.log_artifact(str(Path(dossier) / MODELE))
+            mlflow.log_artifact(str(Path(dossier) / "feature_spec.json"))
+        print(f"🚀 Run MLflow enregistré ({EXPERIENCE})")
+    except Exception as e:
+        print(f"⚠️ MLflow indisponible, métriques conservées dans metriques.json : {e}")
@@ -0,0 +1,288 @@
+"""
+Recherche d'hyperparamètres du modèle AFT (remplace la cellule Optuna de 08_xgboost_v4).
+
+- les matrices train/valid sont encodées une seule fois sur disque (donnees.encoder_cache) ; chaque
+  processus construit ses QuantileDMatrix une fois et les réutilise pour tous ses essais ;
+- l'étude est stockée dans SQLite : une recherche interrompue reprend là où elle s'était arrêtée
+  (les essais d'un processus tué sont relancés grâce au heartbeat) ;
+- élagage par courbe de aft-nloglik sur la validation (MedianPruner) en plus de l'early stopping, relevée
+  toutes les ELAGAGE_PAS itérations (chaque relevé est une écriture SQLite, ~10 ms, pour ~40 ms par arbre) ;
+- aft_loss_distribution_scale est cherché avec les autres paramètres : la métrique native aft-nloglik
+  est évaluée à l'échelle de chaque essai, les essais sont donc comparables entre eux.
+
+Usage (depuis src/model) :
+    python -m entrainement.recherche --dataset dataset_full.parquet --trials 50 --jobs 2
+    python -m entrainement.recherche --dataset dataset_full.parquet --bench 6
+    python -m entrainement.recherche --check 50000   # étude, reprise et best_params.json sur données synthétiques
+
+Dépendances : requirements.txt de src/model (optuna n'est pas requis par l'API).
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import optuna
+import xgboost as xgb
+
+from .donnees import TAILLE_LOT, VALID_FRAC, LotsMemmap, charger_cache, encoder_cache
+from .modele import MAX_BIN, PARAMS_DEFAUT
+
+# --- 1. CONFIGURATION ---
+ETUDE = os.getenv("OPTUNA_STUDY", "XGBoost_Survival_AFT")
+NUM_BOOST_ROUND = 2000
+EARLY_STOPPING = 100
+# Pas d'élagage avant que les courbes ne se soient séparées
+ELAGAGE_DEMARRAGE = 5
+ELAGAGE_ECHAUFFEMENT = 50
+ELAGAGE_PAS = 10
+
+
+def espace(trial):
+    """Espace de recherche du notebook, sur CPU ; la distribution reste logistique (calculate_survival_risk)"""
+    return {
+        **PARAMS_DEFAUT,
+        "max_depth": trial.suggest_int("max_depth", 3, 6),
+        "learning_rate": trial.suggest_float("learning_rate", 0.001, 0.02, log=True),
+        "min_child_weight": trial.suggest_int("min_child_weight", 10, 50),
+        "lambda": trial.suggest_float("lambda", 1.0, 50.0, log=True),
+        "alpha": trial.suggest_float("alpha", 0.1, 10.0, log=True),
+        "aft_loss_distribution_scale": trial.suggest_float("aft_loss_distribution_scale", 0.8, 1.5),
+        "subsample": trial.suggest_float("subsample", 0.5, 0.8),
+        "colsample_bytree": trial.suggest_float("colsample_bytree", 0.5, 0.8),
+    }
+
+
+# --- 2. ÉLAGAGE ---
+class ElagageOptuna(xgb.callback.TrainingCallback):
+    """Rapporte aft-nloglik de validation toutes les `pas` itérations et interrompt l'essai si Optuna l'élague"""
+
+    def __init__(self, trial, evaluation="valid", metrique="aft-nloglik", pas=ELAGAGE_PAS):
+        super().__init__()
+        self.trial, self.evaluation, self.metrique, self.pas = trial, evaluation, metrique, pas
+
+    def after_iteration(self, model, epoch, evals_log):
+        if (epoch + 1) % self.pas:
+            return False
+        score = evals_log[self.evaluation][self.metrique][-1]
+        self.trial.report(float(score), step=epoch)
+        if self.trial.should_prune():
+            raise optuna.TrialPruned(f"élagué à l'itération {epoch} (aft-nloglik={score:.4f})")
+        return False
+
+
+# --- 3. ÉTUDE ---
+def stockage(chemin_db):
+    """SQLite partagé entre processus ; heartbeat pour relancer les essais d'un processus interrompu"""
+    return optuna.storages.RDBStorage(
+        f"sqlite:///{chemin_db}",
+        engine_kwargs={"connect_args": {"timeout": 60}},
+        heartbeat_interval=60,
+        grace_period=180,
+        failed_trial_callback=optuna.storages.RetryFailedTrialCallback(max_retry=2),
+    )
+
+
+def creer_etude(chemin_db, nom=ETUDE, seed=None):
+    return optuna.create_study(
+        study_name=nom,
+        storage=stockage(chemin_db),
+        direction="minimize",
+        load_if_exists=True,
+        sampler=optuna.samplers.TPESampler(seed=seed),
+        pruner=optuna.pruners.MedianPruner(n_startup_trials=ELAGAGE_DEMARRAGE, n_warmup_steps=ELAGAGE_ECHAUFFEMENT),
+    )
+
+
+def matrices_cache(dossier_cache, meta, taille_lot=TAILLE_LOT, max_bin=MAX_BIN):
+    """QuantileDMatrix construites depuis le cache memmap (une fois par processus)"""
+    X, bas, haut = charger_cache(dossier_cache, meta, "train")
+    dtrain = xgb.QuantileDMatrix(LotsMemmap(X, bas, haut, meta["features"], taille_lot), max_bin=max_bin)
+    X, bas, haut = charger_cache(dossier_cache, meta, "valid")
+    dvalid = xgb.QuantileDMatrix(LotsMemmap(X, bas, haut, meta["features"], taille_lot), ref=dtrain)
+    return dtrain, dvalid
+
+
+def objectif(dtrain, dvalid, nthread, elagage=True, rounds=NUM_BOOST_ROUND):
+    def evaluer(trial):
+        params = {**espace(trial), "nthread": nthread}
+        rappels = [ElagageOptuna(trial)] if elagage else []
+        booster = xgb.train(params, dtrain, num_boost_round=rounds, evals=[(dvalid, "valid")],
+                            early_stopping_rounds=EARLY_STOPPING, callbacks=rappels, verbose_eval=False)
+        trial.set_user_attr("best_iteration", booster.best_iteration)
+        return booster.best_score
+    return evaluer
+
+
+def _travailleur(chemin_db, nom, dossier_cache, n_trials, nthread, taille_lot, seed, rounds=NUM_BOOST_ROUND):
+    """Un processus : ses matrices une fois, puis des essais jusqu'au total demandé pour l'étude"""
+    with open(Path(dossier_cache) / "cache.json", encoding="utf-8") as f:
+        meta = json.load(f)
+    dtrain, dvalid = matrices_cache(dossier_cache, meta, taille_lot)
+    etude = optuna.load_study(study_name=nom, storage=stockage(chemin_db),
+                              sampler=optuna.samplers.TPESampler(seed=seed),
+                              pruner=optuna.pruners.MedianPruner(n_startup_trials=ELAGAGE_DEMARRAGE,
+                                                                 n_warmup_steps=ELAGAGE_ECHAUFFEMENT))
+    etats = (optuna.trial.TrialState.COMPLETE, optuna.trial.TrialState.PRUNED)
+    if len(etude.get_trials(deepcopy=False, states=etats)) >= n_trials:
+        return
+    fin = optuna.study.MaxTrialsCallback(n_trials, states=etats)
+    etude.optimize(objectif(dtrain, dvalid, nthread, rounds=rounds), callbacks=[fin], gc_after_trial=True)
+
+
+def rechercher(chemin, dossier, n_trials=50, n_jobs=1, nom=ETUDE, valid_frac=VALID_FRAC, taille_lot=TAILLE_LOT,
+               seed=None, rounds=NUM_BOOST_ROUND):
+    """Lance (ou reprend) l'étude ; écrit best_params.json, réutilisable par python -m entrainement --params"""
+    dossier = Path(dossier)
+    dossier_cache = dossier / "cache_matrices"
+    chemin_db = dossier / "optuna.db"
+    meta = encoder_cache(chemin, dossier_cache, valid_frac, taille_lot)
+    print(f"📦 Cache : {meta['lignes']['train']} lignes train, {meta['lignes']['valid']} valid")
+    etude = creer_etude(chemin_db, nom, seed)
+    deja = len([t for t in etude.trials if t.state.is_finished()])
+    if deja:
+        print(f"♻️ Reprise de l'étude {nom} : {deja} essai(s) déjà terminé(s)")
+
+    nthread = max(1, (os.cpu_count() or 1) // n_jobs)
+    debut = time.perf_counter()
+    contexte = multiprocessing.get_context("spawn")
+    processus = [contexte.Process(target=_travailleur,
+                                  args=(chemin_db, nom, dossier_cache, n_trials, nthread, taille_lot,
+                                        None if seed is None else seed + i, rounds))
+                 for i in range(n_jobs)]
+    for p in processus:
+        p.start()
+    for p in processus:
+        p.join()
+    duree = time.perf_counter() - debut
+
+    etude = optuna.load_study(study_name=nom, storage=stockage(chemin_db))
+    termines = [t for t in etude.trials if t.state.is_finished()]
+    nouveaux = max(len(termines) - deja, 0)
+    elagues = sum(t.state == optuna.trial.TrialState.PRUNED for t in termines)
+    if nouveaux:
+        print(f"⏱️ {nouveaux} essai(s) en {duree:.0f}s : {nouveaux / duree * 3600:.1f} essais/heure")
+    # Aucun essai complet (tous élagués ou en échec) : etude.best_trial lèverait ValueError
+    if not any(t.state == optuna.trial.TrialState.COMPLETE for t in termines):
+        print(f"❌ Aucun essai complet sur {len(termines)} ({elagues} élagués) : best_params.json non écrit")
+        return etude, None
+    meilleur = etude.best_trial
+    params = {**PARAMS_DEFAUT, **meilleur.params}
+    with open(dossier / "best_params.json", "w", encoding="utf-8") as f:
+        json.dump(params, f, indent=2)
+    print(f"🏆 NLogLik={meilleur.value:.4f} en {meilleur.user_attrs.get('best_iteration', -1) + 1} arbres "
+          f"| {len(termines)} essais dont {elagues} élagués")
+    return etude, params
+
+
+# --- 4. COMPARAISON AVEC LE NOTEBOOK ---
+def essais_notebook(chemin, n_trials, valid_frac=VALID_FRAC, seed=None):
+    """Approche du notebook : reconstruction des données en mémoire (read_parquet, get_dummies, DMatrix),
+    essais en série, early stopping sans élagage"""
+    import pandas as pd
+
+    from .donnees import masque_validation
+    from features import reference_notebook
+
+    etude = optuna.create_study(direction="minimize", sampler=optuna.samplers.TPESampler(seed=seed))
+
+    def evaluer(trial):
+        df = pd.read_parquet(chemin)
+        X, index = reference_notebook(df)
+        lignes = df.loc[index]
+        valid = masque_validation(lignes, valid_frac)
+        temps = lignes["age_estime"].to_numpy(dtype=np.float64)
+        haut = np.where(lignes["fermeture"].to_numpy() == 1, temps, np.inf)
+        dtrain, dvalid = xgb.DMatrix(X[~valid]), xgb.DMatrix(X[valid])
+        for d, masque in ((dtrain, ~valid), (dvalid, valid)):
+            d.set_float_info("label_lower_bound", temps[masque])
+            d.set_float_info("label_upper_bound", haut[masque])
+        booster = xgb.train(espace(trial), dtrain, num_boost_round=NUM_BOOST_ROUND, evals=[(dvalid, "valid")],
+                            early_stopping_rounds=EARLY_STOPPING, verbose_eval=False)
+        return booster.best_score
+
+    debut = time.perf_counter()
+    etude.optimize(evaluer, n_trials=n_trials)
+    return etude, time.perf_counter() - debut
+
+
+def bench(chemin, dossier, n_trials, n_jobs=1, seed=0):
+    """Essais par heure : notebook (série, reconstruction, sans élagage) contre cette recherche"""
+    etude_nb, duree_nb = essais_notebook(chemin, n_trials, seed=seed)
+    debut = time.perf_counter()
+    etude, params = rechercher(chemin, dossier, n_trials, n_jobs, nom=f"bench_{int(time.time())}", seed=seed)
+    duree = time.perf_counter() - debut
+    print(f"📓 Notebook  : {n_trials / duree_nb * 3600:6.1f} essais/heure | meilleur NLogLik={etude_nb.best_value:.4f}")
+    meilleur = f"{etude.best_value:.4f}" if params is not None else "aucun essai complet"
+    print(f"🚀 Recherche : {n_trials / duree * 3600:6.1f} essais/heure | meilleur NLogLik={meilleur} "
+          f"(cache compris, {n_jobs} processus)")
+
+
+# --- 5. VÉRIFICATION ---
+def check(n, n_trials=4, n_jobs=2, rounds=200):
+    """Étude complète sur un dataset_full synthétique : essais terminés, best_params.json complet,
+    reprise sans essai relancé, puis essais supplémentaires ajoutés à la même étude"""
+    from .verification import generer_dataset
+
+    erreurs = []
+
+    def finis(etude):
+        return len([t for t in etude.trials if t.state.is_finished()])
+
+    with tempfile.TemporaryDirectory() as dossier:
+        chemin = Path(dossier) / "dataset_full.parquet"
+        generer_dataset(chemin, n)
+        debut = time.perf_counter()
+        etude, params = rechercher(chemin, dossier, n_trials, n_jobs, nom="check", seed=0, rounds=rounds)
+        duree = time.perf_counter() - debut
+        # MaxTrialsCallback : chaque processus peut démarrer un dernier essai au moment où le total est atteint
+        if not n_trials <= finis(etude) < n_trials + n_jobs:
+            erreurs.append(f"{finis(etude)} essais terminés pour {n_trials} demandés")
+        if params is None:
+            erreurs.append("aucun essai complet")
+        else:
+            with open(Path(dossier) / "best_params.json", encoding="utf-8") as f:
+                ecrits = json.load(f)
+            if (ecrits != params or not set(etude.best_trial.params) <= set(ecrits)
+                    or not set(PARAMS_DEFAUT) <= set(ecrits)):
+                erreurs.append("best_params.json incomplet")
+
+        total = finis(etude)
+        etude, _ = rechercher(chemin, dossier, total, n_jobs, nom="check", seed=0, rounds=rounds)
+        if finis(etude) != total:
+            erreurs.append(f"la reprise relance des essais ({total} -> {finis(etude)})")
+        etude, _ = rechercher(chemin, dossier, total + 2, n_jobs, nom="check", seed=0, rounds=rounds)
+        if not total + 2 <= finis(etude) < total + 2 + n_jobs:
+            erreurs.append(f"{finis(etude) - total} essais ajoutés pour 2 demandés")
+
+    print(f"⏱️ {n_trials} essais sur {n} lignes en {duree:.0f}s ({n_jobs} processus)")
+    print("✅ Vérification réussie" if not erreurs else "❌ " + " ; ".join(erreurs))
+    return not erreurs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recherche d'hyperparamètres AFT (Optuna, SQLite, élagage)")
+    parser.add_argument("--dataset", default=os.getenv("DATASET_FULL", "dataset_full.parquet"))
+    parser.add_argument("--out", default=os.getenv("OPTUNA_OUT", "recherche"),
+                        help="Dossier de l'étude SQLite, du cache des matrices et de best_params.json")
+    parser.add_argument("--trials", type=int, default=50, help="Nombre total d'essais de l'étude (reprise comprise)")
+    parser.add_argument("--jobs", type=int, default=max(1, (os.cpu_count() or 1) // 2), help="Processus parallèles")
+    parser.add_argument("--etude", default=ETUDE, help="Nom de l'étude Optuna")
+    parser.add_argument("--valid", type=float, default=VALID_FRAC)
+    parser.add_argument("--taille-lot", type=int, default=TAILLE_LOT)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--bench", type=int, metavar="N", help="Compare N essais à l'approche du notebook")
+    parser.add_argument("--check", type=int, metavar="N", help="Vérification sur N lignes synthétiques")
+    args = parser.parse_args()
+
+    if args.check:
+        raise SystemExit(0 if check(args.check) else 1)
+    Path(args.out).mkdir(parents=True, exist_ok=True)
+    if args.bench:
+        bench(args.dataset, args.out, args.bench, args.jobs, seed=args.seed or 0)
+    else:
+        rechercher(args.dataset, args.out, args.trials, args.jobs, args.etude, args.valid, args.taille_lot, args.seed)
@@ -0,0 +1,348 @@
+"""
+Vérification de l'entraînement hors mémoire sur un dataset_full synthétique.
+
+- même encodage, même découpage train/valid : l'entraînement en mémoire du notebook (read_parquet,
+  get_dummies, DMatrix) et l'entraînement par lots doivent donner des métriques équivalentes ;
+- temps et pic mémoire (RSS) mesurés dans des processus séparés ;
+- C-index vectorisé identique à la définition par paires sur un échantillon.
+
+check_metriques : métriques de metriques.py contre sksurv (ou, sans sksurv, contre des implémentations
+directes de ses algorithmes) sur petits échantillons, contre XGBoost pour aft-nloglik (échelle du modèle),
+et durées sur un ensemble de validation de taille réelle.
+"""
+import json
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import xgboost as xgb
+
+from .donnees import COL_CJ, COL_CODE_APE, COL_DEPT, COL_ESS, COL_SECTION, masque_validation
+from .metriques import c_index, c_index_naif, evaluer
+from .modele import PARAMS_DEFAUT
+
+# --- 1. DONNÉES SYNTHÉTIQUES ---
+SECTIONS = {"10": "Industries alimentaires", "41": "Construction de bâtiments", "47": "Commerce de détail",
+            "55": "Hébergement", "56": "Restauration", "68": "Activités immobilières",
+            "12": "Industrie du tabac", "03": "Pêche et aquaculture"}
+POIDS_SECTIONS = np.array([0.1, 0.2, 0.25, 0.05, 0.2, 0.1993, 0.0004, 0.0003])
+RISQUE_SECTIONS = np.array([0.0, 0.3, 0.2, 0.1, 0.6, -0.4, 0.0, 0.2])
+DEPARTEMENTS = ["1", "13", "2A", "33", "59", "69", "75", "971"]
+
+
+def _lot(rng, debut, n):
+    codes = np.array(list(SECTIONS))
+    s = rng.choice(len(SECTIONS), n, p=POIDS_SECTIONS / POIDS_SECTIONS.sum())
+    dept = rng.integers(0, len(DEPARTEMENTS), n)
+    cj = rng.choice([5499, 5710, 5498, 6540], n, p=[0.45, 0.45, 0.0995, 0.0005])
+    tranche = rng.choice([0, 1, 3, 6, 10, 20], n)
+    # Durées log-logistiques dépendant des features, censure administrative à 30 ans
+    mu = 2.2 - RISQUE_SECTIONS[s] - 0.05 * dept + 0.03 * tranche + 0.2 * (cj == 5710)
+    duree = np.exp(mu + 0.6 * np.log(rng.random(n) / (1 - rng.random(n) + 1e-12) + 1e-12))
+    observe = rng.uniform(0, 30, n)
+    fermeture = (duree <= observe).astype(np.int64)
+    age = np.floor(np.minimum(duree, observe)).astype(np.int64)
+    return pd.DataFrame({
+        "SIREN": [f"{i:09d}" for i in range(debut, debut + n)],
+        "Dénomination de l'unité légale": [f"SOCIETE {i}" for i in range(debut, debut + n)],
+        "Code postal de l'établissement": rng.integers(1000, 98000, n).astype(str),
+        "Code commune de l'établissement": rng.integers(1000, 98000, n).astype(str),
+        COL_CJ: cj,
+        "Activité principale de l'unité légale": [f"{codes[i]}.11Z" for i in s],
+        COL_ESS: rng.choice(["O", "N"], n, p=[0.03, 0.97]),
+        COL_DEPT: np.array(DEPARTEMENTS)[dept],
+        "Code de la région de l'établissement": rng.choice(["11", "84", "93"], n),
+        "Date_fermeture_finale": np.where(fermeture == 1, "2020-01-01", None),
+        "Tranche_effectif_num": tranche.astype(float),
+        "age_estime": age,
+        "latitude": rng.uniform(41, 51, n),
+        "longitude": rng.uniform(-5, 9, n),
+        COL_CODE_APE: codes[s],
+        COL_SECTION: np.array(list(SECTIONS.values()))[s],
+        "fermeture": fermeture,
+    })
+
+
+def generer_dataset(chemin, n, seed=0, taille=100_000):
+    rng = np.random.default_rng(seed)
+    writer = None
+    try:
+        for debut in range(0, n, taille):
+            table = pa.Table.from_pandas(_lot(rng, debut, min(taille, n - debut)), preserve_index=False)
+            writer = writer or pq.ParquetWriter(chemin, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer:
+            writer.close()
+
+
+# --- 2. RÔLES (processus séparés) ---
+def _notebook(chemin, params, rounds):
+    """Chaîne du notebook 08_xgboost_v4 : tout le dataset en mémoire, get_dummies, DMatrix"""
+    sys.path.append(str(Path(__file__).resolve().parents[2] / "api" / "api-business-risk"))
+    from features import reference_notebook
+
+    df = pd.read_parquet(chemin)
+    X, index = reference_notebook(df)
+    lignes = df.loc[index]
+    valid = masque_validation(lignes)
+    temps = lignes["age_estime"].to_numpy(dtype=np.float64)
+    evenement = lignes["fermeture"].to_numpy() == 1
+    haut = np.where(evenement, temps, np.inf)
+    dtrain = xgb.DMatrix(X[~valid])
+    dtrain.set_float_info("label_lower_bound", temps[~valid])
+    dtrain.set_float_info("label_upper_bound", haut[~valid])
+    dvalid = xgb.DMatrix(X[valid])
+    dvalid.set_float_info("label_lower_bound", temps[valid])
+    dvalid.set_float_info("label_upper_bound", haut[valid])
+    booster = xgb.train(params, dtrain, num_boost_round=rounds, evals=[(dvalid, "valid")],
+                        early_stopping_rounds=50, verbose_eval=False)
+    booster = booster[: booster.best_iteration + 1]
+    mu = booster.predict(dvalid, output_margin=True)
+    evaluation = evaluer(mu, temps[valid], evenement[valid], params["aft_loss_distribution_scale"], temps[~valid],
+                         evenement[~valid])
+    return {**{f"valid_{nom}": v for nom, v in evaluation.items()}, "features": list(X.columns)}
+
+
+def _flux(chemin, dossier, params, rounds, taille_lot, cache):
+    from .modele import entrainer
+
+    _, spec, metriques = entrainer(chemin, dossier, params, num_boost_round=rounds, early_stopping=50,
+                                   taille_lot=int(taille_lot), cache_externe=cache or None, verbose_eval=False)
+    return {**metriques, "features": spec.features}
+
+
+def _role(role, chemin, dossier, rounds, taille_lot, cache=""):
+    params = {**PARAMS_DEFAUT, "nthread": 1}
+    debut = time.perf_counter()
+    if role == "notebook":
+        resultat = _notebook(chemin, params, int(rounds))
+    else:
+        resultat = _flux(chemin, dossier, params, int(rounds), taille_lot, cache)
+    resultat.update(duree_s=time.perf_counter() - debut,
+                    rss_max_mo=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024)
+    print(json.dumps(resultat))
+
+
+def _mesurer(role, *args):
+    commande = [sys.executable, "-m", "entrainement.verification", role, *map(str, args)]
+    sortie = subprocess.run(commande, cwd=Path(__file__).resolve().parent.parent, capture_output=True, text=True)
+    if sortie.returncode:
+        raise RuntimeError(f"{role} a échoué :\n{sortie.stdout}\n{sortie.stderr}")
+    return json.loads(sortie.stdout.strip().splitlines()[-1])
+
+
+# --- 3. SCÉNARIO ---
+def check(n, rounds=300, taille_lot=None):
+    base = Path(tempfile.mkdtemp(prefix="entrainement_check_"))
+    erreurs = []
+    try:
+        # C-index vectorisé contre la définition par paires (égalités de temps et de risque comprises)
+        rng = np.random.default_rng(1)
+        for _ in range(20):
+            k = int(rng.integers(1, 400))
+            t, e, r = rng.integers(0, 12, k), rng.random(k) < 0.4, rng.integers(0, 8, k) / 4
+            a, b = c_index(t, e, r), c_index_naif(t, e, r)
+            if not (np.isnan(a) and np.isnan(b)) and abs(a - b) > 1e-12:
+                erreurs.append(f"C-index {a} au lieu de {b} (n={k})")
+                break
+
+        chemin = base / "dataset_full.parquet"
+        generer_dataset(chemin, n)
+        taille_lot = taille_lot or max(10_000, n // 10)
+        m_nb = _mesurer("notebook", chemin, base / "notebook", rounds, taille_lot)
+        m_flux = _mesurer("flux", chemin, base / "flux", rounds, taille_lot)
+        m_ext = _mesurer("flux", chemin, base / "externe", rounds, taille_lot, base / "cache")
+        for nom, m in (("Notebook", m_nb), ("Par lots", m_flux), ("Mémoire externe", m_ext)):
+            print(f"⏱️ {nom:<16}: {m['duree_s']:6.1f}s, pic {m['rss_max_mo']:5.0f} Mo | "
+                  f"NLogLik={m['valid_nloglik']:.4f} C-index={m['valid_c_index']:.4f}")
+
+        for nom, m in (("par lots", m_flux), ("mémoire externe", m_ext)):
+            if m["features"] != m_nb["features"]:
+                erreurs.append(f"{nom} : features différentes du notebook")
+            if abs(m["valid_nloglik"] - m_nb["valid_nloglik"]) > 0.01:
+                erreurs.append(f"{nom} : NLogLik {m['valid_nloglik']:.4f} contre {m_nb['valid_nloglik']:.4f}")
+            if abs(m["valid_c_index"] - m_nb["valid_c_index"]) > 0.01:
+                erreurs.append(f"{nom} : C-index {m['valid_c_index']:.4f} contre {m_nb['valid_c_index']:.4f}")
+        if m_flux["rss_max_mo"] >= m_nb["rss_max_mo"]:
+            erreurs.append("pic mémoire de l'entraînement par lots supérieur à celui du notebook")
+        for fichier in ("model_survie_V3_final.json", "feature_spec.json", "features_config.json", "metriques.json"):
+            if not (base / "flux" / fichier).exists():
+                erreurs.append(f"{fichier} manquant")
+    finally:
+        shutil.rmtree(base, ignore_errors=True)
+
+    print("✅ Vérification réussie" if not erreurs else "❌ " + "\n❌ ".join(erreurs))
+    return not erreurs
+
+
+# --- 4. MÉTRIQUES ---
+def _km_censure_naif(temps, evenement):
+    uniques = np.unique(temps)
+    g, valeurs = 1.0, []
+    for t in uniques:
+        a_risque = (temps >= t).sum() - ((temps == t) & evenement).sum()
+        censures = ((temps == t) & ~evenement).sum()
+        g *= 1 - censures / a_risque if a_risque else 1.0
+        valeurs.append(g)
+    return uniques, np.array(valeurs)
+
+
+def _g_naif(censure, t):
+    uniques, g = censure
+    avant = uniques <= t
+    return g[avant][-1] if avant.any() else 1.0
+
+
+def _auc_naif(temps_train, evenement_train, temps, evenement, risque, horizons):
+    """Algorithme de sksurv.metrics.cumulative_dynamic_auc (courbe ROC parcourue par risque décroissant)"""
+    censure = _km_censure_naif(temps_train, evenement_train)
+    poids = np.array([1 / _g_naif(censure, t) if e else 0.0 for t, e in zip(temps, evenement)])
+    ordre = np.argsort(-risque, kind="stable")
+    scores = []
+    for h in horizons:
+        cas = (temps[ordre] <= h) & evenement[ordre]
+        temoins = temps[ordre] > h
+        vp, fp, precedent, courbe_vp, courbe_fp = 0.0, 0.0, np.inf, [], []
+        for i, est in zip(range(len(ordre)), risque[ordre]):
+            if abs(est - precedent) > np.finfo(float).eps:
+                courbe_vp.append(vp)
+                courbe_fp.append(fp)
+                precedent = est
+            if cas[i]:
+                vp += poids[ordre][i]
+            elif temoins[i]:
+                fp += 1
+        courbe_vp.append(vp)
+        courbe_fp.append(fp)
+        sens = np.array(courbe_vp) / poids[ordre][cas].sum()
+        fpr = np.array(courbe_fp) / temoins.sum()
+        scores.append(np.sum(np.diff(fpr) * (sens[1:] + sens[:-1]) / 2))
+    return np.array(scores)
+
+
+def _brier_naif(temps_train, evenement_train, temps, evenement, survie, horizons):
+    censure = _km_censure_naif(temps_train, evenement_train)
+    scores = []
+    for j, h in enumerate(horizons):
+        total = 0.0
+        for i in range(len(temps)):
+            if temps[i] <= h and evenement[i]:
+                total += survie[i, j] ** 2 / _g_naif(censure, temps[i])
+            elif temps[i] > h:
+                total += (1 - survie[i, j]) ** 2 / _g_naif(censure, h)
+        scores.append(total / len(temps))
+    return np.array(scores)
+
+
+def _references_sksurv():
+    try:
+        from sksurv.metrics import (brier_score, concordance_index_censored, cumulative_dynamic_auc,
+                                    integrated_brier_score)
+        from sksurv.util import Surv
+    except ImportError:
+        return None
+
+    def references(tt, et, t, e, r, survie, horizons):
+        train, test = Surv.from_arrays(et, tt), Surv.from_arrays(e, t)
+        return {"c_index": concordance_index_censored(e, t, r)[0],
+                "auc": cumulative_dynamic_auc(train, test, r, horizons)[0],
+                "brier": brier_score(train, test, survie, horizons)[1],
+                "ibs": integrated_brier_score(train, test, survie, horizons)}
+    return references
+
+
+def _references_naives(tt, et, t, e, r, survie, horizons):
+    brier_naif = _brier_naif(tt, et, t, e, survie, horizons)
+    return {"c_index": c_index_naif(t, e, r), "auc": _auc_naif(tt, et, t, e, r, horizons), "brier": brier_naif,
+            "ibs": np.sum(np.diff(horizons) * (brier_naif[1:] + brier_naif[:-1]) / 2) / (horizons[-1] - horizons[0])}
+
+
+def _echantillon_survie(rng, n, sigma=0.8):
+    mu = rng.normal(2.0, 0.7, n)
+    duree = np.exp(mu + sigma * np.log(rng.random(n) / (1 - rng.random(n) + 1e-12) + 1e-12))
+    suivi_admin = rng.uniform(1, 30, n)
+    temps = np.maximum(np.floor(np.minimum(duree, suivi_admin)), 1.0)
+    return mu, temps, duree <= suivi_admin
+
+
+def check_metriques(n=1_000_000):
+    from .metriques import auc_dynamique, brier, brier_integre, km_censure, nloglik_aft, survie_aft
+
+    erreurs = []
+    rng = np.random.default_rng(3)
+    references = _references_sksurv()
+    print("🔎 Référence : " + ("sksurv" if references else "sksurv absent, algorithmes de sksurv réimplémentés"))
+    references = references or _references_naives
+    horizons = np.array([1.0, 2.0, 3.0])
+    for essai in range(8):
+        k = int(rng.integers(50, 400))
+        mu_train, tt, et = _echantillon_survie(rng, k)
+        mu, t, e = _echantillon_survie(rng, k)
+        # Risques arrondis : égalités de risque et de temps exercées
+        r = np.round(-mu, 1)
+        survie = survie_aft(mu, horizons, 0.8)
+        ref = references(tt, et, t, e, r, survie, horizons)
+        obtenu = {"c_index": c_index(t, e, r), "auc": auc_dynamique(tt, et, t, e, r, horizons),
+                  "brier": brier(tt, et, t, e, survie, horizons),
+                  "ibs": brier_integre(tt, et, t, e, survie, horizons)}
+        for nom, valeur in obtenu.items():
+            if not np.allclose(valeur, ref[nom], rtol=1e-9, atol=1e-12, equal_nan=True):
+                erreurs.append(f"{nom} (essai {essai}, n={k}) : {valeur} au lieu de {ref[nom]}")
+        if not np.allclose(km_censure(tt, et)[1], _km_censure_naif(tt, et)[1]):
+            erreurs.append(f"Kaplan-Meier de la censure différent (essai {essai})")
+    if not erreurs:
+        print("🟰 C-index, AUC 1/2/3 ans, Brier et IBS identiques à la référence (8 échantillons)")
+
+    # aft-nloglik : valeur de la métrique native pendant l'entraînement (celle de l'early stopping), à une
+    # échelle différente de 1 pour vérifier que sigma est bien celui du modèle. Booster.eval() appelé après
+    # coup évalue, lui, avec sigma = 1 (XGBoost 3.2) : il ne sert pas de référence.
+    nb_erreurs = len(erreurs)
+    X = rng.random((3_000, 3))
+    _, t, e = _echantillon_survie(rng, 3_000)
+    haut = np.where(e, t, np.inf)
+    for distribution in ("logistic", "normal", "extreme"):
+        for sigma in (0.6, 1.4):
+            d = xgb.DMatrix(X)
+            d.set_float_info("label_lower_bound", t)
+            d.set_float_info("label_upper_bound", haut)
+            historique = {}
+            booster = xgb.train({"objective": "survival:aft", "aft_loss_distribution": distribution,
+                                 "aft_loss_distribution_scale": sigma, "eval_metric": "aft-nloglik", "nthread": 1},
+                                d, 5, evals=[(d, "valid")], evals_result=historique, verbose_eval=False)
+            attendu = historique["valid"]["aft-nloglik"][-1]
+            obtenu = nloglik_aft(booster.predict(d, output_margin=True), t, haut, sigma, distribution)
+            if abs(obtenu - attendu) > 1e-6 * max(1.0, abs(attendu)):
+                erreurs.append(f"aft-nloglik {distribution} (sigma={sigma}) : {obtenu} au lieu de {attendu}")
+    if len(erreurs) == nb_erreurs:
+        print("🟰 aft-nloglik identique à XGBoost à l'échelle du modèle (logistic, normal, extreme ; sigma 0.6, 1.4)")
+
+    # Ensemble de validation de taille réelle
+    mu_train, tt, et = _echantillon_survie(rng, 4 * n)
+    mu, t, e = _echantillon_survie(rng, n)
+    mu = mu.astype(np.float32)
+    for nom, calcul in (
+        ("C-index", lambda: c_index(t, e, -mu)),
+        ("AUC 1/2/3 ans", lambda: auc_dynamique(tt, et, t, e, -mu, horizons)),
+        ("Brier intégré", lambda: brier_integre(tt, et, t, e, survie_aft(mu, np.linspace(1, 3, 21), 0.8),
+                                                np.linspace(1, 3, 21))),
+        ("NLogLik", lambda: nloglik_aft(mu, t, np.where(e, t, np.inf), 0.8)),
+    ):
+        debut = time.perf_counter()
+        calcul()
+        print(f"⏱️ {nom:<14}: {time.perf_counter() - debut:5.2f}s sur {n} lignes")
+
+    print("✅ Vérification réussie" if not erreurs else "❌ " + "\n❌ ".join(erreurs))
+    return not erreurs
+
+
+if __name__ == "__main__":
+    _role(*sys.argv[1:])